@@ -0,0 +1,143 @@
+# benchmarks/bench_block_memory.py
+#
+# Memory and hashing CPU of an in-memory chain, for the slotted Block/SignedTransaction
+# objects against the previous representation (a plain object whose transactions are
+# {'transaction_dict', 'signature_hex'} dicts of hex strings and whose hash, Merkle root
+# and transaction ids are recomputed on every use).
+#
+# Blocks are decoded from their canonical encoding, as when read from the BlockStore or
+# received from a peer, with a few delegates proposing and a fixed set of senders.
+# Each representation is measured in its own process. Uses random bytes of
+# Dilithium2/Kyber512 sizes, so liboqs is not needed.
+#
+#   python benchmarks/bench_block_memory.py --blocks 100000 --txs-per-block 1
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from core import merkle, serialization
+from core.block import Block
+from core.signed_transaction import transaction_id
+
+DILITHIUM2_PUBLIC_KEY = 1312
+DILITHIUM2_SIGNATURE = 2420
+KYBER512_CIPHERTEXT = 768
+
+class LegacyBlock:
+    """The previous Block: attributes in a __dict__, nothing derived is kept."""
+
+    def __init__(self, block_data: dict):
+        self.index = block_data['index']
+        self.transactions = block_data['transactions']
+        self.previous_hash = block_data['previous_hash']
+        self.proposer_address = block_data['proposer_address']
+        self.timestamp = block_data['timestamp']
+        self.merkle_root = block_data['merkle_root']
+        self.hash = block_data['hash']
+
+    def is_valid(self) -> bool:
+        leaves = [merkle.leaf_hash(serialization.encode_signed_transaction(signed_tx)) for signed_tx in self.transactions]
+        header = {'index': self.index, 'timestamp': self.timestamp, 'previous_hash': self.previous_hash,
+                  'proposer_address': self.proposer_address, 'merkle_root': self.merkle_root, 'tx_count': len(self.transactions)}
+        return self.merkle_root == merkle.merkle_root(leaves).hex() and self.hash == Block.hash_header(header)
+
+    def txids(self) -> list[str]:
+        return [transaction_id(signed_tx['transaction_dict']) for signed_tx in self.transactions]
+
+def encoded_blocks(count: int, txs_per_block: int, senders: int, delegates: int, seed: int):
+    """Yields the canonical encodings of a chain of `count` blocks, one at a time."""
+    rng = random.Random(seed)
+    sender_keys = [rng.randbytes(DILITHIUM2_PUBLIC_KEY).hex() for _ in range(senders)]
+    delegate_keys = [rng.randbytes(DILITHIUM2_PUBLIC_KEY).hex() for _ in range(delegates)]
+    previous_hash = "0" * 64
+    for height in range(1, count + 1):
+        transactions = []
+        for _ in range(txs_per_block):
+            tx_dict = {
+                "sender_address": rng.choice(sender_keys),
+                "recipient_address": rng.choice(sender_keys),
+                "timestamp": height + rng.random(),
+                "tx_type": "message",
+                "content": {"ciphertext": rng.randbytes(KYBER512_CIPHERTEXT).hex(), "nonce": rng.randbytes(12).hex(),
+                            "payload": rng.randbytes(64).hex()}
+            }
+            transactions.append({'transaction_dict': tx_dict, 'signature_hex': rng.randbytes(DILITHIUM2_SIGNATURE).hex()})
+        block = Block(height, transactions, previous_hash, delegate_keys[height % delegates], timestamp=float(height))
+        previous_hash = block.hash
+        yield block.to_bytes()
+
+def timed_pass(blocks: list, check) -> float:
+    start = time.perf_counter()
+    for block in blocks:
+        check(block)
+    return time.perf_counter() - start
+
+def measure(mode: str, args) -> dict:
+    """Builds the chain in one representation and measures it (runs in a child process)."""
+    source = encoded_blocks(args.blocks, args.txs_per_block, args.senders, args.delegates, args.seed)
+    if mode == "legacy":
+        decode = lambda data: LegacyBlock(serialization.decode_block(data))
+        txids = LegacyBlock.txids
+    else:
+        decode = Block.from_bytes
+        txids = lambda block: [signed_tx.txid for signed_tx in block.transactions]
+
+    tracemalloc.start()
+    blocks, decode_seconds = [], 0.0
+    for data in source:
+        start = time.perf_counter()
+        blocks.append(decode(data))
+        decode_seconds += time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Validation is repeated e.g. when a reorg re-applies side blocks or a synced range is re-checked;
+    # mempool cleanup and relay look up the transaction ids of every block.
+    return {
+        "bytes_per_block": held / args.blocks,
+        "decode": decode_seconds,
+        "validate_first": timed_pass(blocks, lambda block: block.is_valid()),
+        "validate_again": timed_pass(blocks, lambda block: block.is_valid()),
+        "txids_first": timed_pass(blocks, txids),
+        "txids_again": timed_pass(blocks, txids),
+    }
+
+def main(args):
+    if args.mode:
+        print(json.dumps(measure(args.mode, args)))
+        return
+    results = {}
+    for mode in ("legacy", "slotted"):
+        command = [sys.executable, __file__, "--mode", mode, "--blocks", str(args.blocks), "--txs-per-block", str(args.txs_per_block),
+                   "--senders", str(args.senders), "--delegates", str(args.delegates), "--seed", str(args.seed)]
+        results[mode] = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+
+    legacy, slotted = results["legacy"], results["slotted"]
+    print(f"{args.blocks} blocks x {args.txs_per_block} txs, {args.senders} senders, {args.delegates} delegates")
+    print(f"{'':<22}{'legacy':>12}{'slotted':>12}")
+    print(f"{'memory / block':<22}{legacy['bytes_per_block'] / 1024:>9.1f} KB{slotted['bytes_per_block'] / 1024:>9.1f} KB"
+          f"   ({slotted['bytes_per_block'] / legacy['bytes_per_block']:.0%}, "
+          f"{(legacy['bytes_per_block'] - slotted['bytes_per_block']) * args.blocks / 2 ** 20:.0f} MB saved)")
+    for key, label in (("decode", "decode (traced)"), ("validate_first", "validate (1st pass)"), ("validate_again", "validate (2nd pass)"),
+                       ("txids_first", "txids (1st pass)"), ("txids_again", "txids (2nd pass)")):
+        print(f"{label:<22}{legacy[key]:>10.2f} s{slotted[key]:>10.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the memory and hashing cost of an in-memory chain.")
+    parser.add_argument('--blocks', type=int, default=100_000, help="Chain length.")
+    parser.add_argument('--txs-per-block', type=int, default=1, help="Message transactions per block.")
+    parser.add_argument('--senders', type=int, default=100, help="Distinct transaction senders.")
+    parser.add_argument('--delegates', type=int, default=4, help="Distinct block proposers.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mode', choices=("legacy", "slotted"), help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,235 @@
+# benchmarks/bench_cluster.py
+#
+# End-to-end benchmark of a local cluster (see benchmarks/cluster.py): drives a signed
+# transaction load at a fixed rate, spread over all nodes, and reports
+#
+#   - throughput: transactions confirmed per second
+#   - confirmation latency (p50/p99): from submission until the block holding the
+#     transaction is on the main chain of every node
+#   - block propagation (p50/p99): from the first node having a block to the last
+#   - CPU and memory (per node for --mode process, per process for --mode inprocess)
+#   - sync time of a node that joins empty after the load
+#
+# Results are written as JSON, tagged with the git commit, so runs can be compared across
+# commits with --compare.
+#
+#   python benchmarks/bench_cluster.py --nodes 4 --transactions 2000 --rate 500
+#   python benchmarks/bench_cluster.py --nodes 7 --latency 0.02 --jitter 0.01 --loss 0.01
+#   python benchmarks/bench_cluster.py --mode process --nodes 4 --compare bench_results/old.json
+#   python benchmarks/bench_cluster.py --nodes 50 --crypto-provider simulated
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from bench_pbft import make_transactions, percentile
+from cluster import InProcessCluster, ProcessCluster
+from core.mempool import transaction_id
+from crypto import providers
+from network.admission import ADMITTED
+
+# Seconds between load batches; each batch goes to the next node in turn.
+BATCH_INTERVAL = 0.05
+# Metrics shown by --compare, and whether higher is better.
+COMPARED_METRICS = {"tps": True, "confirmation_p50_ms": False, "confirmation_p99_ms": False, "propagation_p50_ms": False,
+                    "propagation_p99_ms": False, "join_sync_seconds": False}
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=parent_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def drive_load(cluster, transactions: list[dict], rate: float, node_count: int) -> tuple[dict, Counter]:
+    """
+    Submits the transactions at `rate` per second, a batch every BATCH_INTERVAL, round robin
+    over the nodes. Returns (txid -> submission time of admitted transactions, status counts).
+    """
+    loop = asyncio.get_running_loop()
+    submitted_at, statuses, pending = {}, Counter(), []
+
+    async def submit(node_index: int, batch: list):
+        started = time.time()
+        for signed_tx, status in zip(batch, await cluster.submit(node_index, batch)):
+            statuses[status] += 1
+            if status == ADMITTED:
+                submitted_at[transaction_id(signed_tx['transaction_dict'])] = started
+
+    per_batch, start, sent, tick = rate * BATCH_INTERVAL, loop.time(), 0, 0
+    while sent < len(transactions):
+        due = min(len(transactions), int(per_batch * (tick + 1)))
+        if due > sent:
+            pending.append(asyncio.create_task(submit(tick % node_count, transactions[sent:due])))
+            sent = due
+        tick += 1
+        await asyncio.sleep(max(0.0, start + tick * BATCH_INTERVAL - loop.time()))
+    await asyncio.gather(*pending)
+    return submitted_at, statuses
+
+def confirmations(block_times, submitted_at: dict, node_count: int) -> dict:
+    """txid -> time its block was on all `node_count` original nodes."""
+    confirmed = {}
+    for block_hash, arrivals in block_times.arrivals.items():
+        if sum(1 for index in arrivals if index < node_count) < node_count:
+            continue
+        everywhere = max(at for index, at in arrivals.items() if index < node_count)
+        for txid in block_times.txids.get(block_hash, ()):
+            if txid in submitted_at:
+                confirmed[txid] = everywhere
+    return confirmed
+
+async def wait_for_confirmations(cluster, submitted_at: dict, node_count: int, timeout: float) -> dict:
+    deadline = time.time() + timeout
+    while True:
+        confirmed = confirmations(cluster.block_times, submitted_at, node_count)
+        if len(confirmed) >= len(submitted_at) or time.time() > deadline:
+            return confirmed
+        await asyncio.sleep(0.05)
+
+async def measure_join(cluster, node_count: int, timeout: float) -> dict:
+    target = max((await cluster.heights())[:node_count])
+    started = time.time()
+    joiner = await cluster.add_joiner()
+    while (await cluster.heights())[joiner] < target:
+        if time.time() - started > timeout:
+            return {"synced": False, "target_height": target, "seconds": None}
+        await asyncio.sleep(0.02)
+    return {"synced": True, "target_height": target, "seconds": time.time() - started}
+
+def usage_delta(before: dict, after: dict, elapsed: float) -> dict:
+    def delta(first: dict, last: dict) -> dict:
+        cpu = last["cpu_seconds"] - first["cpu_seconds"]
+        return {"cpu_seconds": cpu, "cpu_percent": 100 * cpu / elapsed, "peak_rss_mb": last["peak_rss_mb"]}
+    if "nodes" in after:
+        return {"nodes": [delta(first, last) for first, last in zip(before["nodes"], after["nodes"])]}
+    return {"process": delta(before["process"], after["process"]), "links": after["links"]}
+
+async def run(args) -> dict:
+    transactions = make_transactions(args.transactions, clients=args.clients)
+    options = dict(delegates=args.delegates, block_max_txs=args.block_max_txs, block_interval=args.block_interval,
+                   mempool_max_txs=max(args.transactions + 1, 1000), validation_workers=args.validation_workers)
+    if args.mode == "process":
+        cluster = ProcessCluster(args.nodes, log_dir=os.path.join(args.output_dir, "logs"), **options)
+    else:
+        cluster = InProcessCluster(args.nodes, latency=args.latency, jitter=args.jitter, loss=args.loss, seed=args.seed, **options)
+
+    await cluster.start()
+    try:
+        before = await cluster.resource_usage()
+        start = time.time()
+        submitted_at, statuses = await drive_load(cluster, transactions, args.rate, args.nodes)
+        confirmed = await wait_for_confirmations(cluster, submitted_at, args.nodes, args.drain_timeout)
+        elapsed = time.time() - start
+        usage = usage_delta(before, await cluster.resource_usage(), elapsed)
+        join = await measure_join(cluster, args.nodes, args.join_timeout) if args.join else None
+    finally:
+        await cluster.stop()
+
+    latencies = [confirmed[txid] - submitted_at[txid] for txid in confirmed]
+    propagation = []
+    for arrivals in cluster.block_times.arrivals.values():
+        times = [at for index, at in arrivals.items() if index < args.nodes]
+        if len(times) == args.nodes:
+            propagation.append(max(times) - min(times))
+    confirmation_span = (max(confirmed.values()) - min(submitted_at.values())) if confirmed else 0.0
+    return {
+        "submitted": len(transactions),
+        "statuses": dict(statuses),
+        "confirmed": len(confirmed),
+        "blocks": len(propagation),
+        "elapsed_seconds": elapsed,
+        "tps": len(confirmed) / confirmation_span if confirmation_span else 0.0,
+        "confirmation_p50_ms": percentile(latencies, 0.5) * 1000,
+        "confirmation_p99_ms": percentile(latencies, 0.99) * 1000,
+        "propagation_p50_ms": percentile(propagation, 0.5) * 1000,
+        "propagation_p99_ms": percentile(propagation, 0.99) * 1000,
+        "join_sync_seconds": join["seconds"] if join else None,
+        "join": join,
+        "resources": usage
+    }
+
+def compare(previous: dict, current: dict):
+    print(f"\nCompared with {previous.get('commit') or 'unknown commit'} ({previous.get('created')}):")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = previous["results"].get(metric), current["results"].get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change > 0) == higher_is_better
+        print(f"  {metric:<22}{old:>12.1f}{new:>12.1f}{change:>+9.1f}%  {'better' if better or change == 0 else 'worse'}")
+
+async def main(args):
+    logging.getLogger().setLevel(logging.ERROR)
+    # Also inherited by the node processes of --mode process.
+    providers.configure(provider=args.crypto_provider, seed=args.crypto_seed)
+    results = await run(args)
+    report = {
+        "benchmark": "cluster",
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "config": vars(args),
+        "results": results
+    }
+
+    print(f"{results['confirmed']}/{results['submitted']} transactions confirmed in {results['blocks']} blocks "
+          f"({results['elapsed_seconds']:.1f}s, statuses {results['statuses']})")
+    print(f"  throughput      {results['tps']:.1f} tx/s")
+    print(f"  confirmation    p50 {results['confirmation_p50_ms']:.1f} ms, p99 {results['confirmation_p99_ms']:.1f} ms")
+    print(f"  propagation     p50 {results['propagation_p50_ms']:.1f} ms, p99 {results['propagation_p99_ms']:.1f} ms")
+    if results["join"]:
+        join = results["join"]
+        print(f"  joiner sync     {join['seconds']:.2f} s to height {join['target_height']}" if join["synced"]
+              else f"  joiner sync     did not reach height {join['target_height']}")
+    for label, usage in ([(f"node {i}", u) for i, u in enumerate(results["resources"]["nodes"])] if "nodes" in results["resources"]
+                         else [("process", results["resources"]["process"])]):
+        print(f"  {label:<16}cpu {usage['cpu_seconds']:.2f} s ({usage['cpu_percent']:.0f}%), peak rss {usage['peak_rss_mb']:.0f} MB")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(args.output_dir, f"cluster-{args.mode}-n{args.nodes}-{report['commit'] or 'nocommit'}-{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark throughput, latency, propagation and sync on a local multi-node cluster.")
+    parser.add_argument('--mode', choices=("inprocess", "process"), default="inprocess",
+                        help="Nodes in this process behind simulated links, or one headless process per node.")
+    parser.add_argument('--nodes', type=int, default=4, help="Cluster size (fully meshed).")
+    parser.add_argument('--delegates', type=int, default=5, help="Committee size elected among the nodes.")
+    parser.add_argument('--transactions', type=int, default=2000, help="Transactions submitted in total.")
+    parser.add_argument('--rate', type=float, default=500.0, help="Submitted transactions per second.")
+    parser.add_argument('--clients', type=int, default=10, help="Distinct sender wallets.")
+    parser.add_argument('--block-max-txs', type=int, default=None, help="Largest number of transactions per block (node default if omitted).")
+    parser.add_argument('--block-interval', type=float, default=0.5, help="Seconds before a partly filled block is cut.")
+    parser.add_argument('--validation-workers', type=int, default=None,
+                        help="Validation processes per node for incoming transaction messages (node default if omitted).")
+    parser.add_argument('--latency', type=float, default=0.0, help="One-way link delay in seconds (in-process mode).")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random extra delay of up to this many seconds per frame (in-process mode).")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probability that a frame is dropped (in-process mode).")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for the simulated links.")
+    parser.add_argument('--crypto-provider', choices=list(providers.PROVIDERS), default=None,
+                        help="Crypto backend; 'simulated' takes signing and verification out of the measurement.")
+    parser.add_argument('--crypto-seed', type=int, default=None, help="Seed of the simulated crypto provider.")
+    parser.add_argument('--drain-timeout', type=float, default=60.0, help="Seconds to wait for the last confirmations after the load.")
+    parser.add_argument('--no-join', dest='join', action='store_false', help="Skip the joining node sync measurement.")
+    parser.add_argument('--join-timeout', type=float, default=60.0, help="Seconds the joining node may take to sync.")
+    parser.add_argument('--output-dir', type=str, default="bench_results", help="Folder for the JSON results (and node logs).")
+    parser.add_argument('--compare', type=str, default=None, help="Earlier results file to compare this run with.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+# benchmarks/bench_crypto.py
+#
+# Throughput and sizes of every supported parameter set, per crypto provider:
+#   - signatures (Dilithium2/3/5, ML-DSA-44/65/87): keygen, sign, verify per second,
+#     public key / secret key / signature bytes
+#   - KEMs (Kyber512/768/1024, ML-KEM-512/768/1024): keygen, encapsulate, decapsulate per
+#     second, public key / secret key / ciphertext bytes
+# The operations go through dilithium_utils and kyber_utils, as the node calls them.
+#
+# Then node cold start, in fresh processes: interpreter start, importing the node modules
+# (no backend is loaded yet), the first key generation (loads the backend), and a headless
+# node answering its API.
+#
+#   python benchmarks/bench_crypto.py
+#   python benchmarks/bench_crypto.py --providers simulated --seconds 0.2 --no-cold-start
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from cluster import NODE_SCRIPT, RpcClient, free_port
+from crypto import dilithium_utils, kyber_utils, providers
+
+COLD_START_RUNS = 5
+NODE_STARTUP_TIMEOUT = 60.0
+
+def throughput(func, seconds: float) -> float:
+    """Calls func() repeatedly for about `seconds` and returns calls per second."""
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+def bench_signature(seconds: float) -> dict:
+    public_key, secret_key = dilithium_utils.generate_keys()
+    message = os.urandom(1024)
+    signature = dilithium_utils.sign(secret_key, message)
+    assert dilithium_utils.verify(public_key, message, signature)
+    assert not dilithium_utils.verify(public_key, message + b"!", signature)
+    return {
+        "keygen": throughput(dilithium_utils.generate_keys, seconds),
+        "sign": throughput(lambda: dilithium_utils.sign(secret_key, message), seconds),
+        "verify": throughput(lambda: dilithium_utils.verify(public_key, message, signature), seconds),
+        "sizes": (len(public_key), len(secret_key), len(signature)),
+    }
+
+def bench_kem(seconds: float) -> dict:
+    public_key, secret_key = kyber_utils.generate_keys()
+    ciphertext, shared_secret = kyber_utils.encapsulate_key(public_key)
+    assert kyber_utils.decapsulate_key(secret_key, ciphertext) == shared_secret
+    return {
+        "keygen": throughput(kyber_utils.generate_keys, seconds),
+        "encapsulate": throughput(lambda: kyber_utils.encapsulate_key(public_key), seconds),
+        "decapsulate": throughput(lambda: kyber_utils.decapsulate_key(secret_key, ciphertext), seconds),
+        "sizes": (len(public_key), len(secret_key), len(ciphertext)),
+    }
+
+def available_algorithms(provider: str) -> tuple[list[str], list[str]] | None:
+    """The provider's enabled (signature, KEM) algorithms, or None if it cannot be loaded."""
+    providers.configure(provider=provider, signature_algorithm=providers.DEFAULT_SIGNATURE_ALGORITHM,
+                        kem_algorithm=providers.DEFAULT_KEM_ALGORITHM)
+    try:
+        backend = providers.get_provider()
+    except (ImportError, ValueError, RuntimeError) as e:
+        print(f"\n--- {provider}: not available ({type(e).__name__}: {e}) ---")
+        return None
+    return backend.enabled_signature_algorithms(), backend.enabled_kem_algorithms()
+
+def run_matrix(provider: str, seconds: float):
+    algorithms = available_algorithms(provider)
+    if algorithms is None:
+        return
+    signature_algorithms, kem_algorithms = algorithms
+    print(f"\n--- {provider}: signatures (operations/s; public key, secret key, signature bytes) ---")
+    print(f"  {'':<12}{'keygen':>10}{'sign':>10}{'verify':>10}    sizes")
+    for algorithm in signature_algorithms:
+        providers.configure(signature_algorithm=algorithm)
+        result = bench_signature(seconds)
+        print(f"  {algorithm:<12}{result['keygen']:>10.0f}{result['sign']:>10.0f}{result['verify']:>10.0f}    "
+              f"{' / '.join(str(size) for size in result['sizes'])}")
+
+    print(f"\n--- {provider}: KEMs (operations/s; public key, secret key, ciphertext bytes) ---")
+    print(f"  {'':<12}{'keygen':>10}{'encaps':>10}{'decaps':>10}    sizes")
+    for algorithm in kem_algorithms:
+        providers.configure(kem_algorithm=algorithm)
+        result = bench_kem(seconds)
+        print(f"  {algorithm:<12}{result['keygen']:>10.0f}{result['encapsulate']:>10.0f}{result['decapsulate']:>10.0f}    "
+              f"{' / '.join(str(size) for size in result['sizes'])}")
+
+# --- Cold start ---
+
+def time_python(code: str, env: dict) -> float:
+    """Median wall time of running `code` in a fresh interpreter, in seconds."""
+    samples = []
+    for _ in range(COLD_START_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=parent_dir, env=env, check=True, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+async def time_node_ready(env: dict) -> float:
+    """Seconds from launching a headless node until its API answers."""
+    api_port = free_port()
+    command = [sys.executable, NODE_SCRIPT, "--host", "127.0.0.1", "--port", str(free_port()), "--api-port", str(api_port),
+               "--headless", "--verify-workers", "0"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = RpcClient(api_port)
+    try:
+        while True:
+            try:
+                await client.call("node_status")
+                return time.perf_counter() - start
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                await client.close()
+                if process.poll() is not None or time.perf_counter() - start > NODE_STARTUP_TIMEOUT:
+                    raise RuntimeError("The node did not start.")
+                await asyncio.sleep(0.005)
+    finally:
+        await client.close()
+        process.terminate()
+        process.wait()
+
+def run_cold_start(provider: str):
+    env = dict(os.environ, **{providers.PROVIDER_ENV: provider, providers.SIGNATURE_ALGORITHM_ENV: providers.DEFAULT_SIGNATURE_ALGORITHM,
+                              providers.KEM_ALGORITHM_ENV: providers.DEFAULT_KEM_ALGORITHM})
+    env.pop(providers.SEED_ENV, None)
+    interpreter = time_python("pass", env)
+    imports = time_python("import sys, network.node; assert 'oqs' not in sys.modules", env)
+    try:
+        first_keys = time_python("import network.node; from core.wallet import Wallet; Wallet()", env)
+    except subprocess.CalledProcessError as e:
+        print(f"  {provider:<12}cannot generate keys: {e.stderr.decode().strip().splitlines()[-1]}")
+        return
+    ready = statistics.median(asyncio.run(time_node_ready(env)) for _ in range(COLD_START_RUNS))
+    print(f"  {provider:<12}{interpreter * 1000:>12.0f}{imports * 1000:>12.0f}{first_keys * 1000:>12.0f}{ready * 1000:>12.0f}")
+
+def main(args):
+    for provider in args.providers:
+        run_matrix(provider, args.seconds)
+    if args.cold_start:
+        print(f"\n--- Cold start (median of {COLD_START_RUNS} runs, ms from launch) ---")
+        print(f"  {'':<12}{'python':>12}{'imports':>12}{'1st wallet':>12}{'node ready':>12}")
+        for provider in args.providers:
+            run_cold_start(provider)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the crypto providers and parameter sets, and node cold start.")
+    parser.add_argument('--providers', nargs='+', choices=list(providers.PROVIDERS), default=list(providers.PROVIDERS),
+                        help="Providers to measure (default: all).")
+    parser.add_argument('--seconds', type=float, default=0.5, help="Measuring time per operation.")
+    parser.add_argument('--no-cold-start', dest='cold_start', action='store_false', help="Skip the cold start measurements.")
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+# benchmarks/bench_decrypt.py
+#
+# Compares messages decrypted/sec of the old per-call path (a new KEM object and AES-GCM
+# context for every message) against a Wallet's KemSession: cold, warm (secrets cached)
+# and batched across N worker processes.
+#
+#   python benchmarks/bench_decrypt.py --count 2000
+
+import argparse
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from core.wallet import Wallet
+from crypto import kyber_utils, providers
+
+def make_messages(wallet: Wallet, count: int) -> list[dict]:
+    """Encrypts `count` messages to the wallet, in the format used by message transactions."""
+    contents = []
+    for i in range(count):
+        ciphertext, shared_secret = kyber_utils.encapsulate_key(wallet.encryption_public_key)
+        nonce, payload = kyber_utils.encrypt_message(shared_secret, f"benchmark message #{i}")
+        contents.append({"ciphertext": ciphertext.hex(), "nonce": nonce.hex(), "payload": payload.hex()})
+    return contents
+
+def bench_per_call(wallet: Wallet, contents: list[dict]) -> float:
+    start = time.perf_counter()
+    for content in contents:
+        shared_secret = kyber_utils.decapsulate_key(wallet.encryption_secret_key, bytes.fromhex(content['ciphertext']))
+        assert kyber_utils.decrypt_message(shared_secret, bytes.fromhex(content['nonce']), bytes.fromhex(content['payload']))
+    return len(contents) / (time.perf_counter() - start)
+
+def bench_session(wallet: Wallet, contents: list[dict]) -> float:
+    start = time.perf_counter()
+    for content in contents:
+        assert wallet.decrypt_message(content) is not None
+    return len(contents) / (time.perf_counter() - start)
+
+def to_items(contents: list[dict]) -> list[tuple[bytes, bytes, bytes]]:
+    return [(bytes.fromhex(c['ciphertext']), bytes.fromhex(c['nonce']), bytes.fromhex(c['payload'])) for c in contents]
+
+def bench_batched(wallet: Wallet, contents: list[dict], workers: int) -> float:
+    # A separate set of messages starts the worker processes, so the timed run sees no cached secrets.
+    warmup = to_items(make_messages(wallet, kyber_utils.DEFAULT_DECRYPT_CHUNK_SIZE * workers + 1))
+    items = to_items(contents)
+    with kyber_utils.KemSession(wallet.encryption_secret_key, cache_size=len(items)) as session:
+        session.decrypt_many(warmup, max_workers=workers)
+        start = time.perf_counter()
+        results = session.decrypt_many(items, max_workers=workers)
+        elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results)
+    return len(items) / elapsed
+
+def run_benchmark(count: int):
+    print(f"--- Preparing {count} encrypted messages ({providers.kem_algorithm()}) ---")
+    wallet = Wallet()
+    wallet._kem_session = kyber_utils.KemSession(wallet.encryption_secret_key, cache_size=count)
+    contents = make_messages(wallet, count)
+
+    print(f"{'path':<20}{'messages/sec':>15}")
+    per_call = bench_per_call(wallet, contents)
+    print(f"{'per call (before)':<20}{per_call:>15.0f}")
+    cold = bench_session(wallet, contents)
+    print(f"{'session, cold':<20}{cold:>15.0f}  ({cold / per_call:.2f}x)")
+    warm = bench_session(wallet, contents)
+    print(f"{'session, cached':<20}{warm:>15.0f}  ({warm / per_call:.2f}x)")
+    for workers in sorted({2, os.cpu_count() or 1} - {1}):
+        rate = bench_batched(wallet, contents, workers)
+        print(f"{f'batched x{workers}':<20}{rate:>15.0f}  ({rate / per_call:.2f}x)")
+    wallet.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-call vs. session-based message decryption.")
+    parser.add_argument('--count', type=int, default=2000, help="Number of messages to decrypt.")
+    args = parser.parse_args()
+    run_benchmark(args.count)
@@ -0,0 +1,66 @@
+# benchmarks/bench_election.py
+#
+# Delegate election latency for 1k, 10k and 100k nodes:
+#   legacy     - the previous algorithm: hex digests, int(..., 16), a score dict and a full sort
+#   cold       - DPoLConsensus on a fresh membership (builds the per-node hash states)
+#   warm       - a new round (new previous hash) with the cached per-node states
+#   +1% churn  - a round right after 1% of the nodes were replaced
+#
+#   python benchmarks/bench_election.py --nodes 1000,10000,100000 --delegates 21
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+
+def legacy_select(nodes: list[str], previous_block_hash: str, num_delegates: int) -> list[str]:
+    node_scores = {}
+    for node_address in nodes:
+        random_value = hashlib.sha256(f"{node_address}-{previous_block_hash}".encode()).hexdigest()
+        node_scores[node_address] = abs(int(previous_block_hash, 16) - int(random_value, 16))
+    return sorted(node_scores.keys(), key=lambda addr: node_scores[addr])[:num_delegates]
+
+def make_addresses(count: int, salt: str = "node") -> list[str]:
+    # Real addresses are hex Dilithium public keys (1312 bytes); the prefix length matters for hashing cost.
+    return [(hashlib.sha256(f"{salt}{i}".encode()).hexdigest() * 82)[:2624] for i in range(count)]
+
+def timed(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+def run_benchmark(node_counts: list[int], num_delegates: int, rounds: int):
+    print(f"{'nodes':>8} {'path':<12}{'ms/election':>14}")
+    for count in node_counts:
+        nodes = make_addresses(count)
+        hashes = [hashlib.sha256(f"block{r}".encode()).hexdigest() for r in range(rounds + 1)]
+
+        legacy_ms, expected = timed(legacy_select, nodes, hashes[0], num_delegates)
+        print(f"{count:>8} {'legacy':<12}{legacy_ms:>14.2f}")
+
+        consensus = DPoLConsensus(nodes=[], num_delegates=num_delegates)
+        cold_ms, delegates = timed(lambda: (consensus.set_nodes(nodes), consensus.select_delegates(hashes[0]))[1])
+        assert delegates == expected, "election result differs from the legacy algorithm"
+        print(f"{count:>8} {'cold':<12}{cold_ms:>14.2f}")
+
+        warm = [timed(consensus.select_delegates, previous_hash)[0] for previous_hash in hashes[1:]]
+        print(f"{count:>8} {'warm':<12}{sum(warm) / len(warm):>14.2f}  ({legacy_ms / (sum(warm) / len(warm)):.1f}x vs legacy)")
+
+        churned = nodes[count // 100:] + make_addresses(count // 100, salt="joined")
+        churn_ms, _ = timed(lambda: (consensus.set_nodes(churned), consensus.select_delegates(hashes[0]))[1])
+        print(f"{count:>8} {'+1% churn':<12}{churn_ms:>14.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DPoL delegate election latency.")
+    parser.add_argument('--nodes', type=str, default="1000,10000,100000", help="Comma-separated membership sizes.")
+    parser.add_argument('--delegates', type=int, default=21, help="Delegates elected per round.")
+    parser.add_argument('--rounds', type=int, default=5, help="Warm rounds averaged per size.")
+    args = parser.parse_args()
+    run_benchmark([int(n) for n in args.nodes.split(',')], args.delegates, args.rounds)
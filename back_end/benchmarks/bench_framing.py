@@ -0,0 +1,178 @@
+# benchmarks/bench_framing.py
+#
+# Receive throughput of one peer connection and event loop stalls while large frames
+# arrive, for:
+#   - legacy: the previous read loop (4-byte length, no size limit, decoded on the loop)
+#   - plain:  the framing layer, uncompressed; frames from --offload-threshold up are
+#             decoded on a thread
+#   - zlib:   the same with compression negotiated in the HANDSHAKE
+# A load generator process sends BLOCKS messages (sync responses of --blocks blocks with
+# --txs transactions each) over one TCP connection per --connections, as fast as the node
+# reads them. The node decodes them and drops them as unsolicited, so framing and decoding
+# are what is measured. MB/s counts decoded (uncompressed) message bytes per connection;
+# the event loop is probed every 2 ms meanwhile.
+#
+#   python benchmarks/bench_framing.py --messages 40 --blocks 16 --txs 40
+#   python benchmarks/bench_framing.py --connections 4
+
+import argparse
+import asyncio
+import logging
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from core import serialization
+from core.block import Block
+from core.blockchain import Blockchain
+from core.public_ledger import PublicKeyLedger
+from core.transaction import Transaction
+from core.wallet import Wallet
+from crypto import providers
+from network import framing
+from network.node import P2PNode
+from cluster import free_port
+
+LAG_PROBE_INTERVAL = 0.002
+DRAIN_TIMEOUT = 300.0
+
+class LegacyNode(P2PNode):
+    """A node with the previous read loop: no frame limits, every frame decoded on the event loop."""
+
+    async def handle_connection(self, reader, writer):
+        peer_addr = writer.get_extra_info('peername')
+        try:
+            if peer_addr not in self.peers:
+                self._add_peer(peer_addr, reader, writer)
+            while True:
+                len_data = await reader.readexactly(4)
+                msg_len = int.from_bytes(len_data, 'big')
+                msg_data = await reader.readexactly(msg_len)
+                message = serialization.decode_message(msg_data)
+                await self.handle_message(message, writer, size=msg_len)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            await self._remove_peer(peer_addr)
+
+def make_blocks_message(blocks: int, txs: int, senders: int = 10) -> dict:
+    """A BLOCKS sync response, as a node sends it: `blocks` consecutive blocks of message transactions."""
+    wallets = [Wallet() for _ in range(senders)]
+    proposers = [Wallet().address for _ in range(4)]
+    recipient = Wallet().get_public_keys_hex()
+    chain, previous_hash = [], "0" * 64
+    for height in range(1, blocks + 1):
+        transactions = []
+        for i in range(txs):
+            wallet = wallets[(height * txs + i) % senders]
+            tx_dict = Transaction(wallet, f"framing benchmark {height}/{i}", recipient).to_dict()
+            transactions.append({"transaction_dict": tx_dict, "signature_hex": wallet.sign_transaction(tx_dict).hex()})
+        block = Block(height, transactions, previous_hash, proposers[height % len(proposers)], timestamp=float(height))
+        previous_hash = block.hash
+        chain.append(block.to_dict())
+    return {"id": "bench", "type": "BLOCKS", "payload": {"start": 1, "blocks": chain}}
+
+def send_frames(port: int, path: str):
+    """Load generator (runs in its own process): handshakes, then writes every frame of `path`."""
+    with open(path, 'rb') as f:
+        handshake, frames = pickle.load(f)
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(handshake)
+        for data in frames:
+            sock.sendall(data)
+        # Stay connected until the node has read everything, draining whatever it sends back
+        # (closing with unread data would reset the connection).
+        while sock.recv(65536):
+            pass
+
+async def measure(mode: str, paths: list[str], count: int, size: int, offload_threshold: int) -> dict:
+    node_class = LegacyNode if mode == "legacy" else P2PNode
+    node = node_class("127.0.0.1", free_port(), Wallet(), Blockchain(), DPoLConsensus(nodes=[]), PublicKeyLedger(),
+                      compression=framing.COMPRESSION_ZLIB if mode == "zlib" else None, offload_threshold=offload_threshold)
+    node_task = asyncio.create_task(node.start())
+    await node.listening.wait()
+
+    loop = asyncio.get_running_loop()
+    lags = []
+    start = time.perf_counter()
+    senders = [subprocess.Popen([sys.executable, __file__, "--send", str(node.port), path]) for path in paths]
+    try:
+        metrics = None
+        while metrics is None or metrics.received.value < count * len(paths):
+            if time.perf_counter() - start > DRAIN_TIMEOUT:
+                raise RuntimeError("The node did not receive every message in time.")
+            expected = loop.time() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lags.append(max(0.0, loop.time() - expected))
+            metrics = node._message_metrics.get("BLOCKS")
+        elapsed = time.perf_counter() - start
+    finally:
+        for sender in senders:
+            sender.kill()
+            sender.wait()
+        node.server.close()
+        node_task.cancel()
+        try:
+            await node_task
+        except asyncio.CancelledError:
+            pass
+    lags.sort()
+    return {"elapsed": elapsed, "mb_per_second": count * len(paths) * size / elapsed / 2 ** 20,
+            "lag_p99": lags[min(len(lags) - 1, int(0.99 * len(lags)))] if lags else 0.0, "lag_max": lags[-1] if lags else 0.0}
+
+def main(args):
+    if args.send:
+        send_frames(int(args.send[0]), args.send[1])
+        return
+    logging.getLogger().setLevel(logging.ERROR)
+    providers.configure(provider=args.crypto_provider, seed=args.seed)
+
+    message = make_blocks_message(args.blocks, args.txs)
+    plain = framing.encode_frame(message)
+    compressed = framing.compress_frame(plain) or plain
+    size = len(plain) - framing.HEADER_SIZE
+    print(f"--- BLOCKS message: {args.blocks} blocks x {args.txs} txs, {size / 2 ** 20:.2f} MB plain, "
+          f"{(len(compressed) - framing.HEADER_SIZE) / 2 ** 20:.2f} MB zlib ({len(compressed) / len(plain):.0%}); "
+          f"{args.messages} messages x {args.connections} connection(s) ---")
+
+    handshake = {"id": "hello", "type": "HANDSHAKE", "payload": {"address": Wallet().address}}
+    paths = {}
+    for mode in ("legacy", "plain", "zlib"):
+        if mode == "zlib":
+            handshake = dict(handshake, payload=dict(handshake["payload"], compression=[framing.COMPRESSION_ZLIB]))
+        data = (bytes(framing.encode_frame(handshake)), [bytes(compressed if mode == "zlib" else plain)] * args.messages)
+        with tempfile.NamedTemporaryFile(suffix=".frames", delete=False) as f:
+            pickle.dump(data, f)
+            paths[mode] = f.name
+    try:
+        print(f"{'path':<10}{'seconds':>10}{'MB/s/conn':>12}{'lag p99':>12}{'lag max':>12}")
+        for mode in ("legacy", "plain", "zlib"):
+            result = asyncio.run(measure(mode, [paths[mode]] * args.connections, args.messages, size, args.offload_threshold))
+            print(f"{mode:<10}{result['elapsed']:>10.2f}{result['mb_per_second'] / args.connections:>12.1f}"
+                  f"{result['lag_p99'] * 1000:>9.1f} ms{result['lag_max'] * 1000:>9.1f} ms")
+    finally:
+        for path in paths.values():
+            os.unlink(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark wire framing: per-connection throughput and event loop stalls.")
+    parser.add_argument('--messages', type=int, default=40, help="BLOCKS messages sent per connection.")
+    parser.add_argument('--blocks', type=int, default=16, help="Blocks per BLOCKS message.")
+    parser.add_argument('--txs', type=int, default=40, help="Transactions per block.")
+    parser.add_argument('--connections', type=int, default=1, help="Concurrent sending connections.")
+    parser.add_argument('--offload-threshold', type=int, default=framing.DEFAULT_OFFLOAD_THRESHOLD,
+                        help="Frames of at least this many bytes are decoded on a thread (plain and zlib).")
+    parser.add_argument('--crypto-provider', choices=list(providers.PROVIDERS), default=providers.PROVIDER_SIMULATED,
+                        help="Provider used to sign the benchmark transactions.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--send', nargs=2, metavar=("PORT", "FILE"), help=argparse.SUPPRESS)
+    main(parser.parse_args())
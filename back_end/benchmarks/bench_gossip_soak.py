@@ -0,0 +1,79 @@
+# benchmarks/bench_gossip_soak.py
+#
+# Soak test for gossip dedup: pushes millions of messages through P2PNode.handle_message
+# and reports throughput, duplicate hits and the memory held by the seen-message cache
+# as the run goes on. A share of the messages are re-broadcasts of earlier content
+# wrapped into a new message (fresh random id), as another peer would relay them.
+#
+#   python benchmarks/bench_gossip_soak.py --messages 2000000 --capacity 200000
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import resource
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from core.blockchain import Blockchain
+from core.public_ledger import PublicKeyLedger
+from core.wallet import Wallet
+from network.node import P2PNode
+from network.seen_cache import SeenCache
+
+SOAK_MESSAGE_TYPE = "SOAK"
+
+class SoakWriter:
+    """Stands in for a peer connection; handle_message only asks it for the peer address."""
+
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 0) if name == 'peername' else None
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def soak(messages: int, capacity: int, ttl: float, duplicate_ratio: float, report_every: int):
+    logging.getLogger().setLevel(logging.WARNING)
+    node = P2PNode('127.0.0.1', 0, Wallet(), Blockchain(), DPoLConsensus(nodes=[]), PublicKeyLedger())
+    node.seen_messages = SeenCache(capacity=capacity, ttl=ttl)
+    writer = SoakWriter()
+    rng = random.Random(1)
+    recent = []
+
+    print(f"--- {messages} messages, {duplicate_ratio:.0%} re-wrapped duplicates, capacity {capacity}, TTL {ttl}s ---")
+    print(f"{'messages':>10}{'msgs/sec':>12}{'hits':>10}{'keys':>10}{'cache MB':>10}{'max RSS MB':>12}")
+    start = last = time.perf_counter()
+    for i in range(1, messages + 1):
+        if recent and rng.random() < duplicate_ratio:
+            content = recent[rng.randrange(len(recent))]
+        else:
+            content = i
+            recent.append(content)
+            if len(recent) > 10_000:
+                recent = recent[5_000:]
+        await node.handle_message(node.create_message(SOAK_MESSAGE_TYPE, {"n": content}), writer)
+
+        if i % report_every == 0 or i == messages:
+            now = time.perf_counter()
+            stats = node.seen_messages.stats(with_memory=True)
+            rate = report_every / (now - last) if i % report_every == 0 else i / (now - start)
+            print(f"{i:>10}{rate:>12.0f}{stats['hits']:>10}{stats['size']:>10}"
+                  f"{stats['memory_bytes'] / 1e6:>10.1f}{max_rss_mb():>12.1f}")
+            last = now
+    print(f"Total: {messages / (time.perf_counter() - start):.0f} msgs/sec, {node.seen_messages.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak the gossip dedup cache through P2PNode.handle_message.")
+    parser.add_argument('--messages', type=int, default=2_000_000, help="Messages pushed through handle_message.")
+    parser.add_argument('--capacity', type=int, default=200_000, help="Seen-message cache capacity (keys).")
+    parser.add_argument('--ttl', type=float, default=600.0, help="Seen-message TTL in seconds.")
+    parser.add_argument('--duplicates', type=float, default=0.3, help="Share of messages that repeat recent content.")
+    parser.add_argument('--report-every', type=int, default=250_000, help="Print a progress line every N messages.")
+    args = parser.parse_args()
+    asyncio.run(soak(args.messages, args.capacity, args.ttl, args.duplicates, args.report_every))
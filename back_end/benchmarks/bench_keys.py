@@ -0,0 +1,100 @@
+# benchmarks/bench_keys.py
+#
+# Measures what a wallet costs to obtain:
+#   - creating wallets one by one (Dilithium2 + Kyber512 keygen each) vs generate_wallets
+#     on a pool of worker processes
+#   - taking wallets from a pre-filled KeyPool, and how long the event loop is blocked meanwhile
+#   - saving and unlocking an encrypted keystore file (dominated by scrypt)
+#
+#   python benchmarks/bench_keys.py --wallets 2000 --workers 4
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from core.key_pool import KeyPool, generate_wallets
+from core.keystore import load_wallet, save_wallet
+from core.wallet import Wallet
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list[float], interval: float = 0.001):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def bench_pool(count: int, workers: int) -> dict:
+    pool = KeyPool(size=count, max_workers=workers)
+    pool.start()
+    start = time.perf_counter()
+    while pool.ready < count:
+        await asyncio.sleep(0.01)
+    fill_seconds = time.perf_counter() - start
+
+    waits = []
+    for _ in range(count):
+        taken = time.perf_counter()
+        await pool.get()
+        waits.append(time.perf_counter() - taken)
+
+    # Bulk creation beyond the stock, while a ticker measures how long the event loop stalls.
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await pool.wallets(count)
+    bulk_seconds = time.perf_counter() - start
+    stop.set()
+    await ticker
+    await pool.close()
+    return {"fill_seconds": fill_seconds, "get_p50_us": percentile(waits, 0.5) * 1e6, "get_p99_us": percentile(waits, 0.99) * 1e6,
+            "bulk_seconds": bulk_seconds, "loop_lag_max_ms": max(lags, default=0.0) * 1000}
+
+def main(args):
+    start = time.perf_counter()
+    for _ in range(args.wallets):
+        Wallet()
+    sequential = time.perf_counter() - start
+    print(f"sequential Wallet():        {args.wallets / sequential:>10.0f} wallets/s")
+
+    start = time.perf_counter()
+    generate_wallets(args.wallets, max_workers=args.workers)
+    parallel = time.perf_counter() - start
+    print(f"generate_wallets ({args.workers} workers): {args.wallets / parallel:>10.0f} wallets/s ({sequential / parallel:.1f}x)")
+
+    pool = asyncio.run(bench_pool(args.wallets, args.workers))
+    print(f"KeyPool fill:               {args.wallets / pool['fill_seconds']:>10.0f} wallets/s")
+    print(f"KeyPool.get from stock:     p50 {pool['get_p50_us']:.1f} us, p99 {pool['get_p99_us']:.1f} us")
+    print(f"KeyPool.wallets (bulk):     {args.wallets / pool['bulk_seconds']:>10.0f} wallets/s, "
+          f"event loop blocked at most {pool['loop_lag_max_ms']:.1f} ms")
+
+    wallet = Wallet()
+    saves, loads = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wallet.json")
+        for _ in range(args.keystore_rounds):
+            start = time.perf_counter()
+            save_wallet(wallet, path, "benchmark passphrase")
+            saves.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            assert load_wallet(path, "benchmark passphrase").address == wallet.address
+            loads.append(time.perf_counter() - start)
+    print(f"keystore save / unlock:     {statistics.median(saves) * 1000:.1f} ms / {statistics.median(loads) * 1000:.1f} ms (median)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark wallet creation, the key pool and the encrypted keystore.")
+    parser.add_argument('--wallets', type=int, default=1000, help="Wallets created per measurement.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Key generation worker processes.")
+    parser.add_argument('--keystore-rounds', type=int, default=5, help="Keystore save/unlock repetitions.")
+    main(parser.parse_args())
@@ -0,0 +1,185 @@
+# benchmarks/bench_pbft.py
+#
+# Runs PBFT among n delegates inside one process, connected by a simulated network, and
+# reports committed blocks/sec, transactions/sec and commit latency per committee size,
+# with and without pipelining. Every node has its own chain, mempool and validator, and
+# every message is encoded once by the sender and decoded by each receiver, as on the wire.
+#
+#   python benchmarks/bench_pbft.py --sizes 4,21,100 --blocks 20 --txs-per-block 50
+#   python benchmarks/bench_pbft.py --sizes 4 --crashed 1      # the first primary is down: view change
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from consensus.pbft import PBFTEngine, max_faulty
+from core import serialization
+from core.blockchain import Blockchain
+from core.key_pool import generate_wallets
+from core.mempool import Mempool
+from core.transaction import Transaction
+from core.wallet import Wallet
+
+class LocalNetwork:
+    """Delivers consensus messages between in-process nodes, each through its own inbox queue."""
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): One-way delay (seconds) added to every message.
+        """
+        self.latency = latency
+        self.inboxes = {}    # address -> asyncio.Queue of encoded messages
+        self.messages = 0
+        self.bytes = 0
+
+    def join(self, address: str) -> asyncio.Queue:
+        self.inboxes[address] = asyncio.Queue()
+        return self.inboxes[address]
+
+    def broadcaster(self, sender: str):
+        loop = asyncio.get_running_loop()
+
+        async def broadcast(payload: dict):
+            data = serialization.encode_value(payload)
+            for address, inbox in self.inboxes.items():
+                if address == sender:
+                    continue
+                self.messages += 1
+                self.bytes += len(data)
+                if self.latency:
+                    loop.call_later(self.latency, inbox.put_nowait, data)
+                else:
+                    inbox.put_nowait(data)
+        return broadcast
+
+async def receive(engine: PBFTEngine, inbox: asyncio.Queue):
+    while True:
+        data = await inbox.get()
+        await engine.on_message(serialization.decode_value(data))
+
+def make_transactions(count: int, clients: int = 10) -> list[dict]:
+    wallets = generate_wallets(clients)
+    transactions = []
+    for i in range(count):
+        wallet = wallets[i % clients]
+        tx_dict = Transaction(sender_wallet=wallet, message="", tx_type="key_registration", username=f"user{i}").to_dict()
+        transactions.append({'transaction_dict': tx_dict, 'signature_hex': wallet.sign_transaction(tx_dict).hex()})
+    return transactions
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+async def run(wallets: list[Wallet], transactions: list[dict], blocks: int, txs_per_block: int, pipeline_depth: int,
+              crashed: int, latency: float, view_timeout: float, time_limit: float) -> dict:
+    addresses = [wallet.address for wallet in wallets]
+    genesis_hash = Blockchain().last_block.hash
+    # Take the first primaries of the election down, so view 0 cannot make progress.
+    down = set(DPoLConsensus(nodes=addresses, num_delegates=len(addresses)).select_delegates(genesis_hash)[:crashed])
+
+    network = LocalNetwork(latency=latency)
+    engines, tasks = [], []
+    commit_times = {}    # height -> wall clock times the live nodes appended it
+    proposed_at = {}     # height -> timestamp of the block that was committed
+    live = len(wallets) - len(down)
+    done = asyncio.Event()
+
+    for wallet in wallets:
+        if wallet.address in down:
+            continue
+        blockchain = Blockchain(mempool=Mempool(max_count=len(transactions) + 1))
+        for signed_tx in transactions:
+            blockchain.admit_transaction(signed_tx['transaction_dict'], signed_tx['signature_hex'])
+
+        async def on_commit(block, blockchain=blockchain):
+            blockchain.commit_block(block)
+            times = commit_times.setdefault(block.index, [])
+            times.append(time.time())
+            proposed_at[block.index] = block.timestamp
+            if block.index >= blocks and len(times) == live:
+                done.set()
+
+        inbox = network.join(wallet.address)
+        engine = PBFTEngine(wallet, blockchain, DPoLConsensus(nodes=addresses, num_delegates=len(addresses)),
+                            broadcast=network.broadcaster(wallet.address), on_commit=on_commit, pipeline_depth=pipeline_depth,
+                            view_timeout=view_timeout, max_block_txs=txs_per_block, auto_propose=True)
+        engines.append(engine)
+        tasks.append(asyncio.create_task(receive(engine, inbox)))
+
+    start = time.perf_counter()
+    for engine in engines:
+        engine.start()
+        await engine.propose()
+    try:
+        await asyncio.wait_for(done.wait(), timeout=time_limit)
+        finished = True
+    except asyncio.TimeoutError:
+        finished = False
+    elapsed = time.perf_counter() - start
+
+    for engine in engines:
+        await engine.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    committed = min(len(engine.blockchain.chain) - 1 for engine in engines)
+    latencies = [max(commit_times[height]) - proposed_at[height] for height in range(1, committed + 1)
+                 if len(commit_times.get(height, ())) == live]
+    return {
+        "finished": finished,
+        "blocks": committed,
+        "blocks_per_sec": committed / elapsed,
+        "txs_per_sec": sum(len(engines[0].blockchain.chain[height].transactions) for height in range(1, committed + 1)) / elapsed,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "views": max(engine.view for engine in engines),
+        "messages": network.messages,
+        "megabytes": network.bytes / 1e6,
+        "agree": len({engine.blockchain.chain[committed].hash for engine in engines}) == 1
+    }
+
+async def main(args):
+    logging.getLogger().setLevel(logging.ERROR)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    depths = sorted({1, args.pipeline_depth})
+    print(f"{'delegates':>10}{'depth':>6}{'blocks':>8}{'blocks/s':>10}{'txs/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'views':>7}{'msgs':>9}{'MB':>8}  agree")
+    for size in sizes:
+        if args.crashed > max_faulty(size):
+            print(f"{size:>10}  skipped: {args.crashed} crashed delegates exceed f = {max_faulty(size)}")
+            continue
+        wallets = generate_wallets(size)
+        transactions = make_transactions(args.blocks * args.txs_per_block)
+        for depth in depths:
+            result = await run(wallets, transactions, args.blocks, args.txs_per_block, depth, args.crashed,
+                               args.latency, args.view_timeout, args.time_limit)
+            status = "yes" if result["agree"] else "NO"
+            if not result["finished"]:
+                status += " (time limit)"
+            print(f"{size:>10}{depth:>6}{result['blocks']:>8}{result['blocks_per_sec']:>10.1f}{result['txs_per_sec']:>10.0f}"
+                  f"{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}{result['views']:>7}"
+                  f"{result['messages']:>9}{result['megabytes']:>8.1f}  {status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PBFT commit latency and throughput on an in-process network.")
+    parser.add_argument('--sizes', type=str, default="4,21,100", help="Comma-separated committee sizes.")
+    parser.add_argument('--blocks', type=int, default=20, help="Blocks to commit per run.")
+    parser.add_argument('--txs-per-block', type=int, default=50, help="Transactions per block.")
+    parser.add_argument('--pipeline-depth', type=int, default=4, help="Pipelined heights (each size also runs with 1).")
+    parser.add_argument('--crashed', type=int, default=0, help="Delegates that never respond, starting with the first primary.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated one-way network delay in seconds.")
+    parser.add_argument('--view-timeout', type=float, default=1.0, help="Seconds without progress before a view change.")
+    parser.add_argument('--time-limit', type=float, default=300.0, help="Give up on a run after this many seconds.")
+    asyncio.run(main(parser.parse_args()))
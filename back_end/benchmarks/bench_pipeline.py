@@ -0,0 +1,176 @@
+# benchmarks/bench_pipeline.py
+#
+# Transaction intake of one node, from the socket to the mempool, for each way of
+# handling NEW_TRANSACTION messages:
+#   - loop:       decoded and verified on the event loop (--verify-workers 0)
+#   - batched xN: decoded on the event loop, verified on a BatchVerifier of N processes
+#   - pooled xN:  routed undecoded to N validation processes (--validation-workers N)
+# A separate load generator process writes the pre-encoded messages over one TCP
+# connection as fast as the node reads them; the time until the mempool holds all of
+# them gives transactions/s. Event loop lag is probed every 2 ms meanwhile.
+#
+# --verify-cost adds a busy wait to every signature check of the simulated provider, to
+# model the Dilithium cost of a given machine without liboqs (liboqs itself is used
+# with --crypto-provider liboqs and --verify-cost 0).
+#
+#   python benchmarks/bench_pipeline.py --transactions 4000 --workers 1 2 4
+#   python benchmarks/bench_pipeline.py --crypto-provider liboqs --verify-cost 0
+
+import argparse
+import asyncio
+import logging
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from core.blockchain import Blockchain
+from core.mempool import Mempool
+from core.public_ledger import PublicKeyLedger
+from core.transaction import Transaction
+from core.wallet import Wallet
+from crypto import providers
+from crypto.dilithium_utils import BatchVerifier
+from network.node import P2PNode
+from network import framing
+from cluster import free_port
+
+COSTLY_PROVIDER = "simulated-costly"
+VERIFY_COST_ENV = "BENCH_VERIFY_COST_US"
+DRAIN_TIMEOUT = 300.0
+LAG_PROBE_INTERVAL = 0.002
+
+class CostlyProvider(providers.SimulatedProvider):
+    """The simulated provider, with every verification taking at least BENCH_VERIFY_COST_US microseconds of CPU."""
+
+    def Signature(self, algorithm: str, secret_key: bytes = None):
+        signature = super().Signature(algorithm, secret_key)
+        cost = float(os.environ.get(VERIFY_COST_ENV, "0")) / 1e6
+        verify = signature.verify
+
+        def costly_verify(message, sig, public_key):
+            deadline = time.perf_counter() + cost
+            while time.perf_counter() < deadline:
+                pass
+            return verify(message, sig, public_key)
+        signature.verify = costly_verify
+        return signature
+
+# Registered at import, so worker processes started with "spawn" (which re-import this
+# module) know the provider too; the selection itself reaches them through the environment.
+providers.register_provider(COSTLY_PROVIDER, CostlyProvider)
+
+def make_frames(count: int, clients: int = 10) -> list[bytes]:
+    """`count` NEW_TRANSACTION messages from a few senders, encoded and framed as on the wire."""
+    senders = [Wallet() for _ in range(clients)]
+    recipient = Wallet().get_public_keys_hex()
+    frames = []
+    for i in range(count):
+        wallet = senders[i % clients]
+        tx_dict = Transaction(wallet, f"pipeline benchmark #{i}", recipient).to_dict()
+        message = {"id": str(i), "type": "NEW_TRANSACTION",
+                   "payload": {"transaction_dict": tx_dict, "signature_hex": wallet.sign_transaction(tx_dict).hex()}}
+        frames.append(bytes(framing.encode_frame(message)))
+    return frames
+
+def send_frames(port: int, path: str):
+    """Load generator (runs in its own process): writes every frame of `path` to the node."""
+    with open(path, 'rb') as f:
+        frames = pickle.load(f)
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        for data in frames:
+            sock.sendall(data)
+        # Stay connected until the node has read everything, draining whatever it sends back
+        # (closing with unread data would reset the connection).
+        while sock.recv(65536):
+            pass
+
+async def measure(path: str, count: int, verify_workers: int, validation_workers: int) -> dict:
+    verifier = BatchVerifier(max_workers=verify_workers) if verify_workers else None
+    blockchain = Blockchain(mempool=Mempool(max_count=count + 1))
+    # No block is cut during the run: the node is its only delegate, but the limits are never reached.
+    node = P2PNode("127.0.0.1", free_port(), Wallet(), blockchain, DPoLConsensus(nodes=[]), PublicKeyLedger(),
+                   verifier=verifier, block_max_txs=count + 1, block_max_bytes=2 ** 40, block_interval=3600.0,
+                   validation_workers=validation_workers)
+    node_task = asyncio.create_task(node.start())
+    await node.listening.wait()
+    if verifier:
+        verifier.verify_many([])    # start the worker processes before the clock does
+
+    loop = asyncio.get_running_loop()
+    lags = []
+    start = time.perf_counter()
+    sender = subprocess.Popen([sys.executable, __file__, "--send", str(node.port), path])
+    try:
+        while len(blockchain.mempool) < count:
+            if time.perf_counter() - start > DRAIN_TIMEOUT:
+                raise RuntimeError(f"Only {len(blockchain.mempool)} of {count} transactions were admitted.")
+            expected = loop.time() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lags.append(max(0.0, loop.time() - expected))
+        elapsed = time.perf_counter() - start
+    finally:
+        sender.kill()
+        sender.wait()
+        node.server.close()
+        node_task.cancel()
+        try:
+            await node_task
+        except asyncio.CancelledError:
+            pass
+        if verifier:
+            verifier.close()
+    lags.sort()
+    return {"elapsed": elapsed, "rate": count / elapsed,
+            "lag_p99": lags[min(len(lags) - 1, int(0.99 * len(lags)))] if lags else 0.0, "lag_max": lags[-1] if lags else 0.0}
+
+def main(args):
+    if args.send:
+        send_frames(int(args.send[0]), args.send[1])
+        return
+    logging.getLogger().setLevel(logging.ERROR)
+    os.environ[VERIFY_COST_ENV] = str(args.verify_cost)
+    provider = COSTLY_PROVIDER if args.verify_cost else args.crypto_provider
+    providers.configure(provider=provider, seed=args.seed)
+
+    print(f"--- Preparing {args.transactions} transactions ({providers.signature_algorithm()}, {provider}"
+          f"{f', {args.verify_cost:.0f} us per verification' if args.verify_cost else ''}; {os.cpu_count()} CPUs) ---")
+    frames = make_frames(args.transactions)
+    with tempfile.NamedTemporaryFile(suffix=".frames", delete=False) as f:
+        pickle.dump(frames, f)
+        path = f.name
+
+    runs = [("loop", 0, 0)]
+    runs += [(f"batched x{workers}", workers, 0) for workers in args.workers]
+    runs += [(f"pooled x{workers}", 0, workers) for workers in args.workers]
+    try:
+        print(f"{'path':<16}{'seconds':>10}{'txs/s':>10}{'vs loop':>10}{'lag p99':>12}{'lag max':>12}")
+        baseline = None
+        for label, verify_workers, validation_workers in runs:
+            result = asyncio.run(measure(path, args.transactions, verify_workers, validation_workers))
+            baseline = baseline or result["rate"]
+            print(f"{label:<16}{result['elapsed']:>10.2f}{result['rate']:>10.0f}{result['rate'] / baseline:>9.2f}x"
+                  f"{result['lag_p99'] * 1000:>9.1f} ms{result['lag_max'] * 1000:>9.1f} ms")
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark transaction intake on the event loop vs. validation workers.")
+    parser.add_argument('--transactions', type=int, default=4000, help="NEW_TRANSACTION messages sent to the node.")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help="Worker counts to measure for the batched and pooled paths.")
+    parser.add_argument('--crypto-provider', choices=list(providers.PROVIDERS), default=providers.PROVIDER_SIMULATED,
+                        help="Crypto provider, when --verify-cost is 0.")
+    parser.add_argument('--verify-cost', type=float, default=100.0,
+                        help="Microseconds of CPU added to every verification of the simulated provider (0: none).")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--send', nargs=2, metavar=("PORT", "FILE"), help=argparse.SUPPRESS)
+    main(parser.parse_args())
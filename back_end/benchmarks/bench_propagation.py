@@ -0,0 +1,146 @@
+# benchmarks/bench_propagation.py
+#
+# Measures broadcast fan-out time on one machine: a source node with 10, 50 and 100
+# connected peer nodes (plus, optionally, one peer that never reads its socket)
+# broadcasts a stream of messages, and each message's propagation time is the time
+# until the last peer has received it. "send ms" is the time the broadcast call itself
+# takes, i.e. how long the sender's event loop is held up per message.
+#
+# Two broadcast paths are compared:
+#   sequential - the old behaviour: encode per peer, then write and drain peer by peer
+#   queued     - P2PNode.broadcast: encode once, enqueue on every peer's outbound queue
+#
+#   python benchmarks/bench_propagation.py --messages 50 --size 16384
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from core import serialization
+from core.blockchain import Blockchain
+from core.public_ledger import PublicKeyLedger
+from core.wallet import Wallet
+from network.node import P2PNode
+
+BENCH_MESSAGE_TYPE = "BENCH_PAYLOAD"
+
+class ReceivingNode(P2PNode):
+    """A peer that records when each benchmark message arrives."""
+
+    def __init__(self, *args, arrivals: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.arrivals = arrivals
+
+    async def handle_message(self, message: dict, writer):
+        if message.get("type") == BENCH_MESSAGE_TYPE:
+            self.arrivals.setdefault(message["payload"]["seq"], []).append(time.perf_counter())
+            return
+        await super().handle_message(message, writer)
+
+def make_node(cls, port: int, wallet: Wallet, **kwargs) -> P2PNode:
+    return cls('127.0.0.1', port, wallet, Blockchain(), DPoLConsensus(nodes=[]), PublicKeyLedger(), **kwargs)
+
+async def sequential_broadcast(node: P2PNode, message: dict):
+    """The broadcast path before per-peer queues: one encode and one drain per peer, in turn."""
+    for peer in list(node.peers.values()):
+        data = serialization.encode_message(message)
+        peer.writer.write(len(data).to_bytes(4, 'big') + data)
+        await peer.writer.drain()
+
+async def run_case(num_peers: int, mode: str, messages: int, size: int, stalled: bool, base_port: int, wallets: list, timeout: float) -> dict:
+    arrivals = {}
+    source = make_node(P2PNode, base_port, wallets[0])
+    peers = [make_node(ReceivingNode, base_port + 1 + i, wallets[1 + i], arrivals=arrivals) for i in range(num_peers)]
+    tasks = [asyncio.create_task(node.start()) for node in [source] + peers]
+    await asyncio.sleep(0.3)
+
+    for node in peers:
+        await node.connect_to_peer('127.0.0.1', base_port)
+    stalled_writer = None
+    if stalled:
+        _, stalled_writer = await asyncio.open_connection('127.0.0.1', base_port)
+    while len(source.peers) < num_peers + int(stalled):
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.3)
+
+    sent_at, send_times = {}, []
+    payload_text = "x" * size
+
+    async def send_all():
+        for seq in range(messages):
+            message = source.create_message(BENCH_MESSAGE_TYPE, {"seq": seq, "data": payload_text})
+            sent_at[seq] = time.perf_counter()
+            if mode == "sequential":
+                await sequential_broadcast(source, message)
+            else:
+                await source.broadcast(message)
+            send_times.append((time.perf_counter() - sent_at[seq]) * 1000)
+            await asyncio.sleep(0)
+
+    completed = True
+    try:
+        await asyncio.wait_for(send_all(), timeout)
+    except asyncio.TimeoutError:
+        completed = False
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and sum(len(times) for times in arrivals.values()) < len(sent_at) * num_peers:
+        await asyncio.sleep(0.01)
+
+    latencies = [(max(arrivals[seq]) - sent_at[seq]) * 1000 for seq in sent_at if len(arrivals.get(seq, [])) == num_peers]
+    delivered = sum(len(times) for times in arrivals.values())
+    stats = source.outbound_stats()
+
+    if stalled_writer:
+        stalled_writer.close()
+    for node in [source] + peers:
+        node.server.close()
+    for node in peers + [source]:
+        await node.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "peers": num_peers,
+        "mode": mode,
+        "sent": len(sent_at),
+        "completed": completed,
+        "delivered_pct": 100.0 * delivered / (messages * num_peers),
+        "send_ms": statistics.mean(send_times) if send_times else float('nan'),
+        "p50_ms": statistics.median(latencies) if latencies else float('nan'),
+        "max_ms": max(latencies) if latencies else float('nan'),
+        "dropped": stats["frames_dropped"]
+    }
+
+async def run_benchmark(peer_counts: list[int], messages: int, size: int, stalled: bool, base_port: int, timeout: float):
+    logging.getLogger().setLevel(logging.ERROR)
+    wallets = [Wallet() for _ in range(max(peer_counts) + 1)]
+    print(f"--- {messages} messages of {size} bytes, {'one stalled peer' if stalled else 'no stalled peer'} ---")
+    print(f"{'peers':>6} {'mode':<11}{'sent':>6}{'delivered':>11}{'send ms':>10}{'p50 ms':>10}{'max ms':>10}{'dropped':>9}")
+    for num_peers in peer_counts:
+        for mode in ("sequential", "queued"):
+            result = await run_case(num_peers, mode, messages, size, stalled, base_port, wallets, timeout)
+            note = "" if result["completed"] else "  (sender blocked)"
+            print(f"{result['peers']:>6} {result['mode']:<11}{result['sent']:>6}{result['delivered_pct']:>10.1f}%{result['send_ms']:>10.3f}"
+                  f"{result['p50_ms']:>10.2f}{result['max_ms']:>10.2f}{result['dropped']:>9}{note}")
+            base_port += num_peers + 2
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark broadcast propagation time across local peers.")
+    parser.add_argument('--peers', type=str, default="10,50,100", help="Comma-separated peer counts.")
+    parser.add_argument('--messages', type=int, default=50, help="Messages broadcast per run.")
+    parser.add_argument('--size', type=int, default=16384, help="Payload size (bytes) of each message.")
+    parser.add_argument('--no-stalled-peer', action='store_true', help="Do not add a peer that never reads.")
+    parser.add_argument('--base-port', type=int, default=19000, help="First port used by the benchmark nodes.")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds before a run is considered blocked.")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark([int(n) for n in args.peers.split(',')], args.messages, args.size, not args.no_stalled_peer, args.base_port, args.timeout))
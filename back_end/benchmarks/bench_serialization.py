@@ -0,0 +1,78 @@
+# benchmarks/bench_serialization.py
+#
+# Size and encode/decode throughput of the canonical binary encoding against the
+# previous sort_keys JSON path, for a message transaction and for a full block.
+# Uses random bytes of Dilithium2/Kyber512 sizes, so liboqs is not needed.
+#
+#   python benchmarks/bench_serialization.py --txs 200
+
+import argparse
+import json
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from core import serialization
+from core.block import Block
+
+DILITHIUM2_PUBLIC_KEY = 1312
+DILITHIUM2_SIGNATURE = 2420
+KYBER512_CIPHERTEXT = 768
+
+def make_signed_transaction(index: int) -> dict:
+    tx_dict = {
+        "sender_address": os.urandom(DILITHIUM2_PUBLIC_KEY).hex(),
+        "recipient_address": os.urandom(DILITHIUM2_PUBLIC_KEY).hex(),
+        "timestamp": time.time() + index,
+        "tx_type": "message",
+        "content": {
+            "ciphertext": os.urandom(KYBER512_CIPHERTEXT).hex(),
+            "nonce": os.urandom(12).hex(),
+            "payload": os.urandom(64 + 16).hex(),
+        },
+    }
+    return {"transaction_dict": tx_dict, "signature_hex": os.urandom(DILITHIUM2_SIGNATURE).hex()}
+
+def throughput(func, arg, seconds: float = 0.5) -> float:
+    """Calls func(arg) repeatedly for about `seconds` and returns calls per second."""
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func(arg)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+def report(name: str, json_size: int, binary_size: int, rates: dict):
+    print(f"\n--- {name} ---")
+    print(f"  size:   json {json_size:>9} bytes   binary {binary_size:>9} bytes   ({binary_size / json_size:.0%} of json)")
+    for label, (json_rate, binary_rate) in rates.items():
+        print(f"  {label:<7} json {json_rate:>9.0f} /s      binary {binary_rate:>9.0f} /s      ({binary_rate / json_rate:.2f}x)")
+
+def run_benchmark(num_txs: int):
+    signed_tx = make_signed_transaction(0)
+    tx_dict = signed_tx["transaction_dict"]
+
+    json_tx = lambda tx: json.dumps(tx, sort_keys=True).encode('utf-8')
+    json_tx_bytes, binary_tx_bytes = json_tx(tx_dict), serialization.encode_transaction(tx_dict)
+    report("transaction (signing preimage)", len(json_tx_bytes), len(binary_tx_bytes), {
+        "encode": (throughput(json_tx, tx_dict), throughput(serialization.encode_transaction, tx_dict)),
+        "decode": (throughput(json.loads, json_tx_bytes), throughput(serialization.decode_transaction, binary_tx_bytes)),
+    })
+
+    block = Block(index=1, transactions=[make_signed_transaction(i) for i in range(num_txs)],
+                  previous_hash=os.urandom(32).hex(), proposer_address=os.urandom(DILITHIUM2_PUBLIC_KEY).hex())
+    json_block = lambda b: json.dumps(b.to_dict(), sort_keys=True).encode()
+    json_block_bytes, binary_block_bytes = json_block(block), block.to_bytes()
+    report(f"block with {num_txs} transactions (storage / wire)", len(json_block_bytes), len(binary_block_bytes), {
+        "encode": (throughput(json_block, block), throughput(Block.to_bytes, block)),
+        "decode": (throughput(json.loads, json_block_bytes), throughput(serialization.decode_block, binary_block_bytes)),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark binary serialization against sort_keys JSON.")
+    parser.add_argument('--txs', type=int, default=200, help="Transactions per benchmark block.")
+    args = parser.parse_args()
+    run_benchmark(args.txs)
@@ -0,0 +1,89 @@
+# benchmarks/bench_validation.py
+#
+# Blocks/sec and signatures/sec of chain validation for 10k and 100k block chains:
+#   legacy     - the old replace_chain loop: Block.from_dict + is_valid + link check, no signatures
+#   serial     - ChainValidator in this process, every signature checked
+#   pool xN    - ChainValidator with N worker processes
+#   checkpoint - pool, with signatures trusted below 90% of the chain height
+#
+#   python benchmarks/bench_validation.py --blocks 10000,100000 --txs-per-block 4
+
+import argparse
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from core.block import Block
+from core.blockchain import Blockchain
+from core.transaction import Transaction
+from core.validation import ChainValidator
+from core.wallet import Wallet
+
+def make_signed_transactions(count: int, num_senders: int = 8) -> list[dict]:
+    """Signs a pool of registration transactions; blocks reuse them to keep setup fast."""
+    wallets = [Wallet() for _ in range(num_senders)]
+    signed = []
+    for i in range(count):
+        wallet = wallets[i % num_senders]
+        tx_dict = Transaction(sender_wallet=wallet, message="", tx_type="key_registration", username=f"user{i}").to_dict()
+        signed.append({'transaction_dict': tx_dict, 'signature_hex': wallet.sign_transaction(tx_dict).hex()})
+    return signed
+
+def make_chain(num_blocks: int, txs_per_block: int, pool: list[dict]) -> Blockchain:
+    blockchain = Blockchain()
+    for height in range(1, num_blocks + 1):
+        start = (height * txs_per_block) % len(pool)
+        transactions = [pool[(start + i) % len(pool)] for i in range(txs_per_block)]
+        blockchain.chain.append(Block(height, transactions, blockchain.chain[-1].hash, "bench", timestamp=float(height)))
+    return blockchain
+
+def bench_legacy(blockchain: Blockchain) -> tuple[float, float]:
+    chain_dicts = [block.to_dict() for block in blockchain.chain]
+    start = time.perf_counter()
+    for i in range(1, len(chain_dicts)):
+        block = Block.from_dict(chain_dicts[i])
+        assert block.is_valid() and block.previous_hash == chain_dicts[i - 1]['hash']
+    return (len(chain_dicts) - 1) / (time.perf_counter() - start), 0.0
+
+def bench_validator(blockchain: Blockchain, validator: ChainValidator) -> tuple[float, float]:
+    with validator:
+        result = blockchain.verify_chain(validator)
+    assert result, result
+    return result.blocks_per_sec, result.signatures_per_sec
+
+def run_benchmark(block_counts: list[int], txs_per_block: int, workers: int):
+    pool = make_signed_transactions(256)
+    print(f"{'blocks':>8} {'path':<14}{'blocks/sec':>12}{'sigs/sec':>12}")
+    for num_blocks in block_counts:
+        blockchain = make_chain(num_blocks, txs_per_block, pool)
+        cases = [
+            ("legacy", None),
+            ("serial", ChainValidator()),
+            (f"pool x{workers}", ChainValidator(max_workers=workers)),
+            ("checkpoint", ChainValidator(max_workers=workers, checkpoint_height=int(num_blocks * 0.9),
+                                          checkpoint_hash=blockchain.chain[int(num_blocks * 0.9)].hash)),
+        ]
+        for name, validator in cases:
+            blocks_rate, sigs_rate = bench_legacy(blockchain) if validator is None else bench_validator(blockchain, validator)
+            print(f"{num_blocks:>8} {name:<14}{blocks_rate:>12.0f}{sigs_rate:>12.0f}")
+
+        # Early stop: a bad signature 10% into the chain ends the run there.
+        good = blockchain.chain[num_blocks // 10]
+        forged = {**good.transactions[0], 'signature_hex': '00' * len(good.transactions[0].signature)}
+        blockchain.chain[good.index] = Block(good.index, [forged, *good.transactions[1:]], good.previous_hash, good.proposer_address,
+                                             timestamp=good.timestamp)
+        with ChainValidator(max_workers=workers) as validator:
+            result = validator.validate(blockchain.chain[1:], blockchain.chain[0])
+        print(f"{num_blocks:>8} {'early stop':<14}  failed at #{result.failed_height} after {result.elapsed:.2f}s ({result.reason})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipelined chain validation.")
+    parser.add_argument('--blocks', type=str, default="10000,100000", help="Comma-separated chain lengths.")
+    parser.add_argument('--txs-per-block', type=int, default=4, help="Signed transactions per block.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes for the pool runs.")
+    args = parser.parse_args()
+    run_benchmark([int(n) for n in args.blocks.split(',')], args.txs_per_block, args.workers)
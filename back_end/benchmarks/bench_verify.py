@@ -0,0 +1,60 @@
+# benchmarks/bench_verify.py
+#
+# Compares Dilithium verifications/sec of the serial path (dilithium_utils.verify,
+# one oqs context per call) against BatchVerifier at 1, 4 and N worker processes.
+#
+#   python benchmarks/bench_verify.py --count 2000
+
+import argparse
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from crypto import dilithium_utils, providers
+from crypto.dilithium_utils import BatchVerifier
+
+def make_items(count: int, num_signers: int = 8) -> list[tuple[bytes, bytes, bytes]]:
+    """Creates `count` signed messages spread over a few key pairs."""
+    keys = [dilithium_utils.generate_keys() for _ in range(num_signers)]
+    items = []
+    for i in range(count):
+        public_key, secret_key = keys[i % num_signers]
+        message = f"benchmark transaction #{i}".encode()
+        items.append((public_key, message, dilithium_utils.sign(secret_key, message)))
+    return items
+
+def bench_serial(items) -> float:
+    start = time.perf_counter()
+    for public_key, message, signature in items:
+        assert dilithium_utils.verify(public_key, message, signature)
+    return len(items) / (time.perf_counter() - start)
+
+def bench_batched(items, workers: int) -> float:
+    with BatchVerifier(max_workers=workers) as verifier:
+        verifier.verify_many(items[:workers])  # warm up the worker processes
+        start = time.perf_counter()
+        results = verifier.verify_many(items)
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return len(items) / elapsed
+
+def run_benchmark(count: int):
+    print(f"--- Preparing {count} signed messages ({providers.signature_algorithm()}) ---")
+    items = make_items(count)
+
+    print(f"{'path':<20}{'verifications/sec':>20}")
+    serial = bench_serial(items)
+    print(f"{'serial':<20}{serial:>20.0f}")
+    for workers in sorted({1, 4, os.cpu_count() or 1}):
+        rate = bench_batched(items, workers)
+        print(f"{f'batched x{workers}':<20}{rate:>20.0f}  ({rate / serial:.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serial vs. batched Dilithium verification.")
+    parser.add_argument('--count', type=int, default=2000, help="Number of signatures to verify.")
+    args = parser.parse_args()
+    run_benchmark(args.count)
@@ -0,0 +1,417 @@
+# benchmarks/cluster.py
+#
+# Local multi-node clusters for benchmarks. Both kinds expose the same interface, so the
+# same load and measurements run against either:
+#
+#   InProcessCluster - P2PNodes in this event loop, every connection routed through a
+#                      SimulatedLink that adds latency, jitter and frame loss
+#   ProcessCluster   - `network/node.py --headless` subprocesses on localhost ports, driven
+#                      through their JSON-RPC API (CPU and memory are then per node)
+#
+# Nodes are fully meshed: a node elects delegates from the addresses of its direct peers,
+# so every node has to be connected to every other one to agree on the committee.
+
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(__file__)
+parent_dir = os.path.join(script_dir, '..')
+sys.path.append(parent_dir)
+
+from consensus.dpol import DPoLConsensus
+from core import serialization
+from core.blockchain import Blockchain
+from core.mempool import Mempool, transaction_id
+from core.public_ledger import PublicKeyLedger
+from core.wallet import Wallet
+from crypto import providers
+from network import framing
+from network.node import P2PNode
+
+NODE_SCRIPT = os.path.join(parent_dir, 'network', 'node.py')
+# Frames that are never dropped by a lossy link: without them peers never learn each
+# other's addresses and the committee cannot form.
+RELIABLE_MESSAGE_TYPES = {"HANDSHAKE"}
+# Seconds between height polls of subprocess nodes (the resolution of their block times).
+POLL_INTERVAL = 0.02
+STARTUP_TIMEOUT = 30.0
+
+def process_usage() -> dict:
+    """CPU seconds and peak resident memory of this process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {"cpu_seconds": usage.ru_utime + usage.ru_stime, "peak_rss_mb": usage.ru_maxrss / 1024}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class BlockTimes:
+    """When each node first had each block on its main chain, and which transactions it carried."""
+
+    def __init__(self):
+        self.arrivals = {}    # block hash -> {node index: time}
+        self.heights = {}     # block hash -> height
+        self.txids = {}       # block hash -> list of txids
+
+    def record(self, node_index: int, height: int, block_hash: str, transactions: list = None, at: float = None):
+        self.arrivals.setdefault(block_hash, {}).setdefault(node_index, at if at is not None else time.time())
+        self.heights[block_hash] = height
+        if transactions is not None and block_hash not in self.txids:
+            self.txids[block_hash] = [transaction_id(signed_tx['transaction_dict']) for signed_tx in transactions]
+
+class SimulatedLink:
+    """
+    A localhost relay in front of one node that delays and drops whole frames, as a WAN link
+    would. Frame order is kept per direction, like TCP.
+    """
+
+    def __init__(self, target_port: int, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, rng: random.Random = None):
+        """
+        Args:
+            target_port (int): The node's P2P port on 127.0.0.1.
+            latency (float): One-way delay (seconds) added to every frame.
+            jitter (float): Extra random delay of up to this many seconds per frame.
+            loss (float): Probability that a frame is dropped.
+            rng (random.Random): Randomness for jitter and loss, seeded for repeatable runs.
+        """
+        self.target_port = target_port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng or random.Random()
+        self.server = None
+        self.port = None
+        self.tasks = set()
+        self.frames = 0
+        self.dropped = 0
+        self.bytes = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, client_reader, client_writer):
+        target_reader, target_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        for reader, writer in ((client_reader, target_writer), (target_reader, client_writer)):
+            task = asyncio.create_task(self._pump(reader, writer))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def _drops(self, data: bytes, compressed: bool) -> bool:
+        if not self.loss or self.rng.random() >= self.loss:
+            return False
+        try:
+            return serialization.message_type(framing.decompress(data) if compressed else data) not in RELIABLE_MESSAGE_TYPES
+        except (serialization.SerializationError, framing.FrameError):
+            return True
+
+    async def _pump(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        deliver_task = asyncio.create_task(self._deliver(queue, writer))
+        last_due = 0.0
+        try:
+            while True:
+                header = await reader.readexactly(framing.HEADER_SIZE)
+                length = int.from_bytes(header, 'big')
+                data = await reader.readexactly(length & framing.LENGTH_MASK)
+                self.frames += 1
+                self.bytes += len(data) + framing.HEADER_SIZE
+                if self._drops(data, bool(length & framing.COMPRESSED_FLAG)):
+                    self.dropped += 1
+                    continue
+                last_due = max(last_due, loop.time() + self.latency + self.rng.uniform(0, self.jitter))
+                queue.put_nowait((last_due, header + data))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # Deliver what is still in flight, then close the far side as well.
+            await queue.put((None, None))
+            await asyncio.gather(deliver_task, return_exceptions=True)
+
+    async def _deliver(self, queue: asyncio.Queue, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                if due > loop.time():
+                    await asyncio.sleep(due - loop.time())
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "dropped": self.dropped, "bytes": self.bytes}
+
+class MeasuredNode(P2PNode):
+    """A P2PNode that reports every block that reaches its main chain to a BlockTimes."""
+
+    def __init__(self, *args, index: int, block_times: BlockTimes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+        self.block_times = block_times
+        self._recorded_height = 0
+
+    def _record_new_blocks(self):
+        chain = self.blockchain.chain
+        now = time.time()
+        # A reorganization may have replaced recorded heights; record the new blocks there too.
+        height = min(self._recorded_height, len(chain) - 1)
+        while height > 0 and self.index not in self.block_times.arrivals.get(chain[height].hash, ()):
+            height -= 1
+        for height in range(height + 1, len(chain)):
+            block = chain[height]
+            self.block_times.record(self.index, height, block.hash, block.transactions, at=now)
+        self._recorded_height = len(chain) - 1
+
+    def apply_chain_update(self, update):
+        super().apply_chain_update(update)
+        self._record_new_blocks()
+
+    async def on_chain_synced(self):
+        await super().on_chain_synced()
+        self._record_new_blocks()
+
+class InProcessCluster:
+    """N P2PNodes in this process, connected through SimulatedLinks."""
+
+    def __init__(self, size: int, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, delegates: int = 5,
+                 block_max_txs: int = None, block_interval: float = None, mempool_max_txs: int = None, seed: int = 1,
+                 validation_workers: int = None):
+        self.size = size
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.delegates = delegates
+        self.node_options = {key: value for key, value in (("block_max_txs", block_max_txs), ("block_interval", block_interval),
+                                                           ("validation_workers", validation_workers))
+                             if value is not None}
+        self.mempool_max_txs = mempool_max_txs
+        self.rng = random.Random(seed)
+        self.block_times = BlockTimes()
+        self.nodes = []
+        self.links = []
+        self._tasks = []
+
+    async def _add_node(self) -> MeasuredNode:
+        mempool = Mempool(max_count=self.mempool_max_txs) if self.mempool_max_txs else Mempool()
+        node = MeasuredNode("127.0.0.1", free_port(), Wallet(), Blockchain(mempool=mempool),
+                            DPoLConsensus(nodes=[], num_delegates=self.delegates), PublicKeyLedger(),
+                            index=len(self.nodes), block_times=self.block_times, **self.node_options)
+        node.update_consensus_nodes()
+        self._tasks.append(asyncio.create_task(node.start()))
+        self.nodes.append(node)
+        while node.server is None:
+            await asyncio.sleep(0.01)
+        # Connect to every earlier node, each connection through its own link.
+        for other in self.nodes[:-1]:
+            link = SimulatedLink(other.port, self.latency, self.jitter, self.loss, self.rng)
+            self.links.append(link)
+            await node.connect_to_peer("127.0.0.1", await link.start())
+        return node
+
+    async def start(self):
+        for _ in range(self.size):
+            await self._add_node()
+        await self.wait_for_membership(self.size)
+
+    async def wait_for_membership(self, count: int, timeout: float = STARTUP_TIMEOUT):
+        deadline = time.time() + timeout
+        while any(len(node.consensus.all_nodes) < count for node in self.nodes):
+            if time.time() > deadline:
+                raise TimeoutError(f"Nodes did not all see {count} members within {timeout}s")
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        for node in self.nodes:
+            await node.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for link in self.links:
+            await link.stop()
+
+    async def submit(self, node_index: int, signed_transactions: list) -> list[str]:
+        admission = self.nodes[node_index].admission
+        return await asyncio.gather(*(admission.admit({"type": "NEW_TRANSACTION", "payload": signed_tx})
+                                      for signed_tx in signed_transactions))
+
+    async def heights(self) -> list[int]:
+        return [len(node.blockchain.chain) - 1 for node in self.nodes]
+
+    async def add_joiner(self) -> int:
+        """Starts an empty node that connects to all others and syncs. Returns its index."""
+        await self._add_node()
+        return len(self.nodes) - 1
+
+    async def resource_usage(self) -> dict:
+        # All nodes share one process, so only the total is meaningful.
+        return {"process": process_usage(), "links": self.link_stats()}
+
+    def link_stats(self) -> dict:
+        totals = {"frames": 0, "dropped": 0, "bytes": 0}
+        for link in self.links:
+            for key, value in link.stats().items():
+                totals[key] += value
+        return totals
+
+class RpcClient:
+    """A minimal keep-alive JSON-RPC client for a node's API."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self._ids = 0
+        self._lock = asyncio.Lock()
+
+    async def call(self, method: str, params=None):
+        async with self._lock:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self._ids += 1
+            body = json.dumps({"jsonrpc": "2.0", "id": self._ids, "method": method, "params": params or {}}).encode()
+            self.writer.write(f"POST /rpc HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            await self.writer.drain()
+            head = await self.reader.readuntil(b"\r\n\r\n")
+            length = next(int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:"))
+            response = json.loads(await self.reader.readexactly(length))
+        if "error" in response:
+            raise RuntimeError(f"{method}: {response['error']['message']}")
+        return response["result"]
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+class ProcessCluster:
+    """N headless node processes on localhost, each with its own P2P and API port."""
+
+    def __init__(self, size: int, log_dir: str, delegates: int = 5, block_max_txs: int = None, block_interval: float = None,
+                 mempool_max_txs: int = None, verify_workers: int = 0, validation_workers: int = None):
+        self.size = size
+        self.log_dir = log_dir
+        self.node_args = []
+        for flag, value in (("--delegates", delegates), ("--block-max-txs", block_max_txs), ("--block-interval", block_interval),
+                            ("--mempool-max-txs", mempool_max_txs), ("--verify-workers", verify_workers),
+                            ("--validation-workers", validation_workers)):
+            if value is not None:
+                self.node_args += [flag, str(value)]
+        self.block_times = BlockTimes()
+        self.processes = []
+        self.p2p_ports = []
+        self.clients = []
+        self._pollers = []
+
+    async def _add_node(self) -> int:
+        index = len(self.processes)
+        p2p_port, api_port = free_port(), free_port()
+        peers = ",".join(f"127.0.0.1:{port}" for port in self.p2p_ports)
+        command = [sys.executable, NODE_SCRIPT, "--host", "127.0.0.1", "--port", str(p2p_port), "--api-port", str(api_port),
+                   "--headless", *self.node_args] + (["--peers", peers] if peers else [])
+        os.makedirs(self.log_dir, exist_ok=True)
+        env = dict(os.environ)
+        if env.get(providers.SEED_ENV):
+            # A seeded simulated backend would give every node the same keys.
+            env[providers.SEED_ENV] = str(int(env[providers.SEED_ENV]) + 1 + index)
+        with open(os.path.join(self.log_dir, f"node{index}.log"), 'w') as log:
+            self.processes.append(subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env))
+        self.p2p_ports.append(p2p_port)
+        client = RpcClient(api_port)
+        self.clients.append(client)
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while True:
+            try:
+                await client.call("node_status")
+                break
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                await client.close()
+                if time.time() > deadline or self.processes[index].poll() is not None:
+                    raise RuntimeError(f"Node {index} did not start; see {self.log_dir}/node{index}.log")
+                await asyncio.sleep(0.1)
+        self._pollers.append(asyncio.create_task(self._poll_blocks(index)))
+        return index
+
+    async def start(self):
+        for _ in range(self.size):
+            await self._add_node()
+        await self.wait_for_membership(self.size)
+
+    async def wait_for_membership(self, count: int, timeout: float = STARTUP_TIMEOUT):
+        deadline = time.time() + timeout
+        while True:
+            statuses = [await client.call("node_status") for client in self.clients]
+            if all(status["delegates"] >= count for status in statuses):
+                return
+            if time.time() > deadline:
+                raise TimeoutError(f"Nodes did not all see {count} members within {timeout}s")
+            await asyncio.sleep(0.1)
+
+    async def _poll_blocks(self, index: int):
+        """Records when blocks appear on a node. Block times are accurate to POLL_INTERVAL."""
+        client, recorded = RpcClient(self.clients[index].port), 0
+        try:
+            while True:
+                height = (await client.call("node_status"))["height"]
+                now = time.time()
+                while recorded < height:
+                    start = recorded + 1
+                    blocks = await client.call("get_blocks", {"start": start, "end": min(height + 1, start + 100)})
+                    for block in blocks:
+                        self.block_times.record(index, block["index"], block["hash"], block["transactions"], at=now)
+                    recorded = blocks[-1]["index"] if blocks else height
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            await client.close()
+
+    async def stop(self):
+        for poller in self._pollers:
+            poller.cancel()
+        await asyncio.gather(*self._pollers, return_exceptions=True)
+        for client in self.clients:
+            await client.close()
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    async def submit(self, node_index: int, signed_transactions: list) -> list[str]:
+        results = await self.clients[node_index].call("submit_transactions", {"transactions": signed_transactions})
+        return [result["status"] for result in results]
+
+    async def heights(self) -> list[int]:
+        return [(await client.call("node_status"))["height"] for client in self.clients]
+
+    async def add_joiner(self) -> int:
+        return await self._add_node()
+
+    async def resource_usage(self) -> dict:
+        return {"nodes": [(await client.call("node_status"))["process"] for client in self.clients]}
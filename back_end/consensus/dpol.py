@@ -1,18 +1,7 @@
 import hashlib
-import time
-import json
-import sys
-import os
-
-# --- This part allows the script to import from the 'core' directory ---
-script_dir = os.path.dirname(__file__)
-parent_dir = os.path.join(script_dir, '..')
-sys.path.append(parent_dir)
-# ----------------------------------------------------------------------
-print("\n\n>>>> DEBUG: DPOL SCRIPT V2 LOADED SUCCESSFULLY <<<<\n\n") 
-
+import heapq
+import logging
 from core.block import Block
-from core.wallet import Wallet
 
 class DPoLConsensus:
     """
@@ -20,16 +9,58 @@ class DPoLConsensus:
     This class is responsible for delegate selection and block creation proposal.
     """
 
-    def __init__(self, nodes: list[Wallet], num_delegates: int = 21):
+    def __init__(self, nodes: list[str], num_delegates: int = 21):
         """
         Initializes the consensus mechanism.
         
         Args:
-            nodes (list[Wallet]): A list of all Wallet objects participating.
+            nodes (list[str]): The addresses of all participating nodes.
             num_delegates (int): The number of delegates to select in each round.
         """
-        self.all_nodes = nodes
+        # address -> SHA-256 state that has already absorbed the per-node VRF input prefix
+        self._vrf_states = {}
+        self._membership_version = 0
+        self._last_election = None   # (previous hash, membership version, delegates)
         self.num_delegates = num_delegates
+        self.all_nodes = nodes
+
+    # --- Membership ---
+
+    @property
+    def all_nodes(self) -> list[str]:
+        return list(self._vrf_states)
+
+    @all_nodes.setter
+    def all_nodes(self, nodes: list[str]):
+        """Replaces the membership, doing work only for the addresses that joined or left."""
+        self.set_nodes(nodes)
+
+    def set_nodes(self, nodes: list[str]) -> tuple[int, int]:
+        """
+        Updates the membership to `nodes` incrementally.
+
+        Returns:
+            tuple: (number of nodes added, number of nodes removed).
+        """
+        wanted = set(nodes)
+        removed = [address for address in self._vrf_states if address not in wanted]
+        for address in removed:
+            del self._vrf_states[address]
+        added = 0
+        for address in nodes:
+            if address not in self._vrf_states:
+                self._vrf_states[address] = hashlib.sha256(f"{address}-".encode())
+                added += 1
+        if added or removed:
+            self._membership_version += 1
+        return added, len(removed)
+
+    def add_node(self, address: str):
+        self.set_nodes(self.all_nodes + [address])
+
+    def remove_node(self, address: str):
+        if self._vrf_states.pop(address, None) is not None:
+            self._membership_version += 1
 
     def _simulate_ivrf_generation(self, node_address: str, previous_hash: str) -> tuple[str, bool]:
         """
@@ -48,76 +79,72 @@ class DPoLConsensus:
         """
         return proof
 
-    # In consensus/dpol.py, replace the entire select_delegates function
-
-    # In consensus/dpol.py
+    def _scores(self, previous_block_hash: str):
+        """
+        Yields (score, address) for every node. Same score as the reference iVRF simulation,
+        |previous hash - sha256(f"{address}-{previous hash}")|, but each node's hash state has
+        already absorbed its address prefix, and digests are read as fixed-width integers.
+        """
+        # The simulated iVRF proof always verifies, so no per-node proof check is needed here.
+        target = int(previous_block_hash, 16)
+        suffix = previous_block_hash.encode()
+        for address, state in self._vrf_states.items():
+            hasher = state.copy()
+            hasher.update(suffix)
+            yield abs(target - int.from_bytes(hasher.digest(), 'big')), address
 
     def select_delegates(self, previous_block_hash: str) -> list[str]:
         """
         Runs the fair lottery to select the delegate committee for the round.
+
+        The k lowest scores are picked with a bounded heap (O(n log k)) instead of a full sort.
+        Equal scores are ordered by address, so every node elects the same committee no matter
+        in which order it learned about its peers. The result is cached per previous hash
+        until the membership changes.
         """
-        print("\n--- Starting Delegate Election ---")
-        node_scores = {}
-
-        # The list self.all_nodes will now be a list of address strings
-        for node_address in self.all_nodes:
-            # We now use node_address directly instead of node.address
-            random_value, proof = self._simulate_ivrf_generation(node_address, previous_block_hash)
-            
-            if self._simulate_ivrf_verification(proof):
-                try:
-                    score = abs(int(previous_block_hash, 16) - int(random_value, 16))
-                    node_scores[node_address] = score
-                except (ValueError, TypeError) as e:
-                    print(f"DEBUG ERROR: Could not calculate score. Error: {e}")
-
-        if not node_scores:
-            print("Error: No scores were calculated. Cannot select delegates.")
+        cache_key = (previous_block_hash, self._membership_version, self.num_delegates)
+        if self._last_election and self._last_election[0] == cache_key:
+            return list(self._last_election[1])
+
+        try:
+            winners = heapq.nsmallest(self.num_delegates, self._scores(previous_block_hash))
+        except (ValueError, TypeError) as e:
+            logging.error(f"Could not calculate delegate scores for block hash {previous_block_hash!r}: {e}")
             return []
-            
-        sorted_addresses = sorted(node_scores.keys(), key=lambda addr: node_scores[addr])
-        
-        delegates = sorted_addresses[:self.num_delegates]
+
+        delegates = [address for _, address in winners]
         if not delegates:
-            print("Error: No delegates could be selected.")
+            logging.warning("No delegates could be selected: there are no participating nodes.")
             return []
 
-        print(f"--- Election Complete. Primary Delegate: {delegates[0][:10]}...")
-        return delegates
+        self._last_election = (cache_key, delegates)
+        logging.debug(f"Election complete. Primary delegate: {delegates[0][:10]}...")
+        return list(delegates)
 
     def create_new_block(self, delegates: list[str], pending_transactions: list, last_block: Block) -> Block:
         """
-        Simulates the block creation and PBFT consensus among delegates.
+        Builds the primary delegate's block proposal. The delegates then agree on it (or on a
+        replacement) by voting with consensus.pbft.PBFTEngine.
 
         Args:
-            delegates (list): The list of selected delegate addresses.
+            delegates (list): The list of selected delegate addresses, primary first.
             pending_transactions (list): The transactions to be included.
             last_block (Block): The current last block of the blockchain.
 
         Returns:
-            Block: A new, validated block, or None if consensus fails.
+            Block: The proposed block, or None if there are no delegates.
         """
         if not delegates:
-            print("Consensus Error: Cannot create a block without delegates.")
+            logging.error("Consensus Error: Cannot create a block without delegates.")
             return None
         
         primary_delegate_address = delegates[0]
-        print(f"\nPrimary Delegate '{primary_delegate_address[:10]}...' is proposing a new block...")
+        logging.info(f"Primary delegate {primary_delegate_address[:10]}... is proposing a new block.")
 
         # The primary delegate creates the block
-        proposed_block = Block(
+        return Block(
             index=last_block.index + 1,
             transactions=pending_transactions,
             previous_hash=last_block.hash,
             proposer_address=primary_delegate_address
         )
-
-        # *** SIMULATION of PBFT Consensus ***
-        # The primary sends the proposed_block to other delegates for voting.
-        # We assume the consensus is successful.
-        num_votes = len(delegates)
-        required_votes = (2 * num_votes // 3) + 1
-        print(f"Simulating PBFT: requires {required_votes} of {num_votes} votes. Consensus reached!")
-        
-        return proposed_block 
-    
\ No newline at end of file
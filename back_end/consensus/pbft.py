@@ -0,0 +1,704 @@
+# consensus/pbft.py
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from core import serialization
+from core.block import Block
+from crypto import dilithium_utils
+
+# Message phases
+PRE_PREPARE = "PRE_PREPARE"
+PREPARE = "PREPARE"
+COMMIT = "COMMIT"
+VIEW_CHANGE = "VIEW_CHANGE"
+NEW_VIEW = "NEW_VIEW"
+
+# Heights voted on at once: the primary of h + 1 proposes as soon as it has the block for h.
+DEFAULT_PIPELINE_DEPTH = 4
+# Seconds without a commit, while work is outstanding, before delegates vote to replace the
+# primary. Every view change that does not lead to a commit doubles it.
+DEFAULT_VIEW_TIMEOUT = 2.0
+# Largest number of transactions a proposal takes from the mempool.
+DEFAULT_MAX_BLOCK_TXS = 500
+# Seconds between checks for view timeouts.
+TICK_INTERVAL = 0.1
+# Signatures remembered as verified; votes come back inside view change certificates.
+VERIFIED_CACHE_SIZE = 100_000
+# PREPARE and COMMIT votes more than this many views away from ours are dropped before they
+# create any round state.
+VOTE_VIEW_WINDOW = 4
+# Commit certificates kept for recently committed blocks, to relay with them and serve to syncing peers.
+CERTIFICATE_CACHE_SIZE = 1000
+# Commit latencies kept for stats.
+LATENCY_SAMPLES = 1000
+# Fields a signature does not cover: a block is covered by its hash (the digest) and
+# prepared certificates carry signatures of their own.
+UNSIGNED_FIELDS = ("signature", "block", "proofs")
+
+def max_faulty(committee_size: int) -> int:
+    """Number of faulty delegates f that a committee of n tolerates (n >= 3f + 1)."""
+    return (committee_size - 1) // 3
+
+def quorum(committee_size: int) -> int:
+    """
+    Votes needed for a certificate: any two quorums share at least f + 1 delegates, so at least
+    one honest one. This is 2f + 1 when n = 3f + 1.
+    """
+    return (committee_size + max_faulty(committee_size)) // 2 + 1
+
+def signing_bytes(payload: dict) -> bytes:
+    """The canonical bytes a consensus message is signed over."""
+    return serialization.encode_value({key: value for key, value in payload.items() if key not in UNSIGNED_FIELDS})
+
+class _Round:
+    """One height in one view: the proposed block and the votes on it, grouped by digest."""
+
+    __slots__ = ('height', 'view', 'block', 'pre_prepare', 'prepares', 'commits', 'prepared', 'committed', 'started', 'txids')
+
+    def __init__(self, height: int, view: int):
+        self.height = height
+        self.view = view
+        self.block = None
+        self.pre_prepare = None
+        self.prepares = {}     # digest -> {sender: signed PRE_PREPARE or PREPARE}
+        self.commits = {}      # digest -> {sender: signed COMMIT}
+        self.prepared = False
+        self.committed = False
+        self.started = None
+        self.txids = None
+
+    def certificate(self) -> dict:
+        """Proof that this round's block was prepared: its PRE_PREPARE and a quorum of PREPAREs."""
+        votes = self.prepares.get(self.block.hash, {}).values()
+        return {"pre_prepare": self.pre_prepare, "prepares": [vote for vote in votes if vote["phase"] == PREPARE]}
+
+class PBFTEngine:
+    """
+    PBFT agreement among the elected delegates on every new block.
+
+    The committee for a height is the DPoL election on its parent block's hash, and its primary
+    is the delegate at position `view` mod n. The primary broadcasts a signed PRE_PREPARE with
+    the block; delegates that find the block valid broadcast a signed PREPARE, and once a quorum
+    (2f + 1 of n = 3f + 1) prepared the same block they broadcast a signed COMMIT. A quorum of
+    commits makes the block final, and it is appended to the chain strictly in height order.
+
+    Heights are pipelined: the primary of h + 1 proposes on top of block h as soon as it has
+    h's PRE_PREPARE, so up to `pipeline_depth` heights are being voted on at once.
+
+    When nothing commits for `view_timeout` seconds while work is outstanding, delegates
+    broadcast a VIEW_CHANGE listing the blocks they prepared. The next primary collects a quorum
+    of them into a NEW_VIEW with a certificate for every block that has to be proposed again,
+    so a block that may have committed somewhere is never replaced by another one.
+
+    The quorum of COMMITs for a block is kept as its commit certificate. Nodes that did not
+    vote accept a block from a peer only with a valid certificate (see verify_certificate).
+    """
+
+    def __init__(self, wallet, blockchain, consensus, broadcast, on_commit=None, pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+                 view_timeout: float = DEFAULT_VIEW_TIMEOUT, max_block_txs: int = DEFAULT_MAX_BLOCK_TXS, auto_propose: bool = False,
+                 clock=time.monotonic):
+        """
+        Args:
+            wallet (Wallet): Signs this node's votes; its address identifies the node as a delegate.
+            blockchain (Blockchain): The chain committed blocks are appended to, with the mempool and validator.
+            consensus (DPoLConsensus): Elects the committee for each height.
+            broadcast (callable): Coroutine function that sends a message payload to every other node.
+            on_commit (callable): Coroutine function called with each committed block, in height order.
+                It must append the block; defaults to Blockchain.commit_block.
+            pipeline_depth (int): Heights that may be in flight at once (1 disables pipelining).
+            view_timeout (float): Seconds without progress before a view change.
+            max_block_txs (int): Largest number of mempool transactions in a proposal.
+            auto_propose (bool): Propose whenever this node is primary and has pending transactions.
+            clock (callable): Time source, replaceable for simulations.
+        """
+        self.wallet = wallet
+        self.address = wallet.address
+        self.blockchain = blockchain
+        self.consensus = consensus
+        self.broadcast = broadcast
+        self.on_commit = on_commit
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.view_timeout = view_timeout
+        self.max_block_txs = max_block_txs
+        self.auto_propose = auto_propose
+        self.clock = clock
+
+        self.view = 0
+        self._changing_to = None        # view this node voted for, until its NEW_VIEW arrives
+        self._timeout = view_timeout
+        self._progress_at = clock()
+        self._rounds = {}               # (height, view) -> _Round
+        self._committed = {}            # height -> committed _Round waiting for its parent to be appended
+        self._future = {}               # (height, view, sender) -> PRE_PREPARE that arrived before its parent block
+        self._blocks = {}               # digest -> Block that passed validation
+        self._reproposals = {}          # height -> Block the current view has to propose again
+        self._view_changes = {}         # view -> {sender: signed VIEW_CHANGE}
+        self._committees = {}           # parent hash -> (delegates, delegate set, quorum)
+        self._verified = OrderedDict()  # digests of messages whose signature checked out
+        self.certificates = OrderedDict()  # block hash -> commit certificate, most recent last
+        self._task = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.stats = {"proposed": 0, "committed": 0, "view_changes": 0, "invalid_messages": 0, "invalid_blocks": 0}
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.error(f"PBFT tick failed: {e}")
+
+    # --- Committee ---
+
+    @property
+    def tip(self) -> Block:
+        return self.blockchain.last_block
+
+    def committee(self, parent_hash: str) -> tuple[list, set, int]:
+        """The delegates elected on `parent_hash`, as (ordered list, set, quorum size)."""
+        entry = self._committees.get(parent_hash)
+        if entry is None:
+            delegates = self.consensus.select_delegates(parent_hash)
+            entry = (delegates, set(delegates), quorum(len(delegates)))
+            self._committees[parent_hash] = entry
+        return entry
+
+    def membership_changed(self):
+        """Forgets cached elections after nodes joined or left."""
+        self._committees.clear()
+
+    def primary(self, parent_hash: str, view: int) -> str | None:
+        delegates = self.committee(parent_hash)[0]
+        return delegates[view % len(delegates)] if delegates else None
+
+    def next_proposer(self) -> str | None:
+        """The delegate that proposes the next block in the current view."""
+        _, parent = self._next_height()
+        return self.primary(parent.hash, self.view)
+
+    # --- Signatures ---
+
+    async def _send(self, payload: dict):
+        """Signs a message, broadcasts it and handles it locally."""
+        payload["sender"] = self.address
+        data = signing_bytes(payload)
+        payload["signature"] = self.wallet.sign_bytes(data).hex()
+        self._remember_verified(hashlib.sha256(data + payload["signature"].encode()).digest())
+        await self.broadcast(payload)
+        await self._dispatch(payload)
+
+    def _remember_verified(self, key: bytes):
+        self._verified[key] = None
+        if len(self._verified) > VERIFIED_CACHE_SIZE:
+            self._verified.popitem(last=False)
+
+    def _verify(self, payload: dict) -> bool:
+        """Checks a message's signature by its sender (whose address is its public key)."""
+        try:
+            data = signing_bytes(payload)
+            signature_hex = payload["signature"]
+            key = hashlib.sha256(data + signature_hex.encode()).digest()
+            if key in self._verified:
+                return True
+            item = (bytes.fromhex(payload["sender"]), data, bytes.fromhex(signature_hex))
+        except (KeyError, ValueError, TypeError, AttributeError, serialization.SerializationError):
+            return False
+        if not dilithium_utils.verify_batch([item])[0]:
+            return False
+        self._remember_verified(key)
+        return True
+
+    # --- Message handling ---
+
+    async def on_message(self, payload: dict) -> bool:
+        """
+        Handles a consensus message from another node (the payload of a "PBFT" message).
+
+        Returns:
+            bool: True if the message was verified and used, i.e. worth relaying to other nodes.
+        """
+        if not isinstance(payload, dict) or payload.get("sender") == self.address:
+            return False
+        if not isinstance(payload.get("height"), int) or not isinstance(payload.get("view"), int):
+            self.stats["invalid_messages"] += 1
+            return False
+        return await self._dispatch(payload)
+
+    async def _dispatch(self, payload: dict) -> bool:
+        phase = payload.get("phase")
+        if phase == PRE_PREPARE:
+            if await self._on_pre_prepare(payload):
+                await self._advance()
+                return True
+            return False
+        if phase in (PREPARE, COMMIT):
+            return await self._on_vote(payload)
+        if phase == VIEW_CHANGE:
+            return await self._on_view_change(payload)
+        if phase == NEW_VIEW:
+            return await self._on_new_view(payload)
+        return False
+
+    def _round(self, height: int, view: int) -> _Round:
+        round_ = self._rounds.get((height, view))
+        if round_ is None:
+            round_ = self._rounds[(height, view)] = _Round(height, view)
+        return round_
+
+    def _block_at(self, height: int, view: int) -> Block | None:
+        """The block this node builds on at `height` in `view`: the tip, or a block being voted on."""
+        if height == self.tip.index:
+            return self.tip
+        round_ = self._rounds.get((height, view))
+        return round_.block if round_ else None
+
+    def _valid_block(self, payload: dict, parent: Block) -> Block | None:
+        """The proposed block, if it follows `parent` and passes full validation (checked once per block)."""
+        digest = payload.get("digest")
+        block = self._blocks.get(digest)
+        if block is None:
+            try:
+                block = Block.from_dict(payload["block"])
+            except (KeyError, TypeError, ValueError):
+                return None
+            if block.hash != digest:
+                return None
+            result = self.blockchain.validate_blocks([block], parent)
+            if not result:
+                logging.warning(f"PBFT: proposed block #{block.index} is invalid: {result.reason}.")
+                return None
+            self._blocks[digest] = block
+        if block.index != payload["height"] or block.previous_hash != parent.hash:
+            return None
+        return block
+
+    async def _on_pre_prepare(self, payload: dict) -> bool:
+        height, view = payload["height"], payload["view"]
+        tip_height = self.tip.index
+        if view < self.view or (view == self.view and self._changing_to is not None) or height <= tip_height:
+            return False
+        parent = self._block_at(height - 1, view) if view == self.view else None
+        if parent is None or height > tip_height + self.pipeline_depth:
+            # Arrived before its parent block, its view or room in the pipeline; retried once that changes.
+            # The primary is not known without the parent, so every known node gets its own slot: a
+            # proposal from another node cannot displace the primary's, and is rejected on retry.
+            sender = payload.get("sender")
+            if (height <= tip_height + 2 * self.pipeline_depth and view <= self.view + VOTE_VIEW_WINDOW
+                    and sender in self.consensus.all_nodes and self._verify(payload)):
+                self._future[(height, view, sender)] = payload
+            return False
+
+        round_ = self._round(height, view)
+        if round_.block is not None:
+            return False
+        sender = payload.get("sender")
+        if sender != self.primary(parent.hash, view) or not self._verify(payload):
+            self.stats["invalid_messages"] += 1
+            return False
+        expected = self._reproposals.get(height)
+        if expected is not None and payload.get("digest") != expected.hash:
+            logging.warning(f"PBFT: primary of view {view} proposed a new block at #{height} instead of the prepared one.")
+            self.stats["invalid_messages"] += 1
+            return False
+        block = self._valid_block(payload, parent)
+        if block is None:
+            self.stats["invalid_blocks"] += 1
+            return False
+
+        round_.block, round_.pre_prepare, round_.started = block, payload, self.clock()
+        # The primary's proposal counts as its PREPARE.
+        round_.prepares.setdefault(block.hash, {})[sender] = payload
+        if sender != self.address and self.address in self.committee(parent.hash)[1]:
+            await self._send({"phase": PREPARE, "view": view, "height": height, "digest": block.hash})
+        await self._check(round_)
+        return True
+
+    async def _on_vote(self, payload: dict) -> bool:
+        height, view, digest = payload["height"], payload["view"], payload.get("digest")
+        tip_height = self.tip.index
+        if not isinstance(digest, str) or not tip_height < height <= tip_height + 2 * self.pipeline_depth:
+            return False
+        if abs(view - self.view) > VOTE_VIEW_WINDOW:
+            return False
+        # Only delegates vote: the committee of the parent block if we have it, else any known node.
+        parent = self._block_at(height - 1, view)
+        members = self.committee(parent.hash)[1] if parent is not None else self.consensus.all_nodes
+        if payload.get("sender") not in members or not self._verify(payload):
+            self.stats["invalid_messages"] += 1
+            return False
+        round_ = self._round(height, view)
+        votes = round_.prepares if payload["phase"] == PREPARE else round_.commits
+        votes.setdefault(digest, {})[payload["sender"]] = payload
+        await self._check(round_)
+        return True
+
+    @staticmethod
+    def _count(votes: dict, digest: str, members: set) -> int:
+        return sum(1 for sender in votes.get(digest, ()) if sender in members)
+
+    async def _check(self, round_: _Round):
+        """Moves a round to prepared and committed once the votes for its block reach a quorum."""
+        block = round_.block
+        if block is None:
+            return
+        _, members, needed = self.committee(block.previous_hash)
+        if not round_.prepared and self._count(round_.prepares, block.hash, members) >= needed:
+            round_.prepared = True
+            if round_.view == self.view and self._changing_to is None and self.address in members:
+                await self._send({"phase": COMMIT, "view": round_.view, "height": round_.height, "digest": block.hash})
+        # A quorum of commits is final in any view: a later view re-proposes the same block.
+        if not round_.committed and self._count(round_.commits, block.hash, members) >= needed:
+            round_.committed = True
+            commits = [vote for sender, vote in round_.commits[block.hash].items() if sender in members]
+            self._remember_certificate(block.hash, {"height": round_.height, "view": round_.view, "digest": block.hash, "commits": commits})
+            self._committed[round_.height] = round_
+            await self._deliver()
+
+    # --- Commit certificates ---
+
+    def _remember_certificate(self, block_hash: str, certificate: dict):
+        self.certificates[block_hash] = certificate
+        self.certificates.move_to_end(block_hash)
+        if len(self.certificates) > CERTIFICATE_CACHE_SIZE:
+            self.certificates.popitem(last=False)
+
+    def certificate(self, block_hash: str) -> dict | None:
+        """The commit certificate of a recently committed (or certified) block, if this node has it."""
+        return self.certificates.get(block_hash)
+
+    def verify_certificate(self, height: int, block_hash: str, previous_hash: str, certificate) -> bool:
+        """
+        Checks that a quorum of the committee elected on `previous_hash` signed a COMMIT for the
+        block in one view. A valid certificate is kept, so the block can be relayed with it.
+        The block's ancestors are final with it, as the block hash covers them.
+        """
+        if block_hash in self.certificates:
+            return True
+        _, members, needed = self.committee(previous_hash)
+        try:
+            view, commits = certificate["view"], certificate["commits"]
+            if (certificate["height"], certificate["digest"]) != (height, block_hash) or not isinstance(view, int):
+                return False
+        except (KeyError, TypeError):
+            return False
+        if not isinstance(commits, list) or len(commits) > len(members):
+            return False
+        voters = set()
+        for vote in commits:
+            if not isinstance(vote, dict) or (vote.get("phase"), vote.get("height"), vote.get("view"), vote.get("digest")) != (COMMIT, height, view, block_hash):
+                return False
+            if vote.get("sender") in members and vote["sender"] not in voters and self._verify(vote):
+                voters.add(vote["sender"])
+        if len(voters) < needed:
+            return False
+        self._remember_certificate(block_hash, {"height": height, "view": view, "digest": block_hash, "commits": commits})
+        return True
+
+    async def _deliver(self):
+        """Appends committed blocks to the chain, in height order."""
+        delivered = False
+        while True:
+            tip = self.tip
+            round_ = self._committed.pop(tip.index + 1, None)
+            if round_ is None:
+                break
+            block = round_.block
+            if block.previous_hash != tip.hash:
+                continue
+            if self.on_commit is not None:
+                await self.on_commit(block)
+            else:
+                self.blockchain.commit_block(block)
+            if self.tip.hash != block.hash:
+                logging.error(f"PBFT: committed block #{block.index} could not be appended.")
+                break
+            delivered = True
+            now = self.clock()
+            self.stats["committed"] += 1
+            self.latencies.append(now - round_.started)
+            self._progress_at = now
+            self._timeout = self.view_timeout
+            logging.info(f"PBFT committed block #{block.index} ({len(block.transactions)} txs) in view {round_.view}.")
+        if delivered:
+            self._prune()
+            await self._advance()
+
+    def _prune(self):
+        tip = self.tip
+        for key in [key for key in self._rounds if key[0] <= tip.index]:
+            del self._rounds[key]
+        for key in [key for key in self._future if key[0] <= tip.index or key[1] < self.view]:
+            del self._future[key]
+        for height in [height for height in self._committed if height <= tip.index]:
+            del self._committed[height]
+        for height in [height for height in self._reproposals if height <= tip.index]:
+            del self._reproposals[height]
+        self._blocks = {digest: block for digest, block in self._blocks.items() if block.index > tip.index}
+        live = {tip.hash} | {round_.block.hash for round_ in self._rounds.values() if round_.block is not None}
+        self._committees = {parent: entry for parent, entry in self._committees.items() if parent in live}
+
+    async def _advance(self):
+        """Retries proposals whose parent is now known, then proposes if it is this node's turn."""
+        progress = True
+        while progress:
+            progress = False
+            for key in sorted(self._future):
+                if key[1] == self.view and key in self._future and await self._on_pre_prepare(self._future.pop(key)):
+                    progress = True
+        if self.auto_propose or self._reproposals:
+            await self.propose()
+
+    # --- Proposing ---
+
+    def _next_height(self) -> tuple[int, Block]:
+        """The lowest height without a proposal in the current view, and the block it builds on."""
+        height, parent = self.tip.index + 1, self.tip
+        while True:
+            round_ = self._rounds.get((height, self.view))
+            if round_ is None or round_.block is None:
+                return height, parent
+            height, parent = height + 1, round_.block
+
+    def in_flight_txids(self) -> set:
+        """Ids of the transactions in blocks that are proposed but not appended yet."""
+        txids = set()
+        for round_ in self._rounds.values():
+            if round_.block is not None and (round_.view == self.view or round_.committed):
+                if round_.txids is None:
+                    round_.txids = {signed_tx.txid for signed_tx in round_.block.transactions}
+                txids |= round_.txids
+        return txids
+
+    async def propose(self, transactions: list = None) -> Block | None:
+        """
+        Proposes the next block if this node is its primary and the pipeline has room.
+
+        Args:
+            transactions (list): Signed transactions to include. Defaults to the best pending
+                ones that are not in a block in flight already.
+
+        Returns:
+            Block: The proposed block, or None if this node cannot propose now.
+        """
+        if self._changing_to is not None:
+            return None
+        height, parent = self._next_height()
+        if height > self.tip.index + self.pipeline_depth or self.primary(parent.hash, self.view) != self.address:
+            return None
+
+        block = self._reproposals.get(height)
+        if block is None or block.previous_hash != parent.hash:
+            if transactions is None:
+                transactions = self.blockchain.mempool.block_template(max_count=self.max_block_txs, exclude=self.in_flight_txids())
+            if not transactions:
+                return None
+            block = Block(index=height, transactions=transactions, previous_hash=parent.hash, proposer_address=self.address)
+            self.stats["proposed"] += 1
+        # Our own block needs no validation.
+        self._blocks[block.hash] = block
+        await self._send({"phase": PRE_PREPARE, "view": self.view, "height": height, "digest": block.hash, "block": block.to_dict()})
+        return block
+
+    # --- View changes ---
+
+    def _has_pending_work(self) -> bool:
+        # Parked proposals are not counted: they may never become valid, and must not force a view change.
+        if self._changing_to is not None or self._committed or self._reproposals:
+            return True
+        if any(round_.block is not None and round_.view == self.view for round_ in self._rounds.values()):
+            return True
+        return self.auto_propose and len(self.blockchain.mempool) > 0
+
+    async def tick(self):
+        """Proposes if due, and votes for a view change when the current view makes no progress."""
+        if self.auto_propose or self._reproposals:
+            await self.propose()
+        now = self.clock()
+        if not self._has_pending_work():
+            self._progress_at = now
+        elif now - self._progress_at >= self._timeout:
+            await self._start_view_change(max(self.view, self._changing_to or 0) + 1)
+
+    def _prepared_rounds(self) -> list[_Round]:
+        """For every height above the tip, the round in the highest view in which this node prepared a block."""
+        best = {}
+        for round_ in self._rounds.values():
+            if round_.prepared and round_.height > self.tip.index:
+                current = best.get(round_.height)
+                if current is None or round_.view > current.view:
+                    best[round_.height] = round_
+        return [best[height] for height in sorted(best)]
+
+    async def _start_view_change(self, new_view: int):
+        if new_view <= max(self.view, self._changing_to or 0) or self.address not in self.committee(self.tip.hash)[1]:
+            return
+        self._changing_to = new_view
+        self._progress_at = self.clock()
+        self._timeout *= 2
+        self.stats["view_changes"] += 1
+        logging.warning(f"PBFT: no progress in view {self.view}; voting for view {new_view}.")
+        prepared = self._prepared_rounds()
+        await self._send({
+            "phase": VIEW_CHANGE, "view": new_view, "height": self.tip.index,
+            "prepared": [[round_.height, round_.view, round_.block.hash] for round_ in prepared],
+            "proofs": [round_.certificate() for round_ in prepared]
+        })
+
+    def _certified_block(self, certificate: dict, height: int, view: int, digest: str) -> Block | None:
+        """Checks a prepared certificate for (height, view, digest) and returns its block."""
+        try:
+            pre_prepare, prepares = certificate["pre_prepare"], certificate["prepares"]
+            if (pre_prepare["phase"], pre_prepare["height"], pre_prepare["view"], pre_prepare["digest"]) != (PRE_PREPARE, height, view, digest):
+                return None
+            block = self._blocks.get(digest) or Block.from_dict(pre_prepare["block"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if block.hash != digest or block.index != height or not block.is_valid():
+            return None
+        _, members, needed = self.committee(block.previous_hash)
+        if pre_prepare.get("sender") != self.primary(block.previous_hash, view) or not self._verify(pre_prepare):
+            return None
+        voters = {pre_prepare["sender"]}
+        for vote in prepares:
+            if not isinstance(vote, dict) or (vote.get("phase"), vote.get("height"), vote.get("view"), vote.get("digest")) != (PREPARE, height, view, digest):
+                return None
+            if vote.get("sender") in members and vote["sender"] not in voters and self._verify(vote):
+                voters.add(vote["sender"])
+        return block if len(voters) >= needed else None
+
+    def _valid_view_change(self, payload: dict) -> bool:
+        """A VIEW_CHANGE is used only if a certificate backs every block it claims was prepared."""
+        prepared, proofs = payload.get("prepared"), payload.get("proofs")
+        if not isinstance(prepared, list) or not isinstance(proofs, list) or len(prepared) != len(proofs):
+            return False
+        for claim, certificate in zip(prepared, proofs):
+            if not isinstance(claim, list) or len(claim) != 3 or not isinstance(certificate, dict):
+                return False
+            if self._certified_block(certificate, *claim) is None:
+                return False
+        return True
+
+    @staticmethod
+    def _selection(view_changes: list[dict], base_height: int) -> list[tuple]:
+        """
+        The blocks a new view must propose again: for each height above `base_height`, the one
+        prepared in the highest view, as long as the heights are consecutive.
+        """
+        claims = {}
+        for view_change in view_changes:
+            for height, view, digest in view_change["prepared"]:
+                if height > base_height and (height not in claims or view > claims[height][0]):
+                    claims[height] = (view, digest)
+        selected, height = [], base_height + 1
+        while height in claims:
+            selected.append((height, *claims[height]))
+            height += 1
+        return selected
+
+    async def _on_view_change(self, payload: dict) -> bool:
+        new_view = payload["view"]
+        if new_view <= self.view:
+            return False
+        delegates, members, needed = self.committee(self.tip.hash)
+        sender = payload.get("sender")
+        if sender not in members or not self._verify(payload) or not self._valid_view_change(payload):
+            self.stats["invalid_messages"] += 1
+            return False
+        self._view_changes.setdefault(new_view, {})[sender] = payload
+
+        # f + 1 delegates asking for a later view include an honest one: join them instead of
+        # waiting for our own timeout.
+        current = max(self.view, self._changing_to or 0)
+        ahead = [view for view, votes in self._view_changes.items() if view > current and len(votes) > max_faulty(len(delegates))]
+        if ahead:
+            await self._start_view_change(min(ahead))
+
+        votes = self._view_changes.get(new_view, {})
+        if len(votes) >= needed and delegates[new_view % len(delegates)] == self.address and new_view > self.view:
+            await self._send_new_view(new_view, list(votes.values()))
+        return True
+
+    async def _send_new_view(self, new_view: int, view_changes: list[dict]):
+        base_height = max(view_change["height"] for view_change in view_changes)
+        selected = self._selection(view_changes, base_height)
+        proofs = []
+        for height, view, digest in selected:
+            for view_change in view_changes:
+                if [height, view, digest] in view_change["prepared"]:
+                    proofs.append(view_change["proofs"][view_change["prepared"].index([height, view, digest])])
+                    break
+        # The VIEW_CHANGEs go out without their own certificates; only the selected blocks need proof.
+        summaries = [{key: value for key, value in view_change.items() if key != "proofs"} for view_change in view_changes]
+        await self._send({"phase": NEW_VIEW, "view": new_view, "height": base_height, "view_changes": summaries, "proofs": proofs})
+
+    async def _on_new_view(self, payload: dict) -> bool:
+        new_view = payload["view"]
+        if new_view <= self.view:
+            return False
+        _, members, needed = self.committee(self.tip.hash)
+        view_changes = payload.get("view_changes")
+        if payload.get("sender") not in members or not isinstance(view_changes, list) or not self._verify(payload):
+            self.stats["invalid_messages"] += 1
+            return False
+
+        senders = set()
+        for view_change in view_changes:
+            if (isinstance(view_change, dict) and view_change.get("phase") == VIEW_CHANGE and view_change.get("view") == new_view
+                    and view_change.get("sender") in members and isinstance(view_change.get("height"), int)
+                    and isinstance(view_change.get("prepared"), list) and self._verify(view_change)):
+                senders.add(view_change["sender"])
+        if len(senders) < needed or len(senders) != len(view_changes):
+            self.stats["invalid_messages"] += 1
+            return False
+        base_height = max(view_change["height"] for view_change in view_changes)
+        if payload["height"] != base_height:
+            self.stats["invalid_messages"] += 1
+            return False
+
+        # Recompute which blocks must be proposed again and check the certificate for each.
+        try:
+            selected = self._selection(view_changes, base_height)
+        except (TypeError, ValueError):
+            self.stats["invalid_messages"] += 1
+            return False
+        proofs = payload.get("proofs")
+        if not isinstance(proofs, list) or len(proofs) != len(selected):
+            self.stats["invalid_messages"] += 1
+            return False
+        reproposals = {}
+        for (height, view, digest), certificate in zip(selected, proofs):
+            block = self._certified_block(certificate, height, view, digest) if isinstance(certificate, dict) else None
+            if block is None:
+                self.stats["invalid_messages"] += 1
+                return False
+            reproposals[height] = block
+        await self._enter_view(new_view, reproposals)
+        return True
+
+    async def _enter_view(self, view: int, reproposals: dict):
+        self.view = view
+        self._changing_to = None
+        self._reproposals = {height: block for height, block in reproposals.items() if height > self.tip.index}
+        self._progress_at = self.clock()
+        for old_view in [old_view for old_view in self._view_changes if old_view <= view]:
+            del self._view_changes[old_view]
+        logging.warning(f"PBFT: entered view {view} ({len(self._reproposals)} prepared block(s) to propose again).")
+        self._prune()
+        await self._advance()
@@ -1,44 +1,158 @@
 import hashlib
-import json
 from time import time
+from core import merkle, serialization
+from core.signed_transaction import SignedTransaction, intern_address
 
 class Block:
-    def __init__(self, index: int, transactions: list, previous_hash: str, proposer_address: str, timestamp: float = None, a_hash: str = None):
+    """
+    An immutable block. Its transactions are shared SignedTransaction objects, its proposer
+    address is interned, and everything derived from the content (hash check, Merkle leaves
+    and root) is computed at most once.
+    """
+
+    __slots__ = ('index', 'timestamp', 'previous_hash', 'proposer_address', 'merkle_root', 'hash', 'transactions',
+                 '_leaves', '_computed_root', '_hash_ok')
+
+    def __init__(self, index: int, transactions: list, previous_hash: str, proposer_address: str, timestamp: float = None, a_hash: str = None, merkle_root: str = None):
         """
         Initializes a block.
-        If timestamp or a_hash are provided, they are used. Otherwise, they are generated.
+        If timestamp, a_hash or merkle_root are provided, they are used. Otherwise, they are generated.
         This allows for both creating new blocks and reconstructing existing ones.
+        Raises KeyError, ValueError or TypeError if a transaction is malformed.
         """
-        self.index = index
-        self.transactions = transactions
-        self.previous_hash = previous_hash
-        self.proposer_address = proposer_address
-        
+        set_slot = object.__setattr__
+        set_slot(self, 'index', index)
+        set_slot(self, 'transactions', tuple(SignedTransaction.of(signed_tx) for signed_tx in transactions))
+        set_slot(self, 'previous_hash', previous_hash)
+        set_slot(self, 'proposer_address', intern_address(proposer_address))
+
         # Use provided timestamp or create a new one
-        self.timestamp = timestamp if timestamp is not None else time()
-        
+        set_slot(self, 'timestamp', timestamp if timestamp is not None else time())
+
+        set_slot(self, '_leaves', None)
+        set_slot(self, '_computed_root', None)
+        # The header commits to the transactions through their Merkle root
+        set_slot(self, 'merkle_root', merkle_root if merkle_root is not None else self.compute_merkle_root())
+
         # Use provided hash or calculate a new one
         # This is the crucial fix: we preserve the original hash when reconstructing
-        self.hash = a_hash if a_hash is not None else self.calculate_hash()
+        if a_hash is not None:
+            set_slot(self, 'hash', a_hash)
+            set_slot(self, '_hash_ok', None)    # unknown until has_valid_hash() checks it
+        else:
+            set_slot(self, 'hash', self.calculate_hash())
+            set_slot(self, '_hash_ok', True)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Block is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Block is immutable")
+
+    def __reduce__(self):
+        # Pickled (e.g. for validation workers) as its content; the caches are rebuilt on the other side.
+        return (Block, (self.index, self.transactions, self.previous_hash, self.proposer_address, self.timestamp, self.hash, self.merkle_root))
+
+    def _leaf_hashes(self) -> tuple[bytes]:
+        if self._leaves is None:
+            object.__setattr__(self, '_leaves', tuple(signed_tx.leaf_hash for signed_tx in self.transactions))
+        return self._leaves
+
+    def compute_merkle_root(self) -> str:
+        """Computes the Merkle root of the block's transactions."""
+        if self._computed_root is None:
+            object.__setattr__(self, '_computed_root', merkle.merkle_root(self._leaf_hashes()).hex())
+        return self._computed_root
+
+    def header_fields(self) -> dict:
+        """Returns the fields covered by the block hash (see serialization.HEADER_FIELDS)."""
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'previous_hash': self.previous_hash,
+            'proposer_address': self.proposer_address,
+            'merkle_root': self.merkle_root,
+            'tx_count': len(self.transactions)
+        }
 
     def calculate_hash(self) -> str:
         """
-        Calculates the SHA-256 hash of the block's content.
+        Calculates the SHA-256 hash of the block header.
+        The transactions are covered through the Merkle root, so this does not grow with the block size.
         """
-        # Create a dictionary of the block's data for hashing
+        return self.hash_header(self.header_fields())
+
+    @staticmethod
+    def hash_header(header: dict) -> str:
+        """Hashes a header dictionary, e.g. one received from a peer during sync."""
         # IMPORTANT: We only include the data that defines the block, not the hash itself.
-        block_data_for_hashing = {
+        # The canonical binary encoding is deterministic, so every node gets the same hash.
+        header_bytes = serialization.encode_block_header(header)
+
+        return hashlib.sha256(header_bytes).hexdigest()
+
+    def has_valid_hash(self) -> bool:
+        """Checks that the header matches the hash. The answer is remembered, as the block cannot change."""
+        if self._hash_ok is None:
+            object.__setattr__(self, '_hash_ok', self.hash == self.calculate_hash())
+        return self._hash_ok
+
+    def is_valid(self) -> bool:
+        """Checks that the transactions match the Merkle root and the header matches the hash."""
+        return self.merkle_root == self.compute_merkle_root() and self.has_valid_hash()
+
+    def header(self) -> dict:
+        """Returns the block header and hash without its transactions (used for sync and light clients)."""
+        return {**self.header_fields(), 'hash': self.hash}
+
+    def inclusion_proof(self, tx_index: int) -> list[str]:
+        """
+        Returns the Merkle proof (hex sibling hashes, bottom-up) that the transaction at
+        `tx_index` is part of this block. Check it with Block.verify_inclusion.
+        """
+        return [sibling.hex() for sibling in merkle.merkle_proof(self._leaf_hashes(), tx_index)]
+
+    @staticmethod
+    def verify_inclusion(header: dict, signed_tx: dict, tx_index: int, proof: list[str]) -> bool:
+        """
+        Confirms that a signed transaction is in the block described by `header`, using
+        O(log n) hashes instead of the full block body.
+
+        Args:
+            header (dict): A block header as returned by Block.header().
+            signed_tx (dict): The {'transaction_dict', 'signature_hex'} entry being checked.
+            tx_index (int): Its position in the block.
+            proof (list[str]): The hex sibling hashes from Block.inclusion_proof.
+        """
+        try:
+            if Block.hash_header(header) != header['hash']:
+                return False
+            leaf = merkle.leaf_hash(serialization.encode_signed_transaction(signed_tx))
+            siblings = [bytes.fromhex(sibling) for sibling in proof]
+            return merkle.verify_proof(leaf, tx_index, header['tx_count'], siblings, bytes.fromhex(header['merkle_root']))
+        except (KeyError, ValueError, TypeError):
+            return False
+
+    def to_dict(self) -> dict:
+        """Returns the block as a plain dictionary, e.g. for JSON; Block.from_dict reverses it."""
+        return {
             'index': self.index,
-            'timestamp': self.timestamp,
-            'transactions': self.transactions,
+            'transactions': [signed_tx.to_dict() for signed_tx in self.transactions],
             'previous_hash': self.previous_hash,
-            'proposer_address': self.proposer_address
+            'proposer_address': self.proposer_address,
+            'timestamp': self.timestamp,
+            'merkle_root': self.merkle_root,
+            'hash': self.hash
         }
-        
-        # Ensure the data is sorted for a consistent hash
-        block_string = json.dumps(block_data_for_hashing, sort_keys=True, default=str).encode()
-        
-        return hashlib.sha256(block_string).hexdigest()
+
+    def to_bytes(self) -> bytes:
+        """Returns the canonical binary encoding of the block, including its hash."""
+        return serialization.encode_block(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Creates a Block object from its canonical binary encoding."""
+        return cls.from_dict(serialization.decode_block(data, signed_transaction=SignedTransaction))
 
     @classmethod
     def from_dict(cls, block_data: dict):
@@ -48,7 +162,8 @@ class Block:
             transactions=block_data['transactions'],
             previous_hash=block_data['previous_hash'],
             proposer_address=block_data['proposer_address'],
-            # Pass the original timestamp and hash to the constructor
+            # Pass the original timestamp, hash and Merkle root to the constructor
             timestamp=block_data.get('timestamp'),
-            a_hash=block_data.get('hash')
-        )
\ No newline at end of file
+            a_hash=block_data.get('hash'),
+            merkle_root=block_data.get('merkle_root')
+        )
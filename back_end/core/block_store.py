@@ -0,0 +1,321 @@
+# core/block_store.py
+
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from core.block import Block
+
+# Record layout inside a segment file:  length (u32) | crc32 (u32) | block hash (32 bytes) | payload
+RECORD_HEADER = struct.Struct('>II32s')
+# Index entry, one per height:  segment number (u32) | record offset (u64) | payload length (u32) | block hash (32 bytes)
+INDEX_ENTRY = struct.Struct('>IQI32s')
+
+SEGMENT_NAME = "blk{:05d}.dat"
+INDEX_NAME = "index.dat"
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+class BlockStore:
+    """
+    Append-only block storage. Serialized blocks are appended to numbered segment files and
+    a fixed-width index file maps every height to its (segment, offset, length, hash).
+
+    Only the index is touched at startup; segments are memory-mapped on first read.
+    A crash mid-append is repaired on open by dropping index entries that point past the
+    data and truncating any torn record at the end of the last segment.
+    """
+
+    def __init__(self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE, sync: bool = False):
+        """
+        Args:
+            directory (str): Folder that holds the segment and index files. Created if missing.
+            segment_size (int): A new segment is started once the current one grows past this size.
+            sync (bool): If True, fsync data and index after every append.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+
+        self._index_path = os.path.join(directory, INDEX_NAME)
+        self._index_file = open(self._index_path, 'a+b')
+        self._index_map = None
+        self._maps = {}
+        self._hash_index = None
+        self._active_file = None
+
+        self._recover()
+        self._open_active_segment()
+
+    # --- Paths and files ---
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_NAME.format(segment))
+
+    def _segment_numbers(self) -> list[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('blk') and name.endswith('.dat'):
+                try:
+                    numbers.append(int(name[3:-4]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _open_active_segment(self):
+        if self._active_file:
+            self._active_file.close()
+        self._active_segment = self._segment_numbers()[-1] if self._segment_numbers() else 0
+        self._active_file = open(self._segment_path(self._active_segment), 'ab')
+
+    def _remap_index(self):
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        self._index_file.flush()
+        size = os.path.getsize(self._index_path)
+        self._count = size // INDEX_ENTRY.size
+        if size:
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_maps(self):
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+
+    # --- Crash recovery ---
+
+    def _read_record_header(self, segment_file, offset: int):
+        segment_file.seek(offset)
+        raw = segment_file.read(RECORD_HEADER.size)
+        if len(raw) < RECORD_HEADER.size:
+            return None
+        return RECORD_HEADER.unpack(raw)
+
+    def _record_is_valid(self, segment: int, offset: int, length: int, block_hash: bytes) -> bool:
+        path = self._segment_path(segment)
+        if not os.path.exists(path) or offset + RECORD_HEADER.size + length > os.path.getsize(path):
+            return False
+        with open(path, 'rb') as segment_file:
+            header = self._read_record_header(segment_file, offset)
+            if header is None or header[0] != length or header[2] != block_hash:
+                return False
+            return zlib.crc32(segment_file.read(length)) == header[1]
+
+    def _recover(self):
+        """Brings the index and the segment files back to a consistent state after a crash."""
+        # 1. Drop a partially written index entry.
+        size = os.path.getsize(self._index_path)
+        if size % INDEX_ENTRY.size:
+            self._truncate_index(size // INDEX_ENTRY.size)
+        self._remap_index()
+
+        # 2. Drop index entries whose record did not make it to disk.
+        while self._count and not self._record_is_valid(*self._entry(self._count - 1)):
+            self._truncate_index(self._count - 1)
+            self._remap_index()
+
+        # 3. Index complete records written after the last indexed one, then cut the torn tail.
+        #    Segments past the last indexed one only hold data from an interrupted append.
+        if self._count:
+            segment, offset, length, _ = self._entry(self._count - 1)
+            end = offset + RECORD_HEADER.size + length
+        else:
+            segment, end = 0, 0
+
+        for number in self._segment_numbers():
+            if number > segment:
+                os.remove(self._segment_path(number))
+            elif number == segment:
+                end = self._reindex_tail(segment, end)
+                with open(self._segment_path(segment), 'r+b') as segment_file:
+                    segment_file.truncate(end)
+        self._remap_index()
+
+    def _reindex_tail(self, segment: int, offset: int) -> int:
+        """Adds index entries for complete records starting at offset; returns the end of the last one."""
+        with open(self._segment_path(segment), 'rb') as segment_file:
+            while True:
+                header = self._read_record_header(segment_file, offset)
+                if header is None:
+                    return offset
+                length, crc, block_hash = header
+                payload = segment_file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return offset
+                self._index_file.write(INDEX_ENTRY.pack(segment, offset, length, block_hash))
+                self._index_file.flush()
+                offset += RECORD_HEADER.size + length
+
+    def _truncate_index(self, count: int):
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        self._index_file.flush()
+        self._index_file.truncate(count * INDEX_ENTRY.size)
+
+    # --- Reads ---
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, height: int) -> tuple[int, int, int, bytes]:
+        if not 0 <= height < self._count:
+            raise IndexError(f"Block height {height} is not in the store.")
+        start = height * INDEX_ENTRY.size
+        return INDEX_ENTRY.unpack(self._index_map[start:start + INDEX_ENTRY.size])
+
+    def _segment_map(self, segment: int, needed: int) -> mmap.mmap:
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < needed:
+            if segment_map is not None:
+                segment_map.close()
+            if segment == self._active_segment:
+                self._active_file.flush()
+            with open(self._segment_path(segment), 'rb') as segment_file:
+                segment_map = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        return segment_map
+
+    def read(self, height: int) -> bytes:
+        """Returns the serialized block stored at the given height."""
+        segment, offset, length, _ = self._entry(height)
+        start = offset + RECORD_HEADER.size
+        segment_map = self._segment_map(segment, start + length)
+        return segment_map[start:start + length]
+
+    def block_hash(self, height: int) -> bytes:
+        return self._entry(height)[3]
+
+    def height_of(self, block_hash: bytes) -> int | None:
+        """Looks up the height of a block by its hash. The hash index is built on first use."""
+        if self._hash_index is None:
+            self._hash_index = {}
+            for height in range(self._count):
+                self._hash_index[self._entry(height)[3]] = height
+        return self._hash_index.get(block_hash)
+
+    # --- Writes ---
+
+    def append(self, payload: bytes, block_hash: bytes) -> int:
+        """Appends a serialized block and returns its height."""
+        if self._active_file.tell() >= self.segment_size:
+            self._active_file.close()
+            self._active_segment += 1
+            self._active_file = open(self._segment_path(self._active_segment), 'ab')
+
+        offset = self._active_file.tell()
+        self._active_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), block_hash))
+        self._active_file.write(payload)
+        self._active_file.flush()
+        if self.sync:
+            os.fsync(self._active_file.fileno())
+
+        self._index_file.write(INDEX_ENTRY.pack(self._active_segment, offset, len(payload), block_hash))
+        self._index_file.flush()
+        if self.sync:
+            os.fsync(self._index_file.fileno())
+        self._remap_index()
+
+        height = self._count - 1
+        if self._hash_index is not None:
+            self._hash_index[block_hash] = height
+        return height
+
+    def truncate(self, height: int):
+        """Removes every block at or above the given height (used when the chain is replaced)."""
+        if height >= self._count:
+            return
+        if height > 0:
+            segment, offset, length, _ = self._entry(height - 1)
+            end = offset + RECORD_HEADER.size + length
+        else:
+            segment, end = 0, 0
+
+        self._close_maps()
+        self._active_file.close()
+        for number in self._segment_numbers():
+            if number > segment:
+                os.remove(self._segment_path(number))
+        with open(self._segment_path(segment), 'a+b') as segment_file:
+            segment_file.truncate(end)
+        self._truncate_index(height)
+        self._remap_index()
+        self._open_active_segment()
+        self._hash_index = None
+
+    def close(self):
+        self._close_maps()
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        self._active_file.close()
+        self._index_file.close()
+
+class StoredChain:
+    """
+    A list-like view of the chain backed by a BlockStore. It supports what Blockchain and the
+    node use on a plain list: len(), indexing (including negative), slicing, iteration, append,
+    extend and deleting a tail slice. Recently used blocks are kept decoded in a small cache.
+    """
+
+    def __init__(self, store: BlockStore, cache_size: int = 256):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def encode_block(block: Block) -> bytes:
+        return block.to_bytes()
+
+    @staticmethod
+    def decode_block(payload: bytes) -> Block:
+        return Block.from_bytes(payload)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+        height = key + len(self) if key < 0 else key
+        block = self._cache.get(height)
+        if block is not None:
+            self._cache.move_to_end(height)
+            return block
+        block = self.decode_block(self.store.read(height))
+        self._remember(height, block)
+        return block
+
+    def __iter__(self):
+        for height in range(len(self)):
+            yield self[height]
+
+    def __delitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1) or key.stop not in (None, len(self)):
+            raise TypeError("StoredChain only supports deleting a tail slice, e.g. del chain[h:].")
+        height = key.start if key.start is not None else 0
+        height = height + len(self) if height < 0 else height
+        self.store.truncate(height)
+        for cached in [h for h in self._cache if h >= height]:
+            del self._cache[cached]
+
+    def _remember(self, height: int, block: Block):
+        self._cache[height] = block
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def append(self, block: Block):
+        height = self.store.append(self.encode_block(block), bytes.fromhex(block.hash))
+        self._remember(height, block)
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.append(block)
+
+    def index_of_hash(self, block_hash: str) -> int | None:
+        return self.store.height_of(bytes.fromhex(block_hash))
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,219 @@
+# core/block_tree.py
+
+import logging
+from collections import OrderedDict
+from core.chain_index import DEFAULT_REORG_DEPTH
+
+# Largest number of blocks kept while their parent is unknown.
+DEFAULT_MAX_ORPHANS = 256
+
+# Outcomes of BlockTree.add_block
+EXTENDED = "extended"          # the block (and maybe others) were appended to the main chain
+REORGANIZED = "reorganized"    # the main chain switched to a heavier branch
+SIDE = "side"                  # stored on a branch that is not (yet) heavier than the main chain
+ORPHAN = "orphan"              # parent unknown; kept until it arrives
+KNOWN = "known"                # already on the main chain or in the tree
+INVALID = "invalid"            # rejected by validation
+
+class ChainUpdate:
+    """
+    How the main chain changed: `reverted` blocks were rolled back (newest first), then
+    `applied` blocks were appended (oldest first). Derived state such as the mempool, the
+    ledger and the inbox is updated from these deltas instead of being rebuilt. An INVALID
+    update may name the height of the first block that failed validation.
+    """
+
+    def __init__(self, status: str, reverted: list = None, applied: list = None, failed_height: int = None):
+        self.status = status
+        self.reverted = reverted or []
+        self.applied = applied or []
+        self.failed_height = failed_height
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.reverted or self.applied)
+
+    def merge(self, other: 'ChainUpdate'):
+        """Appends a later update, cancelling blocks that were applied here and reverted there."""
+        for block in other.reverted:
+            if self.applied and self.applied[-1].hash == block.hash:
+                self.applied.pop()
+            else:
+                self.reverted.append(block)
+        self.applied.extend(other.applied)
+
+class BlockTree:
+    """
+    The blocks around a Blockchain's main chain: side branches and orphans.
+
+    The main chain itself stays the linear `blockchain.chain`; this class keeps every other
+    recent block by hash, linked to its parent. The fork-choice rule is the heaviest branch,
+    where every block weighs the same, so the highest tip wins and ties keep the current
+    chain. When a side branch becomes heavier, only the blocks above the fork point are
+    rolled back and the branch's blocks applied (see Blockchain.reorganize).
+    """
+
+    def __init__(self, blockchain, max_orphans: int = DEFAULT_MAX_ORPHANS, max_depth: int = DEFAULT_REORG_DEPTH):
+        """
+        Args:
+            blockchain (Blockchain): The chain whose main branch this tree extends.
+            max_orphans (int): Largest number of orphan blocks kept.
+            max_depth (int): Side blocks this far below the tip are forgotten.
+        """
+        self.blockchain = blockchain
+        self.max_orphans = max_orphans
+        self.max_depth = max_depth
+        self._side = {}                  # block hash -> Block, off the main chain with a known parent
+        self._children = {}              # parent hash -> set of side block hashes
+        self._orphans = OrderedDict()    # block hash -> Block whose parent is unknown, oldest first
+        self._orphans_by_parent = {}     # parent hash -> set of orphan hashes
+
+    @property
+    def chain(self):
+        return self.blockchain.chain
+
+    def _on_main_chain(self, height: int, block_hash: str) -> bool:
+        return 0 <= height < len(self.chain) and self.chain[height].hash == block_hash
+
+    def has_block(self, block) -> bool:
+        return block.hash in self._side or block.hash in self._orphans or self._on_main_chain(block.index, block.hash)
+
+    def stats(self) -> dict:
+        return {"side_blocks": len(self._side), "orphans": len(self._orphans)}
+
+    # --- Storage ---
+
+    def keep_side_blocks(self, blocks: list):
+        """Stores blocks that just left the main chain, so the chain can switch back to them."""
+        for block in blocks:
+            self._store_side(block)
+
+    def _store_side(self, block):
+        self._side[block.hash] = block
+        self._children.setdefault(block.previous_hash, set()).add(block.hash)
+
+    def _remove_side(self, block_hash: str):
+        block = self._side.pop(block_hash, None)
+        if block is None:
+            return
+        siblings = self._children.get(block.previous_hash)
+        if siblings is not None:
+            siblings.discard(block_hash)
+            if not siblings:
+                del self._children[block.previous_hash]
+
+    def _discard_subtree(self, block_hash: str):
+        """Forgets a side block and everything built on it (used for invalid blocks)."""
+        stack = [block_hash]
+        while stack:
+            current = stack.pop()
+            stack.extend(self._children.get(current, ()))
+            stack.extend(self._orphans_by_parent.get(current, ()))
+            self._remove_side(current)
+            self._remove_orphan(current)
+
+    def _store_orphan(self, block):
+        self._orphans[block.hash] = block
+        self._orphans_by_parent.setdefault(block.previous_hash, set()).add(block.hash)
+        while len(self._orphans) > self.max_orphans:
+            self._remove_orphan(next(iter(self._orphans)))
+
+    def _remove_orphan(self, block_hash: str):
+        block = self._orphans.pop(block_hash, None)
+        if block is None:
+            return
+        waiting = self._orphans_by_parent.get(block.previous_hash)
+        if waiting is not None:
+            waiting.discard(block_hash)
+            if not waiting:
+                del self._orphans_by_parent[block.previous_hash]
+
+    def _prune(self):
+        floor = len(self.chain) - 1 - self.max_depth
+        for block_hash in [h for h, block in self._side.items() if block.index <= floor]:
+            self._remove_side(block_hash)
+
+    # --- Adding blocks ---
+
+    def _branch_to_main(self, block) -> tuple[int, list] | None:
+        """Returns (fork height, branch blocks oldest first) for a side block, or None if it is not connected."""
+        branch = [block]
+        while not self._on_main_chain(branch[-1].index - 1, branch[-1].previous_hash):
+            parent = self._side.get(branch[-1].previous_hash)
+            if parent is None:
+                return None
+            branch.append(parent)
+        branch.reverse()
+        return branch[0].index - 1, branch
+
+    def _connect(self, block) -> ChainUpdate:
+        """Attaches a block whose parent is known (main chain or side branch)."""
+        tip = self.blockchain.last_block
+        if block.previous_hash == tip.hash and block.index == tip.index + 1:
+            result = self.blockchain.validate_blocks([block], tip)
+            if not result:
+                logging.warning(f"Block #{block.index} rejected: {result.reason}.")
+                return ChainUpdate(INVALID)
+            self.chain.append(block)
+            self.blockchain.mempool.remove_block(block)
+            return ChainUpdate(EXTENDED, applied=[block])
+
+        self._store_side(block)
+        located = self._branch_to_main(block)
+        if located is None or block.index <= tip.index:
+            # Fork choice: the current chain stays unless the branch is strictly heavier.
+            return ChainUpdate(SIDE)
+
+        fork_height, branch = located
+        update = self.blockchain.reorganize(fork_height, branch)
+        if update.status == INVALID:
+            # The failed block and everything built on it can never win; its valid ancestors
+            # on the branch stay, as another child of theirs still might.
+            failed = update.failed_height - fork_height - 1 if update.failed_height is not None else 0
+            self._discard_subtree(branch[max(0, min(failed, len(branch) - 1))].hash)
+            return ChainUpdate(INVALID)
+        for branch_block in branch:
+            self._remove_side(branch_block.hash)
+        return update
+
+    def add_block(self, block) -> ChainUpdate:
+        """
+        Adds a block from a peer: extends the main chain, stores it on a side branch (switching
+        to that branch if it is now the heaviest), or parks it as an orphan. Orphans waiting for
+        this block are connected right after it.
+        """
+        if self.has_block(block):
+            return ChainUpdate(KNOWN)
+        try:
+            block_ok = block.is_valid()
+        except (KeyError, ValueError, TypeError):
+            block_ok = False
+        if not block_ok:
+            return ChainUpdate(INVALID)
+
+        parent_known = self._on_main_chain(block.index - 1, block.previous_hash) or block.previous_hash in self._side
+        if not parent_known:
+            self._store_orphan(block)
+            return ChainUpdate(ORPHAN)
+
+        total = ChainUpdate(SIDE)
+        pending = [block]
+        while pending:
+            current = pending.pop()
+            update = self._connect(current)
+            if update.status == INVALID:
+                if current is block:
+                    return update
+                continue
+            total.merge(update)
+            # Orphans that were waiting for this block can be connected now (they were checked on arrival).
+            for orphan_hash in list(self._orphans_by_parent.get(current.hash, ())):
+                orphan = self._orphans[orphan_hash]
+                self._remove_orphan(orphan_hash)
+                if orphan.index == current.index + 1:
+                    pending.append(orphan)
+
+        if total.changed:
+            total.status = REORGANIZED if total.reverted else EXTENDED
+            self._prune()
+        return total
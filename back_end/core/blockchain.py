@@ -1,34 +1,52 @@
-import json
+import logging
 from core.block import Block
+from core.block_store import BlockStore, StoredChain
+from core.block_tree import BlockTree, ChainUpdate, EXTENDED, REORGANIZED, INVALID
+from core.mempool import Mempool, transaction_id
+from core.signed_transaction import SignedTransaction
+from core.validation import ChainValidator, ValidationResult, verification_item
 from crypto import dilithium_utils
 
 class Blockchain:
-    def __init__(self):
-        self.chain = [self.create_genesis_block()]
-        self.pending_transactions = []
+    def __init__(self, data_dir: str = None, mempool: Mempool = None, validator: ChainValidator = None):
+        """
+        Args:
+            data_dir (str): If given, blocks are persisted to an append-only BlockStore in this
+                folder and the chain is reopened from it on restart. Otherwise the chain lives in memory.
+            mempool (Mempool): The pending transaction pool. A default-sized one is created if omitted.
+            validator (ChainValidator): Checks blocks received from peers, including their
+                transaction signatures. Defaults to checking in this process without a checkpoint.
+        """
+        if data_dir:
+            self.chain = StoredChain(BlockStore(data_dir))
+            if len(self.chain) == 0:
+                self.chain.append(self.create_genesis_block())
+        else:
+            self.chain = [self.create_genesis_block()]
+        self.mempool = mempool if mempool is not None else Mempool()
+        self.validator = validator if validator is not None else ChainValidator()
+        # Side branches and orphans around the main chain, for fork choice
+        self.tree = BlockTree(self)
+        # Height of the last block the delegates committed (or certified); never reorganized away
+        self.finalized_height = 0
 
     def create_genesis_block(self) -> Block:
         """
         Creates the very first block in the chain using static, deterministic values.
         This ensures that every node starts with the exact same Block #0.
         """
-        # Create the block with hardcoded values
+        # Create the block with hardcoded values; the fixed timestamp keeps the hash the same everywhere
         genesis_block = Block(
             index=0, 
             transactions=[], 
             previous_hash="0", 
-            proposer_address="genesis"
+            proposer_address="genesis",
+            timestamp=0
         )
         
-        # Manually set a fixed timestamp to ensure the hash is always the same
-        genesis_block.timestamp = 0
-        
-        # Manually set the hash to its pre-calculated value
-        genesis_block.hash = genesis_block.calculate_hash()
-        
         # Sanity check to ensure the hash is what we expect
         # The expected hash for the block with timestamp=0 is:
-        # '092994138b1f3a595353523e38714150b07881c15f9b803c757a2210a52f2070'
+        # 'b3b35c6549a0c5b7c396cb5a0715ebed4e975f2e29fa276247d3b05665912336'
         
         return genesis_block
 
@@ -37,66 +55,96 @@ class Blockchain:
         """Returns the most recent block in the chain."""
         return self.chain[-1]
 
+    @property
+    def pending_transactions(self) -> list[dict]:
+        """The pending signed transactions, in priority order."""
+        return self.mempool.transactions()
+
+    def is_known_transaction(self, transaction_dict: dict) -> bool:
+        """O(1) duplicate check, done before any signature verification."""
+        return self.mempool.is_known(transaction_id(transaction_dict))
+
+    def prepare_verification(self, transaction_dict: dict, signature_hex: str) -> tuple[bytes, bytes, bytes]:
+        """
+        Converts a signed transaction into the (public_key, message, signature) bytes
+        that the Dilithium verifier expects.
+        Raises KeyError, ValueError or TypeError for malformed transactions.
+        """
+        return verification_item(transaction_dict, signature_hex)
+
+    def admit_transaction(self, transaction_dict: dict, signature_hex: str, txid: str = None) -> bool:
+        """
+        Adds a transaction whose signature has already been verified to the pending pool.
+        This structure is consistent with what other parts of the system expect.
+        Returns False if it was a duplicate or did not fit into the pool.
+        """
+        signed_transaction = SignedTransaction(transaction_dict, bytes.fromhex(signature_hex))
+        return self.mempool.add(signed_transaction, txid=txid)
+
+    def admit_signed_transaction(self, signed_transaction: SignedTransaction) -> bool:
+        """Like admit_transaction, for a SignedTransaction whose signature has already been verified."""
+        return self.mempool.add(signed_transaction)
+
     def add_transaction(self, transaction_dict: dict, signature_hex: str) -> bool:
         """
         Verifies a transaction's signature and adds it to the pending pool.
         This method is now more robust and correctly prepares data for verification.
         """
         try:
-            # 1. Get the sender's address from the transaction data.
             sender_address_hex = transaction_dict['sender_address']
-            
-            # 2. Convert hex-encoded strings back to bytes for cryptographic operations.
-            public_key_bytes = bytes.fromhex(sender_address_hex)
-            signature_bytes = bytes.fromhex(signature_hex)
-            
-            # 3. Prepare the message for verification.
-            #    This MUST be done in the exact same way the message was prepared for signing.
-            message_bytes = json.dumps(transaction_dict, sort_keys=True).encode('utf-8')
+            txid = transaction_id(transaction_dict)
+            if self.mempool.is_known(txid):
+                logging.debug("Transaction %s... is already known. Ignoring.", txid[:10])
+                return False
+
+            public_key_bytes, message_bytes, signature_bytes = self.prepare_verification(transaction_dict, signature_hex)
 
             # 4. Verify the signature using the corrected function name and prepared message.
             is_valid = dilithium_utils.verify(public_key_bytes, message_bytes, signature_bytes)
             
             if not is_valid:
-                print(f"❌ Transaction from {sender_address_hex[:10]}... has an invalid signature. Discarding.")
+                logging.warning(f"Transaction from {sender_address_hex[:10]}... has an invalid signature. Discarding.")
                 return False
                 
             # 5. Add the validated, signed transaction to the pending pool.
-            #    This structure is consistent with what other parts of the system expect.
-            signed_transaction = {
-                'transaction_dict': transaction_dict,
-                'signature_hex': signature_hex
-            }
-            self.pending_transactions.append(signed_transaction)
-            print(f"✅ Transaction from {sender_address_hex[:10]}... verified and added to pending pool.")
+            if not self.admit_transaction(transaction_dict, signature_hex, txid=txid):
+                logging.warning(f"Transaction from {sender_address_hex[:10]}... was verified but the pending pool is full.")
+                return False
+            logging.debug("Transaction from %s... verified and added to pending pool.", sender_address_hex[:10])
             return True
 
         except (KeyError, ValueError, TypeError) as e:
             # Catch errors from missing keys, bad hex values, or other data issues.
-            print(f"❌ Discarding malformed transaction. Error: {e}")
+            logging.warning(f"Discarding malformed transaction. Error: {e}")
             return False
 
-    def mine_block(self, proposer_address: str) -> Block:
+    def mine_block(self, proposer_address: str, max_block_bytes: int = None, max_block_txs: int = None) -> Block:
         """
-        Creates a new block from pending transactions and adds it to the chain.
+        Creates a new block from the highest priority pending transactions and adds it to the chain.
+
+        Args:
+            proposer_address (str): Address of the node proposing the block.
+            max_block_bytes (int): Largest total encoded size of the included transactions.
+            max_block_txs (int): Largest number of included transactions.
         """
-        if not self.pending_transactions:
-            print("No pending transactions to mine.")
+        transactions = self.mempool.block_template(max_bytes=max_block_bytes, max_count=max_block_txs)
+        if not transactions:
+            logging.info("No pending transactions to mine.")
             return None
 
         new_block = Block(
             index=self.last_block.index + 1,
-            transactions=self.pending_transactions,
+            transactions=transactions,
             previous_hash=self.last_block.hash,
             proposer_address=proposer_address
         )
 
         self.chain.append(new_block)
         
-        # Clear the pending transactions pool after mining.
-        self.pending_transactions = []
+        # Remove only the included transactions from the pending pool.
+        self.mempool.remove_block(new_block)
         
-        print(f"⛓️ Block #{new_block.index} mined by {proposer_address[:10]}... and added to the chain.")
+        logging.info(f"Block #{new_block.index} mined by {proposer_address[:10]}... and added to the chain.")
         return new_block
     
     def replace_chain(self, new_chain: list[dict]) -> bool:
@@ -107,23 +155,145 @@ class Blockchain:
             # The incoming chain isn't longer, so we ignore it.
             return False
 
-        # Validate the new chain to ensure all blocks are correctly linked and hashed.
-        for i in range(1, len(new_chain)):
-            current_block_data = new_chain[i]
-            previous_block_data = new_chain[i-1]
-            
-            # Re-create the Block object to verify its hash integrity.
-            block_to_verify = Block.from_dict(current_block_data)
-            
-            if block_to_verify.hash != block_to_verify.calculate_hash():
-                print(f"Chain validation failed: Block #{block_to_verify.index} has a corrupted hash.")
-                return False
-            
-            if block_to_verify.previous_hash != previous_block_data['hash']:
-                print(f"Chain validation failed: Block #{block_to_verify.index} has a broken link to the previous block.")
-                return False
-        
-        print(f"✅ Incoming chain is valid. Replacing local chain of length {len(self.chain)} with new chain of length {len(new_chain)}.")
-        # Reconstruct the chain with proper Block objects.
-        self.chain = [Block.from_dict(block_data) for block_data in new_chain]
+        # Blocks we already have are not checked again; the rest are validated from the fork point,
+        # with their linkage, hashes, Merkle roots and transaction signatures.
+        if new_chain[0]['hash'] != self.chain[0].hash:
+            logging.warning("Chain validation failed: The incoming chain has a different genesis block.")
+            return False
+        fork_height = 0
+        while fork_height + 1 < min(len(self.chain), len(new_chain)) and self.chain[fork_height + 1].hash == new_chain[fork_height + 1]['hash']:
+            fork_height += 1
+        try:
+            new_blocks = [Block.from_dict(block_data) for block_data in new_chain[fork_height + 1:]]
+        except (KeyError, ValueError, TypeError) as e:
+            logging.warning(f"Chain validation failed: The incoming chain has a malformed block ({e}).")
+            return False
+        if self.reorganize(fork_height, new_blocks).status == INVALID:
+            return False
+        logging.info(f"Incoming chain is valid. Switched to it at fork point #{fork_height} (now {len(self.chain)} blocks).")
         return True
+
+    def add_block(self, block: Block) -> ChainUpdate:
+        """
+        Adds a block from a peer through the block tree: it extends the chain, waits on a side
+        branch or in the orphan pool, or triggers a reorganization to a heavier branch.
+        """
+        return self.tree.add_block(block)
+
+    def commit_block(self, block: Block) -> ChainUpdate:
+        """
+        Appends a block the delegate committee committed to. It was fully validated before the
+        committee voted on it, so it is not checked again; it only has to extend the tip.
+        """
+        tip = self.last_block
+        if block.previous_hash != tip.hash or block.index != tip.index + 1:
+            logging.warning(f"Committed block #{block.index} does not extend the chain tip #{tip.index}. Ignoring.")
+            return ChainUpdate(INVALID)
+        self.chain.append(block)
+        self.mempool.remove_block(block)
+        self.finalize(block.index)
+        return ChainUpdate(EXTENDED, applied=[block])
+
+    def finalize(self, height: int):
+        """Marks the main chain up to `height` as final: no reorganization may roll it back."""
+        self.finalized_height = max(self.finalized_height, min(height, len(self.chain) - 1))
+
+    def validate_blocks(self, blocks: list[Block], previous: Block) -> ValidationResult:
+        """
+        Validates new blocks that follow `previous`. Signatures of transactions that are in the
+        mempool were verified on admission and are not checked again, so a block made of
+        transactions this node already relayed costs hashing only.
+        """
+        return self.validator.validate(blocks, previous, verified=self.mempool.has_verified)
+
+    def reorganize(self, fork_height: int, blocks: list[Block]) -> ChainUpdate:
+        """
+        Makes `blocks` the chain above `fork_height`. Only the blocks above the fork are rolled
+        back (and kept in the block tree); their transactions return to the mempool, and the
+        new blocks' transactions leave it.
+
+        Returns:
+            ChainUpdate: The rolled back and applied blocks, or an INVALID update naming the
+                height of the first block that failed validation.
+        """
+        if not blocks or not 0 <= fork_height < len(self.chain):
+            return ChainUpdate(INVALID)
+        if fork_height < self.finalized_height:
+            logging.warning(f"Rejected a reorganization at #{fork_height}, below the finalized block #{self.finalized_height}.")
+            return ChainUpdate(INVALID, failed_height=fork_height + 1)
+        result = self.validate_blocks(blocks, self.chain[fork_height])
+        if not result:
+            logging.warning(f"Chain validation failed: Block #{result.failed_height} is invalid: {result.reason}.")
+            return ChainUpdate(INVALID, failed_height=result.failed_height)
+
+        reverted = [self.chain[height] for height in range(len(self.chain) - 1, fork_height, -1)]
+        del self.chain[fork_height + 1:]
+        self.chain.extend(blocks)
+        self.tree.keep_side_blocks(reverted)
+        # The mempool is updated last: the chain has switched by now, whatever happens here.
+        for block in reverted:
+            self.mempool.return_block(block)
+        for block in blocks:
+            self.mempool.remove_block(block)
+        if reverted:
+            logging.info(f"Reorganized: rolled back {len(reverted)} block(s) above #{fork_height}, applied {len(blocks)}.")
+        return ChainUpdate(REORGANIZED if reverted else EXTENDED, reverted, list(blocks))
+
+    def height_of(self, block_hash: str) -> int | None:
+        """Returns the main-chain height of the block with `block_hash`, or None."""
+        if isinstance(self.chain, StoredChain):
+            return self.chain.index_of_hash(block_hash)
+        for height in range(len(self.chain) - 1, -1, -1):
+            if self.chain[height].hash == block_hash:
+                return height
+        return None
+
+    def get_locator(self) -> list[list]:
+        """
+        Builds a block locator: [height, hash] pairs for the last few blocks and then
+        exponentially sparser ones back to genesis. A peer uses it to find the last
+        block both chains have in common, in O(log n) entries.
+        """
+        locator = []
+        height, step = len(self.chain) - 1, 1
+        while height > 0:
+            locator.append([height, self.chain[height].hash])
+            if len(locator) >= 10:
+                step *= 2
+            height -= step
+        locator.append([0, self.chain[0].hash])
+        return locator
+
+    def find_common_height(self, locator: list[list]) -> int | None:
+        """Returns the highest locator height whose hash matches our chain, or None."""
+        for height, block_hash in locator:
+            if 0 <= height < len(self.chain) and self.chain[height].hash == block_hash:
+                return height
+        return None
+
+    def get_headers(self, start_height: int, limit: int) -> list[dict]:
+        """Returns up to `limit` block headers starting at `start_height`."""
+        end = min(len(self.chain), start_height + limit)
+        return [self.chain[height].header() for height in range(start_height, end)]
+
+    def extend_from(self, fork_height: int, blocks: list[Block]) -> bool:
+        """
+        Validates blocks that continue our chain after `fork_height` and, if they form a longer
+        chain, drops our blocks above the fork and appends them. Only the new blocks are checked.
+        """
+        if not blocks or fork_height >= len(self.chain) or fork_height + len(blocks) < len(self.chain):
+            return False
+        return self.reorganize(fork_height, blocks).status != INVALID
+
+    def verify_chain(self, validator: ChainValidator = None) -> ValidationResult:
+        """
+        Re-validates the whole local chain after genesis, e.g. a block store from an untrusted
+        source. Blocks up to the validator's checkpoint skip signature checks.
+        """
+        validator = validator or self.validator
+        return validator.validate(self.chain[1:], self.chain[0])
+
+    def close(self):
+        """Releases the block store, if the chain is persisted."""
+        if isinstance(self.chain, StoredChain):
+            self.chain.close()
@@ -0,0 +1,118 @@
+# core/chain_index.py
+
+from collections import deque
+
+# How many recent block hashes are remembered to detect and undo reorganizations.
+# A reorg deeper than this falls back to rebuilding the index from genesis.
+DEFAULT_REORG_DEPTH = 1000
+
+class ChainIndex:
+    """
+    Base class for state derived from the chain (the public key ledger, the inbox, ...).
+
+    Subclasses implement apply_block, revert_block and reset. apply_block may return undo
+    data, which is handed back to revert_block. update_from_chain then only applies blocks
+    appended since the last call; if the chain was reorganized, the blocks that are no longer
+    on it are reverted first, newest first.
+    """
+
+    def __init__(self, reorg_depth: int = DEFAULT_REORG_DEPTH):
+        self.reorg_depth = reorg_depth
+        self.applied_height = -1
+        self._recent_hashes = deque(maxlen=reorg_depth)   # hashes of the last applied blocks, oldest first
+        self._recent_blocks = deque(maxlen=reorg_depth)   # matching (block, undo data), kept for revert_block
+
+    # --- Hooks for subclasses ---
+
+    def apply_block(self, block):
+        """Applies a block on top of the current state. May return undo data for revert_block."""
+        raise NotImplementedError
+
+    def revert_block(self, block, undo):
+        """Undoes apply_block for the most recently applied block."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Clears all derived state."""
+        raise NotImplementedError
+
+    # --- Tracking ---
+
+    @property
+    def applied_hash(self) -> str | None:
+        return self._recent_hashes[-1] if self._recent_hashes else None
+
+    def _clear(self):
+        self.reset()
+        self.applied_height = -1
+        self._recent_hashes.clear()
+        self._recent_blocks.clear()
+
+    def _push(self, block):
+        undo = self.apply_block(block)
+        self.applied_height = block.index
+        self._recent_hashes.append(block.hash)
+        self._recent_blocks.append((block, undo))
+
+    def _pop(self):
+        block, undo = self._recent_blocks.pop()
+        self._recent_hashes.pop()
+        self.revert_block(block, undo)
+        self.applied_height -= 1
+
+    def _rewind_to_chain(self, chain) -> bool:
+        """Reverts applied blocks until our tip is on `chain`. Returns False if that needs a full rebuild."""
+        while self.applied_height >= 0:
+            on_chain = self.applied_height < len(chain) and chain[self.applied_height].hash == self.applied_hash
+            if on_chain:
+                return True
+            if not self._recent_blocks:
+                return False
+            self._pop()
+        return True
+
+    def update_from_chain(self, blockchain) -> int:
+        """
+        Brings the index up to date with the chain, touching only blocks that changed.
+
+        Returns:
+            int: The number of blocks applied.
+        """
+        chain = blockchain.chain
+        if not self._rewind_to_chain(chain):
+            self._clear()
+        applied = 0
+        for height in range(self.applied_height + 1, len(chain)):
+            self._push(chain[height])
+            applied += 1
+        return applied
+
+    def apply_delta(self, reverted_blocks: list, applied_blocks: list):
+        """
+        Applies a reorganization reported by the chain directly: `reverted_blocks` (newest first)
+        are undone, then `applied_blocks` (oldest first) are applied.
+        """
+        for block in reverted_blocks:
+            if self.applied_hash != block.hash or not self._recent_blocks:
+                break
+            self._pop()
+        for block in applied_blocks:
+            if block.index == self.applied_height + 1:
+                self._push(block)
+
+    # --- Snapshot support ---
+
+    def tracking_state(self) -> dict:
+        """The part of a snapshot that records which blocks have been applied."""
+        return {"applied_height": self.applied_height, "applied_hash": self.applied_hash}
+
+    def restore_tracking_state(self, state: dict):
+        """
+        Restores the applied height and tip hash from a snapshot. Undo data is not stored, so a
+        reorg below the snapshot's tip triggers a full rebuild on the next update.
+        """
+        self._recent_hashes.clear()
+        self._recent_blocks.clear()
+        self.applied_height = state["applied_height"]
+        if state.get("applied_hash") is not None:
+            self._recent_hashes.append(state["applied_hash"])
@@ -0,0 +1,155 @@
+# core/inbox.py
+
+import bisect
+import json
+import logging
+import os
+from collections import OrderedDict
+from core.chain_index import ChainIndex
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_CACHE_SIZE = 4096
+
+class Inbox(ChainIndex):
+    """
+    Secondary index from recipient address to the messages sent to it.
+
+    Each entry is (block height, position in the block, block hash), kept in chain order per
+    recipient and updated incrementally as blocks are appended or reorganized away. Reading
+    a page of messages costs time proportional to the page, not to the chain: bodies are
+    only fetched and decrypted for the entries on the page, and plaintexts are cached.
+    Like the public key ledger, the index can be snapshotted to disk, so a restarted node
+    only replays the blocks after the snapshot.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE, decrypt_workers: int = 1, snapshot_path: str = None):
+        """
+        Args:
+            cache_size (int): How many decrypted messages to keep in memory.
+            decrypt_workers (int): Worker processes used to decrypt a page; 1 decrypts in this process.
+            snapshot_path (str): Optional file used by save_snapshot/load_snapshot.
+        """
+        super().__init__()
+        self.cache_size = cache_size
+        self.decrypt_workers = decrypt_workers
+        self.snapshot_path = snapshot_path
+        self._by_recipient = {}      # recipient address -> [(height, tx_index, block_hash), ...] ascending
+        self._cache = OrderedDict()  # (block_hash, tx_index) -> message dict
+
+    def reset(self):
+        self._by_recipient = {}
+        self._cache.clear()
+
+    def apply_block(self, block) -> list:
+        """Indexes the messages in a block. Returns the recipients touched, for revert_block."""
+        touched = []
+        for tx_index, signed_tx in enumerate(block.transactions):
+            tx = signed_tx.get('transaction_dict', {})
+            recipient = tx.get('recipient_address')
+            if tx.get('tx_type') == 'message' and recipient:
+                self._by_recipient.setdefault(recipient, []).append((block.index, tx_index, block.hash))
+                touched.append(recipient)
+        return touched
+
+    def revert_block(self, block, undo: list):
+        for recipient in reversed(undo):
+            entries = self._by_recipient[recipient]
+            entries.pop()
+            if not entries:
+                del self._by_recipient[recipient]
+
+    def message_count(self, address: str) -> int:
+        return len(self._by_recipient.get(address, ()))
+
+    def _remember(self, key: tuple, message: dict):
+        self._cache[key] = message
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _read(self, blockchain, wallet, entries: list) -> list[dict]:
+        """Returns the messages for `entries`, decrypting the ones that are not cached in one batch."""
+        messages = [None] * len(entries)
+        missing, contents = [], []
+        for position, (height, tx_index, block_hash) in enumerate(entries):
+            key = (block_hash, tx_index)
+            message = self._cache.get(key)
+            if message is not None:
+                self._cache.move_to_end(key)
+                messages[position] = message
+                continue
+            tx = blockchain.chain[height].transactions[tx_index]['transaction_dict']
+            messages[position] = {
+                "height": height,
+                "tx_index": tx_index,
+                "sender_address": tx.get('sender_address'),
+                "timestamp": tx.get('timestamp'),
+                "message": None,
+            }
+            missing.append(position)
+            contents.append(tx.get('content') or {})
+
+        # Decrypted lazily, only for messages on the requested page
+        for position, plaintext in zip(missing, wallet.decrypt_messages(contents, max_workers=self.decrypt_workers)):
+            message = messages[position]
+            message["message"] = plaintext
+            if plaintext is not None:
+                height, tx_index, block_hash = entries[position]
+                self._remember((block_hash, tx_index), message)
+        return messages
+
+    def page(self, blockchain, wallet, limit: int = DEFAULT_PAGE_SIZE, before: tuple = None, since_height: int = None) -> tuple[list[dict], tuple | None]:
+        """
+        Returns one page of the wallet's messages, newest first.
+
+        Args:
+            blockchain (Blockchain): The chain the index was built from.
+            wallet (Wallet): The recipient; its address selects the messages and its key decrypts them.
+            limit (int): Largest number of messages on the page.
+            before (tuple): Cursor from a previous page: only messages older than this are returned.
+            since_height (int): Only messages in blocks above this height are returned.
+
+        Returns:
+            tuple: (messages, next_cursor). next_cursor is None when there are no older messages.
+                A message whose decryption failed has "message" set to None.
+        """
+        entries = self._by_recipient.get(wallet.address, [])
+        end = len(entries) if before is None else bisect.bisect_left(entries, tuple(before[:2]))
+        start = 0 if since_height is None else bisect.bisect_right(entries, (since_height, float('inf')))
+        first = max(start, end - limit)
+
+        messages = self._read(blockchain, wallet, entries[first:end][::-1])
+        next_cursor = entries[first][:2] if first > start else None
+        return messages, next_cursor
+
+    def save_snapshot(self, path: str = None):
+        """Writes the index and the last applied block to disk (atomically). Decrypted messages are not stored."""
+        path = path or self.snapshot_path
+        if not path:
+            return
+        state = {"recipients": self._by_recipient, **self.tracking_state()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str = None) -> bool:
+        """
+        Restores a snapshot written by save_snapshot. The next update_from_chain only replays
+        the blocks after it, or rebuilds from genesis if the snapshot is not on the chain.
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            self.reset()
+            self._by_recipient = {recipient: [(height, tx_index, block_hash) for height, tx_index, block_hash in entries]
+                                  for recipient, entries in state["recipients"].items()}
+            self.restore_tracking_state(state)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable inbox snapshot {path}: {e}")
+            self._clear()
+            return False
+        logging.info(f"Inbox snapshot loaded at block #{self.applied_height} with {len(self._by_recipient)} recipients.")
+        return True
@@ -0,0 +1,137 @@
+# core/key_pool.py
+
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from core.wallet import Wallet, generate_key_pairs
+
+# Ready key pairs a KeyPool keeps in stock.
+DEFAULT_POOL_SIZE = 256
+# Wallets' key pairs generated per worker task.
+DEFAULT_CHUNK_SIZE = 16
+
+def _generate_chunk(count: int) -> list[tuple[bytes, bytes, bytes, bytes]]:
+    return [generate_key_pairs() for _ in range(count)]
+
+def _chunk_sizes(count: int, chunk_size: int) -> list[int]:
+    return [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+
+def generate_wallets(count: int, max_workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> list[Wallet]:
+    """
+    Creates `count` new wallets, generating their keys across worker processes.
+
+    Args:
+        count (int): Number of wallets.
+        max_workers (int): Worker processes. Defaults to the number of CPUs; 1 (or a count that
+            fits into one chunk) generates in this process.
+        chunk_size (int): Wallets generated per worker task.
+    """
+    if max_workers == 1 or count <= chunk_size:
+        return [Wallet(keys) for keys in _generate_chunk(count)]
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        return [Wallet(keys) for chunk in executor.map(_generate_chunk, _chunk_sizes(count, chunk_size)) for keys in chunk]
+
+class KeyPool:
+    """
+    A stock of pre-generated wallet key pairs, refilled in the background by worker processes,
+    so taking a wallet costs no key generation on the event loop.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            size (int): Ready key pairs to keep in stock.
+            max_workers (int): Worker processes generating keys. Defaults to the number of CPUs.
+            chunk_size (int): Key pairs generated per worker task.
+        """
+        self.size = size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._ready = deque()
+        self._waiting = 0
+        self._wake = asyncio.Event()      # stock was taken, or someone is waiting
+        self._filled = asyncio.Event()    # new key pairs arrived
+        self._task = None
+        self.generated = 0
+        self.served = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self):
+        in_flight = set()
+        try:
+            while True:
+                while (len(in_flight) < self.max_workers and
+                       len(self._ready) + len(in_flight) * self.chunk_size < self.size + self._waiting):
+                    in_flight.add(asyncio.wrap_future(self.executor.submit(_generate_chunk, self.chunk_size)))
+                if not in_flight:
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    keys = future.result()
+                    self._ready.extend(keys)
+                    self.generated += len(keys)
+                self._filled.set()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    @property
+    def ready(self) -> int:
+        return len(self._ready)
+
+    def _take(self) -> Wallet:
+        self.served += 1
+        self._wake.set()
+        return Wallet(self._ready.popleft())
+
+    def get_nowait(self) -> Wallet | None:
+        """Returns a wallet from stock, or None if the pool is empty right now."""
+        return self._take() if self._ready else None
+
+    async def get(self) -> Wallet:
+        """Returns a wallet from stock, waiting for the workers if the pool is empty."""
+        while not self._ready:
+            self._waiting += 1
+            self._wake.set()
+            self._filled.clear()
+            try:
+                await self._filled.wait()
+            finally:
+                self._waiting -= 1
+        return self._take()
+
+    async def wallets(self, count: int) -> list[Wallet]:
+        """
+        Returns `count` wallets for bulk use, e.g. simulated users of a load test. The stock is
+        used first; the rest is generated on all workers in parallel, off the event loop.
+        """
+        wallets = [self._take() for _ in range(min(count, len(self._ready)))]
+        missing = count - len(wallets)
+        if missing:
+            chunks = await asyncio.gather(*(asyncio.wrap_future(self.executor.submit(_generate_chunk, size))
+                                            for size in _chunk_sizes(missing, self.chunk_size)))
+            wallets.extend(Wallet(keys) for chunk in chunks for keys in chunk)
+            self.generated += missing
+            self.served += missing
+        return wallets
+
+    def stats(self) -> dict:
+        return {"ready": len(self._ready), "size": self.size, "generated": self.generated, "served": self.served,
+                "workers": self.max_workers}
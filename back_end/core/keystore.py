@@ -0,0 +1,121 @@
+# core/keystore.py
+
+import hashlib
+import json
+import os
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from core import serialization
+from crypto import providers
+from core.wallet import Wallet
+
+KEYSTORE_VERSION = 1
+# scrypt cost: about 0.1 s and 32 MiB per unlock, paid once when a wallet is loaded.
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+NONCE_BYTES = 12
+_KEY_FIELDS = ("signing_public_key", "signing_secret_key", "encryption_public_key", "encryption_secret_key")
+
+class KeystoreError(Exception):
+    """A keystore file could not be unlocked: wrong passphrase, corrupted or unsupported."""
+
+def _derive_key(passphrase: str, kdf: dict) -> bytes:
+    n, r, p = kdf["n"], kdf["r"], kdf["p"]
+    return hashlib.scrypt(passphrase.encode('utf-8'), salt=bytes.fromhex(kdf["salt"]), n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * (n + p), dklen=32)
+
+def _crypto_selection() -> dict:
+    provider, signature_algorithm, kem_algorithm, _ = providers.selection()
+    return {"provider": provider, "signature_algorithm": signature_algorithm, "kem_algorithm": kem_algorithm}
+
+def _associated_data(record: dict) -> bytes:
+    # The cleartext fields are authenticated too, so the address and KDF parameters cannot be swapped.
+    # Keystores written before the schemes were configurable have no "crypto" field.
+    fields = {"version": record["version"], "address": record["address"], "kdf": record["kdf"]}
+    if "crypto" in record:
+        fields["crypto"] = record["crypto"]
+    return serialization.encode_value(fields)
+
+def encrypt_wallet(wallet: Wallet, passphrase: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> dict:
+    """
+    Encrypts a wallet's key pairs with a passphrase: scrypt derives an AES-256-GCM key.
+
+    Returns:
+        dict: The JSON-serializable keystore record. Only the address is readable without the passphrase.
+    """
+    record = {
+        "version": KEYSTORE_VERSION,
+        "address": wallet.address,
+        "kdf": {"name": "scrypt", "n": n, "r": r, "p": p, "salt": os.urandom(SALT_BYTES).hex()},
+        # The keys only work with the schemes (and backend) they were generated for.
+        "crypto": _crypto_selection(),
+    }
+    nonce = os.urandom(NONCE_BYTES)
+    plaintext = serialization.encode_value(dict(zip(_KEY_FIELDS, wallet.export_keys())))
+    ciphertext = AESGCM(_derive_key(passphrase, record["kdf"])).encrypt(nonce, plaintext, _associated_data(record))
+    record["cipher"] = {"name": "aes-256-gcm", "nonce": nonce.hex(), "ciphertext": ciphertext.hex()}
+    return record
+
+def decrypt_wallet(record: dict, passphrase: str) -> Wallet:
+    """
+    Restores the wallet from a keystore record.
+    Raises KeystoreError if the passphrase is wrong or the record was altered.
+    """
+    try:
+        if record["version"] != KEYSTORE_VERSION or record["kdf"]["name"] != "scrypt" or record["cipher"]["name"] != "aes-256-gcm":
+            raise KeystoreError(f"Unsupported keystore format (version {record['version']}).")
+        expected = _crypto_selection()
+        if record.get("crypto", expected) != expected:
+            raise KeystoreError(f"The keystore holds {record['crypto']['signature_algorithm']}/{record['crypto']['kem_algorithm']} keys "
+                                f"of the {record['crypto']['provider']} provider, but {expected['signature_algorithm']}/"
+                                f"{expected['kem_algorithm']} of the {expected['provider']} provider are configured.")
+        key = _derive_key(passphrase, record["kdf"])
+        plaintext = AESGCM(key).decrypt(bytes.fromhex(record["cipher"]["nonce"]), bytes.fromhex(record["cipher"]["ciphertext"]),
+                                        _associated_data(record))
+        keys = serialization.decode_value(plaintext)
+        wallet = Wallet(tuple(keys[field] for field in _KEY_FIELDS))
+    except InvalidTag:
+        raise KeystoreError("Wrong passphrase, or the keystore was modified.")
+    except (KeyError, TypeError, ValueError) as e:
+        raise KeystoreError(f"Malformed keystore: {e}")
+    if wallet.address != record["address"]:
+        raise KeystoreError("The keystore's keys do not match its address.")
+    return wallet
+
+def save_wallet(wallet: Wallet, path: str, passphrase: str, **scrypt_params):
+    """Writes the encrypted wallet to `path` atomically, readable by the owner only."""
+    record = encrypt_wallet(wallet, passphrase, **scrypt_params)
+    temp_path = f"{path}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(record, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def load_wallet(path: str, passphrase: str) -> Wallet:
+    """Reads and decrypts a wallet saved with save_wallet. Raises KeystoreError on failure."""
+    with open(path) as f:
+        try:
+            record = json.load(f)
+        except ValueError as e:
+            raise KeystoreError(f"Malformed keystore {path}: {e}")
+    return decrypt_wallet(record, passphrase)
+
+def load_or_create_wallet(path: str, passphrase: str) -> tuple[Wallet, bool]:
+    """
+    Loads the wallet at `path`, or creates and saves a new one if the file does not exist.
+
+    Returns:
+        tuple: (wallet, created).
+    """
+    if os.path.exists(path):
+        return load_wallet(path, passphrase), False
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    wallet = Wallet()
+    save_wallet(wallet, path, passphrase)
+    return wallet, True
@@ -0,0 +1,248 @@
+# core/mempool.py
+
+import heapq
+import itertools
+from collections import OrderedDict
+from time import time
+from core.signed_transaction import SignedTransaction, transaction_fee, transaction_id
+
+DEFAULT_MAX_COUNT = 50_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# How many recently confirmed transaction ids are remembered to reject late re-broadcasts.
+CONFIRMED_MEMORY = 100_000
+
+class MempoolEntry:
+    """A pending transaction plus the bookkeeping the mempool needs to order and evict it."""
+
+    __slots__ = ('txid', 'signed_tx', 'sender', 'fee', 'size', 'added_at', 'seq')
+
+    def __init__(self, txid: str, signed_tx: SignedTransaction, size: int, seq: int):
+        tx = signed_tx['transaction_dict']
+        self.txid = txid
+        self.signed_tx = signed_tx
+        self.sender = tx['sender_address']
+        self.fee = transaction_fee(tx)
+        self.size = size
+        self.added_at = time()
+        self.seq = seq
+
+    @property
+    def priority(self) -> tuple:
+        """Sort key: highest fee first, then oldest first."""
+        return (-self.fee, self.seq)
+
+class Mempool:
+    """
+    Pool of verified transactions waiting to be put into a block.
+
+    Transactions are keyed by id, so duplicates are rejected in O(1) before any signature work.
+    There is an index per sender, a priority order (fee, then age) kept in a heap, and a cap on
+    both the number of transactions and their encoded size: when it is exceeded, the lowest
+    priority transactions are evicted.
+    """
+
+    def __init__(self, max_count: int = DEFAULT_MAX_COUNT, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_count (int): Largest number of pending transactions.
+            max_bytes (int): Largest total encoded size of the pending transactions.
+        """
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._entries = {}            # txid -> MempoolEntry
+        self._by_sender = {}          # sender address -> set of txids
+        self._best = []               # heap of (priority, txid) for block templates
+        self._worst = []              # heap of (reversed priority, txid) for eviction
+        self._confirmed = OrderedDict()
+        self._seq = itertools.count()
+        self.total_bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, txid: str) -> bool:
+        return txid in self._entries
+
+    def is_known(self, txid: str) -> bool:
+        """True if the transaction is pending or was recently confirmed in a block."""
+        return txid in self._entries or txid in self._confirmed
+
+    def get(self, txid: str) -> dict | None:
+        entry = self._entries.get(txid)
+        return entry.signed_tx if entry else None
+
+    def has_verified(self, signed_tx: SignedTransaction) -> bool:
+        """
+        True if this exact signed transaction, signature included, is pending. Only verified
+        transactions enter the pool, so a block carrying it needs no second signature check.
+        """
+        entry = self._entries.get(signed_tx.txid)
+        if entry is None:
+            return False
+        pending = entry.signed_tx
+        return pending is signed_tx or (pending.signature == signed_tx.signature and pending.txid == signed_tx.txid)
+
+    def add(self, signed_tx: dict, txid: str = None) -> bool:
+        """
+        Adds a verified transaction. It is stored as a SignedTransaction, which blocks built
+        from the pool share instead of copying.
+
+        Returns:
+            bool: False if it was already known or was immediately evicted as the lowest priority entry.
+        """
+        signed_tx = SignedTransaction.of(signed_tx)
+        txid = txid or signed_tx.txid
+        if self.is_known(txid):
+            return False
+
+        size = signed_tx.size
+        entry = MempoolEntry(txid, signed_tx, size, next(self._seq))
+        self._entries[txid] = entry
+        self._by_sender.setdefault(entry.sender, set()).add(txid)
+        self.total_bytes += size
+        heapq.heappush(self._best, (entry.priority, txid))
+        heapq.heappush(self._worst, ((entry.fee, -entry.seq), txid))
+
+        self._evict()
+        return txid in self._entries
+
+    def _is_live(self, txid: str, seq: int) -> bool:
+        """Heap items are removed lazily; an item is live only if it belongs to the current entry."""
+        entry = self._entries.get(txid)
+        return entry is not None and entry.seq == seq
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_count or self.total_bytes > self.max_bytes):
+            (_, negative_seq), txid = heapq.heappop(self._worst)
+            if self._is_live(txid, -negative_seq):
+                self._discard(txid)
+                self.evicted += 1
+
+    def _discard(self, txid: str) -> MempoolEntry | None:
+        entry = self._entries.pop(txid, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry.size
+        sender_txids = self._by_sender.get(entry.sender)
+        if sender_txids is not None:
+            sender_txids.discard(txid)
+            if not sender_txids:
+                del self._by_sender[entry.sender]
+        self._compact()
+        return entry
+
+    def _compact(self):
+        """Rebuilds the heaps once removed entries make up most of them (they are deleted lazily)."""
+        if len(self._best) > 2 * len(self._entries) + 64:
+            self._best = [item for item in self._best if self._is_live(item[1], item[0][1])]
+            heapq.heapify(self._best)
+        if len(self._worst) > 2 * len(self._entries) + 64:
+            self._worst = [item for item in self._worst if self._is_live(item[1], -item[0][1])]
+            heapq.heapify(self._worst)
+
+    def remove(self, txids, confirmed: bool = False) -> int:
+        """
+        Removes transactions by id. With confirmed=True the ids are also remembered so a
+        late re-broadcast of an already included transaction is rejected.
+
+        Returns:
+            int: How many of the ids were pending.
+        """
+        removed = 0
+        for txid in txids:
+            if self._discard(txid):
+                removed += 1
+            if confirmed:
+                self._confirmed[txid] = None
+                if len(self._confirmed) > CONFIRMED_MEMORY:
+                    self._confirmed.popitem(last=False)
+        return removed
+
+    def remove_block(self, block) -> int:
+        """Removes only the transactions included in `block` from the pool."""
+        return self.remove((signed_tx.txid for signed_tx in block.transactions), confirmed=True)
+
+    def return_block(self, block) -> int:
+        """
+        Puts the transactions of a block that was rolled back in a reorg back into the pool.
+        Their signatures were checked when the block was accepted.
+
+        Returns:
+            int: How many of them were added back.
+        """
+        added = 0
+        for signed_tx in block.transactions:
+            txid = signed_tx.txid
+            self._confirmed.pop(txid, None)
+            if self.add(signed_tx, txid=txid):
+                added += 1
+        return added
+
+    def added_at(self, txid: str) -> float | None:
+        """When a pending transaction entered the pool (Unix time), or None if it is not pending."""
+        entry = self._entries.get(txid)
+        return entry.added_at if entry else None
+
+    def pending_totals(self, exclude: set = None) -> tuple[int, int]:
+        """
+        Number and total encoded size of the pending transactions, leaving out `exclude`.
+        Costs O(len(exclude)), so it can be polled.
+        """
+        count, size = len(self._entries), self.total_bytes
+        for txid in exclude or ():
+            entry = self._entries.get(txid)
+            if entry is not None:
+                count -= 1
+                size -= entry.size
+        return count, size
+
+    def txids(self) -> list[str]:
+        """Ids of all pending transactions, in no particular order."""
+        return list(self._entries)
+
+    def transactions(self) -> list[dict]:
+        """All pending signed transactions, in priority order."""
+        return [entry.signed_tx for entry in sorted(self._entries.values(), key=lambda entry: entry.priority)]
+
+    def by_sender(self, sender_address: str) -> list[dict]:
+        entries = (self._entries[txid] for txid in self._by_sender.get(sender_address, ()))
+        return [entry.signed_tx for entry in sorted(entries, key=lambda entry: entry.seq)]
+
+    def block_template(self, max_bytes: int = None, max_count: int = None, exclude: set = None) -> list[dict]:
+        """
+        Picks the highest priority transactions that fit into a block, without removing them.
+
+        Args:
+            max_bytes (int): Largest total encoded size of the selected transactions.
+            max_count (int): Largest number of selected transactions.
+            exclude (set): Txids to leave out, e.g. those in proposed blocks that are not committed yet.
+        """
+        selected, used = [], 0
+        best = self._best
+        # The heap is read in priority order without copying it: a popped item's children in
+        # self._best join a small frontier heap of (item, position), which starts at the root.
+        frontier = [(best[0], 0)] if best else []
+        while frontier and (max_count is None or len(selected) < max_count):
+            ((_, seq), txid), position = heapq.heappop(frontier)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(best):
+                    heapq.heappush(frontier, (best[child], child))
+            if not self._is_live(txid, seq) or (exclude and txid in exclude):
+                continue
+            entry = self._entries[txid]
+            if max_bytes is not None and used + entry.size > max_bytes:
+                continue
+            selected.append(entry.signed_tx)
+            used += entry.size
+        return selected
+
+    def stats(self) -> dict:
+        return {
+            "count": len(self._entries),
+            "bytes": self.total_bytes,
+            "senders": len(self._by_sender),
+            "evicted": self.evicted,
+            "max_count": self.max_count,
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,82 @@
+# core/merkle.py
+
+"""
+Binary Merkle tree over a block's transactions.
+
+Leaves and inner nodes are hashed with different one-byte prefixes so a leaf can never be
+passed off as an inner node. When a level has an odd number of nodes, the last one is
+carried up unchanged instead of being paired with a copy of itself.
+"""
+
+import hashlib
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def _next_level(level: list[bytes]) -> list[bytes]:
+    parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+def merkle_root(leaves: list[bytes]) -> bytes:
+    """
+    Computes the root over a list of leaf hashes.
+
+    Args:
+        leaves (list[bytes]): Leaf hashes, as returned by leaf_hash().
+
+    Returns:
+        bytes: The 32-byte root. An empty tree has the hash of the empty string as its root.
+    """
+    if not leaves:
+        return hashlib.sha256(b'').digest()
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+def merkle_proof(leaves: list[bytes], index: int) -> list[bytes]:
+    """
+    Returns the sibling hashes needed to recompute the root from the leaf at `index`,
+    ordered from the bottom of the tree to the top. Its length is O(log n).
+    """
+    if not 0 <= index < len(leaves):
+        raise IndexError(f"Leaf index {index} is out of range for {len(leaves)} leaves.")
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+def verify_proof(leaf: bytes, index: int, leaf_count: int, proof: list[bytes], root: bytes) -> bool:
+    """
+    Checks that `leaf` is the leaf at `index` of a tree with `leaf_count` leaves and the given root.
+    """
+    if not 0 <= index < leaf_count:
+        return False
+    current, used, size = leaf, 0, leaf_count
+    while size > 1:
+        if index % 2 == 1:
+            if used >= len(proof):
+                return False
+            current = node_hash(proof[used], current)
+            used += 1
+        elif index + 1 < size:
+            if used >= len(proof):
+                return False
+            current = node_hash(current, proof[used])
+            used += 1
+        index //= 2
+        size = (size + 1) // 2
+    return used == len(proof) and current == root
@@ -1,30 +1,79 @@
 # core/public_ledger.py
 
-class PublicKeyLedger:
+import json
+import logging
+import os
+from core.chain_index import ChainIndex
+
+class PublicKeyLedger(ChainIndex):
     """
     Scans the blockchain to build a user-friendly, in-memory registry of 
     usernames mapped to their public keys.
+
+    Only blocks appended since the last update are scanned, blocks dropped by a reorg are
+    undone, and an address -> username index makes reverse lookups O(1). The state can be
+    snapshotted to disk so a restarted node does not have to replay the whole chain.
     """
-    def __init__(self):
+    def __init__(self, snapshot_path: str = None):
+        """
+        Args:
+            snapshot_path (str): Optional file used by save_snapshot/load_snapshot.
+        """
+        super().__init__()
         # This dictionary will be our address book: username -> {address, encryption_key}
         self.users = {}
+        # Reverse index: address -> username
+        self.usernames = {}
+        self.snapshot_path = snapshot_path
+
+    def reset(self):
+        self.users = {}
+        self.usernames = {}
+
+    @staticmethod
+    def _registrations(block):
+        for signed_tx in block.transactions:
+            tx = signed_tx.get('transaction_dict', {})
+            if tx.get('tx_type') == 'key_registration':
+                username = tx.get('username')
+                address = tx.get('sender_address')
+                enc_key = (tx.get('content') or {}).get('encryption_key')
+                if username and address and enc_key:
+                    yield username, address, enc_key
 
-    def update_from_chain(self, blockchain):
+    def _set_user(self, username: str, record: dict | None):
+        old_record = self.users.get(username)
+        if old_record and self.usernames.get(old_record['address']) == username:
+            del self.usernames[old_record['address']]
+        if record is None:
+            self.users.pop(username, None)
+        else:
+            self.users[username] = record
+            self.usernames[record['address']] = username
+
+    def apply_block(self, block) -> list:
+        """Registers the usernames in a block. Returns the previous records, for revert_block."""
+        undo = []
+        for username, address, enc_key in self._registrations(block):
+            undo.append((username, self.users.get(username), self.usernames.get(address), address))
+            self._set_user(username, {"address": address, "encryption_key": enc_key})
+        return undo
+
+    def revert_block(self, block, undo: list):
+        for username, old_record, old_owner, address in reversed(undo):
+            self._set_user(username, old_record)
+            if old_owner is not None:
+                self.usernames[address] = old_owner
+
+    def update_from_chain(self, blockchain) -> int:
         """
-        Iterates through the entire blockchain to find key registrations
-        and updates the user registry.
+        Applies the blocks added to the blockchain since the last update (undoing any that
+        were reorganized away) and updates the user registry.
         """
-        print("Updating public key ledger from blockchain...")
-        for block in blockchain.chain:
-            for signed_tx in block.transactions:
-                tx = signed_tx.get('transaction_dict', {})
-                if tx.get('tx_type') == 'key_registration':
-                    username = tx.get('username')
-                    address = tx.get('sender_address')
-                    enc_key = tx.get('content', {}).get('encryption_key')
-                    if username and address and enc_key:
-                        self.users[username] = {"address": address, "encryption_key": enc_key}
-        print(f"Ledger updated. Found {len(self.users)} registered users.")
+        applied = super().update_from_chain(blockchain)
+        if applied:
+            logging.debug("Ledger updated. Found %d registered users.", len(self.users))
+        return applied
 
     def get_keys_for_user(self, username: str) -> dict | None:
         """Retrieves the address and encryption key for a given username."""
@@ -34,11 +83,41 @@ class PublicKeyLedger:
         """
         Performs a reverse lookup to find a username from a public address.
         """
-        for username, data in self.users.items():
-            if data['address'] == address:
-                return username
-        return None
+        return self.usernames.get(address)
 
     def list_users(self) -> list[str]:
         """Returns a list of all registered usernames."""
-        return list(self.users.keys())
\ No newline at end of file
+        return list(self.users.keys())
+
+    def save_snapshot(self, path: str = None):
+        """Writes the registry and the last applied block to disk (atomically)."""
+        path = path or self.snapshot_path
+        if not path:
+            return
+        state = {"users": self.users, **self.tracking_state()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str = None) -> bool:
+        """
+        Restores a snapshot written by save_snapshot. The next update_from_chain only replays
+        the blocks after it, or rebuilds from genesis if the snapshot is not on the chain.
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            self.reset()
+            for username, record in state["users"].items():
+                self._set_user(username, record)
+            self.restore_tracking_state(state)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable ledger snapshot {path}: {e}")
+            self._clear()
+            return False
+        logging.info(f"Ledger snapshot loaded at block #{self.applied_height} with {len(self.users)} registered users.")
+        return True
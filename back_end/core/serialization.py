@@ -0,0 +1,414 @@
+# core/serialization.py
+
+"""
+Canonical binary encoding for transactions, signed transactions, blocks and wire messages.
+
+Every encoding starts with a format version byte. Integers and floats are fixed width
+(big-endian), strings and byte strings are length prefixed, and dictionaries are written
+with their keys sorted, so the same data always produces the same bytes.
+
+Hex strings (public keys, signatures, ciphertexts, hashes) are stored as their raw bytes
+and turned back into lowercase hex on decode, which halves their size compared to JSON.
+The JSON views (`Block.to_dict()`, `Transaction.to_dict()`) are kept only for debugging.
+"""
+
+import struct
+from collections.abc import Mapping
+
+FORMAT_VERSION = 1
+
+# Type tags for self-describing values.
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_HEX = 6
+TAG_BYTES = 7
+TAG_LIST = 8
+TAG_DICT = 9
+
+# Deepest nesting of lists and dictionaries accepted when decoding. Wire messages need a handful
+# of levels; the limit keeps crafted input from exhausting the interpreter's recursion limit.
+MAX_NESTING_DEPTH = 32
+
+_U8 = struct.Struct('>B')
+_U32 = struct.Struct('>I')
+_U64 = struct.Struct('>Q')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+# Transaction fields with a fixed slot in the encoding. Anything else is kept in a trailing dict.
+_TX_FIELDS = ('tx_type', 'sender_address', 'recipient_address', 'timestamp', 'username', 'content')
+
+class SerializationError(ValueError):
+    """Raised when data cannot be encoded or a byte string is not a valid encoding."""
+
+def _hex_to_raw(text: str) -> bytes | None:
+    """Returns the raw bytes of a non-empty lowercase hex string, or None if `text` is anything else."""
+    if not text or len(text) % 2:
+        return None
+    try:
+        raw = bytes.fromhex(text)
+    except ValueError:
+        return None
+    # fromhex also accepts uppercase and spaces; only exact round trips are stored as raw bytes.
+    return raw if raw.hex() == text else None
+
+# --- Writing ---
+
+def _put_u32(out: bytearray, value: int):
+    out += _U32.pack(value)
+
+def _put_bytes(out: bytearray, data: bytes):
+    out += _U32.pack(len(data))
+    out += data
+
+def _put_str(out: bytearray, text: str):
+    _put_bytes(out, text.encode('utf-8'))
+
+def _put_value(out: bytearray, value):
+    if value is None:
+        out += _U8.pack(TAG_NONE)
+    elif value is True:
+        out += _U8.pack(TAG_TRUE)
+    elif value is False:
+        out += _U8.pack(TAG_FALSE)
+    elif isinstance(value, int):
+        try:
+            out += _U8.pack(TAG_INT) + _I64.pack(value)
+        except struct.error:
+            raise SerializationError(f"Integer {value} does not fit in 64 bits.")
+    elif isinstance(value, float):
+        out += _U8.pack(TAG_FLOAT) + _F64.pack(value)
+    elif isinstance(value, str):
+        raw = _hex_to_raw(value)
+        if raw is not None:
+            out += _U8.pack(TAG_HEX)
+            _put_bytes(out, raw)
+        else:
+            out += _U8.pack(TAG_STR)
+            _put_str(out, value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out += _U8.pack(TAG_BYTES)
+        _put_bytes(out, bytes(value))
+    elif isinstance(value, (list, tuple)):
+        out += _U8.pack(TAG_LIST)
+        _put_u32(out, len(value))
+        for item in value:
+            _put_value(out, item)
+    elif isinstance(value, dict):
+        out += _U8.pack(TAG_DICT)
+        _put_u32(out, len(value))
+        for key in sorted(value):
+            if not isinstance(key, str):
+                raise SerializationError(f"Dictionary keys must be strings, got {type(key).__name__}.")
+            _put_str(out, key)
+            _put_value(out, value[key])
+    elif isinstance(value, Mapping):
+        # Read-only dictionary views such as SignedTransaction.
+        _put_value(out, dict(value))
+    else:
+        raise SerializationError(f"Cannot encode value of type {type(value).__name__}.")
+
+# --- Reading ---
+
+class _Reader:
+    """Sequential reader over a bytes-like object. Slices are taken from a memoryview, not copied twice."""
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.pos = 0
+
+    def _take(self, size: int) -> memoryview:
+        end = self.pos + size
+        if end > len(self.view):
+            raise SerializationError("Unexpected end of data.")
+        chunk = self.view[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def u8(self) -> int:
+        return self._take(1)[0]
+
+    def u32(self) -> int:
+        return _U32.unpack(self._take(4))[0]
+
+    def u64(self) -> int:
+        return _U64.unpack(self._take(8))[0]
+
+    def f64(self) -> float:
+        return _F64.unpack(self._take(8))[0]
+
+    def raw(self) -> bytes:
+        return bytes(self._take(self.u32()))
+
+    def text(self) -> str:
+        return str(self._take(self.u32()), 'utf-8')
+
+    def value(self, depth: int = 0):
+        tag = self.u8()
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_INT:
+            return _I64.unpack(self._take(8))[0]
+        if tag == TAG_FLOAT:
+            return self.f64()
+        if tag == TAG_STR:
+            return self.text()
+        if tag == TAG_HEX:
+            return self._take(self.u32()).hex()
+        if tag == TAG_BYTES:
+            return self.raw()
+        if tag == TAG_LIST or tag == TAG_DICT:
+            if depth >= MAX_NESTING_DEPTH:
+                raise SerializationError(f"Values are nested more than {MAX_NESTING_DEPTH} levels deep.")
+            if tag == TAG_LIST:
+                return [self.value(depth + 1) for _ in range(self.u32())]
+            return {self.text(): self.value(depth + 1) for _ in range(self.u32())}
+        raise SerializationError(f"Unknown value tag {tag}.")
+
+    def skip(self):
+        """Moves past one value without building it."""
+        try:
+            end = _skip_value(self.view, self.pos)
+        except (IndexError, struct.error):
+            end = len(self.view) + 1
+        if end > len(self.view):
+            raise SerializationError("Unexpected end of data.")
+        self.pos = end
+
+    def version(self):
+        version = self.u8()
+        if version != FORMAT_VERSION:
+            raise SerializationError(f"Unsupported format version {version}.")
+
+    def finish(self):
+        if self.pos != len(self.view):
+            raise SerializationError(f"{len(self.view) - self.pos} trailing bytes after encoded data.")
+
+def _skip_value(view: memoryview, pos: int, depth: int = 0) -> int:
+    """Returns the position after the value that starts at `pos`, reading only tags and lengths."""
+    tag = view[pos]
+    pos += 1
+    if tag == TAG_STR or tag == TAG_HEX or tag == TAG_BYTES:
+        return pos + 4 + _U32.unpack_from(view, pos)[0]
+    if tag == TAG_INT or tag == TAG_FLOAT:
+        return pos + 8
+    if (tag == TAG_LIST or tag == TAG_DICT) and depth >= MAX_NESTING_DEPTH:
+        raise SerializationError(f"Values are nested more than {MAX_NESTING_DEPTH} levels deep.")
+    if tag == TAG_LIST:
+        count = _U32.unpack_from(view, pos)[0]
+        pos += 4
+        for _ in range(count):
+            pos = _skip_value(view, pos, depth + 1)
+        return pos
+    if tag == TAG_DICT:
+        count = _U32.unpack_from(view, pos)[0]
+        pos += 4
+        for _ in range(count):
+            pos = _skip_value(view, pos + 4 + _U32.unpack_from(view, pos)[0], depth + 1)
+        return pos
+    if tag == TAG_NONE or tag == TAG_FALSE or tag == TAG_TRUE:
+        return pos
+    raise SerializationError(f"Unknown value tag {tag}.")
+
+# --- Generic values and wire messages ---
+
+def encode_value(value) -> bytes:
+    """Encodes any combination of None, bool, int, float, str, bytes, list and dict."""
+    out = bytearray()
+    encode_value_into(out, value)
+    return bytes(out)
+
+def encode_value_into(out: bytearray, value):
+    """Appends the encoding of `value` to `out`, e.g. after a frame header, without building it separately."""
+    out += _U8.pack(FORMAT_VERSION)
+    _put_value(out, value)
+
+def decode_value(data):
+    reader = _Reader(data)
+    reader.version()
+    value = reader.value()
+    reader.finish()
+    return value
+
+def encode_message(message: dict) -> bytes:
+    """Encodes a P2P message envelope ({"id", "type", "payload"}) for the wire."""
+    return encode_value(message)
+
+def decode_message(data) -> dict:
+    message = decode_value(data)
+    if not isinstance(message, dict):
+        raise SerializationError("A wire message must decode to a dictionary.")
+    return message
+
+def message_type(data) -> str | None:
+    """
+    Reads only the "type" of an encoded message envelope; the payload is skipped, not decoded.
+    Returns None if the envelope has no string type. Raises SerializationError for malformed data.
+    """
+    reader = _Reader(data)
+    reader.version()
+    if reader.u8() != TAG_DICT:
+        raise SerializationError("A wire message must decode to a dictionary.")
+    for _ in range(reader.u32()):
+        if reader.text() == "type":
+            value = reader.value()
+            return value if isinstance(value, str) else None
+        reader.skip()
+    return None
+
+# --- Transactions ---
+
+def _put_transaction(out: bytearray, tx_dict: dict):
+    _put_str(out, tx_dict['tx_type'])
+    _put_value(out, tx_dict['sender_address'])
+    _put_value(out, tx_dict.get('recipient_address'))
+    out += _F64.pack(float(tx_dict['timestamp']))
+    _put_value(out, tx_dict.get('username'))
+    _put_value(out, tx_dict.get('content'))
+    _put_value(out, {key: value for key, value in tx_dict.items() if key not in _TX_FIELDS})
+
+def _read_transaction(reader: _Reader) -> dict:
+    tx_dict = {'tx_type': reader.text(), 'sender_address': reader.value(), 'recipient_address': reader.value(),
+               'timestamp': reader.f64()}
+    username = reader.value()
+    tx_dict['content'] = reader.value()
+    if username is not None:
+        tx_dict['username'] = username
+    tx_dict.update(reader.value())
+    return tx_dict
+
+def encode_transaction(tx_dict: dict) -> bytes:
+    """
+    Encodes an unsigned transaction. These are the exact bytes that are signed and verified.
+
+    Raises:
+        SerializationError: If the transaction holds a value that cannot be encoded.
+        KeyError: If a required field is missing.
+    """
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    _put_transaction(out, tx_dict)
+    return bytes(out)
+
+def decode_transaction(data) -> dict:
+    reader = _Reader(data)
+    reader.version()
+    tx_dict = _read_transaction(reader)
+    reader.finish()
+    return tx_dict
+
+def _put_signed_transaction(out: bytearray, signed_tx: dict):
+    tx_bytes = encode_transaction(signed_tx['transaction_dict'])
+    _put_bytes(out, tx_bytes)
+    # A SignedTransaction holds the raw signature already.
+    signature = getattr(signed_tx, 'signature', None)
+    _put_bytes(out, signature if signature is not None else bytes.fromhex(signed_tx['signature_hex']))
+
+def _read_signed_transaction(reader: _Reader, factory=None) -> dict:
+    transaction_dict = decode_transaction(reader._take(reader.u32()))
+    if factory is not None:
+        return factory(transaction_dict, reader.raw())
+    return {'transaction_dict': transaction_dict, 'signature_hex': reader._take(reader.u32()).hex()}
+
+def encode_signed_transaction(signed_tx: dict) -> bytes:
+    """Encodes a {'transaction_dict', 'signature_hex'} pair with the signature as raw bytes."""
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    _put_signed_transaction(out, signed_tx)
+    return bytes(out)
+
+def encode_signed_parts(tx_bytes: bytes, signature: bytes) -> bytes:
+    """Same as encode_signed_transaction, from an already encoded transaction and the raw signature."""
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    _put_bytes(out, tx_bytes)
+    _put_bytes(out, signature)
+    return bytes(out)
+
+def decode_signed_transaction(data) -> dict:
+    reader = _Reader(data)
+    reader.version()
+    signed_tx = _read_signed_transaction(reader)
+    reader.finish()
+    return signed_tx
+
+# --- Blocks ---
+
+# Header fields, in encoding order. The block hash is the SHA-256 of the encoded header only,
+# so a header can be checked without the block's transactions.
+HEADER_FIELDS = ('index', 'timestamp', 'previous_hash', 'proposer_address', 'merkle_root', 'tx_count')
+
+def _header_int(header: dict, field: str, limit: int) -> int:
+    """A header's integer field, checked to fit its fixed-width slot (headers come from peers too)."""
+    value = header[field]
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value < limit:
+        raise SerializationError(f"Header field {field} must be an integer in [0, {limit}), got {value!r}.")
+    return value
+
+def _put_header(out: bytearray, header: dict):
+    out += _U64.pack(_header_int(header, 'index', 2 ** 64))
+    out += _F64.pack(float(header['timestamp']))
+    _put_value(out, header['previous_hash'])
+    _put_value(out, header['proposer_address'])
+    merkle_root = _hex_to_raw(header['merkle_root']) if isinstance(header['merkle_root'], str) else None
+    if merkle_root is None or len(merkle_root) != 32:
+        raise SerializationError("Header field merkle_root must be 32 bytes of lowercase hex.")
+    out += merkle_root
+    _put_u32(out, _header_int(header, 'tx_count', 2 ** 32))
+
+def _read_header(reader: _Reader) -> dict:
+    return {
+        'index': reader.u64(),
+        'timestamp': reader.f64(),
+        'previous_hash': reader.value(),
+        'proposer_address': reader.value(),
+        'merkle_root': reader._take(32).hex(),
+        'tx_count': reader.u32(),
+    }
+
+def encode_block_header(header: dict) -> bytes:
+    """
+    Encodes the header fields of a block (see HEADER_FIELDS). This is the block hash preimage.
+
+    Raises:
+        SerializationError: If a field is out of range or of the wrong type.
+        KeyError: If a field is missing.
+    """
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    _put_header(out, header)
+    return bytes(out)
+
+def encode_block(block) -> bytes:
+    """
+    Encodes a full block: its header, its signed transactions and its hash (as 32 raw bytes).
+
+    Args:
+        block: Any object with header_fields(), transactions and hash (e.g. a Block).
+    """
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    _put_header(out, block.header_fields())
+    for signed_tx in block.transactions:
+        _put_signed_transaction(out, signed_tx)
+    out += bytes.fromhex(block.hash)
+    return bytes(out)
+
+def decode_block(data, signed_transaction=None) -> dict:
+    """
+    Decodes a full block into the dictionary accepted by Block.from_dict.
+
+    Args:
+        signed_transaction (callable): If given, builds each transaction from (transaction_dict,
+            raw signature) instead of a {'transaction_dict', 'signature_hex'} dictionary.
+    """
+    reader = _Reader(data)
+    reader.version()
+    block_data = _read_header(reader)
+    block_data['transactions'] = [_read_signed_transaction(reader, signed_transaction) for _ in range(block_data.pop('tx_count'))]
+    block_data['hash'] = reader._take(32).hex()
+    reader.finish()
+    return block_data
@@ -0,0 +1,182 @@
+# core/signed_transaction.py
+
+import hashlib
+import sys
+from collections.abc import Mapping
+from core import merkle, serialization
+
+# Transaction fields holding addresses (hex Dilithium public keys, a few KB each). Every
+# transaction of a sender repeats the same one, so they are interned and shared.
+_ADDRESS_FIELDS = ('sender_address', 'recipient_address')
+
+def transaction_id(transaction_dict: dict) -> str:
+    """The id of a transaction: the SHA-256 of its canonical (unsigned) encoding."""
+    return hashlib.sha256(serialization.encode_transaction(transaction_dict)).hexdigest()
+
+def check_transaction_fields(transaction_dict: dict):
+    """
+    Checks the fields the node relies on after admission: the type, the sender and timestamp the
+    encoding needs, and the fee the mempool orders by. Runs before a transaction enters the
+    mempool or a block, so a malformed one is rejected there instead of failing later.
+    Raises KeyError, ValueError or TypeError for malformed transactions.
+    """
+    if not isinstance(transaction_dict, dict):
+        raise TypeError(f"Transaction must be a dictionary, got {type(transaction_dict).__name__}.")
+    if not isinstance(transaction_dict['tx_type'], str):
+        raise TypeError("tx_type must be a string.")
+    if not isinstance(transaction_dict['sender_address'], str):
+        raise TypeError("sender_address must be a string.")
+    timestamp = transaction_dict['timestamp']
+    if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+        raise TypeError(f"timestamp must be a number, got {timestamp!r}.")
+    transaction_fee(transaction_dict)
+
+def transaction_fee(transaction_dict: dict) -> int:
+    """The fee a transaction pays (0 if none). Raises ValueError if it is not a non-negative integer."""
+    fee = transaction_dict.get('fee', 0)
+    if not isinstance(fee, int) or isinstance(fee, bool) or fee < 0:
+        raise ValueError(f"Transaction fee must be a non-negative integer, got {fee!r}.")
+    return fee
+
+def intern_address(address):
+    """Returns the shared copy of an address string (anything else is returned unchanged)."""
+    return sys.intern(address) if type(address) is str else address
+
+class SignedTransaction(Mapping):
+    """
+    An immutable signed transaction: the transaction dictionary plus the raw signature bytes.
+
+    It reads like the {'transaction_dict', 'signature_hex'} dictionary used throughout the
+    node (signed_tx['transaction_dict'], .get(), dict(signed_tx)), so one instance can be
+    shared by the mempool, the blocks of the chain and the relay instead of being copied.
+    The id, Merkle leaf hash and encoded size are computed together on first use and kept.
+    """
+
+    __slots__ = ('transaction_dict', 'signature', '_txid', '_leaf_hash', '_size')
+
+    def __init__(self, transaction_dict: dict, signature: bytes):
+        """
+        Args:
+            transaction_dict (dict): The signed data. It is copied; the copy must not be modified.
+            signature (bytes): The raw Dilithium signature.
+
+        Raises:
+            KeyError, ValueError, TypeError: If the transaction is malformed (see check_transaction_fields).
+        """
+        check_transaction_fields(transaction_dict)
+        tx = dict(transaction_dict)
+        for field in _ADDRESS_FIELDS:
+            if field in tx:
+                tx[field] = intern_address(tx[field])
+        set_slot = object.__setattr__
+        set_slot(self, 'transaction_dict', tx)
+        set_slot(self, 'signature', bytes(signature))
+        set_slot(self, '_txid', None)
+        set_slot(self, '_leaf_hash', None)
+        set_slot(self, '_size', None)
+
+    @classmethod
+    def of(cls, signed_tx) -> "SignedTransaction":
+        """
+        Returns `signed_tx` itself if it is a SignedTransaction, otherwise converts a
+        {'transaction_dict', 'signature_hex'} dictionary.
+        Raises KeyError, ValueError or TypeError for malformed input.
+        """
+        if isinstance(signed_tx, cls):
+            return signed_tx
+        signature_hex = signed_tx['signature_hex']
+        if not isinstance(signature_hex, str):
+            raise TypeError("signature_hex must be a string")
+        return cls(signed_tx['transaction_dict'], bytes.fromhex(signature_hex))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Pickled (e.g. to and from validation workers) as its content plus whatever derived
+        # values are already known, so the receiving process does not hash it again.
+        return (_restore, (self.transaction_dict, self.signature, self._txid, self._leaf_hash, self._size))
+
+    # --- The {'transaction_dict', 'signature_hex'} view ---
+
+    def __getitem__(self, key: str):
+        if key == 'transaction_dict':
+            return self.transaction_dict
+        if key == 'signature_hex':
+            return self.signature.hex()
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(('transaction_dict', 'signature_hex'))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"SignedTransaction(txid={self.txid[:16]}..., type={self.transaction_dict.get('tx_type')!r})"
+
+    def to_dict(self) -> dict:
+        """The plain {'transaction_dict', 'signature_hex'} dictionary, e.g. for JSON."""
+        return {'transaction_dict': self.transaction_dict, 'signature_hex': self.signature.hex()}
+
+    # --- Cached derived values ---
+
+    def _digest(self) -> bytes:
+        tx_bytes = serialization.encode_transaction(self.transaction_dict)
+        encoded = serialization.encode_signed_parts(tx_bytes, self.signature)
+        set_slot = object.__setattr__
+        set_slot(self, '_txid', hashlib.sha256(tx_bytes).hexdigest())
+        set_slot(self, '_leaf_hash', merkle.leaf_hash(encoded))
+        set_slot(self, '_size', len(encoded))
+        return tx_bytes
+
+    @property
+    def txid(self) -> str:
+        """The transaction id (see transaction_id)."""
+        if self._txid is None:
+            self._digest()
+        return self._txid
+
+    @property
+    def leaf_hash(self) -> bytes:
+        """The Merkle leaf hash of the signed encoding."""
+        if self._leaf_hash is None:
+            self._digest()
+        return self._leaf_hash
+
+    @property
+    def size(self) -> int:
+        """Length of the canonical signed encoding in bytes."""
+        if self._size is None:
+            self._digest()
+        return self._size
+
+    def verification_item(self) -> tuple[bytes, bytes, bytes]:
+        """
+        The (public_key, message, signature) bytes the Dilithium verifier expects. The id, leaf
+        hash and size are computed from the same encoding.
+        Raises KeyError, ValueError or TypeError for malformed transactions.
+        """
+        public_key = bytes.fromhex(self.transaction_dict['sender_address'])
+        return public_key, self._digest(), self.signature
+
+    def encode(self) -> bytes:
+        """The canonical binary encoding (see serialization.encode_signed_transaction)."""
+        return serialization.encode_signed_transaction(self)
+
+def _restore(transaction_dict: dict, signature: bytes, txid: str, leaf_hash: bytes, size: int) -> SignedTransaction:
+    signed_tx = SignedTransaction(transaction_dict, signature)
+    set_slot = object.__setattr__
+    set_slot(signed_tx, '_txid', txid)
+    set_slot(signed_tx, '_leaf_hash', leaf_hash)
+    set_slot(signed_tx, '_size', size)
+    return signed_tx
+
+def signed_transaction_id(signed_tx) -> str:
+    """The id of a SignedTransaction or {'transaction_dict', 'signature_hex'} dictionary."""
+    if isinstance(signed_tx, SignedTransaction):
+        return signed_tx.txid
+    return transaction_id(signed_tx['transaction_dict'])
@@ -6,14 +6,16 @@ from core.wallet import Wallet
 
 class Transaction:
     # Note the 'username: str = None' argument has been added here
-    def __init__(self, sender_wallet: Wallet, message: str, recipient_public_keys_hex: dict = None, tx_type: str = "message", username: str = None):
+    def __init__(self, sender_wallet: Wallet, message: str, recipient_public_keys_hex: dict = None, tx_type: str = "message", username: str = None, fee: int = 0):
         """
         Creates a new transaction. Can be a 'message' or 'key_registration'.
+        An optional fee raises its priority in the mempool.
         """
         self.sender_address = sender_wallet.address
         self.timestamp = time.time()
         self.tx_type = tx_type
         self.username = username # Store username at the top level
+        self.fee = fee
 
         if self.tx_type == "message":
             if not recipient_public_keys_hex:
@@ -45,5 +47,8 @@ class Transaction:
         # Only add username to the signed data if it's a key registration
         if self.tx_type == "key_registration":
             tx_dict['username'] = self.username
+        # The fee is only part of the signed data when one is paid
+        if self.fee:
+            tx_dict['fee'] = self.fee
         
         return tx_dict
\ No newline at end of file
@@ -0,0 +1,223 @@
+# core/validation.py
+
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from core import serialization
+from core.block import Block
+from core.signed_transaction import check_transaction_fields
+from crypto import dilithium_utils
+
+# Blocks handed to a worker per task.
+DEFAULT_BLOCKS_PER_TASK = 32
+# Tasks kept in flight per worker; more only adds work that an early failure would waste.
+TASKS_PER_WORKER = 2
+
+def verification_item(transaction_dict: dict, signature_hex: str) -> tuple[bytes, bytes, bytes]:
+    """
+    Converts a signed transaction into the (public_key, message, signature) bytes
+    that the Dilithium verifier expects.
+    Raises KeyError, ValueError or TypeError for malformed transactions.
+    """
+    # 1. Reject transactions the mempool and blocks cannot hold, then get the sender's address.
+    check_transaction_fields(transaction_dict)
+    sender_address_hex = transaction_dict['sender_address']
+
+    # 2. Convert hex-encoded strings back to bytes for cryptographic operations.
+    public_key_bytes = bytes.fromhex(sender_address_hex)
+    signature_bytes = bytes.fromhex(signature_hex)
+
+    # 3. Prepare the message for verification.
+    #    This MUST be done in the exact same way the message was prepared for signing.
+    message_bytes = serialization.encode_transaction(transaction_dict)
+    return public_key_bytes, message_bytes, signature_bytes
+
+def _check_bodies(blocks: list[Block], checkpoint_height: int, verified: frozenset = frozenset()) -> tuple[int | None, str | None, int]:
+    """
+    Checks the bodies of consecutive blocks: the Merkle root, and above the checkpoint every
+    transaction signature except those at the (height, position) pairs in `verified`, which were
+    checked before. Runs in a pool worker (or inline) and stops at the first failure.
+
+    Returns:
+        tuple: (failed height or None, reason or None, number of signatures checked).
+    """
+    signatures = 0
+    for block in blocks:
+        if block.merkle_root != block.compute_merkle_root():
+            return block.index, "its transactions do not match the Merkle root", signatures
+        if block.index <= checkpoint_height:
+            continue
+        positions = [position for position in range(len(block.transactions)) if (block.index, position) not in verified]
+        if not positions:
+            continue
+        try:
+            items = [verification_item(block.transactions[position]['transaction_dict'], block.transactions[position]['signature_hex'])
+                     for position in positions]
+        except (KeyError, ValueError, TypeError) as e:
+            return block.index, f"it contains a malformed transaction ({e})", signatures
+        results = dilithium_utils.verify_batch(items)
+        signatures += len(items)
+        if not all(results):
+            return block.index, f"transaction #{positions[results.index(False)]} has an invalid signature", signatures
+    return None, None, signatures
+
+class ValidationResult:
+    """Outcome and throughput of a ChainValidator run. Truthy when the blocks are valid."""
+
+    def __init__(self, ok: bool, failed_height: int = None, reason: str = None, blocks: int = 0, signatures: int = 0, elapsed: float = 0.0):
+        self.ok = ok
+        self.failed_height = failed_height
+        self.reason = reason
+        self.blocks = blocks
+        self.signatures = signatures
+        self.elapsed = elapsed
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def blocks_per_sec(self) -> float:
+        return self.blocks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def signatures_per_sec(self) -> float:
+        return self.signatures / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self) -> str:
+        status = "valid" if self.ok else f"invalid at #{self.failed_height}: {self.reason}"
+        return (f"ValidationResult({status}, {self.blocks} blocks, {self.signatures} signatures, "
+                f"{self.blocks_per_sec:.0f} blocks/s, {self.signatures_per_sec:.0f} sigs/s)")
+
+class ChainValidator:
+    """
+    Validates a run of blocks in a pipeline.
+
+    Header linkage (height, previous hash, header hash, checkpoint) is checked sequentially
+    in this process, which is cheap because block hashes only cover the header. The bodies,
+    i.e. the Merkle roots and every transaction signature, are checked in parallel chunks on
+    a process pool. Blocks at or below the trusted checkpoint skip signature verification,
+    and the first failure stops the run without checking the blocks after it.
+    """
+
+    def __init__(self, verifier: dilithium_utils.BatchVerifier = None, max_workers: int = 1, checkpoint_height: int = -1,
+                 checkpoint_hash: str = None, blocks_per_task: int = DEFAULT_BLOCKS_PER_TASK):
+        """
+        Args:
+            verifier (BatchVerifier): If given, its worker processes check the bodies.
+            max_workers (int): Without a verifier: worker processes to start (1 checks in this process).
+            checkpoint_height (int): Height up to which the chain is trusted and signatures are not checked.
+            checkpoint_hash (str): Expected hash of the block at checkpoint_height, if known.
+            blocks_per_task (int): Blocks handed to a worker per task.
+        """
+        self.verifier = verifier
+        self.max_workers = verifier.max_workers if verifier else max(1, max_workers or 1)
+        self.checkpoint_height = checkpoint_height
+        self.checkpoint_hash = checkpoint_hash
+        self.blocks_per_task = blocks_per_task
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor | None:
+        if self.verifier:
+            return self.verifier.executor
+        if self.max_workers > 1 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _header_error(self, block: Block, expected_index: int, previous_hash: str) -> str | None:
+        if block.index != expected_index:
+            return f"expected block #{expected_index}"
+        if block.previous_hash != previous_hash:
+            return "it has a broken link to the previous block"
+        if not block.has_valid_hash():
+            return "it has a corrupted hash"
+        if block.index == self.checkpoint_height and self.checkpoint_hash and block.hash != self.checkpoint_hash:
+            return "it does not match the checkpoint"
+        return None
+
+    def _verified_positions(self, blocks: list[Block], verified) -> frozenset:
+        if verified is None:
+            return frozenset()
+        return frozenset((block.index, position) for block in blocks if block.index > self.checkpoint_height
+                         for position, signed_tx in enumerate(block.transactions) if verified(signed_tx))
+
+    def validate(self, blocks: list[Block], previous: Block, verified=None) -> ValidationResult:
+        """
+        Validates `blocks`, which must directly follow `previous` (the last block already trusted).
+
+        Args:
+            blocks (list[Block]): The blocks, in chain order.
+            previous (Block): Their parent.
+            verified (callable): Tells whether a transaction's signature was already checked, e.g.
+                Mempool.has_verified. Those signatures are not checked again.
+
+        Returns:
+            ValidationResult: Truthy if every block is valid; otherwise the first failing height and why.
+        """
+        start = time.perf_counter()
+        pool = self._pool()
+        window = self.max_workers * TASKS_PER_WORKER
+        in_flight = deque()   # (future or inline result, first height, block count), in chain order
+        header_failure = body_failure = None
+        checked_blocks = checked_signatures = 0
+        expected_index, previous_hash = previous.index + 1, previous.hash
+
+        def collect(entry) -> bool:
+            nonlocal body_failure, checked_blocks, checked_signatures
+            result, first_height, count = entry
+            failed_height, reason, signatures = result.result() if pool else result
+            checked_signatures += signatures
+            if failed_height is not None:
+                body_failure = (failed_height, reason)
+                checked_blocks += failed_height - first_height
+                return False
+            checked_blocks += count
+            return True
+
+        for chunk_start in range(0, len(blocks), self.blocks_per_task):
+            good = []
+            for block in blocks[chunk_start:chunk_start + self.blocks_per_task]:
+                reason = self._header_error(block, expected_index, previous_hash)
+                if reason:
+                    header_failure = (expected_index, reason)
+                    break
+                good.append(block)
+                expected_index, previous_hash = block.index + 1, block.hash
+
+            if good:
+                skip = self._verified_positions(good, verified)
+                if pool:
+                    result = pool.submit(_check_bodies, good, self.checkpoint_height, skip)
+                else:
+                    result = _check_bodies(good, self.checkpoint_height, skip)
+                in_flight.append((result, good[0].index, len(good)))
+
+            # Keep the pipeline bounded, and stop submitting at the first failure.
+            while in_flight and (len(in_flight) >= window or not pool):
+                if not collect(in_flight.popleft()):
+                    break
+            if header_failure or body_failure:
+                break
+
+        # Body failures always lie below a header failure, since blocks after it were never submitted.
+        while in_flight and not body_failure:
+            collect(in_flight.popleft())
+        for result, _, _ in in_flight:
+            if pool:
+                result.cancel()
+
+        elapsed = time.perf_counter() - start
+        failure = body_failure or header_failure
+        if failure:
+            return ValidationResult(False, failure[0], failure[1], checked_blocks, checked_signatures, elapsed)
+        return ValidationResult(True, None, None, checked_blocks, checked_signatures, elapsed)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,17 +1,41 @@
-import json
+import logging
+from core import serialization
 from crypto import dilithium_utils, kyber_utils
 
+def generate_key_pairs() -> tuple[bytes, bytes, bytes, bytes]:
+    """Generates the key pairs of one wallet: (signing public, signing secret, encryption public, encryption secret)."""
+    return (*dilithium_utils.generate_keys(), *kyber_utils.generate_keys())
+
 class Wallet:
-    def __init__(self):
-        """Initializes a new wallet by generating quantum-resistant key pairs."""
-        self.signing_public_key, self.signing_secret_key = dilithium_utils.generate_keys()
-        self.encryption_public_key, self.encryption_secret_key = kyber_utils.generate_keys()
+    def __init__(self, keys: tuple[bytes, bytes, bytes, bytes] = None):
+        """
+        Initializes a wallet with quantum-resistant key pairs.
+
+        Args:
+            keys (tuple): Existing keys as returned by export_keys(), e.g. from a keystore file
+                or a KeyPool. New key pairs are generated if omitted.
+        """
+        if keys is None:
+            keys = generate_key_pairs()
+        self.signing_public_key, self.signing_secret_key, self.encryption_public_key, self.encryption_secret_key = keys
+        self._kem_session = None
+
+    @property
+    def kem_session(self) -> kyber_utils.KemSession:
+        """The wallet's long-lived decryption session, created on first use."""
+        if self._kem_session is None:
+            self._kem_session = kyber_utils.KemSession(self.encryption_secret_key)
+        return self._kem_session
 
     @property
     def address(self) -> str:
         """Returns the wallet's public address (the public signing key)."""
         return self.signing_public_key.hex()
 
+    def export_keys(self) -> tuple[bytes, bytes, bytes, bytes]:
+        """Returns (signing public, signing secret, encryption public, encryption secret) key bytes."""
+        return self.signing_public_key, self.signing_secret_key, self.encryption_public_key, self.encryption_secret_key
+
     def get_public_keys_hex(self) -> dict:
         """Returns a dictionary of the public keys in hex format."""
         return {
@@ -21,16 +45,17 @@ class Wallet:
 
     def sign_transaction(self, transaction_data: dict) -> bytes:
         """Generates a digital signature for a transaction using Dilithium."""
-        # 1. Create a consistent, ordered string from the dictionary
-        ordered_tx_string = json.dumps(transaction_data, sort_keys=True)
+        # 1. Create the canonical binary encoding of the transaction
+        tx_bytes = serialization.encode_transaction(transaction_data)
         
-        # 2. Convert the string to bytes
-        tx_bytes = ordered_tx_string.encode('utf-8')
-        
-        # 3. Sign the bytes using the corrected utility function
+        # 2. Sign the bytes using the corrected utility function
         signature = dilithium_utils.sign(self.signing_secret_key, tx_bytes)
         
         return signature
+
+    def sign_bytes(self, data: bytes) -> bytes:
+        """Signs already encoded data, e.g. a consensus vote, with the wallet's Dilithium key."""
+        return dilithium_utils.sign(self.signing_secret_key, data)
     
     def decrypt_message(self, encrypted_content: dict) -> str | None:
         """
@@ -48,16 +73,41 @@ class Wallet:
             nonce_bytes = bytes.fromhex(encrypted_content['nonce'])
             payload_bytes = bytes.fromhex(encrypted_content['payload'])
 
-            # 2. Use our secret key to "decapsulate" the ciphertext and get the shared secret
-            shared_secret = kyber_utils.decapsulate_key(self.encryption_secret_key, ciphertext_bytes)
-
-            # 3. Use the shared secret to decrypt the main payload
-            decrypted_message_bytes = kyber_utils.decrypt_message(shared_secret, nonce_bytes, payload_bytes)
-            
-            # 4. Decode the decrypted bytes back into a human-readable string
-            return decrypted_message_bytes
+            # 2. "Decapsulate" the ciphertext with our loaded KEM handle (or reuse the cached
+            #    shared secret) and decrypt the main payload with it
+            return self.kem_session.decrypt(ciphertext_bytes, nonce_bytes, payload_bytes)
 
         except (KeyError, ValueError, Exception) as e:
             # Catch errors from missing keys, bad hex, or a failed decryption
-            print(f"Decryption failed: {e}")
-            return None
\ No newline at end of file
+            logging.debug("Decryption failed: %s", e)
+            return None
+
+    def decrypt_messages(self, encrypted_contents: list[dict], max_workers: int = 1) -> list[str | None]:
+        """
+        Decrypts a batch of messages, optionally across a pool of worker processes.
+
+        Args:
+            encrypted_contents (list[dict]): Message contents as accepted by decrypt_message.
+            max_workers (int): Number of worker processes; 1 decrypts in this process.
+
+        Returns:
+            list: One plaintext per message, in input order; None where decryption failed.
+        """
+        items, positions = [], []
+        for position, content in enumerate(encrypted_contents):
+            try:
+                items.append((bytes.fromhex(content['ciphertext']), bytes.fromhex(content['nonce']), bytes.fromhex(content['payload'])))
+                positions.append(position)
+            except (KeyError, ValueError, TypeError) as e:
+                logging.debug("Decryption failed: %s", e)
+
+        results = [None] * len(encrypted_contents)
+        for position, plaintext in zip(positions, self.kem_session.decrypt_many(items, max_workers=max_workers)):
+            results[position] = plaintext
+        return results
+
+    def close(self):
+        """Releases the decryption session."""
+        if self._kem_session is not None:
+            self._kem_session.close()
+            self._kem_session = None
@@ -1,26 +1,134 @@
-import oqs
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from crypto import providers
+from utils.metrics import REGISTRY
 
-# Define the signature algorithm to use
-SIG_ALGORITHM = "Dilithium2"
+# The signature scheme (Dilithium2 by default) and the backend providing it are selected
+# with providers.configure(); the backend is loaded on first use.
 
+# Number of (public_key, message, signature) items sent to a worker per task.
+DEFAULT_CHUNK_SIZE = 16
+
+# Shared with kyber_utils; recorded in the process that performs the operation.
+_OPERATION_SECONDS = REGISTRY.histogram("crypto_operation_seconds", "Duration of cryptographic operations.", ("operation",))
+_KEYGEN_SECONDS = _OPERATION_SECONDS.labels("dilithium_keygen")
+_SIGN_SECONDS = _OPERATION_SECONDS.labels("dilithium_sign")
+_VERIFY_SECONDS = _OPERATION_SECONDS.labels("dilithium_verify")
+
+@_KEYGEN_SECONDS.time
 def generate_keys():
     """Generates a new CRYSTALS-Dilithium key pair."""
-    with oqs.Signature(SIG_ALGORITHM) as signer:
+    with providers.get_provider().Signature(providers.signature_algorithm()) as signer:
         public_key = signer.generate_keypair()
         secret_key = signer.export_secret_key()
         return public_key, secret_key
 
+@_SIGN_SECONDS.time
 def sign(secret_key: bytes, message: bytes) -> bytes:
     """Signs a message using a Dilithium secret key."""
     # This function now correctly accepts bytes and performs no JSON conversion
-    with oqs.Signature(SIG_ALGORITHM, secret_key) as signer:
+    with providers.get_provider().Signature(providers.signature_algorithm(), secret_key) as signer:
         signature = signer.sign(message)
         return signature
 
+@_VERIFY_SECONDS.time
 def verify(public_key: bytes, message: bytes, signature: bytes) -> bool:
     """Verifies a signature against a message and a public key."""
+    provider = providers.get_provider()
     try:
-        with oqs.Signature(SIG_ALGORITHM) as verifier:
+        with provider.Signature(providers.signature_algorithm()) as verifier:
             return verifier.verify(message, signature, public_key)
-    except oqs.Error:
-        return False
\ No newline at end of file
+    except provider.Error:
+        return False
+
+# --- Batch verification ---
+# Each worker process keeps one verifier object alive for its whole lifetime,
+# so a batch pays the liboqs context setup once per worker instead of once per signature.
+_worker_verifier = None
+_worker_verifier_generation = None
+
+def _init_verifier_worker():
+    """Process pool initializer: creates the long-lived verifier for this worker."""
+    global _worker_verifier, _worker_verifier_generation
+    _worker_verifier = providers.get_provider().Signature(providers.signature_algorithm())
+    _worker_verifier_generation = providers.generation()
+
+def _verify_chunk(items: list[tuple[bytes, bytes, bytes]]) -> list[bool]:
+    """Verifies a chunk of (public_key, message, signature) items with the worker's verifier."""
+    if _worker_verifier is None or _worker_verifier_generation != providers.generation():
+        _init_verifier_worker()
+    error = providers.get_provider().Error
+    results = []
+    for public_key, message, signature in items:
+        started = time.perf_counter()
+        try:
+            results.append(bool(_worker_verifier.verify(message, signature, public_key)))
+        except error:
+            results.append(False)
+        _VERIFY_SECONDS.observe(time.perf_counter() - started)
+    return results
+
+def verify_batch(items: list[tuple[bytes, bytes, bytes]]) -> list[bool]:
+    """
+    Verifies (public_key, message, signature) items in the calling process, reusing its
+    long-lived verifier. Meant for code that already runs inside a pool worker.
+    """
+    return _verify_chunk(items)
+
+def _chunked(items: list, chunk_size: int) -> list[list]:
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+class BatchVerifier:
+    """
+    Verifies many Dilithium signatures in parallel across a pool of worker processes.
+    Every worker holds a reusable verifier, so only the signature checks themselves are paid per item.
+    """
+
+    def __init__(self, max_workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            chunk_size (int): Number of items handed to a worker per task.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_verifier_worker)
+
+    def submit(self, items: list[tuple[bytes, bytes, bytes]]) -> list:
+        """Submits the items in chunks and returns the list of pending futures, one per chunk."""
+        return [self.executor.submit(_verify_chunk, chunk) for chunk in _chunked(items, self.chunk_size)]
+
+    def verify_many(self, items: list[tuple[bytes, bytes, bytes]]) -> list[bool]:
+        """
+        Verifies a batch of signatures and blocks until all results are known.
+
+        Args:
+            items (list): A list of (public_key, message, signature) tuples of bytes.
+
+        Returns:
+            list[bool]: One result per item, in the same order as the input.
+        """
+        results = []
+        for future in self.submit(items):
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def verify_many(items: list[tuple[bytes, bytes, bytes]], max_workers: int = None) -> list[bool]:
+    """
+    Verifies a batch of signatures. Uses the calling process when max_workers is 1,
+    otherwise spins up a temporary BatchVerifier (keep one around for repeated batches).
+    """
+    if max_workers == 1:
+        return _verify_chunk(items)
+    with BatchVerifier(max_workers=max_workers) as verifier:
+        return verifier.verify_many(items)
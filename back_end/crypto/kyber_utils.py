@@ -1,10 +1,29 @@
+import hashlib
 import os
-import oqs
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from crypto import providers
+from utils.metrics import REGISTRY
 
-# Define the Key Encapsulation Mechanism (KEM) to use.
-KEM_ALGORITHM = "Kyber512"
+# The KEM (Kyber512 by default) and the backend providing it are selected with
+# providers.configure(); the backend is loaded on first use.
 
+# Number of derived shared secrets (with their AES-GCM contexts) a KemSession remembers.
+DEFAULT_SECRET_CACHE_SIZE = 1024
+# Number of messages handed to a decryption worker per task.
+DEFAULT_DECRYPT_CHUNK_SIZE = 16
+
+# Shared with dilithium_utils; recorded in the process that performs the operation.
+_OPERATION_SECONDS = REGISTRY.histogram("crypto_operation_seconds", "Duration of cryptographic operations.", ("operation",))
+_KEYGEN_SECONDS = _OPERATION_SECONDS.labels("kyber_keygen")
+_ENCAPSULATE_SECONDS = _OPERATION_SECONDS.labels("kyber_encapsulate")
+_DECAPSULATE_SECONDS = _OPERATION_SECONDS.labels("kyber_decapsulate")
+_ENCRYPT_SECONDS = _OPERATION_SECONDS.labels("aes_gcm_encrypt")
+_DECRYPT_SECONDS = _OPERATION_SECONDS.labels("aes_gcm_decrypt")
+
+@_KEYGEN_SECONDS.time
 def generate_keys():
     """
     Generates a new CRYSTALS-Kyber key pair.
@@ -12,11 +31,12 @@ def generate_keys():
     Returns:
         tuple: A tuple containing the public key (bytes) and secret key (bytes).
     """
-    with oqs.KeyEncapsulation(KEM_ALGORITHM) as kem:
+    with providers.get_provider().KeyEncapsulation(providers.kem_algorithm()) as kem:
         public_key = kem.generate_keypair()
         secret_key = kem.export_secret_key()
         return public_key, secret_key
 
+@_ENCAPSULATE_SECONDS.time
 def encapsulate_key(public_key: bytes) -> tuple[bytes, bytes]:
     """
     Generates a shared secret and a ciphertext for a recipient's public key.
@@ -28,10 +48,11 @@ def encapsulate_key(public_key: bytes) -> tuple[bytes, bytes]:
     Returns:
         tuple: A tuple containing the ciphertext (bytes) and the shared secret (bytes).
     """
-    with oqs.KeyEncapsulation(KEM_ALGORITHM) as kem:
+    with providers.get_provider().KeyEncapsulation(providers.kem_algorithm()) as kem:
         ciphertext, shared_secret = kem.encap_secret(public_key)
         return ciphertext, shared_secret
 
+@_DECAPSULATE_SECONDS.time
 def decapsulate_key(secret_key: bytes, ciphertext: bytes) -> bytes:
     """
     Derives the shared secret from a ciphertext using the recipient's secret key.
@@ -44,10 +65,11 @@ def decapsulate_key(secret_key: bytes, ciphertext: bytes) -> bytes:
     Returns:
         bytes: The derived shared secret.
     """
-    with oqs.KeyEncapsulation(KEM_ALGORITHM, secret_key) as kem:
+    with providers.get_provider().KeyEncapsulation(providers.kem_algorithm(), secret_key) as kem:
         shared_secret = kem.decap_secret(ciphertext)
         return shared_secret
 
+@_ENCRYPT_SECONDS.time
 def encrypt_message(shared_secret: bytes, message: str) -> tuple[bytes, bytes]:
     """
     Encrypts a message using AES-GCM with the derived shared secret.
@@ -66,6 +88,7 @@ def encrypt_message(shared_secret: bytes, message: str) -> tuple[bytes, bytes]:
     encrypted_payload = aesgcm.encrypt(nonce, message_bytes, None)
     return nonce, encrypted_payload
 
+@_DECRYPT_SECONDS.time
 def decrypt_message(shared_secret: bytes, nonce: bytes, encrypted_payload: bytes) -> str:
     """
     Decrypts a message using AES-GCM with the derived shared secret.
@@ -81,4 +104,146 @@ def decrypt_message(shared_secret: bytes, nonce: bytes, encrypted_payload: bytes
     """
     aesgcm = AESGCM(shared_secret)
     decrypted_bytes = aesgcm.decrypt(nonce, encrypted_payload, None)
-    return decrypted_bytes.decode('utf-8')
\ No newline at end of file
+    return decrypted_bytes.decode('utf-8')
+
+# --- Long-lived decryption sessions ---
+
+class KemSession:
+    """
+    Decrypts messages for one Kyber secret key.
+
+    The KEM handle is created once and kept loaded, and every derived shared secret is
+    memoized (as a ready AES-GCM context) by the SHA-256 of its ciphertext in a bounded
+    LRU, so reading the same message again costs one AES-GCM decryption.
+    """
+
+    def __init__(self, secret_key: bytes, cache_size: int = DEFAULT_SECRET_CACHE_SIZE):
+        """
+        Args:
+            secret_key (bytes): The recipient's private Kyber key.
+            cache_size (int): How many shared secrets to remember.
+        """
+        self.secret_key = secret_key
+        self.cache_size = cache_size
+        self.kem = providers.get_provider().KeyEncapsulation(providers.kem_algorithm(), secret_key)
+        self._contexts = OrderedDict()   # sha256(ciphertext) -> AESGCM
+        self._executor = None
+        self._executor_workers = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _context(self, ciphertext: bytes) -> AESGCM:
+        key = hashlib.sha256(ciphertext).digest()
+        context = self._contexts.get(key)
+        if context is not None:
+            self._contexts.move_to_end(key)
+            self.hits += 1
+            return context
+        self.misses += 1
+        started = time.perf_counter()
+        shared_secret = self.kem.decap_secret(ciphertext)
+        _DECAPSULATE_SECONDS.observe(time.perf_counter() - started)
+        return self._remember(key, shared_secret)
+
+    def _remember(self, key: bytes, shared_secret: bytes) -> AESGCM:
+        context = AESGCM(shared_secret)
+        self._contexts[key] = context
+        if len(self._contexts) > self.cache_size:
+            self._contexts.popitem(last=False)
+        return context
+
+    def decrypt(self, ciphertext: bytes, nonce: bytes, encrypted_payload: bytes) -> str:
+        """
+        Decapsulates (or looks up) the shared secret and decrypts the payload.
+
+        Raises:
+            cryptography.exceptions.InvalidTag: If the payload does not authenticate.
+        """
+        context = self._context(ciphertext)
+        started = time.perf_counter()
+        try:
+            return context.decrypt(nonce, encrypted_payload, None).decode('utf-8')
+        finally:
+            _DECRYPT_SECONDS.observe(time.perf_counter() - started)
+
+    def decrypt_many(self, items: list[tuple[bytes, bytes, bytes]], max_workers: int = 1, chunk_size: int = DEFAULT_DECRYPT_CHUNK_SIZE) -> list[str | None]:
+        """
+        Decrypts a batch of (ciphertext, nonce, payload) items.
+
+        With max_workers > 1 the items whose secret is not cached yet are decapsulated on a
+        pool of worker processes (each holding its own KEM handle for this key); the pool is
+        created on first use and kept until close().
+
+        Returns:
+            list: One plaintext per item, in input order; None where decryption failed.
+        """
+        if max_workers <= 1 or len(items) <= chunk_size:
+            return [self._try_decrypt(item) for item in items]
+
+        results = [None] * len(items)
+        pending = []
+        for position, item in enumerate(items):
+            if hashlib.sha256(item[0]).digest() in self._contexts:
+                results[position] = self._try_decrypt(item)
+            else:
+                pending.append((position, item))
+
+        executor = self._pool(max_workers)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        futures = [executor.submit(_decrypt_chunk, [item for _, item in chunk]) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            for (position, item), (plaintext, shared_secret) in zip(chunk, future.result()):
+                results[position] = plaintext
+                if shared_secret is not None:
+                    self._remember(hashlib.sha256(item[0]).digest(), shared_secret)
+        return results
+
+    def _try_decrypt(self, item: tuple[bytes, bytes, bytes]) -> str | None:
+        try:
+            return self.decrypt(*item)
+        except Exception:
+            return None
+
+    def _pool(self, max_workers: int) -> ProcessPoolExecutor:
+        if self._executor is None or self._executor_workers != max_workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_decrypt_worker, initargs=(self.secret_key,))
+            self._executor_workers = max_workers
+        return self._executor
+
+    def close(self):
+        """Frees the KEM handle and stops the worker pool, if one was started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.kem is not None:
+            self.kem.free()
+            self.kem = None
+        self._contexts.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Each decryption worker keeps one KEM handle for the session's key for its whole lifetime.
+_worker_kem = None
+
+def _init_decrypt_worker(secret_key: bytes):
+    """Process pool initializer: loads the session's secret key into a long-lived KEM handle."""
+    global _worker_kem
+    _worker_kem = providers.get_provider().KeyEncapsulation(providers.kem_algorithm(), secret_key)
+
+def _decrypt_chunk(items: list[tuple[bytes, bytes, bytes]]) -> list[tuple[str | None, bytes | None]]:
+    """Decrypts a chunk in a worker. Returns (plaintext, shared secret) pairs so the session can cache the secrets."""
+    results = []
+    for ciphertext, nonce, encrypted_payload in items:
+        try:
+            shared_secret = _worker_kem.decap_secret(ciphertext)
+            plaintext = AESGCM(shared_secret).decrypt(nonce, encrypted_payload, None).decode('utf-8')
+            results.append((plaintext, shared_secret))
+        except Exception:
+            results.append((None, None))
+    return results
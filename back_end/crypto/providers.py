@@ -0,0 +1,302 @@
+# crypto/providers.py
+
+import hashlib
+import importlib
+import itertools
+import multiprocessing
+import os
+import threading
+
+# Signature parameter sets: name -> (public key, secret key, signature) sizes in bytes.
+# Dilithium* are the round 3 schemes the network started with; ML-DSA-* are their FIPS 204
+# successors at the same security levels. The two families do not verify each other's signatures.
+SIGNATURE_ALGORITHMS = {
+    "Dilithium2": (1312, 2528, 2420),
+    "Dilithium3": (1952, 4000, 3293),
+    "Dilithium5": (2592, 4864, 4595),
+    "ML-DSA-44": (1312, 2560, 2420),
+    "ML-DSA-65": (1952, 4032, 3309),
+    "ML-DSA-87": (2592, 4896, 4627),
+}
+# KEM parameter sets: name -> (public key, secret key, ciphertext, shared secret) sizes in bytes.
+KEM_ALGORITHMS = {
+    "Kyber512": (800, 1632, 768, 32),
+    "Kyber768": (1184, 2400, 1088, 32),
+    "Kyber1024": (1568, 3168, 1568, 32),
+    "ML-KEM-512": (800, 1632, 768, 32),
+    "ML-KEM-768": (1184, 2400, 1088, 32),
+    "ML-KEM-1024": (1568, 3168, 1568, 32),
+}
+
+PROVIDER_LIBOQS = "liboqs"
+PROVIDER_SIMULATED = "simulated"
+DEFAULT_PROVIDER = PROVIDER_LIBOQS
+DEFAULT_SIGNATURE_ALGORITHM = "Dilithium2"
+DEFAULT_KEM_ALGORITHM = "Kyber512"
+
+# The selection is read from these on first use and written back by configure(), so worker
+# processes and child scripts use the same backend as the process that started them.
+PROVIDER_ENV = "NODE_CRYPTO_PROVIDER"
+SIGNATURE_ALGORITHM_ENV = "NODE_SIGNATURE_ALGORITHM"
+KEM_ALGORITHM_ENV = "NODE_KEM_ALGORITHM"
+SEED_ENV = "NODE_CRYPTO_SEED"
+
+class LiboqsProvider:
+    """The real post-quantum schemes, from liboqs through its Python wrapper (`oqs`)."""
+
+    name = PROVIDER_LIBOQS
+
+    def __init__(self, seed: int = None):
+        # Loading liboqs is the expensive part of importing the crypto modules, so it waits
+        # until a key, signature or ciphertext is first needed.
+        oqs = importlib.import_module("oqs")
+        self.Signature = oqs.Signature
+        self.KeyEncapsulation = oqs.KeyEncapsulation
+        # liboqs-python reports failures as oqs.Error in some releases and RuntimeError in others.
+        self.Error = getattr(oqs, "Error", RuntimeError)
+        self._oqs = oqs
+
+    def enabled_signature_algorithms(self) -> list[str]:
+        return [name for name in SIGNATURE_ALGORITHMS if name in self._oqs.get_enabled_sig_mechanisms()]
+
+    def enabled_kem_algorithms(self) -> list[str]:
+        return [name for name in KEM_ALGORITHMS if name in self._oqs.get_enabled_kem_mechanisms()]
+
+# --- Simulated backend ---
+
+class SimulatedCryptoError(Exception):
+    """A simulated scheme was used with an unknown algorithm or a malformed key."""
+
+class _SimulatedHandle:
+    """Common part of the simulated Signature and KeyEncapsulation handles (same interface as oqs)."""
+
+    _algorithms = {}
+
+    def __init__(self, provider, algorithm: str, secret_key: bytes = None):
+        if algorithm not in self._algorithms:
+            raise SimulatedCryptoError(f"Unknown algorithm {algorithm!r}.")
+        self.provider = provider
+        self.algorithm = algorithm
+        self.sizes = self._algorithms[algorithm]
+        self.secret_key = secret_key
+
+    def export_secret_key(self) -> bytes:
+        return self.secret_key
+
+    def free(self):
+        self.secret_key = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
+
+    def _seed(self) -> bytes:
+        if self.secret_key is None or len(self.secret_key) != self.sizes[1]:
+            raise SimulatedCryptoError("A secret key of the right size is required.")
+        return self.secret_key[:32]
+
+def _expand(label: bytes, data: bytes, size: int) -> bytes:
+    return hashlib.shake_256(label + data).digest(size)
+
+class SimulatedSignature(_SimulatedHandle):
+    _algorithms = SIGNATURE_ALGORITHMS
+
+    def generate_keypair(self) -> bytes:
+        seed = self.provider.random_bytes(32)
+        public_size, secret_size, _ = self.sizes
+        self.secret_key = seed + _expand(b"sig-sk", seed, secret_size - 32)
+        return _expand(b"sig-pk", seed, public_size)
+
+    def sign(self, message: bytes) -> bytes:
+        public_key = _expand(b"sig-pk", self._seed(), self.sizes[0])
+        return _expand(b"sig", public_key + message, self.sizes[2])
+
+    def verify(self, message: bytes, signature: bytes, public_key: bytes) -> bool:
+        if len(public_key) != self.sizes[0] or len(signature) != self.sizes[2]:
+            return False
+        return signature == _expand(b"sig", public_key + message, self.sizes[2])
+
+class SimulatedKeyEncapsulation(_SimulatedHandle):
+    _algorithms = KEM_ALGORITHMS
+
+    def generate_keypair(self) -> bytes:
+        seed = self.provider.random_bytes(32)
+        public_size, secret_size, _, _ = self.sizes
+        self.secret_key = seed + _expand(b"kem-sk", seed, secret_size - 32)
+        return _expand(b"kem-pk", seed, public_size)
+
+    def encap_secret(self, public_key: bytes) -> tuple[bytes, bytes]:
+        if len(public_key) != self.sizes[0]:
+            raise SimulatedCryptoError("Public key of the wrong size.")
+        nonce = self.provider.random_bytes(32)
+        ciphertext = nonce + _expand(b"kem-ct", public_key + nonce, self.sizes[2] - 32)
+        return ciphertext, _expand(b"kem-ss", public_key + nonce, self.sizes[3])
+
+    def decap_secret(self, ciphertext: bytes) -> bytes:
+        seed = self._seed()
+        public_key = _expand(b"kem-pk", seed, self.sizes[0])
+        nonce = ciphertext[:32]
+        if len(ciphertext) == self.sizes[2] and ciphertext[32:] == _expand(b"kem-ct", public_key + nonce, self.sizes[2] - 32):
+            return _expand(b"kem-ss", public_key + nonce, self.sizes[3])
+        # Like ML-KEM's implicit rejection: a foreign ciphertext yields an unrelated secret, not an error.
+        return _expand(b"kem-reject", seed + ciphertext, self.sizes[3])
+
+class SimulatedProvider:
+    """
+    A fast, deterministic stand-in for large simulations and benchmarks. NOT SECURE.
+
+    Keys, signatures and ciphertexts have the sizes of the selected parameter sets and are
+    derived with SHAKE-256 from a seeded counter, so a run with the same seed repeats exactly
+    and costs a few microseconds per operation. A signature only proves knowledge of the
+    public key: anyone can forge one. Worker processes (multiprocessing pools) mix their pid
+    into the stream, so they never repeat the keys of the process that started them.
+    """
+
+    name = PROVIDER_SIMULATED
+
+    def __init__(self, seed: int = None):
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._reseed()
+        self.Error = SimulatedCryptoError
+
+    def _reseed(self):
+        self._pid = os.getpid()
+        base = os.urandom(32) if self.seed is None else str(self.seed).encode()
+        worker = multiprocessing.parent_process() is not None
+        self._stream = hashlib.sha256(base + (str(self._pid).encode() if worker else b"")).digest()
+        self._counter = itertools.count()
+
+    def random_bytes(self, size: int) -> bytes:
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reseed()
+            index = next(self._counter)
+        return _expand(b"rng", self._stream + index.to_bytes(8, 'big'), size)
+
+    def Signature(self, algorithm: str, secret_key: bytes = None) -> SimulatedSignature:
+        return SimulatedSignature(self, algorithm, secret_key)
+
+    def KeyEncapsulation(self, algorithm: str, secret_key: bytes = None) -> SimulatedKeyEncapsulation:
+        return SimulatedKeyEncapsulation(self, algorithm, secret_key)
+
+    def enabled_signature_algorithms(self) -> list[str]:
+        return list(SIGNATURE_ALGORITHMS)
+
+    def enabled_kem_algorithms(self) -> list[str]:
+        return list(KEM_ALGORITHMS)
+
+# --- Registry and selection ---
+
+PROVIDERS = {
+    PROVIDER_LIBOQS: LiboqsProvider,
+    PROVIDER_SIMULATED: SimulatedProvider,
+}
+
+_lock = threading.Lock()
+_selection = None    # (provider name, signature algorithm, KEM algorithm, seed)
+_provider = None
+_generation = 0
+
+def register_provider(name: str, factory):
+    """
+    Adds a backend. `factory(seed)` is called on first use and must return an object with
+    Signature(algorithm, secret_key=None) and KeyEncapsulation(algorithm, secret_key=None)
+    handles following the oqs interface, an Error exception class and the
+    enabled_signature_algorithms() / enabled_kem_algorithms() methods.
+    """
+    PROVIDERS[name] = factory
+
+def _from_environment() -> tuple:
+    seed = os.environ.get(SEED_ENV)
+    return (os.environ.get(PROVIDER_ENV, DEFAULT_PROVIDER),
+            os.environ.get(SIGNATURE_ALGORITHM_ENV, DEFAULT_SIGNATURE_ALGORITHM),
+            os.environ.get(KEM_ALGORITHM_ENV, DEFAULT_KEM_ALGORITHM),
+            int(seed) if seed else None)
+
+def _check(selection: tuple):
+    provider, signature_algorithm, kem_algorithm, _ = selection
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown crypto provider {provider!r} (available: {', '.join(PROVIDERS)}).")
+    if signature_algorithm not in SIGNATURE_ALGORITHMS:
+        raise ValueError(f"Unknown signature algorithm {signature_algorithm!r} (supported: {', '.join(SIGNATURE_ALGORITHMS)}).")
+    if kem_algorithm not in KEM_ALGORITHMS:
+        raise ValueError(f"Unknown KEM algorithm {kem_algorithm!r} (supported: {', '.join(KEM_ALGORITHMS)}).")
+
+def configure(provider: str = None, signature_algorithm: str = None, kem_algorithm: str = None, seed: int = None):
+    """
+    Selects the crypto backend and parameter sets. Arguments left out keep their current value.
+    Nothing is loaded yet; the backend is created on first use.
+
+    Args:
+        provider (str): A registered provider name, e.g. "liboqs" or "simulated".
+        signature_algorithm (str): One of SIGNATURE_ALGORITHMS, e.g. "Dilithium3".
+        kem_algorithm (str): One of KEM_ALGORITHMS, e.g. "Kyber768".
+        seed (int): Seed of the simulated provider's key and nonce stream.
+
+    Raises:
+        ValueError: For an unknown provider or algorithm.
+    """
+    global _selection, _provider, _generation
+    current = selection()
+    new = (provider or current[0], signature_algorithm or current[1], kem_algorithm or current[2],
+           seed if seed is not None else current[3])
+    _check(new)
+    with _lock:
+        if new != _selection:
+            _selection, _provider = new, None
+            _generation += 1
+    for name, value in zip((PROVIDER_ENV, SIGNATURE_ALGORITHM_ENV, KEM_ALGORITHM_ENV, SEED_ENV), new):
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = str(value)
+
+def selection() -> tuple:
+    """The current (provider, signature algorithm, KEM algorithm, seed), without loading anything."""
+    global _selection
+    if _selection is None:
+        environment = _from_environment()
+        _check(environment)
+        _selection = environment
+    return _selection
+
+def generation() -> int:
+    """Changes whenever configure() selects something else, so long-lived handles know to be recreated."""
+    return _generation
+
+def signature_algorithm() -> str:
+    return selection()[1]
+
+def kem_algorithm() -> str:
+    return selection()[2]
+
+def get_provider():
+    """Returns the selected backend, loading it on first use."""
+    global _provider
+    provider = _provider
+    if provider is not None:
+        return provider
+    with _lock:
+        if _provider is None:
+            name, signature, kem, seed = selection()
+            provider = PROVIDERS[name](seed)
+            if signature not in provider.enabled_signature_algorithms():
+                raise ValueError(f"{signature} is not enabled in the {name} provider.")
+            if kem not in provider.enabled_kem_algorithms():
+                raise ValueError(f"{kem} is not enabled in the {name} provider.")
+            _provider = provider
+        return _provider
+
+def describe() -> dict:
+    """The selection and its key and signature sizes, e.g. for status output."""
+    name, signature, kem, _ = selection()
+    public_key, secret_key, signature_size = SIGNATURE_ALGORITHMS[signature]
+    kem_public_key, kem_secret_key, ciphertext, _ = KEM_ALGORITHMS[kem]
+    return {
+        "provider": name, "signature_algorithm": signature, "kem_algorithm": kem,
+        "sizes": {"public_key": public_key, "secret_key": secret_key, "signature": signature_size,
+                  "kem_public_key": kem_public_key, "kem_secret_key": kem_secret_key, "ciphertext": ciphertext}
+    }
@@ -0,0 +1,307 @@
+# network/admission.py
+
+import asyncio
+import logging
+from core import serialization
+from core.mempool import transaction_id
+from crypto import dilithium_utils
+from network.validation_pool import ValidationPool
+
+# Outcome of each submitted transaction
+ADMITTED = "admitted"
+DUPLICATE = "duplicate"
+INVALID_SIGNATURE = "invalid_signature"
+MALFORMED = "malformed"
+POOL_FULL = "pool_full"
+BUSY = "busy"    # the admission queue was full; the transaction was not looked at
+
+# Transactions waiting for verification. Further ones are dropped (from peers) or answered
+# BUSY (from the API) instead of growing the queue without bound.
+DEFAULT_MAX_QUEUED_TRANSACTIONS = 10_000
+
+class MempoolAdmission:
+    """
+    Collects incoming NEW_TRANSACTION messages into small batches and verifies their
+    signatures on a BatchVerifier's worker processes, so the event loop keeps serving
+    peers while the Dilithium checks run. Without a verifier, batches are checked in this
+    process with a reused verifier handle.
+    """
+    def __init__(self, blockchain, verifier, on_admitted=None, max_batch_size: int = 64, max_delay: float = 0.005,
+                 max_queued: int = DEFAULT_MAX_QUEUED_TRANSACTIONS):
+        """
+        Args:
+            blockchain (Blockchain): The chain whose pending pool receives verified transactions.
+            verifier (BatchVerifier): The process pool used for signature verification, or None to verify in this process.
+            on_admitted (coroutine function): Called as on_admitted(message, writer, txid) for every admitted transaction.
+            max_batch_size (int): Largest number of transactions verified together.
+            max_delay (float): Longest time (seconds) to wait for a batch to fill up once it has one item.
+            max_queued (int): Largest number of transactions waiting for verification.
+        """
+        self.blockchain = blockchain
+        self.verifier = verifier
+        self.on_admitted = on_admitted
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.dropped = 0    # transactions turned away because the queue was full
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def backlog(self) -> int:
+        """Transactions waiting for verification."""
+        return self.queue.qsize()
+
+    def submit(self, message: dict, writer=None) -> bool:
+        """
+        Queues a NEW_TRANSACTION message for verification. Never blocks.
+
+        Returns:
+            bool: False if the queue was full and the message was dropped.
+        """
+        try:
+            self.queue.put_nowait((message, writer, None))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def admit(self, message: dict) -> str:
+        """
+        Queues a NEW_TRANSACTION-style message and waits for its verification, which is batched
+        with whatever else arrives at the same time.
+
+        Returns:
+            str: ADMITTED, DUPLICATE, INVALID_SIGNATURE, MALFORMED, POOL_FULL or BUSY.
+        """
+        result = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((message, None, result))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return BUSY
+        return await result
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                statuses = await self.process_batch([(message, writer) for message, writer, _ in batch])
+            except Exception as e:
+                logging.error(f"Transaction batch of {len(batch)} failed verification: {e}")
+                statuses = [e] * len(batch)
+            for (_, _, result), status in zip(batch, statuses):
+                if result is None or result.done():
+                    continue
+                if isinstance(status, Exception):
+                    result.set_exception(status)
+                else:
+                    result.set_result(status)
+
+    async def process_batch(self, batch: list) -> list[str]:
+        """
+        Verifies a batch of (message, writer) pairs and admits the valid transactions.
+
+        Returns:
+            list[str]: The outcome for each pair, in order.
+        """
+        statuses = [DUPLICATE] * len(batch)
+        prepared, items, batch_txids = [], [], set()
+        for position, (message, writer) in enumerate(batch):
+            try:
+                payload = message['payload']
+                tx_dict, signature_hex = payload['transaction_dict'], payload['signature_hex']
+                # Duplicates are dropped here, before any signature work is spent on them.
+                txid = transaction_id(tx_dict)
+                if txid in batch_txids or self.blockchain.mempool.is_known(txid):
+                    continue
+                items.append(self.blockchain.prepare_verification(tx_dict, signature_hex))
+                prepared.append((position, message, writer, tx_dict, signature_hex, txid))
+                batch_txids.add(txid)
+            except (KeyError, ValueError, TypeError) as e:
+                statuses[position] = MALFORMED
+                logging.warning(f"Discarding malformed transaction. Error: {e}")
+
+        if not items:
+            return statuses
+
+        if self.verifier is not None:
+            futures = self.verifier.submit(items)
+            chunk_results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+            results = [ok for chunk in chunk_results for ok in chunk]
+        else:
+            results = dilithium_utils.verify_batch(items)
+
+        admitted = 0
+        for (position, message, writer, tx_dict, signature_hex, txid), is_valid in zip(prepared, results):
+            if not is_valid:
+                statuses[position] = INVALID_SIGNATURE
+                logging.warning(f"Transaction from {tx_dict['sender_address'][:10]}... has an invalid signature. Discarding.")
+                continue
+            try:
+                if not self.blockchain.admit_transaction(tx_dict, signature_hex, txid=txid):
+                    statuses[position] = POOL_FULL
+                    continue
+            except (KeyError, ValueError, TypeError) as e:
+                statuses[position] = MALFORMED
+                logging.warning(f"Discarding malformed transaction. Error: {e}")
+                continue
+            statuses[position] = ADMITTED
+            admitted += 1
+            if self.on_admitted:
+                await self.on_admitted(message, writer, txid)
+        logging.info(f"Verified batch of {len(items)} transactions, admitted {admitted}.")
+        return statuses
+
+class PooledAdmission:
+    """
+    Admission for the multi-process node: NEW_TRANSACTION and TX messages are decoded and
+    verified on a ValidationPool's worker processes, and this process only applies the results.
+
+    Peer frames are submitted as they came off the socket. The pool's sequencer returns the
+    results in arrival order, and one task applies them to the mempool, so admission happens in
+    the same order as with MempoolAdmission and stays on the event loop, where the mempool lives.
+    """
+    def __init__(self, blockchain, workers: int, on_admitted=None, screen=None, **pool_options):
+        """
+        Args:
+            blockchain (Blockchain): The chain whose pending pool receives verified transactions.
+            workers (int): Number of validation processes.
+            on_admitted (coroutine function): Called as on_admitted(message, writer, txid) for every admitted transaction.
+            screen (callable): Called as screen(message type, writer, txid) before a valid transaction is
+                admitted; returning False drops it (e.g. as a duplicate or an unsolicited relay body).
+            pool_options: Passed on to ValidationPool.
+        """
+        self.blockchain = blockchain
+        self.on_admitted = on_admitted
+        self.screen = screen
+        self.pool = ValidationPool(workers, self._on_result, **pool_options)
+        self.results = asyncio.Queue()    # (context, result) in arrival order, waiting to be applied
+        self.dropped = 0    # transaction messages turned away because the pool was full
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self.pool.start()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.pool.stop()
+
+    def backlog(self) -> int:
+        """Transaction messages waiting for verification or to be applied."""
+        return self.pool.backlog + self.results.qsize()
+
+    def submit_frame(self, data: bytes, msg_type: str, writer=None, result: asyncio.Future = None) -> bool:
+        """
+        Queues an encoded NEW_TRANSACTION or TX message, as read from the wire. Never blocks.
+
+        Returns:
+            bool: False if the pool's waiting frames are at their limit and the message was dropped.
+        """
+        if self.pool.submit(data, (msg_type, writer, result)):
+            return True
+        self.dropped += 1
+        return False
+
+    def submit(self, message: dict, writer=None) -> bool:
+        """Queues a NEW_TRANSACTION message for verification. Never blocks."""
+        return self.submit_frame(serialization.encode_message(message), message.get("type"), writer)
+
+    async def admit(self, message: dict) -> str:
+        """
+        Queues a NEW_TRANSACTION-style message and waits for its verification.
+
+        Returns:
+            str: ADMITTED, DUPLICATE, INVALID_SIGNATURE, MALFORMED, POOL_FULL or BUSY.
+        """
+        result = asyncio.get_running_loop().create_future()
+        if not self.submit_frame(serialization.encode_message(message), "NEW_TRANSACTION", None, result):
+            return BUSY
+        return await result
+
+    def _on_result(self, context: tuple, transactions: list | None):
+        self.results.put_nowait((context, transactions))
+
+    async def _run(self):
+        while True:
+            (msg_type, writer, result), transactions = await self.results.get()
+            try:
+                statuses = await self.apply(msg_type, writer, transactions)
+            except Exception as e:
+                logging.error(f"Applying a verified {msg_type} message failed: {e}")
+                statuses = [e]
+            if result is None or result.done():
+                continue
+            status = statuses[0] if statuses else MALFORMED
+            if isinstance(status, Exception):
+                result.set_exception(status)
+            else:
+                result.set_result(status)
+
+    async def apply(self, msg_type: str, writer, transactions: list | None) -> list[str]:
+        """
+        Admits the valid transactions of one verified message.
+
+        Returns:
+            list[str]: The outcome for each transaction of the message, in order.
+        """
+        if transactions is None:
+            logging.warning(f"Discarding an undecodable {msg_type} message.")
+            return [MALFORMED]
+        statuses = []
+        for valid, signed_tx in transactions:
+            if valid is None:
+                statuses.append(MALFORMED)
+                logging.warning("Discarding malformed transaction.")
+                continue
+            if not valid:
+                statuses.append(INVALID_SIGNATURE)
+                logging.warning(f"Transaction from {signed_tx.transaction_dict['sender_address'][:10]}... has an invalid signature. Discarding.")
+                continue
+            txid = signed_tx.txid
+            if (self.screen is not None and not self.screen(msg_type, writer, txid)) or self.blockchain.mempool.is_known(txid):
+                statuses.append(DUPLICATE)
+                continue
+            if not self.blockchain.admit_signed_transaction(signed_tx):
+                statuses.append(POOL_FULL)
+                continue
+            statuses.append(ADMITTED)
+            if self.on_admitted:
+                await self.on_admitted({"type": "NEW_TRANSACTION", "payload": signed_tx}, writer, txid)
+        return statuses
@@ -0,0 +1,517 @@
+# network/api.py
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import resource
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from core.inbox import DEFAULT_PAGE_SIZE
+from core.mempool import transaction_id
+from core.transaction import Transaction
+from crypto import providers
+from network.admission import ADMITTED, DUPLICATE
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8080
+# Largest request line plus headers, and largest request body (bytes).
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 8 * 1024 * 1024
+# Seconds a keep-alive connection may sit idle between requests.
+IDLE_TIMEOUT = 30.0
+# Largest number of calls in one JSON-RPC batch, and of transactions in one submit_transactions call.
+MAX_RPC_BATCH = 1000
+# Largest block range returned by get_blocks; longer ranges are streamed from GET /blocks.
+MAX_RPC_BLOCKS = 100
+# Largest inbox page returned by get_messages.
+MAX_PAGE_SIZE = 500
+# Blocks written per chunk of a GET /blocks stream before waiting for the client to read them.
+STREAM_CHUNK_BLOCKS = 64
+# Content type of the Prometheus text exposition format served at GET /metrics.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# Server-defined errors
+NOT_FOUND = -32004
+TRANSACTION_REJECTED = -32010
+NOT_PRIMARY = -32011
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), '..', 'index.html')
+
+class RpcError(Exception):
+    """An error answered to a JSON-RPC call, with its JSON-RPC error code."""
+
+    def __init__(self, code: int, message: str, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> dict:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+class HttpError(Exception):
+    """A request that is answered with an HTTP error status."""
+
+    def __init__(self, status: int, message: str = None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+class _Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, path: str, query: dict, headers: dict, body: bytes, keep_alive: bool):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+def _encode_json(value) -> bytes:
+    # default=dict turns SignedTransaction (a read-only Mapping) into its dictionary view.
+    return json.dumps(value, separators=(',', ':'), default=dict).encode()
+
+def _int_param(name: str, value, minimum: int = None) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or (minimum is not None and value < minimum):
+        raise RpcError(INVALID_PARAMS, f"'{name}' must be an integer" + (f" >= {minimum}" if minimum is not None else ""))
+    return value
+
+class ApiServer:
+    """
+    HTTP/JSON-RPC front end of a P2PNode, for wallets, explorers and headless deployments.
+
+    Served on plain asyncio streams with keep-alive connections, next to the P2P server in
+    the same event loop:
+
+        POST /rpc       JSON-RPC 2.0 calls, single or batched (see the rpc_* methods)
+        GET  /blocks    ?start=&end=[&headers=1] streams a block range as chunked NDJSON
+        GET  /health    liveness and chain height
+        GET  /          the web UI (index.html)
+
+    Submitted transactions go through the node's MempoolAdmission, so concurrent calls (and
+    the calls of one batch) are signature-checked together with transactions from peers.
+    """
+
+    def __init__(self, node, host: str = DEFAULT_API_HOST, port: int = DEFAULT_API_PORT, max_body_bytes: int = MAX_BODY_BYTES,
+                 idle_timeout: float = IDLE_TIMEOUT):
+        """
+        Args:
+            node (P2PNode): The node whose chain, mempool and indexes are served.
+            host (str): Address to listen on. Keep the default loopback address unless the
+                port is protected otherwise; the API can sign with the node's wallet.
+            port (int): Port to listen on (0 picks a free one).
+            max_body_bytes (int): Largest accepted request body.
+            idle_timeout (float): Seconds before an idle keep-alive connection is closed.
+        """
+        self.node = node
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.idle_timeout = idle_timeout
+        self.server = None
+        self._writers = set()    # open client connections, closed on stop
+        self.methods = {name[len("rpc_"):]: getattr(self, name) for name in dir(self) if name.startswith("rpc_")}
+        self._signatures = {name: inspect.signature(method) for name, method in self.methods.items()}
+        self.stats = {"connections": 0, "requests": 0, "rpc_calls": 0, "rpc_errors": 0, "streamed_blocks": 0}
+        self._rpc_seconds = node.metrics.histogram("api_rpc_call_seconds", "Time spent in a JSON-RPC method.", ("method",))
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        self.stats["connections"] += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._respond(writer, e.status, _encode_json({"error": str(e)}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                self.stats["requests"] += 1
+                await self._route(request, writer)
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.error(f"API connection failed: {e}")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader) -> _Request | None:
+        """Reads one request, or returns None when the client closed the connection."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HttpError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431)
+
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411, "Send a Content-Length instead of a chunked body")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length")
+        if length < 0 or length > self.max_body_bytes:
+            raise HttpError(413)
+        body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return _Request(method.upper(), url.path, query, headers, body, keep_alive)
+
+    async def _respond(self, writer, status: int, body: bytes, content_type: str = "application/json", keep_alive: bool = True):
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _route(self, request: _Request, writer):
+        route = (request.method, request.path)
+        try:
+            if route == ("POST", "/rpc"):
+                response = await self.handle_rpc(request.body)
+                if response is None:
+                    # Only notifications: nothing to answer.
+                    await self._respond(writer, 204, b"", keep_alive=request.keep_alive)
+                else:
+                    await self._respond(writer, 200, _encode_json(response), keep_alive=request.keep_alive)
+            elif route == ("GET", "/blocks"):
+                await self._stream_blocks(request, writer)
+            elif route == ("GET", "/health"):
+                body = {"status": "ok", "height": self.node.blockchain.last_block.index, "peers": len(self.node.peers)}
+                await self._respond(writer, 200, _encode_json(body), keep_alive=request.keep_alive)
+            elif route == ("GET", "/metrics"):
+                body = self.node.metrics_text().encode('utf-8')
+                await self._respond(writer, 200, body, content_type=METRICS_CONTENT_TYPE, keep_alive=request.keep_alive)
+            elif route in (("GET", "/"), ("GET", "/index.html")):
+                with open(INDEX_PATH, 'rb') as f:
+                    page = f.read()
+                await self._respond(writer, 200, page, content_type="text/html; charset=utf-8", keep_alive=request.keep_alive)
+            elif request.path in ("/rpc", "/blocks", "/health", "/metrics", "/"):
+                raise HttpError(405)
+            else:
+                raise HttpError(404)
+        except HttpError as e:
+            await self._respond(writer, e.status, _encode_json({"error": str(e)}), keep_alive=request.keep_alive)
+
+    async def _stream_blocks(self, request: _Request, writer):
+        """
+        Streams blocks [start, end) as one JSON object per line in a chunked response, a
+        chunk at a time, so any range can be read without holding it in memory on either side.
+        """
+        chain = self.node.blockchain.chain
+        try:
+            start = int(request.query.get("start", 0))
+            end = int(request.query.get("end", len(chain)))
+        except ValueError:
+            raise HttpError(400, "'start' and 'end' must be integers")
+        if start < 0 or end < start:
+            raise HttpError(400, "Expected 0 <= start <= end")
+        headers_only = request.query.get("headers", "0").lower() in ("1", "true")
+
+        writer.write((f"HTTP/1.1 200 OK\r\n"
+                      f"Content-Type: application/x-ndjson\r\n"
+                      f"Transfer-Encoding: chunked\r\n"
+                      f"Connection: {'keep-alive' if request.keep_alive else 'close'}\r\n\r\n").encode('latin-1'))
+        height = start
+        while True:
+            # Re-read the length every chunk: the chain may grow (or reorganize) meanwhile.
+            stop = min(end, len(chain), height + STREAM_CHUNK_BLOCKS)
+            if height >= stop:
+                break
+            lines = []
+            for current in range(height, stop):
+                block = chain[current]
+                lines.append(_encode_json(block.header() if headers_only else block.to_dict()))
+            data = b"\n".join(lines) + b"\n"
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            self.stats["streamed_blocks"] += stop - height
+            height = stop
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # --- JSON-RPC ---
+
+    async def handle_rpc(self, body: bytes):
+        """
+        Answers a JSON-RPC 2.0 request body. The calls of a batch run concurrently.
+
+        Returns:
+            dict | list | None: The response(s), or None if every call was a notification.
+        """
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}}
+        if isinstance(request, list):
+            if not request or len(request) > MAX_RPC_BATCH:
+                message = "Empty batch" if not request else f"Batches are limited to {MAX_RPC_BATCH} calls"
+                return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": message}}
+            responses = await asyncio.gather(*(self._call(item) for item in request))
+            return [response for response in responses if response is not None] or None
+        return await self._call(request)
+
+    async def _call(self, request) -> dict | None:
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            request_id = request.get("id") if isinstance(request, dict) else None
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": INVALID_REQUEST, "message": "Invalid Request"}}
+        self.stats["rpc_calls"] += 1
+        started = time.perf_counter()
+        try:
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "result": await self.call(request["method"], request.get("params"))}
+        except RpcError as e:
+            self.stats["rpc_errors"] += 1
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "error": e.to_dict()}
+        except Exception as e:
+            self.stats["rpc_errors"] += 1
+            logging.error(f"RPC method '{request['method']}' failed: {e}")
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": INTERNAL_ERROR, "message": "Internal error"}}
+        if request["method"] in self.methods:
+            self._rpc_seconds.labels(request["method"]).observe(time.perf_counter() - started)
+        # Notifications (no id) get no response.
+        return response if "id" in request else None
+
+    async def call(self, method: str, params=None):
+        """
+        Runs an RPC method with positional (list) or named (dict) params.
+        Raises RpcError for unknown methods and unusable params.
+        """
+        function = self.methods.get(method)
+        if function is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        try:
+            if params is None:
+                bound = self._signatures[method].bind()
+            elif isinstance(params, list):
+                bound = self._signatures[method].bind(*params)
+            elif isinstance(params, dict):
+                bound = self._signatures[method].bind(**params)
+            else:
+                raise TypeError("params must be an array or an object")
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, f"Invalid params: {e}")
+        result = function(*bound.args, **bound.kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+    # --- RPC methods ---
+
+    def rpc_node_status(self) -> dict:
+        node = self.node
+        tip = node.blockchain.last_block
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "address": node.node_wallet.address,
+            "height": tip.index,
+            "tip_hash": tip.hash,
+            "peers": len(node.peers),
+            "delegates": len(node.consensus.all_nodes),
+            "view": node.pbft.view,
+            "pending_transactions": len(node.blockchain.mempool),
+            "crypto": providers.describe(),
+            "api": dict(self.stats),
+            "process": {"cpu_seconds": usage.ru_utime + usage.ru_stime, "peak_rss_mb": usage.ru_maxrss / 1024}
+        }
+
+    async def rpc_submit_transaction(self, transaction_dict: dict, signature_hex: str) -> dict:
+        """Verifies and admits one signed transaction; duplicates are accepted idempotently."""
+        result = (await self._admit([{"transaction_dict": transaction_dict, "signature_hex": signature_hex}]))[0]
+        if result["status"] not in (ADMITTED, DUPLICATE):
+            raise RpcError(TRANSACTION_REJECTED, f"Transaction rejected: {result['status']}", data=result)
+        return result
+
+    async def rpc_submit_transactions(self, transactions: list) -> list[dict]:
+        """Verifies and admits a batch of signed transactions; returns {txid, status} for each, in order."""
+        if not isinstance(transactions, list) or len(transactions) > MAX_RPC_BATCH:
+            raise RpcError(INVALID_PARAMS, f"'transactions' must be a list of at most {MAX_RPC_BATCH} signed transactions")
+        return await self._admit(transactions)
+
+    async def _admit(self, signed_transactions: list) -> list[dict]:
+        admission = self.node.admission
+        statuses = await asyncio.gather(*(admission.admit({"type": "NEW_TRANSACTION", "payload": signed_tx})
+                                          for signed_tx in signed_transactions))
+        results = []
+        for signed_tx, status in zip(signed_transactions, statuses):
+            try:
+                txid = transaction_id(signed_tx["transaction_dict"])
+            except (KeyError, ValueError, TypeError):
+                txid = None
+            results.append({"txid": txid, "status": status})
+        return results
+
+    def _block(self, height: int, headers_only: bool) -> dict:
+        block = self.node.blockchain.chain[height]
+        return block.header() if headers_only else block.to_dict()
+
+    def rpc_get_block(self, height: int = None, block_hash: str = None, headers_only: bool = False) -> dict:
+        """Returns the main-chain block at `height` or with `block_hash`."""
+        blockchain = self.node.blockchain
+        if block_hash is not None:
+            if not isinstance(block_hash, str):
+                raise RpcError(INVALID_PARAMS, "'block_hash' must be a hex string")
+            height = blockchain.height_of(block_hash)
+            if height is None:
+                raise RpcError(NOT_FOUND, f"Unknown block {block_hash}")
+        elif height is None:
+            raise RpcError(INVALID_PARAMS, "Expected 'height' or 'block_hash'")
+        _int_param("height", height, minimum=0)
+        if height >= len(blockchain.chain):
+            raise RpcError(NOT_FOUND, f"No block at height {height}")
+        return self._block(height, headers_only)
+
+    def rpc_get_blocks(self, start: int, end: int = None, headers_only: bool = False) -> list[dict]:
+        """Returns the main-chain blocks [start, end), at most MAX_RPC_BLOCKS of them."""
+        chain_length = len(self.node.blockchain.chain)
+        _int_param("start", start, minimum=0)
+        end = chain_length if end is None else _int_param("end", end, minimum=start)
+        if end - start > MAX_RPC_BLOCKS:
+            raise RpcError(INVALID_PARAMS, f"Ranges are limited to {MAX_RPC_BLOCKS} blocks; stream longer ones from GET /blocks")
+        return [self._block(height, headers_only) for height in range(start, min(end, chain_length))]
+
+    def rpc_get_tx_proof(self, height: int, tx_index: int) -> dict:
+        """Returns a transaction with its block header and Merkle inclusion proof."""
+        proof = self.node.build_tx_proof({"height": height, "tx_index": tx_index})
+        if "error" in proof:
+            raise RpcError(NOT_FOUND, proof["error"])
+        return proof
+
+    def rpc_get_messages(self, limit: int = DEFAULT_PAGE_SIZE, before: list = None) -> dict:
+        """
+        Returns one page of the node wallet's inbox, newest first. Pass the returned
+        next_cursor as `before` for the next page; it is null after the oldest message.
+        """
+        _int_param("limit", limit, minimum=1)
+        if before is not None and (not isinstance(before, list) or len(before) != 2 or not all(isinstance(part, int) for part in before)):
+            raise RpcError(INVALID_PARAMS, "'before' must be a cursor [height, tx_index]")
+        node = self.node
+        messages, cursor = node.inbox.page(node.blockchain, node.node_wallet, limit=min(limit, MAX_PAGE_SIZE), before=before)
+        return {
+            "messages": [{**message, "sender_name": node.ledger.get_user_for_address(message["sender_address"])} for message in messages],
+            "next_cursor": list(cursor) if cursor is not None else None
+        }
+
+    def rpc_get_user(self, username: str) -> dict:
+        """Returns a registered user's address and encryption key."""
+        keys = self.node.ledger.get_keys_for_user(username)
+        if keys is None:
+            raise RpcError(NOT_FOUND, f"Unknown user '{username}'")
+        return {"username": username, **keys}
+
+    def rpc_get_user_by_address(self, address: str) -> dict:
+        username = self.node.ledger.get_user_for_address(address)
+        if username is None:
+            raise RpcError(NOT_FOUND, f"No user registered for {address}")
+        return self.rpc_get_user(username)
+
+    def rpc_list_users(self) -> list[str]:
+        return self.node.ledger.list_users()
+
+    def rpc_mempool_stats(self) -> dict:
+        node = self.node
+        return {
+            **node.blockchain.mempool.stats(),
+            "admission_queue": node.admission.backlog(),
+            "admission_dropped": node.admission.dropped,
+            "block_production": node.producer.stats()
+        }
+
+    def rpc_profiler_start(self, interval_ms: float = None) -> dict:
+        """Starts sampling the event loop's stack; profiler_stop returns where it spent its time."""
+        if interval_ms is not None and (not isinstance(interval_ms, (int, float)) or interval_ms <= 0):
+            raise RpcError(INVALID_PARAMS, "'interval_ms' must be a positive number")
+        profiler = self.node.profiler
+        if not profiler.running:
+            profiler.start(interval=interval_ms / 1000 if interval_ms else None)
+        return profiler.report(limit=0)
+
+    def rpc_profiler_stop(self, limit: int = 20, collapsed: bool = False) -> dict:
+        """
+        Stops the profiler and returns the functions with the most samples; with `collapsed`,
+        also the raw stacks in the format flame graph tools read.
+        """
+        if not isinstance(limit, int) or limit < 0:
+            raise RpcError(INVALID_PARAMS, "'limit' must be a non-negative integer")
+        self.node.profiler.stop()
+        report = self.node.profiler.report(limit=limit)
+        if collapsed:
+            report["collapsed"] = self.node.profiler.collapsed()
+        return report
+
+    # Signed with the node's own wallet, for the web UI and operators.
+
+    async def _submit_own(self, transaction: Transaction) -> dict:
+        tx_dict = transaction.to_dict()
+        signature_hex = self.node.node_wallet.sign_transaction(tx_dict).hex()
+        return await self.rpc_submit_transaction(tx_dict, signature_hex)
+
+    async def rpc_register_key(self, username: str) -> dict:
+        """Registers `username` for the node's wallet."""
+        if not isinstance(username, str) or not username:
+            raise RpcError(INVALID_PARAMS, "'username' must be a non-empty string")
+        return await self._submit_own(Transaction(sender_wallet=self.node.node_wallet, message="", tx_type="key_registration", username=username))
+
+    async def rpc_send_message(self, recipient: str, message: str) -> dict:
+        """Sends an encrypted message from the node's wallet to a registered user."""
+        recipient_keys = self.node.ledger.get_keys_for_user(recipient)
+        if recipient_keys is None:
+            raise RpcError(NOT_FOUND, f"Unknown user '{recipient}'")
+        if not isinstance(message, str):
+            raise RpcError(INVALID_PARAMS, "'message' must be a string")
+        return await self._submit_own(Transaction(sender_wallet=self.node.node_wallet, message=message, recipient_public_keys_hex=recipient_keys))
+
+    async def rpc_mine(self) -> dict:
+        """Cuts a block from the pending transactions now, if this node is the next primary."""
+        node = self.node
+        block = await node.producer.produce(force=True)
+        if block is None:
+            primary = node.pbft.next_proposer()
+            raise RpcError(NOT_PRIMARY, "Cannot propose now", data={"next_primary": primary, "view": node.pbft.view,
+                                                                             "pending_transactions": len(node.blockchain.mempool)})
+        return {"proposed": block.index, "hash": block.hash, "transactions": len(block.transactions)}
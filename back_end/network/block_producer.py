@@ -0,0 +1,166 @@
+# network/block_producer.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from consensus.pbft import DEFAULT_MAX_BLOCK_TXS
+
+# Largest total encoded size (bytes) of the transactions in one block.
+DEFAULT_MAX_BLOCK_BYTES = 1024 * 1024
+# Seconds after the last block before a partly filled block is cut.
+DEFAULT_BLOCK_INTERVAL = 2.0
+# Longest sleep (seconds) between checks when nothing wakes the producer earlier.
+PRODUCER_TICK = 0.05
+# Samples kept for the fill ratio and inclusion latency metrics.
+FILL_SAMPLES = 1000
+INCLUSION_SAMPLES = 10_000
+
+# Why a block was cut
+CUT_COUNT = "count"          # max_block_txs transactions were pending
+CUT_SIZE = "size"            # max_block_bytes of transactions were pending
+CUT_INTERVAL = "interval"    # block_interval passed with a partly filled block
+CUT_MANUAL = "manual"        # requested by the operator
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+class BlockProducer:
+    """
+    Cuts blocks from the mempool in the background and proposes them to the delegates.
+
+    Only the delegate that is primary for the next height proposes. It cuts a block as soon as
+    a full block's worth of transactions is pending (by count or by size), or when
+    `block_interval` has passed since the last block and anything is pending. Transactions
+    already in a proposed block that is not committed yet are left out, so with a backlog the
+    PBFT pipeline fills with full blocks back to back.
+
+    Every node measures how full the blocks it produced were and, for the blocks the delegates
+    commit, how long their transactions waited in its mempool.
+    """
+
+    def __init__(self, engine, mempool, max_block_txs: int = DEFAULT_MAX_BLOCK_TXS, max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+                 block_interval: float = DEFAULT_BLOCK_INTERVAL, clock=time.time):
+        """
+        Args:
+            engine (PBFTEngine): Knows the next primary and runs the vote on each proposal.
+            mempool (Mempool): The pending transactions blocks are cut from.
+            max_block_txs (int): Largest number of transactions in a block.
+            max_block_bytes (int): Largest total encoded size of the transactions in a block.
+            block_interval (float): Target seconds between blocks when there is no backlog.
+            clock (callable): Unix time source, comparable with the mempool's entry times.
+        """
+        self.engine = engine
+        self.mempool = mempool
+        self.max_block_txs = max_block_txs
+        self.max_block_bytes = max_block_bytes
+        self.block_interval = block_interval
+        self.clock = clock
+        self._last_block_at = clock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.cuts = {CUT_COUNT: 0, CUT_SIZE: 0, CUT_INTERVAL: 0, CUT_MANUAL: 0}
+        self.fill_ratios = deque(maxlen=FILL_SAMPLES)
+        self.inclusion_latencies = deque(maxlen=INCLUSION_SAMPLES)
+        self.committed_transactions = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Wakes the producer, e.g. after transactions entered the mempool or a block committed."""
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=PRODUCER_TICK)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                # Keep cutting while full blocks are pending and the pipeline has room.
+                while await self.produce():
+                    pass
+            except Exception as e:
+                logging.error(f"Block production failed: {e}")
+
+    def _cut_reason(self, in_flight: set) -> str | None:
+        count, size = self.mempool.pending_totals(exclude=in_flight)
+        if count == 0:
+            return None
+        if count >= self.max_block_txs:
+            return CUT_COUNT
+        if size >= self.max_block_bytes:
+            return CUT_SIZE
+        if self.clock() - self._last_block_at >= self.block_interval:
+            return CUT_INTERVAL
+        return None
+
+    async def produce(self, force: bool = False):
+        """
+        Cuts and proposes a block if this node is the next primary and a cut is due.
+
+        Args:
+            force (bool): Cut whatever is pending now, without waiting for a full block or the interval.
+
+        Returns:
+            Block: The proposed block, or None if none was due or it could not be proposed.
+        """
+        engine = self.engine
+        if engine.next_proposer() != engine.address:
+            return None
+        in_flight = engine.in_flight_txids()
+        reason = self._cut_reason(in_flight)
+        if force and reason is None and self.mempool.pending_totals(exclude=in_flight)[0]:
+            reason = CUT_MANUAL
+        if reason is None:
+            return None
+
+        transactions = self.mempool.block_template(max_bytes=self.max_block_bytes, max_count=self.max_block_txs, exclude=in_flight)
+        block = await engine.propose(transactions)
+        if block is None:
+            return None
+        tx_bytes = sum(signed_tx.size for signed_tx in transactions)
+        self.fill_ratios.append(max(len(transactions) / self.max_block_txs, tx_bytes / self.max_block_bytes))
+        self.cuts[reason] += 1
+        self._last_block_at = self.clock()
+        logging.info(f"Cut block #{block.index} ({reason}): {len(transactions)} txs, {tx_bytes} bytes.")
+        return block
+
+    def on_block_committed(self, block):
+        """
+        Records how long the block's transactions waited in this node's mempool. Must be
+        called before the block's transactions are removed from the mempool.
+        """
+        now = self.clock()
+        for signed_tx in block.transactions:
+            added_at = self.mempool.added_at(signed_tx.txid)
+            if added_at is not None:
+                self.inclusion_latencies.append(now - added_at)
+        self.committed_transactions += len(block.transactions)
+        self._last_block_at = now
+        self.notify()
+
+    def stats(self) -> dict:
+        fill = self.fill_ratios
+        return {
+            "blocks_cut": sum(self.cuts.values()),
+            "cuts": dict(self.cuts),
+            "fill_ratio_avg": sum(fill) / len(fill) if fill else 0.0,
+            "fill_ratio_last": fill[-1] if fill else 0.0,
+            "committed_transactions": self.committed_transactions,
+            "inclusion_p50_ms": _percentile(self.inclusion_latencies, 0.5) * 1000,
+            "inclusion_p95_ms": _percentile(self.inclusion_latencies, 0.95) * 1000,
+            "limits": {"max_block_txs": self.max_block_txs, "max_block_bytes": self.max_block_bytes, "block_interval": self.block_interval}
+        }
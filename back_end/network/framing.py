@@ -0,0 +1,203 @@
+# network/framing.py
+
+"""
+Wire framing for P2P messages.
+
+A frame is a 4-byte big-endian header followed by an encoded message. The low 31 bits of
+the header hold the payload length; the high bit marks a zlib-compressed payload. Peers
+that never negotiated compression in their HANDSHAKE are never sent compressed frames, so
+for them the format is unchanged.
+
+Frames are built in one buffer (header, then the message encoded after it), checked
+against a global and a per-message-type size limit before they are decoded, and handed to
+the decoder as memoryviews. Large frames are decompressed and decoded on a thread, so one
+big BLOCKS message does not stall every other connection's reads.
+"""
+
+import struct
+import zlib
+from core import serialization
+
+HEADER_SIZE = 4
+COMPRESSED_FLAG = 0x8000_0000
+LENGTH_MASK = 0x7FFF_FFFF
+_HEADER = struct.Struct('>I')
+
+# Compression codecs a node can offer in its HANDSHAKE.
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_CODECS = (COMPRESSION_ZLIB,)
+# zlib level: large frames are mostly signatures and ciphertexts, which do not compress, plus
+# repeated public keys, which level 1 already finds. Higher levels cost time for nothing.
+ZLIB_LEVEL = 1
+# A compressed frame is only sent if it is at most this fraction of the plain one.
+MIN_COMPRESSION_GAIN = 0.9
+
+# Frames of at least this many bytes are compressed for peers that accept it.
+DEFAULT_COMPRESS_THRESHOLD = 64 * 1024
+# Frames of at least this many bytes are compressed, decompressed and decoded on a thread.
+DEFAULT_OFFLOAD_THRESHOLD = 256 * 1024
+
+# No frame may be larger than this, compressed or not, whatever its type.
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Limit for message types without their own entry.
+DEFAULT_MAX_MESSAGE_BYTES = 1024 * 1024
+# Room for the envelope, header, signatures and certificates around a block's transactions.
+BLOCK_OVERHEAD_BYTES = 1024 * 1024
+
+class FrameError(ValueError):
+    """Raised when a frame is too large for its type or its payload cannot be decompressed."""
+
+def message_limits(max_block_bytes: int, blocks_per_request: int, pipeline_depth: int) -> dict:
+    """
+    Largest accepted (decompressed) size per message type. The limits of the types that carry
+    blocks follow the node's block size limit, so nodes of one network should share it.
+
+    Args:
+        max_block_bytes (int): Largest total size of a block's transactions.
+        blocks_per_request (int): Blocks in one BLOCKS response.
+        pipeline_depth (int): PBFT heights in flight; a NEW_VIEW may carry a block for each.
+
+    Returns:
+        dict: message type -> bytes, each at most MAX_FRAME_BYTES.
+    """
+    block = max_block_bytes + BLOCK_OVERHEAD_BYTES
+    limits = {
+        "HANDSHAKE": 64 * 1024,
+        "STATUS": 64 * 1024,
+        "GET_HEADERS": 64 * 1024,
+        "GET_BLOCKS": 64 * 1024,
+        "GET_TX_PROOF": 64 * 1024,
+        "TX_PROOF": DEFAULT_MAX_MESSAGE_BYTES,
+        "INV": DEFAULT_MAX_MESSAGE_BYTES,
+        "GETDATA": DEFAULT_MAX_MESSAGE_BYTES,
+        "GET_BLOCK_TXN": DEFAULT_MAX_MESSAGE_BYTES,
+        "NEW_TRANSACTION": DEFAULT_MAX_MESSAGE_BYTES,
+        "HEADERS": 4 * 1024 * 1024,
+        "TX": MAX_FRAME_BYTES,
+        "NEW_BLOCK": block,
+        "CMPCT_BLOCK": block,
+        "BLOCK_TXN": block,
+        "PBFT": block * (pipeline_depth + 1),
+        "BLOCKS": block * blocks_per_request,
+    }
+    return {msg_type: min(limit, MAX_FRAME_BYTES) for msg_type, limit in limits.items()}
+
+# --- Writing ---
+
+def frame(payload: bytes) -> bytes:
+    """Prefixes an already encoded message with its uncompressed frame header."""
+    return _HEADER.pack(len(payload)) + payload
+
+def encode_frame(message: dict) -> bytearray:
+    """
+    Encodes a message straight into a frame: the header is reserved, the message is encoded
+    after it and the length filled in, so no second buffer is built to prepend the header.
+    """
+    out = bytearray(HEADER_SIZE)
+    serialization.encode_value_into(out, message)
+    size = len(out) - HEADER_SIZE
+    if size > LENGTH_MASK:
+        raise FrameError(f"Message of {size} bytes does not fit into a frame.")
+    _HEADER.pack_into(out, 0, size)
+    return out
+
+def compress_frame(data) -> bytes | None:
+    """
+    Returns the compressed version of an uncompressed frame, or None if compression does not
+    make it meaningfully smaller. zlib releases the GIL, so this can run on a thread.
+    """
+    payload = memoryview(data)[HEADER_SIZE:]
+    compressed = zlib.compress(payload, ZLIB_LEVEL)
+    if len(compressed) > len(payload) * MIN_COMPRESSION_GAIN:
+        return None
+    return _HEADER.pack(len(compressed) | COMPRESSED_FLAG) + compressed
+
+class OutboundFrame:
+    """
+    One message framed for sending, with its compressed variant made at most once, the first
+    time a peer that accepts compression needs it. broadcast() shares one between all peers.
+    """
+    __slots__ = ("plain", "_compressed", "_compress_tried")
+
+    def __init__(self, plain):
+        self.plain = plain
+        self._compressed = None
+        self._compress_tried = False
+
+    def needs_compression(self, threshold: int) -> bool:
+        return not self._compress_tried and len(self.plain) >= threshold
+
+    def set_compressed(self, compressed: bytes | None):
+        self._compressed = compressed
+        self._compress_tried = True
+
+    def for_peer(self, compression: str | None, threshold: int):
+        """The bytes to send to a peer that negotiated `compression` (None: plain frames only)."""
+        if compression is None or len(self.plain) < threshold:
+            return self.plain
+        if not self._compress_tried:
+            self.set_compressed(compress_frame(self.plain))
+        return self._compressed or self.plain
+
+# --- Reading ---
+
+async def read_frame(reader) -> tuple[bytes, bool]:
+    """
+    Reads one frame from a StreamReader.
+
+    Returns:
+        tuple: (payload as received, whether it is compressed).
+
+    Raises:
+        FrameError: If the header announces more than MAX_FRAME_BYTES; nothing of the
+            payload is read then.
+        asyncio.IncompleteReadError: If the connection closes mid-frame.
+    """
+    header = _HEADER.unpack(await reader.readexactly(HEADER_SIZE))[0]
+    size = header & LENGTH_MASK
+    if size > MAX_FRAME_BYTES:
+        raise FrameError(f"Frame of {size} bytes exceeds the {MAX_FRAME_BYTES} byte limit.")
+    return await reader.readexactly(size), bool(header & COMPRESSED_FLAG)
+
+def decompress(data) -> bytes:
+    """Inflates a compressed payload, refusing to produce more than MAX_FRAME_BYTES."""
+    inflater = zlib.decompressobj()
+    try:
+        payload = inflater.decompress(data, MAX_FRAME_BYTES)
+    except zlib.error as e:
+        raise FrameError(f"Compressed frame does not inflate: {e}") from e
+    if inflater.unconsumed_tail or not inflater.eof:
+        raise FrameError(f"Compressed frame is truncated or inflates beyond {MAX_FRAME_BYTES} bytes.")
+    return payload
+
+def open_frame(data, compressed: bool, limits: dict) -> tuple[str | None, memoryview]:
+    """
+    Decompresses a frame's payload if needed and checks it against its type's size limit,
+    reading only the envelope's type.
+
+    Returns:
+        tuple: (message type, payload as a memoryview, ready for serialization.decode_message).
+
+    Raises:
+        FrameError: If the payload does not inflate or is larger than its type allows.
+        SerializationError: If the envelope is malformed.
+    """
+    payload = memoryview(decompress(data) if compressed else data)
+    msg_type = serialization.message_type(payload)
+    limit = limits.get(msg_type, DEFAULT_MAX_MESSAGE_BYTES)
+    if len(payload) > limit:
+        raise FrameError(f"{msg_type} message of {len(payload)} bytes exceeds its {limit} byte limit.")
+    return msg_type, payload
+
+def read_message(data, compressed: bool, limits: dict, undecoded_types=frozenset()) -> tuple[str | None, memoryview, dict | None]:
+    """
+    open_frame() followed by decoding the message, unless its type is in `undecoded_types`
+    (messages passed on as bytes). Runs on a thread for large frames.
+
+    Returns:
+        tuple: (message type, payload, decoded message or None).
+    """
+    msg_type, payload = open_frame(data, compressed, limits)
+    if msg_type in undecoded_types:
+        return msg_type, payload, None
+    return msg_type, payload, serialization.decode_message(payload)
@@ -5,9 +5,12 @@ import json
 import uuid
 import logging
 import argparse
+import getpass
 import sys
 import os
+import signal
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # --- Add project root to the path for imports ---
@@ -20,40 +23,190 @@ sys.path.append(parent_dir)
 from core.block import Block
 from core.blockchain import Blockchain
 from core.wallet import Wallet
+from core.keystore import load_or_create_wallet, KeystoreError
 from core.public_ledger import PublicKeyLedger
+from core.inbox import Inbox
+from core.mempool import Mempool, DEFAULT_MAX_COUNT, DEFAULT_MAX_BYTES
+from core.block_tree import ORPHAN
 from consensus.dpol import DPoLConsensus
+from consensus.pbft import PBFTEngine, DEFAULT_MAX_BLOCK_TXS
 from core.transaction import Transaction
+from core import serialization
+from core.validation import ChainValidator
+from crypto import providers
+from crypto.dilithium_utils import BatchVerifier
+from network.admission import MempoolAdmission, PooledAdmission
+from network.sync import ChainSync
+from network.seen_cache import SeenCache, message_key, transaction_key
+from network.relay import InventoryRelay
+from network.block_producer import BlockProducer, DEFAULT_MAX_BLOCK_BYTES, DEFAULT_BLOCK_INTERVAL
+from network.api import ApiServer, DEFAULT_API_HOST
+from core.mempool import transaction_id
+from utils.metrics import MetricsRegistry, LoopLagMonitor, REGISTRY
+from utils.profiler import SamplingProfiler
+from network.validation_pool import ROUTED_MESSAGE_TYPES
+from network import framing
+from network.peer import Peer, DEFAULT_MAX_QUEUED_FRAMES, DEFAULT_MAX_QUEUED_BYTES, OVERFLOW_DROP, OVERFLOW_POLICIES
 
 # --- Basic Logging Setup ---
 # Configures a logger to print timestamped informational messages to the console.
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Request/response messages exchanged with a single peer. They are never relayed,
+# so they skip the broadcast-loop check.
+DIRECT_MESSAGE_TYPES = {"STATUS", "GET_HEADERS", "HEADERS", "GET_BLOCKS", "BLOCKS", "GET_TX_PROOF", "TX_PROOF",
+                        "INV", "GETDATA", "TX", "CMPCT_BLOCK", "GET_BLOCK_TXN", "BLOCK_TXN"}
+# Gossip whose key only identifies part of its content (a transaction's id does not cover its
+# signature). Their keys are recorded once the content was verified, so an invalid copy cannot
+# hide the valid one; before that, they are only checked against the cache.
+VERIFIED_GOSSIP_TYPES = {"NEW_TRANSACTION"}
+# Message types with their own metrics series; anything else is recorded as "other".
+MESSAGE_TYPES = DIRECT_MESSAGE_TYPES | {"HANDSHAKE", "NEW_TRANSACTION", "NEW_BLOCK", "PBFT"}
+# Seconds between checks for timed-out sync requests.
+SYNC_TICK_INTERVAL = 1.0
+# Environment variable holding the passphrase of the node's keystore.
+WALLET_PASSPHRASE_ENV = "NODE_WALLET_PASSPHRASE"
+
+class _MessageMetrics:
+    """The series one message type updates; bundled so handling a message costs one lookup."""
+    __slots__ = ("received", "received_bytes", "seconds")
+
+    def __init__(self, received, received_bytes, seconds):
+        self.received = received
+        self.received_bytes = received_bytes
+        self.seconds = seconds
+
+    def observe(self, elapsed: float, size: int):
+        self.received.value += 1
+        self.received_bytes.value += size
+        self.seconds.observe(elapsed)
+
 class P2PNode:
     """
     Manages all peer-to-peer network operations for a single blockchain node.
     """
-    def __init__(self, host: str, port: int, node_wallet: Wallet, blockchain: Blockchain, consensus: DPoLConsensus, ledger: PublicKeyLedger):
+    def __init__(self, host: str, port: int, node_wallet: Wallet, blockchain: Blockchain, consensus: DPoLConsensus, ledger: PublicKeyLedger, verifier: BatchVerifier = None, inbox: Inbox = None,
+                 peer_queue_frames: int = DEFAULT_MAX_QUEUED_FRAMES, peer_queue_bytes: int = DEFAULT_MAX_QUEUED_BYTES, peer_overflow: str = OVERFLOW_DROP,
+                 block_max_txs: int = DEFAULT_MAX_BLOCK_TXS, block_max_bytes: int = DEFAULT_MAX_BLOCK_BYTES, block_interval: float = DEFAULT_BLOCK_INTERVAL,
+                 validation_workers: int = 0, compression: str = framing.COMPRESSION_ZLIB,
+                 compress_threshold: int = framing.DEFAULT_COMPRESS_THRESHOLD, offload_threshold: int = framing.DEFAULT_OFFLOAD_THRESHOLD,
+                 require_certificates: bool = False):
         self.host = host
         self.port = port
         self.node_wallet = node_wallet
         self.blockchain = blockchain
         self.consensus = consensus
         self.ledger = ledger
+        # Recipient -> message index, so reading messages does not scan the chain
+        self.inbox = inbox if inbox is not None else Inbox()
         
-        # --- UPDATED: The dictionary now maps peer_addr -> (reader, writer, address_string) ---
+        # peer_addr -> Peer. Every peer has its own bounded outbound queue and writer task.
         self.peers = {}
+        self.peer_queue_frames = peer_queue_frames
+        self.peer_queue_bytes = peer_queue_bytes
+        self.peer_overflow = peer_overflow
+        # Outbound counters of peers that have since disconnected
+        self.outbound_totals = {"frames_sent": 0, "bytes_sent": 0, "frames_dropped": 0, "overflow_disconnects": 0}
         
         self.server = None
-        self.seen_messages = set()
+        # Set once the P2P server accepts connections.
+        self.listening = asyncio.Event()
+        # Content keys of recently relayed messages, bounded in size and age
+        self.seen_messages = SeenCache()
+
+        # Incoming transactions are verified in batches on the verifier's worker processes.
+        # Without a verifier the batches are checked on the event loop. With validation workers,
+        # transaction messages are not even decoded here: their frames go to the workers as received.
+        self.validation_workers = validation_workers
+        if validation_workers:
+            self.admission = PooledAdmission(blockchain, validation_workers, on_admitted=self._relay_admitted_transaction,
+                                             screen=self._screen_transaction)
+        else:
+            self.admission = MempoolAdmission(blockchain, verifier, on_admitted=self._relay_admitted_transaction)
+
+        # Headers-first chain sync state.
+        self.sync = ChainSync(self)
+        # Transactions are announced by id (INV/GETDATA) and blocks relayed as compact blocks.
+        self.relay = InventoryRelay(self)
+        # Delegates agree on every new block with PBFT; its signed votes travel as "PBFT" gossip.
+        self.pbft = PBFTEngine(node_wallet, blockchain, consensus, broadcast=self._broadcast_consensus, on_commit=self.commit_block,
+                               max_block_txs=block_max_txs)
+        # When this node is the next primary, blocks are cut by size, count or interval and proposed.
+        self.producer = BlockProducer(self.pbft, blockchain.mempool, max_block_txs=block_max_txs, max_block_bytes=block_max_bytes,
+                                      block_interval=block_interval)
+        # Optionally, blocks from peers (relayed or synced) are only accepted with a valid PBFT commit
+        # certificate, and become final with it. Certificates are checked against the committee this
+        # node elects from its own peer set, so this is only sound in a fully meshed cluster whose
+        # nodes all see the same committee; joining nodes and partial meshes must leave it off.
+        self.require_certificates = require_certificates
+        self._sync_timer = None
+
+        # Wire framing: the codec offered in HANDSHAKE (None for plain frames only), the frame size from
+        # which frames are compressed for peers that accepted it, the one from which frames are
+        # (de)compressed and decoded on a thread, and the largest accepted size of every message type.
+        if compression is not None and compression not in framing.COMPRESSION_CODECS:
+            raise ValueError(f"Unknown compression '{compression}', expected one of {framing.COMPRESSION_CODECS}.")
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.offload_threshold = offload_threshold
+        self.message_limits = framing.message_limits(block_max_bytes, self.sync.blocks_per_request, self.pbft.pipeline_depth)
+        # One thread for all offloaded frames: decoding holds the GIL, so more threads would only
+        # compete with the event loop, and a single queue keeps every connection's frames in order.
+        self._frame_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-codec")
+
+        # Counters and gauges served as Prometheus text (GET /metrics on the API, "metrics" in the console).
+        self.metrics = MetricsRegistry()
+        self._init_metrics()
+        self.loop_lag = LoopLagMonitor(self.metrics.histogram("node_event_loop_lag_seconds", "How late the event loop ran a timer."),
+                                       self.metrics.gauge("node_event_loop_lag_last_seconds", "The latest event loop lag sample."))
+        # Started on demand to find where the event loop spends its time.
+        self.profiler = SamplingProfiler()
+
+    def _init_metrics(self):
+        self._messages_received = self.metrics.counter("node_messages_received_total", "Messages received from peers.", ("type",))
+        self._message_bytes = self.metrics.counter("node_message_bytes_received_total", "Encoded size of the messages received from peers.", ("type",))
+        self._message_seconds = self.metrics.histogram("node_message_handle_seconds", "Time spent handling a message from a peer.", ("type",))
+        self._message_metrics = {}    # message type -> _MessageMetrics, created on first use
+        self._duplicate_messages = self.metrics.counter("node_messages_duplicate_total", "Gossip messages dropped because they were seen before.")
+        self._compressed_frames = self.metrics.counter("node_frames_compressed_received_total", "Compressed frames received from peers.")
+        self._offloaded_frames = self.metrics.counter("node_frames_offloaded_total", "Received frames decompressed and decoded on a thread.")
+
+        gauges = [
+            ("node_chain_height", "Height of the chain tip.", lambda: len(self.blockchain.chain) - 1),
+            ("node_mempool_transactions", "Transactions in the mempool.", lambda: len(self.blockchain.mempool)),
+            ("node_mempool_bytes", "Encoded size of the mempool's transactions.", lambda: self.blockchain.mempool.total_bytes),
+            ("node_peers", "Connected peers.", lambda: len(self.peers)),
+            ("node_peer_queued_frames", "Frames waiting in the peers' outbound queues.", lambda: sum(peer.queued_frames for peer in self.peers.values())),
+            ("node_peer_queued_bytes", "Bytes waiting in the peers' outbound queues.", lambda: sum(peer.queued_bytes for peer in self.peers.values())),
+            ("node_admission_queue", "Transactions waiting for signature verification.", lambda: self.admission.backlog()),
+            ("node_admission_dropped", "Transactions dropped because the admission queue was full.", lambda: self.admission.dropped),
+            ("node_seen_messages", "Entries in the gossip deduplication cache.", lambda: len(self.seen_messages)),
+            ("node_pbft_view", "Current PBFT view.", lambda: self.pbft.view),
+        ]
+        for name, help_text, function in gauges:
+            self.metrics.gauge(name, help_text, function=function)
+
+    def metrics_text(self) -> str:
+        """The node's metrics and the process-wide ones (crypto timings) in the Prometheus text format."""
+        return self.metrics.render() + REGISTRY.render()
 
     def create_message(self, msg_type: str, payload: dict = None) -> dict:
         return {"id": str(uuid.uuid4()), "type": msg_type, "payload": payload or {}}
 
     async def start(self):
         try:
+            self.admission.start()
+            self.loop_lag.start()
+            self._sync_timer = asyncio.create_task(self._run_sync_timer())
+            self.relay.start()
+            self.pbft.start()
+            self.producer.start()
             self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+            self.listening.set()
             logging.info(f"Node listening on {self.host}:{self.port}")
             logging.info(f"Node address: {self.node_wallet.address}")
+            crypto = providers.describe()
+            logging.info(f"Crypto: {crypto['signature_algorithm']}/{crypto['kem_algorithm']} from the {crypto['provider']} provider.")
             await self.server.serve_forever()
         except Exception as e:
             logging.error(f"Error starting node: {e}")
@@ -61,196 +214,463 @@ class P2PNode:
             await self.stop()
 
     async def stop(self):
+        if self._sync_timer:
+            self._sync_timer.cancel()
+        await self.admission.stop()
+        await self.loop_lag.stop()
+        if self.profiler.running:
+            self.profiler.stop()
+        await self.relay.stop()
+        await self.producer.stop()
+        await self.pbft.stop()
         if self.server:
             self.server.close()
             await self.server.wait_closed()
-        for addr, (reader, writer, _) in self.peers.items():
-            writer.close()
-            await writer.wait_closed()
-        self.peers.clear()
+        for peer_addr in list(self.peers):
+            await self._remove_peer(peer_addr)
+        self._frame_executor.shutdown(wait=False, cancel_futures=True)
 
     async def connect_to_peer(self, peer_host: str, peer_port: int):
         try:
             reader, writer = await asyncio.open_connection(peer_host, peer_port)
             peer_addr = writer.get_extra_info('peername')
-            self.peers[peer_addr] = (reader, writer, None)
+            peer = self._add_peer(peer_addr, reader, writer)
             logging.info(f"Successfully connected to peer {peer_addr}")
-            handshake_msg = self.create_message("HANDSHAKE", {"address": self.node_wallet.address})
-            await self.send_message(writer, handshake_msg)
-            get_chain_msg = self.create_message("GET_CHAIN")
-            await self.send_message(writer, get_chain_msg)
+            await self.send_message(writer, self.handshake_message())
+            peer.handshake_sent = True
+            status_msg = self.create_message("STATUS", self.sync.status_payload())
+            await self.send_message(writer, status_msg)
             asyncio.create_task(self.handle_connection(reader, writer))
         except Exception as e:
             logging.error(f"Failed to connect to {peer_host}:{peer_port}: {e}")
 
+    def _add_peer(self, peer_addr, reader, writer) -> Peer:
+        peer = Peer(peer_addr, reader, writer, max_frames=self.peer_queue_frames, max_bytes=self.peer_queue_bytes, overflow=self.peer_overflow)
+        self.peers[peer_addr] = peer
+        peer.start()
+        return peer
+
+    async def _remove_peer(self, peer_addr):
+        peer = self.peers.pop(peer_addr, None)
+        if peer is None:
+            return
+        await peer.close()
+        self.outbound_totals["frames_sent"] += peer.frames_sent
+        self.outbound_totals["bytes_sent"] += peer.bytes_sent
+        self.outbound_totals["frames_dropped"] += peer.frames_dropped
+        self.outbound_totals["overflow_disconnects"] += int(peer.overflowed)
+
+    def outbound_stats(self) -> dict:
+        """Outbound traffic and backpressure counters, over current and past peers."""
+        stats = dict(self.outbound_totals)
+        for peer in self.peers.values():
+            stats["frames_sent"] += peer.frames_sent
+            stats["bytes_sent"] += peer.bytes_sent
+            stats["frames_dropped"] += peer.frames_dropped
+            stats["overflow_disconnects"] += int(peer.overflowed)
+        stats["queued_frames"] = sum(peer.queued_frames for peer in self.peers.values())
+        stats["queued_bytes"] = sum(peer.queued_bytes for peer in self.peers.values())
+        stats["peers"] = len(self.peers)
+        return stats
+
     # --- UPDATED: This now works with address strings ---
     def update_consensus_nodes(self):
         """Updates the consensus algorithm with the current list of known peer addresses."""
-        peer_addresses = [addr_str for _, _, addr_str in self.peers.values() if addr_str]
+        peer_addresses = [peer.address for peer in self.peers.values() if peer.address]
         all_addresses = peer_addresses + [self.node_wallet.address]
-        self.consensus.all_nodes = list(set(all_addresses)) # Ensure uniqueness
-        logging.info(f"Consensus nodes updated. Total unique nodes: {len(self.consensus.all_nodes)}")
+        added, removed = self.consensus.set_nodes(all_addresses) # Only joined or departed nodes cost work
+        if added or removed:
+            self.pbft.membership_changed()
+        logging.info(f"Consensus nodes updated (+{added}/-{removed}). Total unique nodes: {len(self.consensus.all_nodes)}")
 
     async def handle_connection(self, reader, writer):
         peer_addr = writer.get_extra_info('peername')
         try:
-            self.peers[peer_addr] = (reader, writer, None) 
-            
+            # Outgoing connections were registered by connect_to_peer already.
+            if peer_addr not in self.peers:
+                self._add_peer(peer_addr, reader, writer)
+
             logging.info(f"Accepted connection from {peer_addr}")
+            # With validation workers, transaction messages are routed to them undecoded.
+            routed = ROUTED_MESSAGE_TYPES if self.validation_workers else frozenset()
 
             while True:
-                len_data = await reader.readexactly(4)
-                msg_len = int.from_bytes(len_data, 'big')
-                msg_data = await reader.readexactly(msg_len)
-                message = json.loads(msg_data.decode())
-                await self.handle_message(message, writer)
+                data, compressed = await framing.read_frame(reader)
+                if compressed:
+                    if self.compression is None:
+                        raise framing.FrameError("compressed frame, but compression was not offered")
+                    self._compressed_frames.inc()
+                # Large and compressed frames (whose inflated size is not known yet) are inflated,
+                # checked and decoded on a thread, so the loop keeps serving other connections
+                # meanwhile; this connection's order is kept.
+                if compressed or len(data) >= self.offload_threshold:
+                    self._offloaded_frames.inc()
+                    msg_type, payload, message = await asyncio.get_running_loop().run_in_executor(
+                        self._frame_executor, framing.read_message, data, compressed, self.message_limits, routed)
+                else:
+                    msg_type, payload, message = framing.read_message(data, compressed, self.message_limits, routed)
+                if message is None:
+                    self._route_frame(payload, msg_type, writer, len(data))
+                    continue
+                await self.handle_message(message, writer, size=len(data))
         except (asyncio.IncompleteReadError, ConnectionResetError):
             logging.warning(f"Peer {peer_addr} disconnected.")
+        except (serialization.SerializationError, framing.FrameError) as e:
+            logging.warning(f"Peer {peer_addr} sent an undecodable message ({e}). Disconnecting.")
         finally:
-            if peer_addr in self.peers:
-                del self.peers[peer_addr]
+            await self._remove_peer(peer_addr)
             self.update_consensus_nodes()
-            writer.close()
-            await writer.wait_closed()
+            self.relay.on_peer_disconnected(peer_addr)
+            await self.sync.on_peer_disconnected(peer_addr)
+
+    async def handle_message(self, message: dict, writer, size: int = 0):
+        """Handles a message from a peer, recording its count, size and handling time by type."""
+        msg_type = message.get("type")
+        metrics = self._message_metrics.get(msg_type) or self._new_message_metrics(msg_type)
+        started = time.perf_counter()
+        try:
+            await self._handle_message(message, writer)
+        finally:
+            metrics.observe(time.perf_counter() - started, size)
+
+    def _route_frame(self, payload, msg_type: str, writer, size: int):
+        """Hands a transaction message to the validation workers without decoding it."""
+        started = time.perf_counter()
+        if not self.admission.submit_frame(payload, msg_type, writer):
+            logging.debug(f"Validation workers are saturated. Dropping a {msg_type} message from a peer.")
+        metrics = self._message_metrics.get(msg_type) or self._new_message_metrics(msg_type)
+        metrics.observe(time.perf_counter() - started, size)
+
+    def _screen_transaction(self, msg_type: str, writer, txid: str) -> bool:
+        """
+        The checks the event loop makes before verifying a transaction, made on the results of
+        the validation workers instead: gossip deduplication, and that relayed bodies were asked for.
+        """
+        if writer is None:
+            return True
+        if msg_type == "TX":
+            return self.relay.record_delivery(writer.get_extra_info('peername'), txid)
+        if self.seen_messages.check_and_add(transaction_key(txid)):
+            self._duplicate_messages.inc()
+            return False
+        return True
+
+    def _new_message_metrics(self, msg_type) -> "_MessageMetrics":
+        # Unknown types share one series, so peers cannot create unbounded label sets.
+        label = msg_type if msg_type in MESSAGE_TYPES else "other"
+        metrics = self._message_metrics.get(label)
+        if metrics is None:
+            metrics = self._message_metrics[label] = _MessageMetrics(self._messages_received.labels(label), self._message_bytes.labels(label),
+                                                                     self._message_seconds.labels(label))
+        return metrics
 
     # --- UPDATED: The HANDSHAKE handler is now much simpler and more robust ---
-    async def handle_message(self, message: dict, writer):
+    async def _handle_message(self, message: dict, writer):
         msg_type = message.get("type")
         originator_addr = writer.get_extra_info('peername')
         
         # Prevent infinite broadcast loops for most messages
-        if msg_type not in ["GET_CHAIN", "CHAIN_RESPONSE"]:
-            if message.get("id") in self.seen_messages:
-                return
-            self.seen_messages.add(message.get("id"))
+        if msg_type in VERIFIED_GOSSIP_TYPES:
+            duplicate = message_key(message) in self.seen_messages
+        else:
+            duplicate = msg_type not in DIRECT_MESSAGE_TYPES and self.seen_messages.check_and_add(message_key(message))
+        if duplicate:
+            self._duplicate_messages.inc()
+            return
 
-        logging.info(f"Received '{msg_type}' from {originator_addr}")
+        logging.debug("Received '%s' from %s", msg_type, originator_addr)
+
+        if msg_type == "STATUS":
+            payload = message.get("payload", {})
+            await self.sync.on_peer_status(originator_addr, payload.get("height", -1), payload.get("tip_hash"))
+
+        elif msg_type == "GET_HEADERS":
+            await self.sync.handle_get_headers(message.get("payload", {}), writer)
+
+        elif msg_type == "HEADERS":
+            await self.sync.on_headers(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "GET_BLOCKS":
+            await self.sync.handle_get_blocks(message.get("payload", {}), writer)
+
+        elif msg_type == "BLOCKS":
+            await self.sync.on_blocks(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "INV":
+            await self.relay.on_inv(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "GETDATA":
+            await self.relay.handle_getdata(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "TX":
+            for tx_message in self.relay.on_tx(originator_addr, message.get("payload", {})):
+                await self._receive_transaction(tx_message, writer)
+
+        elif msg_type == "CMPCT_BLOCK":
+            await self.relay.on_compact_block(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "GET_BLOCK_TXN":
+            await self.relay.handle_get_block_txn(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "BLOCK_TXN":
+            await self.relay.on_block_txn(originator_addr, message.get("payload", {}))
+
+        elif msg_type == "GET_TX_PROOF":
+            await self.send_message(writer, self.create_message("TX_PROOF", self.build_tx_proof(message.get("payload", {}))))
+
+        elif msg_type == "TX_PROOF":
+            payload = message.get("payload", {})
+            if self.verify_tx_proof(payload):
+                logging.info(f"✅ Transaction #{payload.get('tx_index')} is included in block #{payload['header']['index']} ({len(payload['proof'])} proof hashes).")
+            else:
+                logging.warning(f"Transaction inclusion proof from {originator_addr} did not verify.")
 
-        if msg_type == "GET_CHAIN":
-            chain_data = [block.__dict__ for block in self.blockchain.chain]
-            response = self.create_message("CHAIN_RESPONSE", {"chain": chain_data})
-            await self.send_message(writer, response)
-        
-        elif msg_type == "CHAIN_RESPONSE":
-            chain_data = message.get("payload", {}).get("chain", [])
-            if self.blockchain.replace_chain(chain_data):
-                self.ledger.update_from_chain(self.blockchain)
-        
         elif msg_type == "HANDSHAKE":
             peer_wallet_address_hex = message.get("payload", {}).get("address")
             if peer_wallet_address_hex:
                 # We just store the peer's address string, not a full Wallet object.
-                if originator_addr in self.peers:
-                    reader, writer, _ = self.peers[originator_addr]
-                    self.peers[originator_addr] = (reader, writer, peer_wallet_address_hex)
+                peer = self.peers.get(originator_addr)
+                if peer is not None:
+                    peer.address = peer_wallet_address_hex
+                    peer.compression = self._negotiate_compression(message.get("payload", {}).get("compression"))
+                    # Answer an incoming connection's handshake, so both sides elect from the same delegates.
+                    if not peer.handshake_sent:
+                        peer.handshake_sent = True
+                        await self.send_message(writer, self.handshake_message())
                 logging.info(f"Handshake complete. Peer {originator_addr} address loaded.")
                 self.update_consensus_nodes()
+                # Tell the peer where our chain ends so it can sync from us if it is behind.
+                await self.send_message(writer, self.create_message("STATUS", self.sync.status_payload()))
         
         elif msg_type == "NEW_TRANSACTION":
-            if self.blockchain.add_transaction(message['payload']['transaction_dict'], message['payload']['signature_hex']):
-                await self.broadcast(message, originator_writer=writer)
+            # Full-payload push, still accepted from peers that do not announce with INV.
+            await self._receive_transaction(message, writer)
 
         elif msg_type == "NEW_BLOCK":
-            block_data = message.get("payload")
-            new_block = Block.from_dict(block_data)
-            if new_block.index == self.blockchain.last_block.index + 1 and new_block.previous_hash == self.blockchain.last_block.hash:
-                self.blockchain.chain.append(new_block)
-                self.blockchain.pending_transactions = []
-                logging.info(f"✅ Appended new block #{new_block.index} from peer.")
-                self.ledger.update_from_chain(self.blockchain)
-                self.scan_block_for_messages(new_block)
-                await self.broadcast(message, originator_writer=writer)
-            elif new_block.index > self.blockchain.last_block.index:
-                logging.warning(f"Received block ahead of us. Requesting chain sync from {originator_addr}.")
-                get_chain_msg = self.create_message("GET_CHAIN")
-                await self.send_message(writer, get_chain_msg)
-            else:
-                logging.info(f"Ignoring old or irrelevant block #{new_block.index}.")
+            try:
+                block = Block.from_dict(message.get("payload"))
+            except (KeyError, ValueError, TypeError) as e:
+                logging.warning(f"Malformed block from {originator_addr} ({e}). Ignoring.")
+                return
+            await self.accept_block(block, originator_addr, certificate=message["payload"].get("certificate"))
+
+        elif msg_type == "PBFT":
+            # Pass verified consensus messages on, so delegates that are not our direct peers get them too.
+            if await self.pbft.on_message(message.get("payload", {})):
+                await self.broadcast(message, writer)
+
+    async def _receive_transaction(self, message: dict, writer):
+        """Verifies and admits a transaction from a peer; admitted ones are announced onwards."""
+        if not self.admission.submit(message, writer):
+            logging.debug("Admission queue is full. Dropping a transaction from a peer.")
+
+    async def accept_block(self, new_block: Block, peer_addr=None, certificate: dict = None) -> bool:
+        """
+        Adds a block received from `peer_addr` to the block tree. If the main chain changed
+        (extended, or reorganized onto a heavier branch), the indexes are updated from the
+        delta and the newly applied blocks are relayed as compact blocks. An orphan starts a
+        sync from that peer to fetch its missing ancestors.
+
+        Args:
+            new_block (Block): The block.
+            peer_addr: The peer it came from, None if it is our own.
+            certificate (dict): Its PBFT commit certificate. Without a valid one the block is
+                dropped, unless the node does not require certificates.
+        """
+        if self.require_certificates and not self.pbft.verify_certificate(new_block.index, new_block.hash, new_block.previous_hash, certificate):
+            logging.warning(f"Block #{new_block.index} from {peer_addr} has no valid commit certificate. Ignoring.")
+            return False
+        update = self.blockchain.add_block(new_block)
+        if update.status == ORPHAN and peer_addr is not None:
+            logging.warning(f"Received block #{new_block.index} with an unknown parent. Syncing missing blocks from {peer_addr}.")
+            await self.sync.on_peer_status(peer_addr, new_block.index, new_block.hash)
+            return False
+        if not update.changed:
+            logging.info(f"Block #{new_block.index} not applied ({update.status}).")
+            return False
+
+        if update.reverted:
+            logging.warning(f"Reorganized: rolled back {len(update.reverted)} block(s), applied {len(update.applied)}.")
+        logging.info(f"✅ Chain tip is now block #{self.blockchain.last_block.index}.")
+        if self.require_certificates and any(block.hash == new_block.hash for block in update.applied):
+            self.blockchain.finalize(new_block.index)
+        self.apply_chain_update(update)
+        # Reports our messages in every applied block (it looks at all heights from the first one up).
+        self.scan_block_for_messages(update.applied[0])
+        for block in update.applied:
+            await self.relay.announce_block(block, exclude=peer_addr)
+        return True
+
+    async def commit_block(self, block: Block):
+        """Appends a block the delegates committed to, updates the indexes and relays it to the other nodes."""
+        # Read the transactions' waiting times before they leave the mempool.
+        self.producer.on_block_committed(block)
+        update = self.blockchain.commit_block(block)
+        if not update.changed:
+            return
+        logging.info(f"✅ Block #{block.index} committed by the delegates.")
+        self.apply_chain_update(update)
+        self.scan_block_for_messages(block)
+        await self.relay.announce_block(block)
+
+    async def _broadcast_consensus(self, payload: dict):
+        await self.broadcast(self.create_message("PBFT", payload))
+
+    def build_tx_proof(self, request: dict) -> dict:
+        """Answers a GET_TX_PROOF request: the block header, the transaction and its Merkle proof."""
+        height, tx_index = request.get("height"), request.get("tx_index")
+        if not isinstance(height, int) or not 0 <= height < len(self.blockchain.chain):
+            return {"error": f"unknown block height {height}"}
+        block = self.blockchain.chain[height]
+        if not isinstance(tx_index, int) or not 0 <= tx_index < len(block.transactions):
+            return {"error": f"block #{height} has no transaction #{tx_index}"}
+        return {
+            "header": block.header(),
+            "signed_tx": block.transactions[tx_index],
+            "tx_index": tx_index,
+            "proof": block.inclusion_proof(tx_index)
+        }
+
+    def verify_tx_proof(self, response: dict) -> bool:
+        """
+        Checks a TX_PROOF answer the way a light client would: the header must hash correctly
+        (and match our copy, if we have that block) and the Merkle proof must lead to its root.
+        """
+        header = response.get("header")
+        if not isinstance(header, dict) or "error" in response:
+            return False
+        height = header.get("index")
+        if isinstance(height, int) and 0 <= height < len(self.blockchain.chain) and self.blockchain.chain[height].hash != header.get("hash"):
+            return False
+        return Block.verify_inclusion(header, response.get("signed_tx"), response.get("tx_index"), response.get("proof") or [])
+
+    def apply_chain_update(self, update):
+        """Rolls the ledger and inbox back and forward by the blocks a ChainUpdate lists."""
+        self.ledger.apply_delta(update.reverted, update.applied)
+        self.inbox.apply_delta(update.reverted, update.applied)
+        # No-op when the deltas lined up; otherwise this catches the indexes up from the chain.
+        self.refresh_indexes()
+
+    def refresh_indexes(self):
+        """Applies new (or reorganized) blocks to the public key ledger and the inbox."""
+        self.ledger.update_from_chain(self.blockchain)
+        self.inbox.update_from_chain(self.blockchain)
+
+    async def on_chain_synced(self):
+        """Called by ChainSync after it has appended or switched to blocks from peers."""
+        self.refresh_indexes()
+
+    async def _run_sync_timer(self):
+        while True:
+            await asyncio.sleep(SYNC_TICK_INTERVAL)
+            try:
+                await self.sync.tick()
+            except Exception as e:
+                logging.error(f"Chain sync tick failed: {e}")
 
     def scan_block_for_messages(self, block: Block):
-        my_address = self.node_wallet.address
-        for signed_tx in block.transactions:
-            tx = signed_tx['transaction_dict']
-            if tx.get('tx_type') == 'message' and tx.get('recipient_address') == my_address:
-                logging.info("!!! You have a new message in this block !!!")
-                encrypted_content = tx.get('content')
-                decrypted_message = self.node_wallet.decrypt_message(encrypted_content)
-                if decrypted_message:
-                    sender_address = tx.get('sender_address')
-                    sender_name = self.ledger.get_user_for_address(sender_address) or f"{sender_address[:10]}..."
-                    print(f"\n[NEW MESSAGE] From: {sender_name}")
-                    print(f" > '{decrypted_message}'\n")
-                else:
-                    print("Found a message for you, but FAILED to decrypt.")
+        # The inbox index already knows which entries of this block are addressed to us.
+        my_messages = self.inbox.message_count(self.node_wallet.address)
+        messages, _ = self.inbox.page(self.blockchain, self.node_wallet, limit=my_messages, since_height=block.index - 1)
+        for message in reversed(messages):
+            logging.info("!!! You have a new message in this block !!!")
+            if message['message']:
+                sender_address = message['sender_address']
+                sender_name = self.ledger.get_user_for_address(sender_address) or f"{sender_address[:10]}..."
+                print(f"\n[NEW MESSAGE] From: {sender_name}")
+                print(f" > '{message['message']}'\n")
+            else:
+                print("Found a message for you, but FAILED to decrypt.")
+
+    async def _relay_admitted_transaction(self, message: dict, writer, txid: str):
+        # Recorded only now that the signature checked out (see VERIFIED_GOSSIP_TYPES).
+        self.seen_messages.add(transaction_key(txid))
+        self.relay.announce_transaction(txid, exclude=writer.get_extra_info('peername') if writer else None)
+        self.producer.notify()
+
+    def handshake_message(self) -> dict:
+        """Our HANDSHAKE: the node's address and the frame compression it accepts."""
+        payload = {"address": self.node_wallet.address}
+        if self.compression is not None:
+            payload["compression"] = [self.compression]
+        return self.create_message("HANDSHAKE", payload)
+
+    def _negotiate_compression(self, offered) -> str | None:
+        """The codec to compress frames to a peer with: ours, if the peer's HANDSHAKE offered it too."""
+        if self.compression is not None and isinstance(offered, list) and self.compression in offered:
+            return self.compression
+        return None
+
+    async def _outbound_frame(self, message: dict, peers) -> framing.OutboundFrame:
+        """
+        Frames a message for sending to `peers`. A frame large enough to be offloaded is compressed
+        on a thread right away if any of them takes compressed frames; smaller ones are compressed
+        on first use.
+        """
+        outbound = framing.OutboundFrame(framing.encode_frame(message))
+        if (self.compression is not None and outbound.needs_compression(max(self.compress_threshold, self.offload_threshold))
+                and any(peer.compression for peer in peers)):
+            outbound.set_compressed(await asyncio.get_running_loop().run_in_executor(self._frame_executor, framing.compress_frame, outbound.plain))
+        return outbound
 
     async def send_message(self, writer, message):
+        """Sends a message to one peer through its outbound queue."""
+        peer = self.peers.get(writer.get_extra_info('peername'))
+        if peer is not None and peer.writer is writer:
+            outbound = await self._outbound_frame(message, (peer,))
+            peer.enqueue(outbound.for_peer(peer.compression, self.compress_threshold))
+            return
         try:
-            msg_bytes = json.dumps(message, default=str).encode()
-            len_bytes = len(msg_bytes).to_bytes(4, 'big')
-            writer.write(len_bytes + msg_bytes)
+            writer.write(framing.encode_frame(message))
             await writer.drain()
         except ConnectionResetError:
             pass
 
     async def broadcast(self, message: dict, originator_writer=None):
-        all_writers = [w for _, w, _ in self.peers.values() if w is not originator_writer]
-        for writer in all_writers:
-            await self.send_message(writer, message)
-
-
-async def main(args):
-    # (The setup part of this function remains the same)
-    node_wallet = Wallet()
-    blockchain = Blockchain()
-    consensus = DPoLConsensus(nodes=[], num_delegates=5)
-    ledger = PublicKeyLedger()
-    ledger.update_from_chain(blockchain)
-
-    node = P2PNode(args.host, args.port, node_wallet, blockchain, consensus, ledger)
-    
-    server_task = asyncio.create_task(node.start())
-    await asyncio.sleep(1)
-
-    if args.peers:
-        for peer in args.peers.split(','):
-            await node.connect_to_peer(peer.split(':')[0], int(peer.split(':')[1]))
-
+        """
+        Queues a message for every peer except the one it came from. The message is encoded
+        once, and no peer's socket is waited on, so fan-out time does not depend on slow peers.
+        """
+        if originator_writer is None:
+            # Our own message: don't process it again if a peer echoes it back.
+            self.seen_messages.add(message_key(message))
+        peers = [peer for peer in self.peers.values() if peer.writer is not originator_writer]
+        outbound = await self._outbound_frame(message, peers)
+        for peer in peers:
+            peer.enqueue(outbound.for_peer(peer.compression, self.compress_threshold))
+
+
+async def run_console(node: P2PNode, ledger: PublicKeyLedger):
+    """Reads operator commands from stdin until 'exit' or end of input."""
     while True:
         try:
-            cmd = await asyncio.to_thread(input, "\nCommands: users, register_key <user>, send_msg <user> <msg>, read_msgs, mempool, mine, chain, exit\n> ")
+            cmd = await asyncio.to_thread(input, "\nCommands: users, register_key <user>, send_msg <user> <msg>, read_msgs, mempool, peers, metrics, profile start|stop [file], mine, chain, exit\n> ")
             
             if cmd == 'read_msgs':
-                print("\n--- Manually checking blockchain for your messages ---")
-                my_address = node.node_wallet.address
+                print("\n--- Your messages, newest first ---")
                 messages_found = 0
-                
-                # Iterate through every block in the chain
-                for block in node.blockchain.chain:
-                    # Iterate through every transaction in the block
-                    for signed_tx in block.transactions:
-                        tx = signed_tx['transaction_dict']
-                        
-                        # Check if the transaction is a 'message' and if it's addressed to us
-                        if tx.get('tx_type') == 'message' and tx.get('recipient_address') == my_address:
-                            encrypted_content = tx.get('content')
-                            
-                            # Use our wallet to try and decrypt the content
-                            decrypted_message = node.node_wallet.decrypt_message(encrypted_content)
-                            
-                            if decrypted_message:
-                                messages_found += 1
-                                sender_address = tx.get('sender_address')
-                                sender_name = ledger.get_user_for_address(sender_address) or f"{sender_address[:10]}..."
-                                time_formatted = datetime.fromtimestamp(tx.get('timestamp')).strftime('%Y-%m-%d %H:%M:%S')
-
-                                print(f"\nMessage #{messages_found}:")
-                                print(f"  From:      {sender_name}")
-                                print(f"  At:        {time_formatted}")
-                                print(f"  Message:   '{decrypted_message}'")
-                            else:
-                                print(f"Found a message from {tx.get('sender_address')[:12]} but FAILED to decrypt.")
-                
-                # After checking all blocks, if we haven't found any messages, say so.
+                cursor = None
+
+                # Walk the inbox index page by page; only our own messages are read and decrypted.
+                while True:
+                    messages, cursor = node.inbox.page(node.blockchain, node.node_wallet, before=cursor)
+                    for message in messages:
+                        if message['message']:
+                            messages_found += 1
+                            sender_address = message['sender_address']
+                            sender_name = ledger.get_user_for_address(sender_address) or f"{sender_address[:10]}..."
+                            time_formatted = datetime.fromtimestamp(message['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+
+                            print(f"\nMessage #{messages_found} (block #{message['height']}):")
+                            print(f"  From:      {sender_name}")
+                            print(f"  At:        {time_formatted}")
+                            print(f"  Message:   '{message['message']}'")
+                        else:
+                            print(f"Found a message from {message['sender_address'][:12]} but FAILED to decrypt.")
+                    if cursor is None:
+                        break
+
+                # If we haven't found any messages, say so.
                 if messages_found == 0:
                     print("No messages found for you on the blockchain.")
 
@@ -264,10 +684,10 @@ async def main(args):
                 tx_obj = Transaction(sender_wallet=node.node_wallet, tx_type="key_registration", username=username, message="")
                 tx_dict = tx_obj.to_dict()
                 signature = node.node_wallet.sign_transaction(tx_dict)
-                payload = {'transaction_dict': tx_dict, 'signature_hex': signature.hex()}
                 if node.blockchain.add_transaction(tx_dict, signature.hex()):
-                    tx_message = node.create_message("NEW_TRANSACTION", payload)
-                    await node.broadcast(tx_message)
+                    print("Transaction added to the pending pool.")
+                    node.relay.announce_transaction(transaction_id(tx_dict))
+                    node.producer.notify()
 
             elif cmd.startswith('send_msg'):
                 parts = cmd.split()
@@ -279,32 +699,153 @@ async def main(args):
                 tx_obj = Transaction(sender_wallet=node.node_wallet, message=message_text, recipient_public_keys_hex=recipient_keys)
                 tx_dict = tx_obj.to_dict()
                 signature = node.node_wallet.sign_transaction(tx_dict)
-                payload = {'transaction_dict': tx_dict, 'signature_hex': signature.hex()}
                 if node.blockchain.add_transaction(tx_dict, signature.hex()):
-                    tx_message = node.create_message("NEW_TRANSACTION", payload)
-                    await node.broadcast(tx_message)
+                    print("Transaction added to the pending pool.")
+                    node.relay.announce_transaction(transaction_id(tx_dict))
+                    node.producer.notify()
             
             elif cmd == 'mempool':
-                print(f"Pending transactions: {len(node.blockchain.pending_transactions)}")
-                print(json.dumps(node.blockchain.pending_transactions, indent=2))
+                print(f"Pending transactions: {len(node.blockchain.mempool)} {node.blockchain.mempool.stats()}")
+                print(json.dumps(node.blockchain.pending_transactions, indent=2, default=dict))
+                print(f"Block production: {node.producer.stats()}")
+
+            elif cmd == 'metrics':
+                print(node.metrics_text(), end="")
+
+            elif cmd.startswith('profile'):
+                parts = cmd.split()
+                if len(parts) < 2 or parts[1] not in ("start", "stop"): print("Usage: profile start|stop [collapsed_stacks_file]"); continue
+                if parts[1] == "start":
+                    node.profiler.start()
+                    print(f"Sampling the event loop every {node.profiler.interval * 1000:.0f} ms. 'profile stop' prints the report.")
+                else:
+                    report = node.profiler.stop()
+                    print(f"{report['samples']} samples over {report['duration']:.1f} s. Functions by own samples:")
+                    for entry in report["top"]:
+                        print(f"  {entry['own']:>6} {entry['total']:>6}  {entry['function']}")
+                    if len(parts) > 2:
+                        with open(parts[2], "w") as f:
+                            f.write(node.profiler.collapsed())
+                        print(f"Collapsed stacks written to {parts[2]} (flamegraph.pl / speedscope format).")
+
+            elif cmd == 'peers':
+                for peer in node.peers.values():
+                    print(f"{peer.addr} {peer.address[:12] + '...' if peer.address else '(no handshake)'} {peer.stats()}")
+                print(f"Outbound: {node.outbound_stats()}")
+                print(f"Gossip dedup: {node.seen_messages.stats(with_memory=True)}")
+                print(f"Inventory relay: {node.relay.stats}")
+                print(f"PBFT (view {node.pbft.view}): {node.pbft.stats}")
 
             elif cmd == 'mine':
-                if not node.blockchain.pending_transactions: logging.info('No pending transactions to create a block.'); continue
-                new_block = node.blockchain.mine_block(proposer_address=node.node_wallet.address)
+                if not len(node.blockchain.mempool): logging.info('No pending transactions to create a block.'); continue
+                # Cut a block now instead of waiting for it to fill up or for the block interval.
+                # It is appended once a quorum of the delegates has committed to it.
+                new_block = await node.producer.produce(force=True)
                 if new_block:
-                    block_message = node.create_message("NEW_BLOCK", new_block.__dict__)
-                    await node.broadcast(block_message)
-                    ledger.update_from_chain(node.blockchain)
+                    print(f"Proposed block #{new_block.index} to the delegates.")
+                else:
+                    primary = node.pbft.next_proposer()
+                    print(f"Cannot propose now: the next block's primary is {primary[:10] + '...' if primary else 'unknown'} (view {node.pbft.view}).")
 
             elif cmd == 'chain':
-                print(json.dumps([b.__dict__ for b in node.blockchain.chain], indent=2, default=str))
+                print(json.dumps([b.to_dict() for b in node.blockchain.chain], indent=2))
             elif cmd == 'exit':
                 break
         except (EOFError, KeyboardInterrupt):
             break
 
+def open_node_wallet(args) -> Wallet | None:
+    """
+    Returns the node's identity. With --wallet (or a --data-dir) it is kept in an encrypted
+    keystore and survives restarts; otherwise a new wallet is created for this run.
+    Returns None if the keystore cannot be unlocked.
+    """
+    path = args.wallet or (os.path.join(args.data_dir, 'wallet.json') if args.data_dir else None)
+    if path is None:
+        return Wallet()
+    passphrase = os.environ.get(WALLET_PASSPHRASE_ENV)
+    if passphrase is None:
+        if args.headless or not sys.stdin.isatty():
+            logging.error(f"Set {WALLET_PASSPHRASE_ENV} to unlock the node wallet {path}.")
+            return None
+        passphrase = getpass.getpass(f"Passphrase for the node wallet {path}: ")
+    try:
+        wallet, created = load_or_create_wallet(path, passphrase)
+    except KeystoreError as e:
+        logging.error(f"Cannot unlock the node wallet {path}: {e}")
+        return None
+    logging.info(f"{'Created a new' if created else 'Loaded the'} node wallet {path} ({wallet.address[:10]}...).")
+    return wallet
+
+async def main(args):
+    node_wallet = open_node_wallet(args)
+    if node_wallet is None:
+        return
+    mempool = Mempool(max_count=args.mempool_max_txs, max_bytes=args.mempool_max_bytes)
+    verifier = BatchVerifier(max_workers=args.verify_workers) if args.verify_workers != 0 else None
+    # Blocks from peers are validated on the verifier's workers; signatures below the checkpoint are trusted.
+    validator = ChainValidator(verifier=verifier, checkpoint_height=args.checkpoint_height, checkpoint_hash=args.checkpoint_hash)
+    blockchain = Blockchain(data_dir=args.data_dir, mempool=mempool, validator=validator)
+    if args.verify_chain:
+        result = blockchain.verify_chain()
+        logging.info(f"Stored chain check: {result}")
+        if not result:
+            blockchain.close()
+            if verifier:
+                verifier.close()
+            return
+    consensus = DPoLConsensus(nodes=[], num_delegates=args.delegates)
+    # With a data dir, the ledger resumes from its snapshot and only replays newer blocks.
+    ledger = PublicKeyLedger(snapshot_path=os.path.join(args.data_dir, 'ledger.json') if args.data_dir else None)
+    ledger.load_snapshot()
+    inbox = Inbox(snapshot_path=os.path.join(args.data_dir, 'inbox.json') if args.data_dir else None)
+    inbox.load_snapshot()
+
+    node = P2PNode(args.host, args.port, node_wallet, blockchain, consensus, ledger, verifier=verifier, inbox=inbox,
+                   peer_queue_frames=args.peer_queue_frames, peer_queue_bytes=args.peer_queue_bytes, peer_overflow=args.peer_overflow,
+                   block_max_txs=args.block_max_txs, block_max_bytes=args.block_max_bytes, block_interval=args.block_interval,
+                   validation_workers=args.validation_workers, compression=None if args.compression == "none" else args.compression,
+                   compress_threshold=args.compress_threshold, offload_threshold=args.offload_threshold,
+                   require_certificates=args.require_certificates)
+    node.refresh_indexes()
+    # Until peers join, this node is the only delegate.
+    node.update_consensus_nodes()
+    
+    server_task = asyncio.create_task(node.start())
+    # Dial the peers once the server accepts their connections back (or failed to start).
+    listening = asyncio.create_task(node.listening.wait())
+    await asyncio.wait((listening, server_task), return_when=asyncio.FIRST_COMPLETED)
+    listening.cancel()
+
+    if args.peers:
+        for peer in args.peers.split(','):
+            await node.connect_to_peer(peer.split(':')[0], int(peer.split(':')[1]))
+
+    api = None
+    if args.api_port is not None:
+        api = ApiServer(node, host=args.api_host, port=args.api_port)
+        await api.start()
+
+    if args.headless:
+        # No console: serve peers and the API until the process is interrupted or terminated.
+        stop_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_requested.set)
+        await stop_requested.wait()
+    else:
+        await run_console(node, ledger)
+
+    if api:
+        await api.stop()
     server_task.cancel()
     await node.stop()
+    if verifier:
+        verifier.close()
+    node_wallet.close()
+    ledger.save_snapshot()
+    inbox.save_snapshot()
+    blockchain.close()
 
 # This is the entry point when you run "python network/node.py ..."
 if __name__ == "__main__":
@@ -313,7 +854,46 @@ if __name__ == "__main__":
     parser.add_argument('--host', type=str, default='0.0.0.0', help="The host address to listen on.")
     parser.add_argument('--port', type=int, required=True, help="The port to listen on.")
     parser.add_argument('--peers', type=str, help="A comma-separated list of initial peers to connect to (e.g., localhost:8001,localhost:8002).")
+    parser.add_argument('--data-dir', type=str, help="Folder for the on-disk block store. Without it the chain is kept in memory only.")
+    parser.add_argument('--wallet', type=str, help=f"Encrypted keystore with the node's identity, created on first use (default: wallet.json in --data-dir). The passphrase is read from ${WALLET_PASSPHRASE_ENV} or prompted for.")
+    parser.add_argument('--mempool-max-txs', type=int, default=DEFAULT_MAX_COUNT, help="Largest number of pending transactions kept in the mempool.")
+    parser.add_argument('--mempool-max-bytes', type=int, default=DEFAULT_MAX_BYTES, help="Largest total size (bytes) of pending transactions kept in the mempool.")
+    parser.add_argument('--verify-workers', type=int, default=None, help="Worker processes for batched signature verification (default: CPU count, 0 to verify on the event loop).")
+    parser.add_argument('--validation-workers', type=int, default=0, help="Worker processes that decode and verify incoming transaction messages, fed through pipes; the event loop then only routes them (default: 0, off).")
+    parser.add_argument('--compression', choices=framing.COMPRESSION_CODECS + ("none",), default=framing.COMPRESSION_ZLIB,
+                        help="Frame compression offered to peers in the handshake (default: zlib).")
+    parser.add_argument('--compress-threshold', type=int, default=framing.DEFAULT_COMPRESS_THRESHOLD,
+                        help="Frames of at least this many bytes are compressed for peers that accept it.")
+    parser.add_argument('--offload-threshold', type=int, default=framing.DEFAULT_OFFLOAD_THRESHOLD,
+                        help="Frames of at least this many bytes are (de)compressed and decoded on a thread.")
+    parser.add_argument('--require-certificates', action='store_true',
+                        help="Only accept peer blocks with a PBFT commit certificate from this node's committee (fully meshed clusters only).")
+    parser.add_argument('--checkpoint-height', type=int, default=-1, help="Height up to which block signatures are trusted and not re-verified.")
+    parser.add_argument('--checkpoint-hash', type=str, default=None, help="Expected hash of the block at --checkpoint-height.")
+    parser.add_argument('--verify-chain', action='store_true', help="Re-validate the stored chain (hashes, Merkle roots, signatures) on startup.")
+    parser.add_argument('--peer-queue-frames', type=int, default=DEFAULT_MAX_QUEUED_FRAMES, help="Largest number of messages queued for one peer.")
+    parser.add_argument('--peer-queue-bytes', type=int, default=DEFAULT_MAX_QUEUED_BYTES, help="Largest total size (bytes) of messages queued for one peer.")
+    parser.add_argument('--peer-overflow', choices=OVERFLOW_POLICIES, default=OVERFLOW_DROP, help="What to do when a peer's queue is full: drop the message or disconnect the peer.")
+    parser.add_argument('--delegates', type=int, default=5, help="Number of delegates elected for each block.")
+    parser.add_argument('--block-max-txs', type=int, default=DEFAULT_MAX_BLOCK_TXS, help="Largest number of transactions in a block.")
+    parser.add_argument('--block-max-bytes', type=int, default=DEFAULT_MAX_BLOCK_BYTES, help="Largest total size (bytes) of the transactions in a block.")
+    parser.add_argument('--block-interval', type=float, default=DEFAULT_BLOCK_INTERVAL, help="Seconds after the last block before a partly filled block is cut.")
+    parser.add_argument('--api-port', type=int, default=None, help="Serve the HTTP/JSON-RPC API (and the web UI) on this port.")
+    parser.add_argument('--api-host', type=str, default=DEFAULT_API_HOST, help="Address the API listens on. It can sign with the node's wallet, so expose it with care.")
+    parser.add_argument('--headless', action='store_true', help="Run as a daemon without the interactive console; stop it with SIGINT or SIGTERM.")
+    parser.add_argument('--crypto-provider', choices=list(providers.PROVIDERS), default=None,
+                        help=f"Crypto backend (default: ${providers.PROVIDER_ENV} or {providers.DEFAULT_PROVIDER}). 'simulated' is fast and deterministic but NOT secure; use it for simulations only.")
+    parser.add_argument('--signature-algorithm', choices=list(providers.SIGNATURE_ALGORITHMS), default=None,
+                        help=f"Signature parameter set (default: ${providers.SIGNATURE_ALGORITHM_ENV} or {providers.DEFAULT_SIGNATURE_ALGORITHM}). All nodes of a network must use the same one.")
+    parser.add_argument('--kem-algorithm', choices=list(providers.KEM_ALGORITHMS), default=None,
+                        help=f"KEM parameter set for encrypted messages (default: ${providers.KEM_ALGORITHM_ENV} or {providers.DEFAULT_KEM_ALGORITHM}).")
+    parser.add_argument('--crypto-seed', type=int, default=None, help="Seed of the simulated provider, for reproducible runs.")
     args = parser.parse_args()
+    try:
+        providers.configure(provider=args.crypto_provider, signature_algorithm=args.signature_algorithm,
+                            kem_algorithm=args.kem_algorithm, seed=args.crypto_seed)
+    except ValueError as e:
+        parser.error(str(e))
     
     try:
         # Start the asyncio event loop.
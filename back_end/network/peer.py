@@ -0,0 +1,133 @@
+# network/peer.py
+
+import asyncio
+import logging
+from collections import deque
+
+# Outbound queue limits per peer. A peer that cannot keep up hits these instead of
+# stalling the senders.
+DEFAULT_MAX_QUEUED_FRAMES = 1024
+DEFAULT_MAX_QUEUED_BYTES = 16 * 1024 * 1024
+
+# What happens when a frame does not fit into a peer's queue.
+OVERFLOW_DROP = "drop"              # the frame is dropped, the connection stays up
+OVERFLOW_DISCONNECT = "disconnect"  # the peer is disconnected
+OVERFLOW_POLICIES = (OVERFLOW_DROP, OVERFLOW_DISCONNECT)
+
+class Peer:
+    """
+    One connected peer: its stream, its wallet address once the handshake is done, and a
+    bounded outbound queue drained by its own writer task.
+
+    Senders only enqueue already framed bytes and never wait for the socket, so a slow peer
+    fills its own queue (and then drops frames or is disconnected) without delaying anyone else.
+    """
+
+    def __init__(self, addr, reader, writer, max_frames: int = DEFAULT_MAX_QUEUED_FRAMES, max_bytes: int = DEFAULT_MAX_QUEUED_BYTES, overflow: str = OVERFLOW_DROP):
+        """
+        Args:
+            addr (tuple): The peer's socket address (host, port).
+            reader (asyncio.StreamReader): The incoming side of the connection.
+            writer (asyncio.StreamWriter): The outgoing side of the connection.
+            max_frames (int): Largest number of queued frames.
+            max_bytes (int): Largest total size of the queued frames.
+            overflow (str): OVERFLOW_DROP or OVERFLOW_DISCONNECT.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}.")
+        self.addr = addr
+        self.reader = reader
+        self.writer = writer
+        self.address = None
+        self.handshake_sent = False
+        self.compression = None    # codec both sides offered in their HANDSHAKE; None sends plain frames
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._ready = asyncio.Event()
+        self._task = None
+        self.closed = False
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+        self.overflowed = False
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def queued_frames(self) -> int:
+        return len(self._queue)
+
+    @property
+    def queued_bytes(self) -> int:
+        return self._queued_bytes
+
+    def enqueue(self, data: bytes) -> bool:
+        """
+        Queues a framed message for sending. Never blocks.
+
+        Returns:
+            bool: False if the frame was not queued (peer closed or queue full).
+        """
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_frames or self._queued_bytes + len(data) > self.max_bytes:
+            self.frames_dropped += 1
+            if self.overflow == OVERFLOW_DISCONNECT and not self.overflowed:
+                self.overflowed = True
+                logging.warning(f"Outbound queue to {self.addr} is full ({len(self._queue)} frames). Disconnecting.")
+                self.writer.close()
+            return False
+        self._queue.append(data)
+        self._queued_bytes += len(data)
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                # Everything queued so far goes out in one write and one drain.
+                frames = list(self._queue)
+                self._queue.clear()
+                self._queued_bytes = 0
+                self._ready.clear()
+                self.writer.writelines(frames)
+                await self.writer.drain()
+                self.frames_sent += len(frames)
+                self.bytes_sent += sum(len(data) for data in frames)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.warning(f"Sending to {self.addr} failed: {e}")
+            self.closed = True
+
+    def stats(self) -> dict:
+        return {
+            "queued_frames": len(self._queue),
+            "queued_bytes": self._queued_bytes,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "frames_dropped": self.frames_dropped,
+            "overflowed": self.overflowed
+        }
+
+    async def close(self):
+        """Stops the writer task and closes the connection. Frames still queued are discarded."""
+        self.closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
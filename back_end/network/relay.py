@@ -0,0 +1,375 @@
+# network/relay.py
+
+import asyncio
+import hashlib
+import logging
+import time
+from core.block import Block
+from core.mempool import transaction_id
+from network.seen_cache import SeenCache
+
+# Seconds between INV flushes; announcements made in between go out as one batch per peer.
+ANNOUNCE_INTERVAL = 0.1
+# Largest number of ids in one INV or GETDATA message.
+MAX_INV_BATCH = 1000
+# Transactions one peer may have requested from it at once.
+MAX_IN_FLIGHT_PER_PEER = 5000
+# Seconds before an unanswered GETDATA or GET_BLOCK_TXN is retried elsewhere.
+REQUEST_TIMEOUT = 5.0
+# Bytes of a compact block's short transaction ids.
+SHORT_ID_BYTES = 6
+# How many inventory ids are remembered per peer as already known to it.
+PEER_KNOWN_CAPACITY = 50_000
+# Largest number of transactions a compact block may announce.
+MAX_COMPACT_BLOCK_TXS = 50_000
+# Compact blocks one peer may have waiting for missing transactions at once.
+MAX_PARTIAL_BLOCKS_PER_PEER = 4
+
+def short_id(block_hash: str, txid: str) -> str:
+    """
+    Short id of a transaction inside a compact block. It is salted with the block hash,
+    so a collision found for one block says nothing about the next.
+    """
+    return hashlib.sha256(bytes.fromhex(block_hash) + bytes.fromhex(txid)).digest()[:SHORT_ID_BYTES].hex()
+
+def short_id_index(block_hash: str, txids) -> dict:
+    """
+    Maps the short ids of `txids` under `block_hash` to their txids; ambiguous short ids map
+    to None. Same ids as short_id, with the salt hashed once instead of once per transaction.
+    """
+    salted = hashlib.sha256(bytes.fromhex(block_hash))
+    index = {}
+    for txid in txids:
+        hasher = salted.copy()
+        hasher.update(bytes.fromhex(txid))
+        sid = hasher.digest()[:SHORT_ID_BYTES].hex()
+        index[sid] = None if sid in index else txid
+    return index
+
+class InventoryRelay:
+    """
+    Announce-then-fetch gossip for a P2PNode.
+
+    Transactions: new transaction ids are batched into INV messages, at most one per peer
+    every ANNOUNCE_INTERVAL. A receiver asks with GETDATA only for the ids it does not
+    have and is not already fetching, and gets them back in a TX message. Requests that
+    time out are retried with another peer that announced the same id.
+
+    Blocks: a new block is pushed as a CMPCT_BLOCK, its header plus short transaction ids.
+    The receiver rebuilds the body from its mempool, fetches the few transactions it is
+    missing with GET_BLOCK_TXN, and falls back to a headers-first sync if that fails.
+
+    Every peer then receives each transaction body about once, instead of once per neighbour.
+    """
+
+    def __init__(self, node, announce_interval: float = ANNOUNCE_INTERVAL, request_timeout: float = REQUEST_TIMEOUT):
+        self.node = node
+        self.announce_interval = announce_interval
+        self.request_timeout = request_timeout
+        self._pending_inv = {}     # peer_addr -> txids waiting for the next INV flush
+        self._peer_known = {}      # peer_addr -> SeenCache of txids and block hashes the peer has
+        self._in_flight = {}       # txid -> (peer_addr, deadline)
+        self._announcers = {}      # txid -> further peers that announced it, for retries
+        self._load = {}            # peer_addr -> number of transactions requested from it
+        self._partial_blocks = {}  # block hash -> (header, transactions with gaps, peer_addr, deadline)
+        self._short_ids = (None, {})  # (block hash, short id -> txid of our mempool) of the last compact block
+        self._task = None
+        self.stats = {
+            "inv_sent": 0, "inv_ids_received": 0, "tx_requested": 0, "tx_received": 0,
+            "tx_request_timeouts": 0, "compact_blocks_received": 0, "compact_blocks_rebuilt": 0,
+            "block_txs_requested": 0, "compact_block_fallbacks": 0
+        }
+
+    @property
+    def blockchain(self):
+        return self.node.blockchain
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.announce_interval)
+            try:
+                await self.flush_announcements()
+                await self.tick()
+            except Exception as e:
+                logging.error(f"Inventory relay tick failed: {e}")
+
+    async def _send(self, peer_addr, msg_type: str, payload: dict) -> bool:
+        peer = self.node.peers.get(peer_addr)
+        if not peer:
+            return False
+        await self.node.send_message(peer.writer, self.node.create_message(msg_type, payload))
+        return True
+
+    def _known(self, peer_addr) -> SeenCache:
+        known = self._peer_known.get(peer_addr)
+        if known is None:
+            known = self._peer_known[peer_addr] = SeenCache(capacity=PEER_KNOWN_CAPACITY)
+        return known
+
+    def on_peer_disconnected(self, peer_addr):
+        self._pending_inv.pop(peer_addr, None)
+        self._peer_known.pop(peer_addr, None)
+        self._load.pop(peer_addr, None)
+        for txid, (owner, _) in list(self._in_flight.items()):
+            if owner == peer_addr:
+                # Let the next tick hand the request to another announcer.
+                self._in_flight[txid] = (owner, 0.0)
+
+    # --- Transactions ---
+
+    def announce_transaction(self, txid: str, exclude=None):
+        """Schedules a transaction we have (and accepted) for announcement to every other peer."""
+        for peer_addr in self.node.peers:
+            if peer_addr == exclude or txid in self._known(peer_addr):
+                continue
+            self._pending_inv.setdefault(peer_addr, []).append(txid)
+
+    async def flush_announcements(self):
+        pending, self._pending_inv = self._pending_inv, {}
+        for peer_addr, txids in pending.items():
+            known = self._known(peer_addr)
+            fresh = [txid for txid in dict.fromkeys(txids) if txid not in known]
+            for txid in fresh:
+                known.add(txid)
+            for i in range(0, len(fresh), MAX_INV_BATCH):
+                if await self._send(peer_addr, "INV", {"tx": fresh[i:i + MAX_INV_BATCH]}):
+                    self.stats["inv_sent"] += 1
+
+    def _finish_request(self, txid: str):
+        peer_addr, _ = self._in_flight.pop(txid)
+        if peer_addr in self._load:
+            self._load[peer_addr] -= 1
+
+    async def on_inv(self, peer_addr, payload: dict):
+        txids = [txid for txid in payload.get("tx", [])[:MAX_INV_BATCH] if isinstance(txid, str)]
+        self.stats["inv_ids_received"] += len(txids)
+        known = self._known(peer_addr)
+        mempool = self.blockchain.mempool
+        wanted = []
+        for txid in txids:
+            known.add(txid)
+            if mempool.is_known(txid):
+                continue
+            if txid in self._in_flight:
+                # Someone else is already sending it; remember this peer in case they don't.
+                announcers = self._announcers.setdefault(txid, [])
+                if peer_addr not in announcers and len(announcers) < 8:
+                    announcers.append(peer_addr)
+                continue
+            wanted.append(txid)
+
+        room = MAX_IN_FLIGHT_PER_PEER - self._load.get(peer_addr, 0)
+        wanted = wanted[:max(room, 0)]
+        if wanted:
+            await self._request_transactions(peer_addr, wanted)
+
+    async def _request_transactions(self, peer_addr, txids: list):
+        deadline = time.monotonic() + self.request_timeout
+        for txid in txids:
+            self._in_flight[txid] = (peer_addr, deadline)
+        self._load[peer_addr] = self._load.get(peer_addr, 0) + len(txids)
+        self.stats["tx_requested"] += len(txids)
+        await self._send(peer_addr, "GETDATA", {"tx": txids})
+
+    async def handle_getdata(self, peer_addr, payload: dict):
+        mempool = self.blockchain.mempool
+        known = self._known(peer_addr)
+        txs = []
+        for txid in payload.get("tx", [])[:MAX_INV_BATCH]:
+            signed_tx = mempool.get(txid)
+            if signed_tx is not None:
+                txs.append(signed_tx)
+                known.add(txid)
+        if txs:
+            await self._send(peer_addr, "TX", {"txs": txs})
+
+    def on_tx(self, peer_addr, payload: dict) -> list[dict]:
+        """
+        Records the transactions of a TX message as delivered. Returns the ones we asked for,
+        as NEW_TRANSACTION-style messages for the node's normal admission path.
+        """
+        accepted = []
+        for signed_tx in payload.get("txs", []):
+            try:
+                txid = transaction_id(signed_tx['transaction_dict'])
+            except (KeyError, ValueError, TypeError):
+                continue
+            if self.record_delivery(peer_addr, txid):
+                accepted.append({"type": "NEW_TRANSACTION", "payload": signed_tx})
+        return accepted
+
+    def record_delivery(self, peer_addr, txid: str) -> bool:
+        """
+        Records that `peer_addr` sent us the body of `txid` in a TX message. Returns True if
+        we had asked that peer for it; unsolicited bodies are to be ignored.
+        """
+        if peer_addr in self.node.peers:
+            # (Validated off the event loop, the body may come back after the peer left.)
+            self._known(peer_addr).add(txid)
+        requested = self._in_flight.get(txid)
+        if requested is None or requested[0] != peer_addr:
+            # Unsolicited bodies are ignored; they are exactly the traffic INV avoids.
+            return False
+        self._finish_request(txid)
+        self._announcers.pop(txid, None)
+        self.stats["tx_received"] += 1
+        return True
+
+    # --- Compact blocks ---
+
+    def compact_block(self, block: Block, peer_addr=None) -> dict:
+        """
+        Header plus short ids and the block's commit certificate; transactions the peer is not
+        known to have are sent in full.
+        """
+        known = self._peer_known.get(peer_addr)
+        short_ids, prefilled = [], []
+        for tx_index, signed_tx in enumerate(block.transactions):
+            txid = signed_tx.txid
+            short_ids.append(short_id(block.hash, txid))
+            if known is None or txid not in known:
+                prefilled.append([tx_index, signed_tx])
+        return {"header": block.header(), "short_ids": short_ids, "prefilled": prefilled,
+                "certificate": self.node.pbft.certificate(block.hash)}
+
+    async def announce_block(self, block: Block, exclude=None):
+        """Pushes a block we just accepted to every other peer as a compact block."""
+        for peer_addr in list(self.node.peers):
+            known = self._known(peer_addr)
+            if peer_addr == exclude or block.hash in known:
+                continue
+            known.add(block.hash)
+            await self._send(peer_addr, "CMPCT_BLOCK", self.compact_block(block, peer_addr))
+
+    def _have_block(self, header: dict) -> bool:
+        height = header.get('index')
+        chain = self.blockchain.chain
+        return isinstance(height, int) and 0 <= height < len(chain) and chain[height].hash == header.get('hash')
+
+    async def on_compact_block(self, peer_addr, payload: dict):
+        self.stats["compact_blocks_received"] += 1
+        header, short_ids = payload.get("header") or {}, payload.get("short_ids") or []
+        try:
+            if not isinstance(short_ids, list) or len(short_ids) > MAX_COMPACT_BLOCK_TXS:
+                logging.warning(f"Compact block from {peer_addr} announces too many transactions. Ignoring.")
+                return
+            if Block.hash_header(header) != header['hash'] or header['tx_count'] != len(short_ids):
+                logging.warning(f"Compact block from {peer_addr} has an invalid header. Ignoring.")
+                return
+        except (KeyError, ValueError, TypeError):
+            logging.warning(f"Malformed compact block from {peer_addr}. Ignoring.")
+            return
+        self._known(peer_addr).add(header['hash'])
+        if self._have_block(header) or header['hash'] in self._partial_blocks:
+            return
+        if header['index'] > self.blockchain.last_block.index + 1:
+            # We are missing its parent anyway; a sync fetches both.
+            await self.node.sync.on_peer_status(peer_addr, header['index'], header['hash'])
+            return
+        if sum(1 for partial in self._partial_blocks.values() if partial[2] == peer_addr) >= MAX_PARTIAL_BLOCKS_PER_PEER:
+            logging.warning(f"Peer {peer_addr} has too many compact blocks waiting for transactions. Ignoring block #{header['index']}.")
+            return
+        # Checked before any transaction is requested; a valid certificate stays cached for accept_block.
+        if self.node.require_certificates and not self.node.pbft.verify_certificate(
+                header['index'], header['hash'], header['previous_hash'], payload.get("certificate")):
+            logging.warning(f"Compact block #{header['index']} from {peer_addr} has no valid commit certificate. Ignoring.")
+            return
+
+        transactions = [None] * len(short_ids)
+        for entry in payload.get("prefilled") or []:
+            if isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], int) and 0 <= entry[0] < len(transactions):
+                transactions[entry[0]] = entry[1]
+
+        # Match the remaining short ids against our mempool; ambiguous matches count as missing.
+        # The ids are salted per block, so the index is built once per block hash, not per message.
+        if self._short_ids[0] != header['hash']:
+            self._short_ids = (header['hash'], short_id_index(header['hash'], self.blockchain.mempool.txids()))
+        by_short_id = self._short_ids[1]
+        for tx_index, sid in enumerate(short_ids):
+            if transactions[tx_index] is None and isinstance(sid, str) and by_short_id.get(sid):
+                transactions[tx_index] = self.blockchain.mempool.get(by_short_id[sid])
+
+        missing = [tx_index for tx_index, signed_tx in enumerate(transactions) if signed_tx is None]
+        if not missing:
+            await self._complete_block(peer_addr, header, transactions)
+            return
+        self._partial_blocks[header['hash']] = (header, transactions, peer_addr, time.monotonic() + self.request_timeout)
+        self.stats["block_txs_requested"] += len(missing)
+        await self._send(peer_addr, "GET_BLOCK_TXN", {"height": header['index'], "hash": header['hash'], "indexes": missing})
+
+    async def handle_get_block_txn(self, peer_addr, payload: dict):
+        request = {"index": payload.get("height"), "hash": payload.get("hash")}
+        if not self._have_block(request):
+            return
+        block = self.blockchain.chain[request["index"]]
+        txs = [[i, block.transactions[i]] for i in payload.get("indexes", []) if isinstance(i, int) and 0 <= i < len(block.transactions)]
+        await self._send(peer_addr, "BLOCK_TXN", {"hash": block.hash, "txs": txs})
+
+    async def on_block_txn(self, peer_addr, payload: dict):
+        partial = self._partial_blocks.get(payload.get("hash"))
+        if partial is None or partial[2] != peer_addr:
+            return
+        header, transactions, _, _ = partial
+        for entry in payload.get("txs") or []:
+            if isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], int) and 0 <= entry[0] < len(transactions):
+                transactions[entry[0]] = entry[1]
+        del self._partial_blocks[header['hash']]
+        if any(signed_tx is None for signed_tx in transactions):
+            await self._fall_back(peer_addr, header, "the peer did not send every missing transaction")
+            return
+        await self._complete_block(peer_addr, header, transactions)
+
+    async def _complete_block(self, peer_addr, header: dict, transactions: list):
+        try:
+            block = Block(header['index'], transactions, header['previous_hash'], header['proposer_address'],
+                          timestamp=header['timestamp'], a_hash=header['hash'])
+            block_ok = block.is_valid()
+        except (KeyError, ValueError, TypeError):
+            await self._fall_back(peer_addr, header, "the peer sent a malformed transaction")
+            return
+        if not block_ok:
+            # A short id matched the wrong mempool transaction (or the peer lied): fetch the real body.
+            await self._fall_back(peer_addr, header, "the rebuilt body does not match the Merkle root")
+            return
+        self.stats["compact_blocks_rebuilt"] += 1
+        await self.node.accept_block(block, peer_addr, certificate=self.node.pbft.certificate(block.hash))
+
+    async def _fall_back(self, peer_addr, header: dict, reason: str):
+        self.stats["compact_block_fallbacks"] += 1
+        logging.warning(f"Could not rebuild compact block #{header['index']} ({reason}). Fetching it in full.")
+        await self.node.sync.on_peer_status(peer_addr, header['index'], header['hash'])
+
+    # --- Timeouts ---
+
+    async def tick(self):
+        now = time.monotonic()
+        retries = {}
+        for txid, (peer_addr, deadline) in list(self._in_flight.items()):
+            if deadline > now:
+                continue
+            self.stats["tx_request_timeouts"] += 1
+            self._finish_request(txid)
+            announcers = [addr for addr in self._announcers.pop(txid, []) if addr in self.node.peers and addr != peer_addr]
+            if announcers and not self.blockchain.mempool.is_known(txid):
+                self._announcers[txid] = announcers[1:]
+                retries.setdefault(announcers[0], []).append(txid)
+        for peer_addr, txids in retries.items():
+            await self._request_transactions(peer_addr, txids)
+
+        for block_hash, (header, _, peer_addr, deadline) in list(self._partial_blocks.items()):
+            if deadline <= now:
+                del self._partial_blocks[block_hash]
+                await self._fall_back(peer_addr, header, "missing transactions timed out")
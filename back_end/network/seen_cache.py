@@ -0,0 +1,114 @@
+# network/seen_cache.py
+
+import hashlib
+import sys
+import time
+from core import serialization
+from core.mempool import transaction_id
+
+# Largest number of message keys remembered, and how long (seconds) a key is remembered
+# at most. Keys live in one of two sets; the older set is dropped when the newer one is
+# half full or half a TTL old, so a key is remembered for between TTL/2 and TTL.
+DEFAULT_SEEN_CAPACITY = 200_000
+DEFAULT_SEEN_TTL = 600.0
+
+def transaction_key(txid: str) -> bytes:
+    """
+    The key of a NEW_TRANSACTION message, from its transaction id. The id does not cover the
+    signature, so the node records this key only after the signature was verified.
+    """
+    return b"tx:" + bytes.fromhex(txid)
+
+def message_key(message: dict) -> bytes:
+    """
+    Identifies a gossip message by its content rather than its random id, so the same
+    transaction or block wrapped into a new message by another peer is still recognized.
+    """
+    msg_type = message.get("type")
+    payload = message.get("payload") or {}
+    try:
+        if msg_type == "NEW_TRANSACTION":
+            return transaction_key(transaction_id(payload['transaction_dict']))
+        if msg_type == "NEW_BLOCK":
+            return b"block:" + bytes.fromhex(payload['hash'])
+    except (KeyError, ValueError, TypeError):
+        pass
+    content = serialization.encode_value([msg_type, payload])
+    return b"msg:" + hashlib.sha256(content).digest()
+
+class SeenCache:
+    """
+    Bounded, time-expiring set of recently seen gossip messages.
+
+    Two sets rotate: new keys go into `current`, lookups check both, and when `current`
+    is full or old, `previous` is dropped and `current` takes its place. Memory stays
+    within `capacity` keys and stale keys expire without a per-key timestamp.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_SEEN_CAPACITY, ttl: float = DEFAULT_SEEN_TTL, clock=time.monotonic):
+        """
+        Args:
+            capacity (int): Largest number of keys held over both sets.
+            ttl (float): Longest time (seconds) a key is remembered.
+            clock (callable): Time source, replaceable for simulations.
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = clock()
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def __contains__(self, key) -> bool:
+        return key in self._current or key in self._previous
+
+    def _rotate_if_due(self):
+        now = self.clock()
+        if len(self._current) >= self.capacity // 2 or now - self._rotated_at >= self.ttl / 2:
+            # If a whole TTL passed without a rotation, the previous generation is stale as well.
+            self._previous = self._current if now - self._rotated_at < self.ttl else set()
+            self._current = set()
+            self._rotated_at = now
+            self.rotations += 1
+
+    def add(self, key):
+        self._rotate_if_due()
+        self._current.add(key)
+
+    def check_and_add(self, key) -> bool:
+        """
+        Records a key. Returns True if it was already seen (the message is a duplicate).
+        """
+        if key in self._current or key in self._previous:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self.add(key)
+        return False
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the sets and their keys."""
+        size = sys.getsizeof(self._current) + sys.getsizeof(self._previous)
+        for keys in (self._current, self._previous):
+            for key in keys:
+                size += sys.getsizeof(key)
+        return size
+
+    def stats(self, with_memory: bool = False) -> dict:
+        stats = {
+            "size": len(self),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rotations": self.rotations
+        }
+        if with_memory:
+            stats["memory_bytes"] = self.memory_bytes()
+        return stats
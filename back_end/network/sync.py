@@ -0,0 +1,315 @@
+# network/sync.py
+
+import logging
+import time
+from core.block import Block
+
+# Largest number of headers returned in one HEADERS message.
+HEADERS_PAGE_SIZE = 200
+# Number of block bodies asked for in one GET_BLOCKS message.
+BLOCKS_PER_REQUEST = 16
+# Requests a single peer may have outstanding at once.
+MAX_IN_FLIGHT_PER_PEER = 4
+# Seconds before an unanswered request is handed to another peer.
+REQUEST_TIMEOUT = 10.0
+# Most (height, hash) entries read from a peer's block locator.
+MAX_LOCATOR_ENTRIES = 64
+
+def _is_height(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _block_refs(entries, limit: int) -> list[tuple[int, str]]:
+    """Returns the well-formed [height, hash] pairs among the first `limit` entries a peer sent."""
+    if not isinstance(entries, list):
+        return []
+    return [(entry[0], entry[1]) for entry in entries[:limit]
+            if isinstance(entry, list) and len(entry) == 2 and _is_height(entry[0]) and isinstance(entry[1], str)]
+
+class ChainSync:
+    """
+    Headers-first chain synchronization for a P2PNode.
+
+    1. Peers announce their tip (height, hash) with STATUS, or implicitly with NEW_BLOCK.
+    2. When a peer is ahead, we send GET_HEADERS with a block locator; the peer answers with
+       a bounded page of HEADERS after the last block we have in common (the fork point).
+    3. Once all missing headers are linked, the block bodies are fetched in small GET_BLOCKS
+       batches spread across every peer whose tip is high enough.
+    4. Bodies that extend our tip are appended as they arrive; a competing fork is switched to
+       only once all of its blocks are present and checked.
+
+    The last page of headers carries the commit certificate of the peer's tip. A node that requires
+    certificates checks it before any body is fetched; the hash chain of the headers certifies
+    every block below it.
+
+    Work and bandwidth scale with the number of missing blocks, and no message carries the whole chain.
+    """
+
+    def __init__(self, node, page_size: int = HEADERS_PAGE_SIZE, blocks_per_request: int = BLOCKS_PER_REQUEST,
+                 request_timeout: float = REQUEST_TIMEOUT):
+        self.node = node
+        self.page_size = page_size
+        self.blocks_per_request = blocks_per_request
+        self.request_timeout = request_timeout
+        # peer_addr -> (height, tip_hash) as last announced by that peer
+        self.peer_tips = {}
+        self._reset()
+
+    def _reset(self):
+        self.sync_peer = None
+        self.fork_height = None
+        self.headers = []       # headers above the fork point, in height order
+        self.bodies = {}        # height -> Block, received but not yet applied
+        self.applied = 0        # how many of self.headers are now on our chain
+        self.pending = []       # chunks of headers whose bodies still have to be requested
+        self.in_flight = {}     # chunk start height -> (peer_addr, deadline, chunk)
+        self.headers_deadline = None
+
+    @property
+    def syncing(self) -> bool:
+        return self.sync_peer is not None
+
+    @property
+    def blockchain(self):
+        return self.node.blockchain
+
+    async def _send(self, peer_addr, msg_type: str, payload: dict) -> bool:
+        peer = self.node.peers.get(peer_addr)
+        if not peer:
+            return False
+        await self.node.send_message(peer.writer, self.node.create_message(msg_type, payload))
+        return True
+
+    def status_payload(self) -> dict:
+        last_block = self.blockchain.last_block
+        return {"height": last_block.index, "tip_hash": last_block.hash}
+
+    # --- Serving peers ---
+
+    async def handle_get_headers(self, payload: dict, writer):
+        if not isinstance(payload, dict):
+            return
+        limit = payload.get('limit', self.page_size)
+        if not _is_height(limit):
+            return
+        limit = max(1, min(limit, self.page_size))
+        fork_height = self.blockchain.find_common_height(_block_refs(payload.get('locator'), MAX_LOCATOR_ENTRIES))
+        headers = [] if fork_height is None else self.blockchain.get_headers(fork_height + 1, limit)
+        certificate = self.node.pbft.certificate(headers[-1]['hash']) if headers else None
+        response = self.node.create_message("HEADERS", {"fork_height": fork_height, "headers": headers, "certificate": certificate,
+                                                        **self.status_payload()})
+        await self.node.send_message(writer, response)
+
+    async def handle_get_blocks(self, payload: dict, writer):
+        if not isinstance(payload, dict) or not _is_height(payload.get('start')):
+            return
+        blocks = []
+        for height, block_hash in _block_refs(payload.get('blocks'), self.blocks_per_request):
+            if 0 <= height < len(self.blockchain.chain):
+                block = self.blockchain.chain[height]
+                if block.hash == block_hash:
+                    blocks.append(block.to_dict())
+        response = self.node.create_message("BLOCKS", {"start": payload.get('start'), "blocks": blocks})
+        await self.node.send_message(writer, response)
+
+    # --- Driving our own sync ---
+
+    async def on_peer_status(self, peer_addr, height: int, tip_hash: str):
+        if not _is_height(height):
+            return
+        self.peer_tips[peer_addr] = (height, tip_hash)
+        if not self.syncing and height > self.blockchain.last_block.index:
+            await self._start(peer_addr)
+
+    async def on_peer_disconnected(self, peer_addr):
+        self.peer_tips.pop(peer_addr, None)
+        for start, (owner, _, chunk) in list(self.in_flight.items()):
+            if owner == peer_addr:
+                del self.in_flight[start]
+                self.pending.append(chunk)
+        if peer_addr == self.sync_peer and (self.headers_deadline is not None or not (self.pending or self.in_flight)):
+            await self._abort("sync peer disconnected")
+        elif self.syncing:
+            await self._dispatch()
+
+    async def _start(self, peer_addr):
+        self._reset()
+        self.sync_peer = peer_addr
+        logging.info(f"Starting headers-first sync from {peer_addr} (peer height {self.peer_tips[peer_addr][0]}).")
+        await self._request_headers(self.blockchain.get_locator())
+
+    async def _request_headers(self, locator: list[list]):
+        self.headers_deadline = time.monotonic() + self.request_timeout
+        await self._send(self.sync_peer, "GET_HEADERS", {"locator": locator, "limit": self.page_size})
+
+    async def _abort(self, reason: str):
+        logging.warning(f"Chain sync with {self.sync_peer} aborted: {reason}")
+        self.peer_tips.pop(self.sync_peer, None)
+        self._reset()
+        await self._restart_if_behind()
+
+    async def _restart_if_behind(self):
+        best = max(self.peer_tips.items(), key=lambda item: item[1][0], default=None)
+        if best and best[1][0] > self.blockchain.last_block.index:
+            await self._start(best[0])
+
+    async def on_headers(self, peer_addr, payload: dict):
+        if peer_addr != self.sync_peer or self.headers_deadline is None:
+            return
+        self.headers_deadline = None
+        if not isinstance(payload, dict):
+            await self._abort("malformed HEADERS message")
+            return
+        fork_height = payload.get('fork_height')
+        headers = payload.get('headers', [])
+        if _is_height(payload.get('height')):
+            self.peer_tips[peer_addr] = (payload['height'], payload.get('tip_hash'))
+        if fork_height is None:
+            await self._abort("no common block with peer")
+            return
+        if not _is_height(fork_height) or fork_height < 0 or not isinstance(headers, list) \
+                or not all(isinstance(header, dict) for header in headers):
+            await self._abort("malformed HEADERS message")
+            return
+
+        if self.headers and fork_height == self.headers[-1]['index']:
+            previous_hash = self.headers[-1]['hash']
+        elif fork_height < len(self.blockchain.chain):
+            # First page, or the peer matched an older locator entry: start over from its fork point.
+            self.fork_height = fork_height
+            self.headers = []
+            previous_hash = self.blockchain.chain[fork_height].hash
+        else:
+            await self._abort(f"fork point #{fork_height} is above our tip")
+            return
+
+        for header in headers:
+            if header.get('previous_hash') != previous_hash or header.get('index') != self.fork_height + len(self.headers) + 1:
+                await self._abort(f"header #{header.get('index')} does not link to its parent")
+                return
+            try:
+                header_ok = Block.hash_header(header) == header['hash']
+            except (KeyError, ValueError, TypeError):
+                header_ok = False
+            if not header_ok:
+                await self._abort(f"header #{header.get('index')} does not match its hash")
+                return
+            self.headers.append(header)
+            previous_hash = header['hash']
+
+        if len(headers) >= self.page_size:
+            last = self.headers[-1]
+            await self._request_headers([[last['index'], last['hash']]] + self.blockchain.get_locator())
+            return
+
+        if self.fork_height + len(self.headers) <= self.blockchain.last_block.index:
+            logging.info("Peer chain is not longer than ours. Nothing to sync.")
+            self._reset()
+            return
+        last = self.headers[-1]
+        if self.node.require_certificates and not self.node.pbft.verify_certificate(
+                last['index'], last['hash'], last['previous_hash'], payload.get('certificate')):
+            await self._abort(f"header #{last['index']} has no valid commit certificate")
+            return
+
+        logging.info(f"Received {len(self.headers)} headers above fork point #{self.fork_height}. Fetching bodies.")
+        self.pending = [self.headers[i:i + self.blocks_per_request] for i in range(0, len(self.headers), self.blocks_per_request)]
+        await self._dispatch()
+
+    def _candidate_peers(self, needed_height: int) -> list:
+        loads = {}
+        for owner, _, _ in self.in_flight.values():
+            loads[owner] = loads.get(owner, 0) + 1
+        candidates = [addr for addr, (height, _) in self.peer_tips.items()
+                      if height >= needed_height and addr in self.node.peers and loads.get(addr, 0) < MAX_IN_FLIGHT_PER_PEER]
+        return sorted(candidates, key=lambda addr: loads.get(addr, 0))
+
+    async def _dispatch(self):
+        """Hands pending body requests to the least busy peers that have the blocks."""
+        while self.pending:
+            chunk = self.pending[0]
+            candidates = self._candidate_peers(chunk[-1]['index'])
+            if not candidates:
+                break
+            self.pending.pop(0)
+            peer_addr = candidates[0]
+            start = chunk[0]['index']
+            self.in_flight[start] = (peer_addr, time.monotonic() + self.request_timeout, chunk)
+            request = {"start": start, "blocks": [[header['index'], header['hash']] for header in chunk]}
+            if not await self._send(peer_addr, "GET_BLOCKS", request):
+                del self.in_flight[start]
+                self.pending.append(chunk)
+                self.peer_tips.pop(peer_addr, None)
+
+    async def on_blocks(self, peer_addr, payload: dict):
+        if not isinstance(payload, dict) or not _is_height(payload.get('start')):
+            return
+        entry = self.in_flight.get(payload.get('start'))
+        if not entry or entry[0] != peer_addr:
+            return
+        _, _, chunk = self.in_flight.pop(payload['start'])
+        expected = {header['index']: header['hash'] for header in chunk}
+
+        blocks = payload.get('blocks')
+        for block_data in blocks if isinstance(blocks, list) else []:
+            try:
+                block = Block.from_dict(block_data)
+                block_ok = expected.get(block.index) == block.hash and block.is_valid()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if block_ok:
+                self.bodies[block.index] = block
+                del expected[block.index]
+
+        missing = [header for header in chunk if header['index'] in expected]
+        if missing:
+            self.pending.append(missing)
+        await self._apply_ready()
+        if self.syncing:
+            await self._dispatch()
+
+    async def _apply_ready(self):
+        next_height = self.fork_height + self.applied + 1
+        run = []
+        while next_height + len(run) in self.bodies:
+            run.append(self.bodies[next_height + len(run)])
+        if not run:
+            return
+
+        base = self.fork_height + self.applied
+        completes_fork = self.applied + len(run) == len(self.headers)
+        if base != self.blockchain.last_block.index and not completes_fork:
+            # Switching to a competing fork: wait until every block above the fork point is here.
+            return
+
+        if not self.blockchain.extend_from(base, run):
+            await self._abort(f"blocks #{run[0].index}-#{run[-1].index} were rejected")
+            return
+        if self.node.require_certificates:
+            # Ancestors of the certified last header: final as well.
+            self.blockchain.finalize(run[-1].index)
+        for block in run:
+            del self.bodies[block.index]
+        self.applied += len(run)
+        logging.info(f"✅ Synced up to block #{self.blockchain.last_block.index}.")
+
+        if self.applied == len(self.headers):
+            self._reset()
+            await self.node.on_chain_synced()
+            await self._restart_if_behind()
+
+    async def tick(self):
+        """Re-assigns timed-out requests. Called periodically by the node."""
+        if not self.syncing:
+            return
+        now = time.monotonic()
+        if self.headers_deadline is not None and now > self.headers_deadline:
+            await self._abort("timed out waiting for headers")
+            return
+        for start, (peer_addr, deadline, chunk) in list(self.in_flight.items()):
+            if now > deadline:
+                logging.warning(f"Block request #{start} to {peer_addr} timed out. Re-assigning.")
+                del self.in_flight[start]
+                self.pending.append(chunk)
+        await self._dispatch()
+        if self.pending and not self.in_flight:
+            await self._abort("no connected peer can serve the missing blocks")
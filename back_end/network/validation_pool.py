@@ -0,0 +1,305 @@
+# network/validation_pool.py
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import struct
+import threading
+from collections import deque
+from core import serialization
+from core.signed_transaction import SignedTransaction
+from crypto import dilithium_utils
+
+# Message types whose frames are handed to the pool exactly as received, instead of being
+# decoded on the event loop.
+ROUTED_MESSAGE_TYPES = frozenset({"NEW_TRANSACTION", "TX"})
+# Frames sent to a worker in one pipe message.
+DEFAULT_MAX_BATCH_FRAMES = 32
+# Frames a worker may have queued or in progress. Further frames wait on the event loop's
+# side until results come back, so a burst cannot outrun the workers through the pipes.
+DEFAULT_MAX_IN_FLIGHT_FRAMES = 256
+# Frames that may wait for a worker on the event loop's side. Beyond that, submit() drops them.
+DEFAULT_MAX_WAITING_FRAMES = 10_000
+# Seconds a worker gets to exit after being asked to, before it is terminated.
+WORKER_STOP_TIMEOUT = 5.0
+
+# A batch is [sequence number of its first frame, frame count] followed by the frames, each
+# prefixed with its length as on the wire.
+_BATCH_HEADER = struct.Struct('>QI')
+_FRAME_LENGTH = struct.Struct('>I')
+
+def validate_frame(data) -> list[tuple[bool | None, SignedTransaction | None]]:
+    """
+    Decodes a NEW_TRANSACTION or TX message and verifies the signatures of its transactions.
+
+    Returns:
+        list: (valid, signed_tx) per transaction, in message order. A malformed transaction
+            is reported as (None, None).
+
+    Raises:
+        SerializationError: If the message does not decode.
+    """
+    message = serialization.decode_message(data)
+    payload = message.get("payload")
+    if message.get("type") == "TX":
+        candidates = payload.get("txs") if isinstance(payload, dict) else None
+        candidates = candidates if isinstance(candidates, list) else []
+    else:
+        candidates = [payload]
+
+    parsed, items = [], []
+    for candidate in candidates:
+        try:
+            signed_tx = SignedTransaction.of(candidate)
+            items.append(signed_tx.verification_item())
+            parsed.append(signed_tx)
+        except (KeyError, ValueError, TypeError):
+            parsed.append(None)
+    verified = iter(dilithium_utils.verify_batch(items))
+    return [(next(verified), signed_tx) if signed_tx is not None else (None, None) for signed_tx in parsed]
+
+def _worker_main(conn):
+    """Validation worker: answers every batch with (first sequence number, one result per frame)."""
+    # Ctrl+C reaches the whole process group; the node stops its workers itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except EOFError:
+            break
+        if not data:
+            break
+        view = memoryview(data)
+        first_seq, count = _BATCH_HEADER.unpack_from(view)
+        pos = _BATCH_HEADER.size
+        results = []
+        for _ in range(count):
+            size = _FRAME_LENGTH.unpack_from(view, pos)[0]
+            pos += _FRAME_LENGTH.size
+            try:
+                # The frame is a slice of the received buffer, not a copy.
+                results.append(validate_frame(view[pos:pos + size]))
+            except Exception as e:
+                logging.debug("Undecodable transaction message: %s", e)
+                results.append(None)
+            pos += size
+        conn.send((first_seq, results))
+
+class Sequencer:
+    """
+    Releases results in the order their work was submitted, whichever worker finished first.
+    Everything the pool validated is applied from here, so the mempool sees transactions in
+    the order they arrived, as it did when they were handled on the event loop.
+    """
+
+    def __init__(self, release):
+        """
+        Args:
+            release (callable): Called as release(result) for every result, in sequence order.
+        """
+        self.release = release
+        self.next_seq = 0
+        self._done = {}    # sequence number -> result finished ahead of an earlier one
+
+    def push(self, seq: int, result):
+        self._done[seq] = result
+        while self.next_seq in self._done:
+            result = self._done.pop(self.next_seq)
+            self.next_seq += 1
+            self.release(result)
+
+    @property
+    def held(self) -> int:
+        """Results waiting for an earlier one."""
+        return len(self._done)
+
+class _Worker:
+    """One validation process, its pipe, and the two threads that move bytes through the pipe."""
+
+    def __init__(self, pool, index: int):
+        self.pool = pool
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main, args=(child_conn,), name=f"validation-worker-{index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.batches = deque()    # (first sequence number, frame count) sent and not answered yet
+        self.in_flight = 0
+        # Pipe writes and reads happen on these threads, so a busy worker never blocks the event loop.
+        self._outbox = queue.SimpleQueue()
+        self._sender = threading.Thread(target=self._send_loop, name=f"{self.process.name}-send", daemon=True)
+        self._receiver = threading.Thread(target=self._receive_loop, name=f"{self.process.name}-receive", daemon=True)
+        self._sender.start()
+        self._receiver.start()
+
+    def send(self, first_seq: int, count: int, data: bytes):
+        self.batches.append((first_seq, count))
+        self.in_flight += count
+        self._outbox.put(data)
+
+    def _send_loop(self):
+        while True:
+            data = self._outbox.get()
+            try:
+                self.conn.send_bytes(data)
+            except (OSError, ValueError):
+                break
+            if not data:
+                break
+
+    def _receive_loop(self):
+        loop = self.pool.loop
+        while True:
+            try:
+                result = self.conn.recv()
+            except (EOFError, OSError):
+                callback, args = self.pool._worker_exited, (self,)
+            else:
+                callback, args = self.pool._batch_done, (self, result)
+            try:
+                loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                return    # the event loop is closed
+            if callback is self.pool._worker_exited:
+                return
+
+    def close(self):
+        """Asks the worker to exit once it has answered what it was sent."""
+        self._outbox.put(b"")
+
+    def join(self, timeout: float):
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+class ValidationPool:
+    """
+    Decodes and verifies transaction messages on worker processes fed through pipes.
+
+    The event loop only frames and routes: frames are passed on as they came off the socket,
+    batched into one pipe message per worker, and never decoded or re-encoded in this process.
+    Workers slice the frames out of the batch with memoryviews, decode them and verify the
+    signatures, and send back SignedTransactions with their id, leaf hash and size already
+    computed. A Sequencer hands the results to `on_result` in submission order.
+    """
+
+    def __init__(self, workers: int, on_result, max_batch_frames: int = DEFAULT_MAX_BATCH_FRAMES,
+                 max_in_flight_frames: int = DEFAULT_MAX_IN_FLIGHT_FRAMES, max_waiting_frames: int = DEFAULT_MAX_WAITING_FRAMES):
+        """
+        Args:
+            workers (int): Number of validation processes.
+            on_result (callable): Called on the event loop as on_result(context, result) per frame,
+                in submission order. `result` is validate_frame()'s list, or None if the frame
+                did not decode (or its worker died).
+            max_batch_frames (int): Largest number of frames sent to a worker at once.
+            max_in_flight_frames (int): Largest number of frames queued at one worker.
+            max_waiting_frames (int): Largest number of frames waiting for a worker; more are dropped.
+        """
+        self.size = max(1, workers)
+        self.on_result = on_result
+        self.max_batch_frames = max_batch_frames
+        self.max_in_flight_frames = max_in_flight_frames
+        self.max_waiting_frames = max_waiting_frames
+        self.loop = None
+        self._workers = []
+        self._waiting = deque()     # frames not handed to a worker yet
+        self._contexts = deque()    # context of every frame not released yet, in sequence order
+        self._next_seq = 0          # sequence number of the next submitted frame
+        self._dispatched = 0        # sequence number of the first waiting frame
+        self._sequencer = Sequencer(self._release)
+        self._flush_scheduled = False
+        self._stopping = False
+        self.stats = {"frames": 0, "batches": 0, "undecodable": 0, "worker_restarts": 0, "dropped": 0}
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._workers = [_Worker(self, index) for index in range(self.size)]
+
+    async def stop(self):
+        self._stopping = True
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+        for worker in workers:
+            await asyncio.to_thread(worker.join, WORKER_STOP_TIMEOUT)
+
+    @property
+    def backlog(self) -> int:
+        """Frames submitted whose results have not been released yet."""
+        return len(self._contexts)
+
+    def submit(self, data: bytes, context=None) -> bool:
+        """
+        Queues one encoded message (without its length prefix). Never blocks.
+
+        Args:
+            data (bytes): The message as read from the wire.
+            context: Handed back to on_result with the frame's result.
+
+        Returns:
+            bool: False if max_waiting_frames frames are already waiting; the frame is dropped
+                and on_result is never called for it.
+        """
+        if len(self._waiting) >= self.max_waiting_frames:
+            self.stats["dropped"] += 1
+            return False
+        self._next_seq += 1
+        self._contexts.append(context)
+        self._waiting.append(data)
+        self.stats["frames"] += 1
+        # Frames that arrive in the same event loop iteration share a batch.
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._flush)
+        return True
+
+    def _flush(self):
+        self._flush_scheduled = False
+        while self._waiting and self._workers:
+            worker = min(self._workers, key=lambda w: w.in_flight)
+            count = min(self.max_in_flight_frames - worker.in_flight, self.max_batch_frames, len(self._waiting))
+            if count <= 0:
+                return    # every worker is full; _batch_done flushes again
+            parts = [_BATCH_HEADER.pack(self._dispatched, count)]
+            for _ in range(count):
+                data = self._waiting.popleft()
+                parts.append(_FRAME_LENGTH.pack(len(data)))
+                parts.append(data)
+            worker.send(self._dispatched, count, b"".join(parts))
+            self._dispatched += count
+            self.stats["batches"] += 1
+
+    def _batch_done(self, worker: _Worker, response: tuple):
+        first_seq, count = worker.batches.popleft()
+        worker.in_flight -= count
+        answered_seq, results = response
+        if answered_seq != first_seq or len(results) != count:
+            logging.error(f"Validation worker {worker.process.name} answered out of order.")
+            results = [None] * count
+        for offset, result in enumerate(results):
+            self._sequencer.push(first_seq + offset, result)
+        self._flush()
+
+    def _worker_exited(self, worker: _Worker):
+        if self._stopping or worker not in self._workers:
+            return
+        logging.error(f"Validation worker {worker.process.name} exited (code {worker.process.exitcode}). Restarting it.")
+        index = self._workers.index(worker)
+        self._workers[index] = _Worker(self, index)
+        self.stats["worker_restarts"] += 1
+        # Whatever it had not answered is released as failed, so later results are not held back.
+        for first_seq, count in worker.batches:
+            for offset in range(count):
+                self._sequencer.push(first_seq + offset, None)
+        worker.batches.clear()
+        asyncio.ensure_future(asyncio.to_thread(worker.join, 0))
+        self._flush()
+
+    def _release(self, result):
+        if result is None:
+            self.stats["undecodable"] += 1
+        self.on_result(self._contexts.popleft(), result)
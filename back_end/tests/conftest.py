@@ -0,0 +1,38 @@
+# tests/conftest.py
+
+import pytest
+from core.block import Block
+from core.transaction import Transaction
+from core.wallet import Wallet
+from crypto import providers
+
+@pytest.fixture(autouse=True, scope="session")
+def simulated_crypto():
+    """Runs the tests on the simulated crypto provider, so they need neither liboqs nor its key generation time."""
+    providers.configure(provider=providers.PROVIDER_SIMULATED, seed=1)
+    yield
+
+@pytest.fixture
+def signed_tx():
+    """
+    Factory for signed transaction payloads ({'transaction_dict', 'signature_hex'}).
+
+    signed_tx(text, wallet=None, recipient=None, forged=False, tx_type="message", username=None, **fields):
+    a message to `recipient` (or a key registration) from `wallet`, fresh wallets standing in for
+    either if None, with `fields` added to the signed data. A forged payload has an all-zero signature.
+    """
+    def make(text: str = "test", wallet: Wallet = None, recipient: Wallet = None, forged: bool = False,
+             tx_type: str = "message", username: str = None, **fields) -> dict:
+        wallet = wallet or Wallet()
+        recipient_keys = (recipient or Wallet()).get_public_keys_hex() if tx_type == "message" else None
+        tx_dict = {**Transaction(wallet, text, recipient_keys, tx_type=tx_type, username=username).to_dict(), **fields}
+        signature_hex = wallet.sign_transaction(tx_dict).hex()
+        return {"transaction_dict": tx_dict, "signature_hex": "00" * (len(signature_hex) // 2) if forged else signature_hex}
+    return make
+
+@pytest.fixture
+def child_block():
+    """Factory for the block after `parent`: child_block(parent, transactions=(), proposer="a", timestamp=None)."""
+    def make(parent: Block, transactions=(), proposer: str = "a", timestamp: float = None) -> Block:
+        return Block(parent.index + 1, list(transactions), parent.hash, proposer, timestamp=timestamp or parent.index + 1.0)
+    return make
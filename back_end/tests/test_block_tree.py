@@ -0,0 +1,56 @@
+# tests/test_block_tree.py
+
+from core.block import Block
+from core.block_tree import EXTENDED, INVALID, REORGANIZED, SIDE
+from core.blockchain import Blockchain
+from core.wallet import Wallet
+
+def test_heavier_branch_wins_and_ties_keep_the_chain(child_block):
+    blockchain = Blockchain()
+    genesis = blockchain.last_block
+    main = child_block(genesis, proposer="main")
+    assert blockchain.add_block(main).status == EXTENDED
+
+    side = child_block(genesis, proposer="side")
+    assert blockchain.add_block(side).status == SIDE
+    assert blockchain.last_block.hash == main.hash
+
+    update = blockchain.add_block(child_block(side, proposer="side"))
+    assert update.status == REORGANIZED
+    assert [block.hash for block in update.reverted] == [main.hash]
+    assert [block.index for block in update.applied] == [1, 2]
+    assert blockchain.tree.has_block(main)
+
+def test_invalid_block_only_discards_itself_and_its_descendants(signed_tx, child_block):
+    blockchain, wallet = Blockchain(), Wallet()
+    genesis = blockchain.last_block
+    blockchain.add_block(child_block(genesis, proposer="main"))
+    side = child_block(genesis, proposer="side")
+    blockchain.add_block(side)
+
+    bad = child_block(side, [signed_tx("forged", wallet, forged=True)], proposer="side")
+    assert blockchain.add_block(bad).status == INVALID
+    assert blockchain.tree.has_block(side) and not blockchain.tree.has_block(bad)
+
+    # The valid part of the branch can still win with another child.
+    good = child_block(side, [signed_tx("real", wallet)], proposer="side", timestamp=9.0)
+    assert blockchain.add_block(good).status == REORGANIZED
+    assert blockchain.last_block.hash == good.hash
+
+def test_malformed_block_is_invalid(child_block):
+    blockchain = Blockchain()
+    block = child_block(blockchain.last_block)
+    malformed = Block(-1, [], block.previous_hash, "a", timestamp=1.0, a_hash=block.hash, merkle_root=block.merkle_root)
+    assert blockchain.add_block(malformed).status == INVALID
+
+def test_no_reorganization_below_the_finalized_height(child_block):
+    blockchain = Blockchain()
+    genesis = blockchain.last_block
+    main = child_block(genesis, proposer="main")
+    blockchain.add_block(main)
+    blockchain.finalize(main.index)
+
+    side = child_block(genesis, proposer="side")
+    blockchain.add_block(side)
+    assert blockchain.add_block(child_block(side, proposer="side")).status == INVALID
+    assert blockchain.last_block.hash == main.hash
@@ -0,0 +1,148 @@
+# tests/test_blockchain.py
+
+import asyncio
+import hashlib
+import os
+import pytest
+from core.block import Block
+from core.block_store import INDEX_ENTRY, INDEX_NAME, RECORD_HEADER, SEGMENT_NAME, BlockStore
+from core.blockchain import Blockchain
+from core.mempool import Mempool
+from core.signed_transaction import SignedTransaction
+from core.wallet import Wallet
+from network.admission import ADMITTED, MALFORMED, MempoolAdmission
+
+@pytest.mark.parametrize("fee", ["lots", -1, 1.5, True])
+def test_transaction_with_bad_fee_is_rejected_before_blocks(fee, signed_tx):
+    payload = signed_tx("fee", fee=fee)
+    with pytest.raises(ValueError):
+        SignedTransaction.of(payload)
+    with pytest.raises(ValueError):
+        Block(1, [payload], "00" * 32, "proposer")
+
+def test_bad_fee_only_fails_its_own_transaction(signed_tx):
+    blockchain = Blockchain()
+    wallet = Wallet()
+    batch = [({"type": "NEW_TRANSACTION", "payload": signed_tx("good", wallet)}, None),
+             ({"type": "NEW_TRANSACTION", "payload": signed_tx("bad", wallet, fee="lots")}, None)]
+    statuses = asyncio.run(MempoolAdmission(blockchain, None).process_batch(batch))
+    assert statuses == [ADMITTED, MALFORMED]
+    assert len(blockchain.mempool) == 1
+
+def test_signatures_verified_into_the_mempool_are_not_checked_again(signed_tx, child_block):
+    blockchain = Blockchain()
+    genesis = blockchain.last_block
+    payload = signed_tx("relayed")
+    blockchain.mempool.add(payload)
+    # Decoded from the wire, as a peer's block is: equal transactions, new objects.
+    block = Block.from_dict(child_block(genesis, [payload, signed_tx("unseen")]).to_dict())
+    forged = child_block(genesis, [dict(payload, signature_hex=signed_tx("other")["signature_hex"])])
+
+    result = blockchain.validate_blocks([block], genesis)
+    assert result and result.signatures == 1
+    assert blockchain.validator.validate([block], genesis).signatures == 2
+    assert not blockchain.validate_blocks([forged], genesis)
+
+# --- BlockStore ---
+
+def record(height: int) -> tuple[bytes, bytes]:
+    payload = f"block {height}".encode() * 10
+    return payload, hashlib.sha256(payload).digest()
+
+def filled_store(directory, count: int, **kwargs) -> BlockStore:
+    store = BlockStore(str(directory), **kwargs)
+    for height in range(count):
+        assert store.append(*record(height)) == height
+    return store
+
+def test_block_store_reopens_with_every_block(tmp_path):
+    filled_store(tmp_path, 5, segment_size=200).close()
+    store = BlockStore(str(tmp_path), segment_size=200)
+    assert len(store) == 5
+    assert [store.read(height) for height in range(5)] == [record(height)[0] for height in range(5)]
+    assert store.height_of(record(3)[1]) == 3
+    store.close()
+
+def test_block_store_cuts_a_torn_record(tmp_path):
+    filled_store(tmp_path, 3).close()
+    segment = tmp_path / SEGMENT_NAME.format(0)
+    payload, block_hash = record(3)
+    with open(segment, 'ab') as f:
+        f.write(RECORD_HEADER.pack(len(payload), 0, block_hash) + payload[:5])
+    store = BlockStore(str(tmp_path))
+    assert len(store) == 3
+    assert store.append(payload, block_hash) == 3 and store.read(3) == payload
+    store.close()
+
+def test_block_store_drops_index_entries_without_data(tmp_path):
+    filled_store(tmp_path, 3).close()
+    segment = tmp_path / SEGMENT_NAME.format(0)
+    os.truncate(segment, os.path.getsize(segment) - 4)
+    store = BlockStore(str(tmp_path))
+    assert len(store) == 2 and store.read(1) == record(1)[0]
+    store.close()
+
+def test_block_store_reindexes_records_written_before_a_crash(tmp_path):
+    filled_store(tmp_path, 3).close()
+    index = tmp_path / INDEX_NAME
+    # The last index entry was only half written.
+    os.truncate(index, 2 * INDEX_ENTRY.size + INDEX_ENTRY.size // 2)
+    store = BlockStore(str(tmp_path))
+    assert len(store) == 3 and store.block_hash(2) == record(2)[1]
+    store.close()
+
+# --- Mempool ---
+
+def test_mempool_orders_by_fee_then_age(signed_tx):
+    mempool = Mempool()
+    wallet = Wallet()
+    payloads = [signed_tx(f"fee {fee}", wallet, fee=fee) for fee in (1, 5, 1, 3)]
+    for payload in payloads:
+        assert mempool.add(payload)
+    assert not mempool.add(payloads[0])
+    template = mempool.block_template()
+    assert [tx["transaction_dict"]["fee"] for tx in template] == [5, 3, 1, 1]
+    # Equal fees: the older transaction first.
+    assert [dict(tx) for tx in template[2:]] == [payloads[0], payloads[2]]
+    assert [dict(tx) for tx in mempool.block_template(max_count=2)] == [payloads[1], payloads[3]]
+
+def test_block_template_matches_the_priority_order_after_removals(signed_tx):
+    mempool = Mempool()
+    wallet = Wallet()
+    payloads = [signed_tx(f"tx {i}", wallet, fee=(i * 7) % 5) for i in range(40)]
+    for payload in payloads:
+        mempool.add(payload)
+    txids = [SignedTransaction.of(payload).txid for payload in payloads]
+    mempool.remove(txids[::3])
+    exclude = set(txids[1::4])
+    expected = [tx for tx in mempool.transactions() if tx.txid not in exclude]
+    assert mempool.block_template(max_count=10, exclude=exclude) == expected[:10]
+    assert mempool.block_template(exclude=exclude) == expected
+    best = mempool.transactions()[:3]
+    assert mempool.block_template(max_bytes=sum(tx.size for tx in best)) == best
+
+def test_mempool_evicts_the_lowest_fee_first(signed_tx):
+    mempool = Mempool(max_count=3)
+    wallet = Wallet()
+    for fee in (2, 4, 6):
+        assert mempool.add(signed_tx(f"fee {fee}", wallet, fee=fee))
+    assert not mempool.add(signed_tx("too cheap", wallet, fee=1))
+    assert mempool.add(signed_tx("fee 5", wallet, fee=5))
+    assert sorted(tx["transaction_dict"]["fee"] for tx in mempool.transactions()) == [4, 5, 6]
+    assert mempool.evicted == 2 and len(mempool) == 3
+
+    first, cheaper, better = (signed_tx(text, wallet, fee=fee) for text, fee in (("tx 1", 2), ("tx 2", 1), ("tx 3", 3)))
+    by_size = Mempool(max_bytes=SignedTransaction.of(first).size + SignedTransaction.of(cheaper).size - 1)
+    assert by_size.add(first)
+    assert not by_size.add(cheaper)
+    assert by_size.add(better)
+    assert [tx["transaction_dict"]["fee"] for tx in by_size.transactions()] == [3]
+    assert by_size.total_bytes <= by_size.max_bytes
+
+def test_mempool_rejects_confirmed_transactions(signed_tx):
+    mempool = Mempool()
+    payload = signed_tx("confirmed")
+    mempool.add(payload)
+    txid = mempool.txids()[0]
+    assert mempool.remove([txid], confirmed=True) == 1
+    assert not mempool.add(payload) and mempool.is_known(txid)
@@ -0,0 +1,187 @@
+# tests/test_consensus.py
+
+import asyncio
+import pytest
+from collections import deque
+from consensus.dpol import DPoLConsensus
+from consensus.pbft import COMMIT, PRE_PREPARE, PREPARE, VOTE_VIEW_WINDOW, PBFTEngine, max_faulty, quorum, signing_bytes
+from core import serialization
+from core.blockchain import Blockchain
+from core.wallet import Wallet
+
+class Network:
+    """Delivers consensus messages between in-process engines, encoded as on the wire, until none are left."""
+
+    def __init__(self):
+        self.engines = {}
+        self.queue = deque()
+        self.down = set()
+        self.missed = {}    # address of a down engine -> messages it did not get, in order
+
+    def broadcaster(self, sender: str):
+        async def broadcast(payload: dict):
+            self.queue.append((sender, serialization.encode_value(payload)))
+        return broadcast
+
+    async def settle(self):
+        while self.queue:
+            sender, data = self.queue.popleft()
+            for address, engine in self.engines.items():
+                if address in self.down:
+                    self.missed.setdefault(address, []).append(data)
+                elif address != sender:
+                    await engine.on_message(serialization.decode_value(data))
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_cluster(size: int = 4, **kwargs) -> tuple[Network, list[PBFTEngine]]:
+    wallets = [Wallet() for _ in range(size)]
+    addresses = [wallet.address for wallet in wallets]
+    network = Network()
+    for wallet in wallets:
+        network.engines[wallet.address] = PBFTEngine(wallet, Blockchain(), DPoLConsensus(nodes=addresses, num_delegates=size),
+                                                     broadcast=network.broadcaster(wallet.address), **kwargs)
+    return network, list(network.engines.values())
+
+def sign(wallet: Wallet, payload: dict) -> dict:
+    payload["sender"] = wallet.address
+    payload["signature"] = wallet.sign_bytes(signing_bytes(payload)).hex()
+    return payload
+
+async def commit_one_block(network: Network, engines: list[PBFTEngine], payload: dict):
+    primary = engines[0].next_proposer()
+    block = await network.engines[primary].propose([payload])
+    await network.settle()
+    return block
+
+@pytest.mark.parametrize("size, faulty, needed", [(1, 0, 1), (4, 1, 3), (5, 1, 4), (7, 2, 5), (21, 6, 14)])
+def test_quorum_sizes(size, faulty, needed):
+    assert max_faulty(size) == faulty
+    assert quorum(size) == needed
+    # Two quorums overlap in at least f + 1 delegates.
+    assert 2 * needed - size >= faulty + 1
+
+@pytest.mark.parametrize("down, commits", [(1, True), (2, False)])
+def test_block_commits_only_with_a_quorum(down, commits, signed_tx):
+    async def scenario():
+        network, engines = make_cluster()
+        delegates = engines[0].committee(engines[0].tip.hash)[0]
+        network.down = set(delegates[1:1 + down])
+        block = await commit_one_block(network, engines, signed_tx("pbft test"))
+        return block, [engine for engine in engines if engine.address not in network.down]
+
+    block, live = asyncio.run(scenario())
+    assert all((engine.tip.hash == block.hash) == commits for engine in live)
+    assert all(engine.tip.index == (1 if commits else 0) for engine in live)
+
+def test_view_change_replaces_a_silent_primary(signed_tx):
+    async def scenario():
+        clock = Clock()
+        network, engines = make_cluster(clock=clock, auto_propose=True)
+        delegates = engines[0].committee(engines[0].tip.hash)[0]
+        network.down = {delegates[0]}
+        live = [engine for engine in engines if engine.address not in network.down]
+        payload = signed_tx("waiting for a primary")
+        for engine in live:
+            engine.blockchain.mempool.add(payload)
+            await engine.tick()
+        await network.settle()
+        assert all(engine.tip.index == 0 for engine in live)
+
+        clock.now += live[0].view_timeout + 1
+        for engine in live:
+            await engine.tick()
+        await network.settle()
+        return delegates, live
+
+    delegates, live = asyncio.run(scenario())
+    assert all(engine.view == 1 and engine.stats["view_changes"] == 1 for engine in live)
+    assert all(engine.tip.index == 1 and engine.tip.proposer_address == delegates[1] for engine in live)
+
+def test_commit_certificate_convinces_a_node_that_did_not_vote(signed_tx):
+    async def scenario():
+        network, engines = make_cluster()
+        block = await commit_one_block(network, engines, signed_tx("pbft test"))
+        observer = PBFTEngine(Wallet(), Blockchain(), DPoLConsensus(nodes=list(network.engines), num_delegates=4), broadcast=None)
+        return block, engines, observer
+
+    block, engines, observer = asyncio.run(scenario())
+    assert all(engine.tip.hash == block.hash for engine in engines)
+    certificate = engines[1].certificate(block.hash)
+    assert len(certificate["commits"]) >= 3
+
+    short = dict(certificate, commits=certificate["commits"][:2])
+    assert not observer.verify_certificate(block.index, block.hash, block.previous_hash, short)
+    assert not observer.verify_certificate(block.index, "00" * 32, block.previous_hash, dict(certificate, digest="00" * 32))
+    assert not observer.verify_certificate(block.index, block.hash, block.previous_hash, None)
+    assert observer.verify_certificate(block.index, block.hash, block.previous_hash, certificate)
+    assert observer.certificate(block.hash) is not None
+
+def test_votes_outside_the_committee_or_view_window_create_no_rounds():
+    async def scenario():
+        network, engines = make_cluster()
+        engine, member = engines[0], engines[1].wallet
+        digest = "ab" * 32
+        vote = {"phase": PREPARE, "view": 0, "height": 1, "digest": digest}
+        results = [
+            await engine.on_message(sign(Wallet(), dict(vote))),
+            await engine.on_message(sign(member, dict(vote, view=VOTE_VIEW_WINDOW + 1))),
+            await engine.on_message(sign(member, dict(vote, phase=COMMIT, view=10 ** 9))),
+        ]
+        rounds_after_rejects = len(engine._rounds)
+        results.append(await engine.on_message(sign(member, dict(vote))))
+        return results, rounds_after_rejects, engine
+
+    results, rounds_after_rejects, engine = asyncio.run(scenario())
+    assert results == [False, False, False, True]
+    assert rounds_after_rejects == 0
+    assert list(engine._rounds) == [(1, 0)]
+
+def test_early_proposals_are_parked_per_sender_and_only_the_primarys_is_used(signed_tx):
+    async def scenario():
+        network, engines = make_cluster()
+        observer = PBFTEngine(Wallet(), Blockchain(), DPoLConsensus(nodes=list(network.engines), num_delegates=4), broadcast=None)
+        network.engines[observer.address] = observer
+        network.down = {observer.address}
+        first = await commit_one_block(network, engines, signed_tx("one"))
+
+        # The next primary's proposal reaches the observer before the block it builds on,
+        # after a proposal for the same slot from another delegate.
+        primary = network.engines[engines[0].next_proposer()]
+        second = await primary.propose([signed_tx("two")])
+        proposal = serialization.decode_value(network.queue.popleft()[1])
+        impostor = next(engine for engine in engines if engine is not primary)
+        await observer.on_message(sign(impostor.wallet, {"phase": PRE_PREPARE, "view": 0, "height": 2, "digest": "ab" * 32, "block": {}}))
+        await observer.on_message(proposal)
+        parked = sorted(sender for _, _, sender in observer._future)
+        busy = observer._has_pending_work()
+
+        for data in network.missed.pop(observer.address):
+            await observer.on_message(serialization.decode_value(data))
+        return first, second, observer, parked, busy, [impostor.address, primary.address]
+
+    first, second, observer, parked, busy, senders = asyncio.run(scenario())
+    assert parked == sorted(senders)
+    assert not busy
+    assert observer.tip.hash == first.hash
+    assert observer._rounds[(2, 0)].block.hash == second.hash
+    assert observer._future == {}
+
+def test_view_change_drops_parked_proposals_of_older_views():
+    async def scenario():
+        network, engines = make_cluster()
+        engine, member = engines[0], engines[1].wallet
+        for view in (0, 1):
+            await engine.on_message(sign(member, {"phase": PRE_PREPARE, "view": view, "height": 3, "digest": "ab" * 32, "block": {}}))
+        parked = len(engine._future)
+        await engine._enter_view(1, {})
+        return engine, parked
+
+    engine, parked = asyncio.run(scenario())
+    assert parked == 2
+    assert [key[:2] for key in engine._future] == [(3, 1)]
@@ -0,0 +1,128 @@
+# tests/test_crypto.py
+
+import os
+import pytest
+import subprocess
+import sys
+from core.wallet import Wallet
+from crypto import dilithium_utils, kyber_utils, providers
+
+@pytest.fixture(scope="module")
+def signed_items():
+    """Five valid (public_key, message, signature) items and one whose message was changed."""
+    public_key, secret_key = dilithium_utils.generate_keys()
+    items = [(public_key, f"message {i}".encode(), dilithium_utils.sign(secret_key, f"message {i}".encode())) for i in range(5)]
+    return items + [(public_key, b"tampered", items[0][2])]
+
+# --- Batch verification ---
+
+def test_batch_verification_matches_single_verification(signed_items):
+    expected = [dilithium_utils.verify(*item) for item in signed_items]
+    assert expected == [True] * 5 + [False]
+    assert dilithium_utils.verify_batch(signed_items) == expected
+    assert dilithium_utils.verify_many(signed_items, max_workers=1) == expected
+
+def test_batch_verifier_keeps_the_input_order_across_workers(signed_items):
+    with dilithium_utils.BatchVerifier(max_workers=2, chunk_size=2) as verifier:
+        assert verifier.verify_many(signed_items) == [True] * 5 + [False]
+        assert verifier.verify_many([]) == []
+
+# --- KEM sessions ---
+
+def encrypted(wallet: Wallet, text: str) -> dict:
+    """A message for `wallet` as carried in a transaction: hex ciphertext, nonce and payload."""
+    ciphertext, shared_secret = kyber_utils.encapsulate_key(wallet.encryption_public_key)
+    nonce, payload = kyber_utils.encrypt_message(shared_secret, text)
+    return {"ciphertext": ciphertext.hex(), "nonce": nonce.hex(), "payload": payload.hex()}
+
+def test_kem_session_reuses_shared_secrets_within_its_bound():
+    wallet = Wallet()
+    contents = [encrypted(wallet, f"message {i}") for i in range(3)]
+    items = [(bytes.fromhex(c["ciphertext"]), bytes.fromhex(c["nonce"]), bytes.fromhex(c["payload"])) for c in contents]
+    with kyber_utils.KemSession(wallet.encryption_secret_key, cache_size=2) as session:
+        assert [session.decrypt(*item) for item in items + items[2:]] == ["message 0", "message 1", "message 2", "message 2"]
+        assert (session.hits, session.misses) == (1, 3)
+        # The oldest secret was evicted; reading its message again decapsulates once more.
+        assert session.decrypt(*items[0]) == "message 0"
+        assert (session.hits, session.misses) == (1, 4)
+
+def test_wallet_decrypts_only_its_own_untampered_messages():
+    wallet, other = Wallet(), Wallet()
+    mine = encrypted(wallet, "for me")
+    tampered = dict(mine, payload="00" + mine["payload"][2:])
+    assert wallet.decrypt_message(mine) == "for me"
+    assert wallet.decrypt_message(encrypted(other, "not for me")) is None
+    assert wallet.decrypt_message(tampered) is None
+    assert wallet.decrypt_message({"ciphertext": "zz"}) is None
+    wallet.close()
+
+def test_batch_decryption_on_workers_matches_the_session():
+    wallet = Wallet()
+    contents = [encrypted(wallet, f"batch {i}") for i in range(2 * kyber_utils.DEFAULT_DECRYPT_CHUNK_SIZE + 3)]
+    contents[5] = {"nonce": "00"}
+    expected = [None if i == 5 else f"batch {i}" for i in range(len(contents))]
+    try:
+        assert wallet.decrypt_messages(contents, max_workers=2) == expected
+        # The workers' shared secrets are cached by the session.
+        misses = wallet.kem_session.misses
+        assert wallet.decrypt_messages(contents) == expected
+        assert wallet.kem_session.misses == misses
+    finally:
+        wallet.close()
+
+# --- Provider selection ---
+
+@pytest.fixture
+def restore_selection():
+    """Puts the session's crypto selection back after a test changes it."""
+    saved = providers.selection()
+    yield
+    providers.PROVIDERS.pop("counting", None)
+    providers.configure(*saved)
+
+@pytest.mark.parametrize("signature_algorithm, kem_algorithm", [("Dilithium3", "Kyber768"), ("ML-DSA-87", "ML-KEM-1024")])
+def test_parameter_sets_are_selected_by_configuration(signature_algorithm, kem_algorithm, restore_selection):
+    providers.configure(signature_algorithm=signature_algorithm, kem_algorithm=kem_algorithm)
+    public_size, secret_size, signature_size = providers.SIGNATURE_ALGORITHMS[signature_algorithm]
+    public_key, secret_key = dilithium_utils.generate_keys()
+    signature = dilithium_utils.sign(secret_key, b"sized")
+    assert (len(public_key), len(secret_key), len(signature)) == (public_size, secret_size, signature_size)
+    assert dilithium_utils.verify(public_key, b"sized", signature)
+    kem_public_key, _ = kyber_utils.generate_keys()
+    ciphertext, _ = kyber_utils.encapsulate_key(kem_public_key)
+    assert len(ciphertext) == providers.KEM_ALGORITHMS[kem_algorithm][2]
+    assert providers.describe()["sizes"]["signature"] == signature_size
+
+def test_unknown_providers_and_algorithms_are_rejected(restore_selection):
+    before = providers.selection()
+    for options in ({"provider": "nope"}, {"signature_algorithm": "Dilithium4"}, {"kem_algorithm": "Kyber256"}):
+        with pytest.raises(ValueError):
+            providers.configure(**options)
+    assert providers.selection() == before
+
+def test_simulated_provider_repeats_keys_for_a_seed(restore_selection):
+    keys = []
+    for seed in (7, 8, 7):
+        providers.configure(provider=providers.PROVIDER_SIMULATED, seed=seed)
+        keys.append(dilithium_utils.generate_keys())
+    assert keys[0] == keys[2] and keys[0] != keys[1]
+
+def test_registered_providers_load_on_first_use(restore_selection):
+    created = []
+
+    def counting(seed):
+        created.append(seed)
+        return providers.SimulatedProvider(seed)
+    providers.register_provider("counting", counting)
+    generation = providers.generation()
+    providers.configure(provider="counting", seed=3)
+    assert created == [] and providers.generation() > generation
+    public_key, secret_key = dilithium_utils.generate_keys()
+    assert dilithium_utils.verify(public_key, b"loaded", dilithium_utils.sign(secret_key, b"loaded"))
+    assert created == [3]
+
+def test_importing_the_crypto_modules_does_not_load_liboqs():
+    code = "import sys, consensus.dpol, core.wallet, crypto.dilithium_utils, crypto.kyber_utils; print('oqs' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output == "False\n"
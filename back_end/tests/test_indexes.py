@@ -0,0 +1,82 @@
+# tests/test_indexes.py
+
+from core.block_tree import REORGANIZED
+from core.blockchain import Blockchain
+from core.inbox import Inbox
+from core.public_ledger import PublicKeyLedger
+from core.wallet import Wallet
+
+def add_message(signed_tx, blockchain: Blockchain, sender: Wallet, recipient: Wallet, text: str):
+    """Mines a block holding one message from `sender` to `recipient`."""
+    payload = signed_tx(text, wallet=sender, recipient=recipient)
+    assert blockchain.add_transaction(payload["transaction_dict"], payload["signature_hex"])
+    return blockchain.mine_block(sender.address)
+
+def test_inbox_snapshot_resumes_from_its_height(tmp_path, signed_tx):
+    blockchain, sender, recipient = Blockchain(), Wallet(), Wallet()
+    for i in range(3):
+        add_message(signed_tx, blockchain, sender, recipient, f"message {i}")
+    inbox = Inbox(snapshot_path=str(tmp_path / "inbox.json"))
+    inbox.update_from_chain(blockchain)
+    inbox.save_snapshot()
+
+    add_message(signed_tx, blockchain, sender, recipient, "after the snapshot")
+    restored = Inbox(snapshot_path=str(tmp_path / "inbox.json"))
+    assert restored.load_snapshot()
+    assert restored.applied_height == 3 and restored.message_count(recipient.address) == 3
+    assert restored.update_from_chain(blockchain) == 1
+    messages, _ = restored.page(blockchain, recipient, limit=10)
+    assert [message["message"] for message in messages] == ["after the snapshot", "message 2", "message 1", "message 0"]
+
+def test_inbox_snapshot_off_the_chain_is_rebuilt(tmp_path, signed_tx):
+    blockchain, sender, recipient = Blockchain(), Wallet(), Wallet()
+    add_message(signed_tx, blockchain, sender, recipient, "kept")
+    inbox = Inbox(snapshot_path=str(tmp_path / "inbox.json"))
+    inbox.update_from_chain(blockchain)
+    inbox.save_snapshot()
+
+    other = Blockchain()
+    add_message(signed_tx, other, sender, recipient, "elsewhere")
+    add_message(signed_tx, other, sender, recipient, "elsewhere too")
+    restored = Inbox(snapshot_path=str(tmp_path / "inbox.json"))
+    assert restored.load_snapshot()
+    assert restored.update_from_chain(other) == 3
+    assert restored.message_count(recipient.address) == 2
+
+def test_ledger_undoes_blocks_dropped_by_a_reorg(signed_tx, child_block):
+    blockchain, first, second = Blockchain(), Wallet(), Wallet()
+    genesis = blockchain.last_block
+    blockchain.add_block(child_block(genesis, [signed_tx(wallet=first, tx_type="key_registration", username="alice")], "main"))
+    by_delta, by_rescan = PublicKeyLedger(), PublicKeyLedger()
+    for ledger in (by_delta, by_rescan):
+        ledger.update_from_chain(blockchain)
+        assert ledger.get_keys_for_user("alice")["address"] == first.address
+
+    side = child_block(genesis, [signed_tx(wallet=second, tx_type="key_registration", username="bob")], "side")
+    blockchain.add_block(side)
+    update = blockchain.add_block(child_block(side, [signed_tx(wallet=second, tx_type="key_registration", username="alice")], "side"))
+    assert update.status == REORGANIZED
+
+    by_delta.apply_delta(update.reverted, update.applied)
+    assert by_rescan.update_from_chain(blockchain) == 2
+    for ledger in (by_delta, by_rescan):
+        assert ledger.applied_height == 2 and ledger.applied_hash == blockchain.last_block.hash
+        assert ledger.get_keys_for_user("alice")["address"] == second.address
+        assert first.address not in ledger.usernames
+        assert ledger.usernames[second.address] == "alice"
+        assert set(ledger.users) == {"alice", "bob"}
+
+def test_ledger_rebuilds_when_the_reorg_is_deeper_than_its_undo_data(signed_tx, child_block):
+    blockchain, wallet = Blockchain(), Wallet()
+    genesis = blockchain.last_block
+    blockchain.add_block(child_block(genesis, [signed_tx(wallet=wallet, tx_type="key_registration", username="carol")], "main"))
+    ledger = PublicKeyLedger()
+    ledger.update_from_chain(blockchain)
+    # A snapshot restore keeps no undo data, so a reorg below it has to replay the chain.
+    ledger.restore_tracking_state(ledger.tracking_state())
+
+    side = child_block(genesis, [], "side")
+    blockchain.add_block(side)
+    blockchain.add_block(child_block(side, [], "side"))
+    assert ledger.update_from_chain(blockchain) == 3
+    assert ledger.get_keys_for_user("carol") is None
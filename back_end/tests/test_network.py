@@ -0,0 +1,289 @@
+# tests/test_network.py
+
+import asyncio
+import pytest
+import zlib
+from types import SimpleNamespace
+from consensus.dpol import DPoLConsensus
+from core import serialization
+from core.block import Block
+from core.blockchain import Blockchain
+from core.public_ledger import PublicKeyLedger
+from core.signed_transaction import SignedTransaction
+from core.wallet import Wallet
+from network import framing
+from network.admission import ADMITTED, BUSY, DUPLICATE, INVALID_SIGNATURE, MALFORMED, MempoolAdmission, PooledAdmission
+from network.framing import FrameError
+from network.node import P2PNode
+from network.relay import MAX_COMPACT_BLOCK_TXS, MAX_PARTIAL_BLOCKS_PER_PEER, SHORT_ID_BYTES, short_id, short_id_index
+
+class FakeWriter:
+    """Stands in for a peer's StreamWriter; only the peer address is read."""
+
+    def __init__(self, peername=("127.0.0.1", 1)):
+        self.peername = peername
+
+    def get_extra_info(self, name):
+        return self.peername if name == 'peername' else None
+
+def make_node(**kwargs) -> P2PNode:
+    return P2PNode("127.0.0.1", 0, Wallet(), Blockchain(), DPoLConsensus(nodes=[]), PublicKeyLedger(), **kwargs)
+
+def record_relay(node: P2PNode, *peers) -> list:
+    """
+    Connects stand-in peers and replaces the relay's sender. Returns the (peer, type, payload)
+    messages it sends, the payloads encoded and decoded as on the wire.
+    """
+    for peer_addr in peers:
+        node.peers[peer_addr] = SimpleNamespace(writer=None)
+    sent = []
+
+    async def send(peer_addr, msg_type, payload):
+        sent.append((peer_addr, msg_type, serialization.decode_value(serialization.encode_value(payload))))
+        return True
+    node.relay._send = send
+    return sent
+
+def txid_of(payload: dict) -> str:
+    return SignedTransaction.of(payload).txid
+
+def test_forged_signature_does_not_hide_the_valid_transaction(signed_tx):
+    async def scenario():
+        node = make_node()
+        node.admission.start()
+        try:
+            payload = signed_tx("hello")
+            forged = {"id": "1", "type": "NEW_TRANSACTION", "payload": dict(payload, signature_hex="00" * (len(payload["signature_hex"]) // 2))}
+            valid = {"id": "2", "type": "NEW_TRANSACTION", "payload": payload}
+            for message in (forged, valid, dict(valid, id="3")):
+                await node._handle_message(message, FakeWriter())
+                while node.admission.backlog():
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.05)
+            return node
+        finally:
+            await node.admission.stop()
+
+    node = asyncio.run(scenario())
+    assert len(node.blockchain.mempool) == 1
+    assert node._duplicate_messages.value == 1
+
+def test_short_id_index_matches_short_id():
+    block_hash = "ab" * 32
+    txids = [f"{i:064x}" for i in range(50)]
+    index = short_id_index(block_hash, txids)
+    assert all(index[short_id(block_hash, txid)] == txid for txid in txids)
+
+# --- Inventory relay ---
+
+def test_inv_requests_only_missing_ids_and_retries_another_announcer(signed_tx):
+    async def scenario():
+        node = make_node()
+        sent = record_relay(node, "a", "b")
+        known = signed_tx("known")
+        node.blockchain.mempool.add(known)
+        first, second = "11" * 32, "22" * 32
+        await node.relay.on_inv("a", {"tx": [txid_of(known), first, 5]})
+        await node.relay.on_inv("b", {"tx": [first, second]})
+        # "a" leaves before answering: its request goes to the other peer that announced the id.
+        del node.peers["a"]
+        node.relay.on_peer_disconnected("a")
+        await node.relay.tick()
+        return node, sent, first, second
+
+    node, sent, first, second = asyncio.run(scenario())
+    assert sent == [("a", "GETDATA", {"tx": [first]}), ("b", "GETDATA", {"tx": [second]}), ("b", "GETDATA", {"tx": [first]})]
+    assert node.relay.stats["tx_request_timeouts"] == 1
+
+def test_tx_bodies_are_taken_only_from_the_peer_asked(signed_tx):
+    async def scenario():
+        node = make_node()
+        record_relay(node, "a", "b")
+        payload = signed_tx("asked for")
+        await node.relay.on_inv("a", {"tx": [txid_of(payload)]})
+        return [node.relay.on_tx(peer_addr, {"txs": [payload]}) for peer_addr in ("b", "a", "a")], payload
+
+    (from_other, from_asked, again), payload = asyncio.run(scenario())
+    assert from_other == [] and again == []
+    assert from_asked == [{"type": "NEW_TRANSACTION", "payload": payload}]
+
+def test_announcements_and_getdata_skip_what_a_peer_has(signed_tx):
+    async def scenario():
+        node = make_node()
+        sent = record_relay(node, "a", "b")
+        payload = signed_tx("pending")
+        node.blockchain.mempool.add(payload)
+        txid = txid_of(payload)
+        for _ in range(2):
+            node.relay.announce_transaction(txid, exclude="a")
+            await node.relay.flush_announcements()
+        await node.relay.handle_getdata("c", {"tx": [txid, "ff" * 32]})
+        return sent, payload, txid
+
+    sent, payload, txid = asyncio.run(scenario())
+    assert sent == [("b", "INV", {"tx": [txid]}), ("c", "TX", {"txs": [payload]})]
+
+def test_compact_block_is_rebuilt_from_the_mempool_and_the_missing_transactions(signed_tx):
+    async def scenario():
+        sender, receiver = make_node(), make_node()
+        to_receiver, to_sender = record_relay(sender, "receiver"), record_relay(receiver, "sender")
+        payloads = [signed_tx(f"block tx {i}") for i in range(3)]
+        block = Block(1, payloads, sender.blockchain.last_block.hash, "p")
+        assert sender.blockchain.add_block(block).changed
+        for payload in payloads:
+            sender.relay._known("receiver").add(txid_of(payload))
+        receiver.blockchain.mempool.add(payloads[0])
+        receiver.blockchain.mempool.add(payloads[2])
+
+        await receiver.relay.on_compact_block("sender", serialization.decode_value(serialization.encode_value(
+            sender.relay.compact_block(block, "receiver"))))
+        _, msg_type, request = to_sender.pop()
+        await sender.relay.handle_get_block_txn("receiver", request)
+        await receiver.relay.on_block_txn("sender", to_receiver.pop()[2])
+        return block, receiver, msg_type, request
+
+    block, receiver, msg_type, request = asyncio.run(scenario())
+    assert msg_type == "GET_BLOCK_TXN" and request["indexes"] == [1]
+    assert receiver.blockchain.last_block.hash == block.hash
+    assert receiver.relay.stats["compact_blocks_rebuilt"] == 1
+    assert len(receiver.blockchain.mempool) == 0
+
+def test_compact_block_limits():
+    async def scenario():
+        node = make_node()
+        sent = record_relay(node)
+        tip = node.blockchain.last_block
+        # More short ids than any block may hold: ignored before the header is even hashed.
+        await node.relay.on_compact_block("peer", {"header": {}, "short_ids": ["00"] * (MAX_COMPACT_BLOCK_TXS + 1)})
+        # Blocks whose transactions are all missing wait for GET_BLOCK_TXN answers, a few per peer.
+        for i in range(MAX_PARTIAL_BLOCKS_PER_PEER + 2):
+            header = {'index': tip.index + 1, 'timestamp': float(i), 'previous_hash': tip.hash, 'proposer_address': "p",
+                      'merkle_root': "00" * 32, 'tx_count': 1}
+            header['hash'] = Block.hash_header(header)
+            await node.relay.on_compact_block("peer", {"header": header, "short_ids": ["00" * SHORT_ID_BYTES]})
+        # A malformed header is ignored instead of raising.
+        await node.relay.on_compact_block("peer", {"header": {**header, 'tx_count': -1}, "short_ids": []})
+        return node, sent
+
+    node, sent = asyncio.run(scenario())
+    assert len(node.relay._partial_blocks) == MAX_PARTIAL_BLOCKS_PER_PEER
+    assert [msg_type for _, msg_type, _ in sent] == ["GET_BLOCK_TXN"] * MAX_PARTIAL_BLOCKS_PER_PEER
+
+def test_uncertified_blocks_and_unverified_votes_are_not_accepted_or_relayed():
+    async def scenario():
+        node = make_node(require_certificates=True)
+        relayed = []
+
+        async def fake_broadcast(message, exclude_writer=None):
+            relayed.append(message["type"])
+        node.broadcast = fake_broadcast
+        tip = node.blockchain.last_block
+        block = Block(tip.index + 1, [], tip.hash, "p", timestamp=1.0)
+        await node._handle_message({"id": "1", "type": "NEW_BLOCK", "payload": block.to_dict()}, FakeWriter())
+        vote = {"phase": "PREPARE", "view": 0, "height": 1, "digest": block.hash, "sender": Wallet().address, "signature": "00"}
+        await node._handle_message({"id": "2", "type": "PBFT", "payload": vote}, FakeWriter())
+        return node, relayed
+
+    node, relayed = asyncio.run(scenario())
+    assert node.blockchain.last_block.index == 0
+    assert relayed == []
+
+# --- Transaction admission ---
+
+def test_admission_verifies_a_burst_in_bounded_batches(signed_tx):
+    async def scenario():
+        admission = MempoolAdmission(Blockchain(), None, max_batch_size=8)
+        batch_sizes = []
+        process_batch = admission.process_batch
+
+        async def recording(batch):
+            batch_sizes.append(len(batch))
+            return await process_batch(batch)
+        admission.process_batch = recording
+        payloads = [signed_tx(f"burst {i}") for i in range(20)]
+        payloads += [payloads[0], signed_tx("forged", forged=True), {"transaction_dict": {}, "signature_hex": "00"}]
+        admission.start()
+        try:
+            statuses = await asyncio.gather(*(admission.admit({"type": "NEW_TRANSACTION", "payload": payload}) for payload in payloads))
+        finally:
+            await admission.stop()
+        return admission, statuses, batch_sizes
+
+    admission, statuses, batch_sizes = asyncio.run(scenario())
+    assert statuses == [ADMITTED] * 20 + [DUPLICATE, INVALID_SIGNATURE, MALFORMED]
+    assert len(admission.blockchain.mempool) == 20
+    assert sum(batch_sizes) == 23 and max(batch_sizes) <= 8 and len(batch_sizes) <= 4
+
+def test_admission_turns_transactions_away_when_its_queue_is_full(signed_tx):
+    async def scenario():
+        # Not started: nothing leaves the queue.
+        admission = MempoolAdmission(Blockchain(), None, max_queued=2)
+        message = {"type": "NEW_TRANSACTION", "payload": signed_tx("queued")}
+        accepted = [admission.submit(message) for _ in range(3)]
+        return admission, accepted, await admission.admit(message)
+
+    admission, accepted, status = asyncio.run(scenario())
+    assert accepted == [True, True, False]
+    assert status == BUSY
+    assert admission.dropped == 2 and admission.backlog() == 2
+
+def test_validation_pool_drops_frames_over_its_waiting_limit():
+    async def scenario():
+        # Not started: no worker takes frames, so they all stay waiting.
+        admission = PooledAdmission(Blockchain(), 1, max_waiting_frames=2)
+        admission.pool.loop = asyncio.get_running_loop()
+        return admission, [admission.submit_frame(b"frame", "NEW_TRANSACTION") for _ in range(3)]
+
+    admission, accepted = asyncio.run(scenario())
+    assert accepted == [True, True, False]
+    assert admission.dropped == 1 and admission.pool.stats["dropped"] == 1
+    assert admission.backlog() == 2
+
+# --- Framing ---
+
+LIMITS = framing.message_limits(max_block_bytes=1024 * 1024, blocks_per_request=16, pipeline_depth=2)
+
+def read_frame(data: bytes):
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await framing.read_frame(reader)
+    return asyncio.run(scenario())
+
+def test_frames_round_trip_plain_and_compressed():
+    message = {"id": "1", "type": "INV", "payload": {"txids": ["ab" * 32] * 2000}}
+    plain = framing.encode_frame(message)
+    compressed = framing.compress_frame(plain)
+    assert compressed is not None and len(compressed) < len(plain)
+    for data in (bytes(plain), compressed):
+        payload, is_compressed = read_frame(data)
+        assert is_compressed == (data is compressed)
+        msg_type, _, decoded = framing.read_message(payload, is_compressed, LIMITS)
+        assert (msg_type, decoded) == ("INV", message)
+
+def test_oversized_frame_header_is_rejected_before_the_payload():
+    header = (framing.MAX_FRAME_BYTES + 1).to_bytes(framing.HEADER_SIZE, 'big')
+    with pytest.raises(FrameError):
+        read_frame(header)
+
+def test_message_type_limits():
+    small = framing.encode_frame({"id": "1", "type": "STATUS", "payload": {"height": 1}})
+    assert framing.open_frame(small[framing.HEADER_SIZE:], False, LIMITS)[0] == "STATUS"
+    big = framing.encode_frame({"id": "1", "type": "STATUS", "payload": {"padding": "x" * LIMITS["STATUS"]}})
+    with pytest.raises(FrameError):
+        framing.open_frame(big[framing.HEADER_SIZE:], False, LIMITS)
+    # Unknown types get the default limit, compressed or not.
+    unknown = framing.encode_frame({"id": "1", "type": "UNKNOWN", "payload": "x" * framing.DEFAULT_MAX_MESSAGE_BYTES})
+    with pytest.raises(FrameError):
+        framing.open_frame(framing.compress_frame(unknown)[framing.HEADER_SIZE:], True, LIMITS)
+
+def test_decompression_bombs_are_rejected():
+    bomb = zlib.compress(b"\x00" * (framing.MAX_FRAME_BYTES + 1), 1)
+    assert len(bomb) < 1024 * 1024
+    with pytest.raises(FrameError):
+        framing.decompress(bomb)
+    with pytest.raises(FrameError):
+        framing.decompress(b"not zlib at all")
+    with pytest.raises(FrameError):
+        framing.decompress(zlib.compress(b"truncated" * 100)[:-4])
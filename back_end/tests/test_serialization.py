@@ -0,0 +1,119 @@
+# tests/test_serialization.py
+
+import pytest
+from core import merkle, serialization
+from core.block import Block
+from core.serialization import SerializationError
+
+HEADER = {
+    'index': 7,
+    'timestamp': 1700000000.5,
+    'previous_hash': "ab" * 32,
+    'proposer_address': "cd" * 32,
+    'merkle_root': "ef" * 32,
+    'tx_count': 3,
+}
+
+def test_values_round_trip():
+    value = {"none": None, "flags": [True, False], "int": -2 ** 63, "float": 0.1, "text": "héllo",
+             "hex": "00ff" * 16, "odd hex": "abc", "bytes": b"\x00\x01", "nested": {"list": [1, [2, {"b": ""}]]}}
+    assert serialization.decode_value(serialization.encode_value(value)) == value
+    assert serialization.encode_value({"b": 1, "a": 2}) == serialization.encode_value({"a": 2, "b": 1})
+
+def test_transactions_and_blocks_round_trip(signed_tx):
+    transactions = [signed_tx(f"tx {i}", fee=3) for i in range(3)]
+    tx_dict = transactions[0]["transaction_dict"]
+    assert serialization.decode_transaction(serialization.encode_transaction(tx_dict)) == tx_dict
+    assert serialization.decode_signed_transaction(serialization.encode_signed_transaction(transactions[0])) == transactions[0]
+
+    block = Block(5, transactions, "ab" * 32, "cd" * 32, timestamp=12.5)
+    decoded = Block.from_dict(serialization.decode_block(serialization.encode_block(block)))
+    assert decoded.hash == block.hash and decoded.is_valid()
+    assert [dict(tx) for tx in decoded.transactions] == transactions
+
+@pytest.mark.parametrize("data", [
+    b"",
+    bytes([serialization.FORMAT_VERSION + 1, serialization.TAG_NONE]),
+    bytes([serialization.FORMAT_VERSION, 0xEE]),
+    bytes([serialization.FORMAT_VERSION, serialization.TAG_INT, 0, 0]),
+    bytes([serialization.FORMAT_VERSION, serialization.TAG_LIST, 0xFF, 0xFF, 0xFF, 0xFF]),
+    bytes([serialization.FORMAT_VERSION, serialization.TAG_STR, 0, 0, 0, 9]) + b"short",
+    serialization.encode_value([1, 2]) + b"\x00",
+])
+def test_malformed_values_raise_serialization_error(data):
+    with pytest.raises(SerializationError):
+        serialization.decode_value(data)
+
+def test_malformed_messages_and_blocks_raise_serialization_error(signed_tx):
+    with pytest.raises(SerializationError):
+        serialization.decode_message(serialization.encode_value(["not", "a", "dict"]))
+    encoded = serialization.encode_block(Block(1, [signed_tx("cut")], "ab" * 32, "cd" * 32, timestamp=1.0))
+    with pytest.raises(SerializationError):
+        serialization.decode_block(encoded[:-1])
+    with pytest.raises(SerializationError):
+        serialization.encode_value({1: "non-string key"})
+
+def nested_lists(depth: int) -> bytes:
+    return bytes([serialization.TAG_LIST, 0, 0, 0, 1]) * depth + bytes([serialization.TAG_NONE])
+
+@pytest.mark.parametrize("depth", [serialization.MAX_NESTING_DEPTH + 1, 5000])
+def test_deeply_nested_values_raise_serialization_error(depth):
+    with pytest.raises(SerializationError):
+        serialization.decode_value(bytes([serialization.FORMAT_VERSION]) + nested_lists(depth))
+    # A message whose payload is skipped while looking for its type.
+    message = bytes([serialization.FORMAT_VERSION, serialization.TAG_DICT, 0, 0, 0, 2, 0, 0, 0, 1]) + b"a" + nested_lists(depth)
+    with pytest.raises(SerializationError):
+        serialization.message_type(message)
+
+def test_nesting_up_to_the_limit_decodes():
+    value = None
+    for _ in range(serialization.MAX_NESTING_DEPTH):
+        value = [value]
+    assert serialization.decode_value(serialization.encode_value(value)) == value
+
+@pytest.mark.parametrize("count", range(1, 10))
+def test_merkle_proofs_verify_every_leaf(count):
+    leaves = [merkle.leaf_hash(bytes([i])) for i in range(count)]
+    root = merkle.merkle_root(leaves)
+    for index, leaf in enumerate(leaves):
+        proof = merkle.merkle_proof(leaves, index)
+        assert merkle.verify_proof(leaf, index, count, proof, root)
+        assert not merkle.verify_proof(merkle.leaf_hash(b"other"), index, count, proof, root)
+        if count > 1:
+            assert not merkle.verify_proof(leaf, (index + 1) % count, count, proof, root)
+            assert not merkle.verify_proof(leaf, index, count, proof[:-1], root)
+
+def test_block_inclusion_proofs(signed_tx):
+    transactions = [signed_tx(f"tx {i}") for i in range(5)]
+    block = Block(1, transactions, "ab" * 32, "cd" * 32, timestamp=1.0)
+    header = block.header()
+    for tx_index, payload in enumerate(transactions):
+        assert Block.verify_inclusion(header, payload, tx_index, block.inclusion_proof(tx_index))
+    proof = block.inclusion_proof(2)
+    assert not Block.verify_inclusion(header, transactions[3], 2, proof)
+    assert not Block.verify_inclusion({**header, 'tx_count': 6}, transactions[2], 2, proof)
+
+def test_header_hash_is_deterministic():
+    assert serialization.encode_block_header(HEADER) == serialization.encode_block_header(dict(HEADER))
+    assert Block.hash_header(HEADER) != Block.hash_header({**HEADER, 'tx_count': 4})
+
+@pytest.mark.parametrize("field, value", [
+    ('index', -1),
+    ('index', 2 ** 64),
+    ('index', "7"),
+    ('index', 7.0),
+    ('tx_count', -1),
+    ('tx_count', 2 ** 32),
+    ('tx_count', None),
+    ('tx_count', True),
+    ('merkle_root', "ef" * 31),
+    ('merkle_root', "EF" * 32),
+    ('merkle_root', 5),
+])
+def test_malformed_header_raises_serialization_error(field, value):
+    with pytest.raises(SerializationError):
+        serialization.encode_block_header({**HEADER, field: value})
+
+def test_malformed_header_never_verifies():
+    header = {**HEADER, 'tx_count': -1, 'hash': "00" * 32}
+    assert not Block.verify_inclusion(header, {'transaction_dict': {}, 'signature_hex': ""}, 0, [])
@@ -0,0 +1,133 @@
+# tests/test_sync.py
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from consensus.dpol import DPoLConsensus
+from core.block import Block
+from core.blockchain import Blockchain
+from core.public_ledger import PublicKeyLedger
+from core.wallet import Wallet
+from network.node import P2PNode
+
+def make_node(height: int = 0, **kwargs) -> P2PNode:
+    blockchain = Blockchain()
+    for _ in range(height):
+        tip = blockchain.last_block
+        blockchain.chain.append(Block(tip.index + 1, [], tip.hash, "p", timestamp=tip.index + 1.0))
+    return P2PNode("127.0.0.1", 0, Wallet(), blockchain, DPoLConsensus(nodes=[]), PublicKeyLedger(), **kwargs)
+
+def record_sends(node: P2PNode) -> list:
+    """Replaces the node's ChainSync sender; returns the (peer, type, payload) requests it makes."""
+    sent = []
+
+    async def send(peer_addr, msg_type, payload):
+        sent.append((peer_addr, msg_type, payload))
+        return True
+    node.sync._send = send
+    return sent
+
+def record_responses(node: P2PNode) -> list:
+    """Replaces the node's send_message; returns the messages it answers with."""
+    responses = []
+
+    async def send_message(writer, message):
+        responses.append(message)
+    node.send_message = send_message
+    return responses
+
+async def serve(server: P2PNode, client: P2PNode, requests: list):
+    """Answers the client's requests from the server until the client stops asking."""
+    handlers = {"GET_HEADERS": (server.sync.handle_get_headers, client.sync.on_headers),
+                "GET_BLOCKS": (server.sync.handle_get_blocks, client.sync.on_blocks)}
+    responses = record_responses(server)
+    while requests:
+        peer_addr, msg_type, payload = requests.pop(0)
+        handle, deliver = handlers[msg_type]
+        await handle(payload, None)
+        await deliver(peer_addr, responses.pop()["payload"])
+
+def test_headers_first_sync_catches_up_in_pages():
+    async def scenario():
+        server, client = make_node(height=45), make_node(height=3)
+        client.sync.page_size, client.sync.blocks_per_request = 10, 4
+        server.sync.page_size = 10
+        client.peers["server"] = SimpleNamespace(writer=None)
+        requests = record_sends(client)
+        await client.sync.on_peer_status("server", server.blockchain.last_block.index, server.blockchain.last_block.hash)
+        await serve(server, client, requests)
+        return server, client
+
+    server, client = asyncio.run(scenario())
+    assert client.blockchain.last_block.hash == server.blockchain.last_block.hash
+    assert not client.sync.syncing
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"fork_height": "0", "headers": []},
+    {"fork_height": True, "headers": []},
+    {"fork_height": -1, "headers": []},
+    {"fork_height": 0, "headers": {}},
+    {"fork_height": 0, "headers": ["not a header"]},
+])
+def test_malformed_headers_abort_and_sync_moves_to_another_peer(payload):
+    async def scenario():
+        node = make_node()
+        sent = record_sends(node)
+        await node.sync.on_peer_status("a", 5, "aa" * 32)
+        await node.sync.on_peer_status("b", 4, "bb" * 32)
+        await node.sync.on_headers("a", payload)
+        return node, sent
+
+    node, sent = asyncio.run(scenario())
+    assert node.sync.sync_peer == "b"
+    assert "a" not in node.sync.peer_tips
+    assert [(peer, msg_type) for peer, msg_type, _ in sent] == [("a", "GET_HEADERS"), ("b", "GET_HEADERS")]
+
+def test_losing_an_idle_sync_peer_ends_the_sync():
+    async def scenario():
+        node = make_node()
+        record_sends(node)
+        await node.sync.on_peer_status("a", 5, "aa" * 32)
+        # The headers arrived but left no body to fetch, e.g. after a failed handler.
+        node.sync.headers_deadline = None
+        await node.sync.on_peer_disconnected("a")
+        stuck = node.sync.syncing
+        await node.sync.on_peer_status("b", 5, "bb" * 32)
+        return node, stuck
+
+    node, stuck = asyncio.run(scenario())
+    assert not stuck
+    assert node.sync.sync_peer == "b"
+
+@pytest.mark.parametrize("msg_type, payload", [
+    ("GET_HEADERS", []),
+    ("GET_HEADERS", {"locator": [[0, "00"]], "limit": "all"}),
+    ("GET_HEADERS", {"locator": [[0, "00"]], "limit": None}),
+    ("GET_BLOCKS", {"start": None, "blocks": [[1, "00"]]}),
+    ("GET_BLOCKS", {"start": [1], "blocks": [[1, "00"]]}),
+])
+def test_malformed_requests_are_ignored(msg_type, payload):
+    async def scenario():
+        node = make_node(height=3)
+        responses = record_responses(node)
+        handle = node.sync.handle_get_headers if msg_type == "GET_HEADERS" else node.sync.handle_get_blocks
+        await handle(payload, None)
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert responses == []
+
+def test_malformed_locator_and_block_entries_are_skipped():
+    async def scenario():
+        node = make_node(height=3)
+        responses = record_responses(node)
+        chain = node.blockchain.chain
+        await node.sync.handle_get_headers({"locator": ["x", [1], [True, chain[1].hash], [2, chain[2].hash]], "limit": 5}, None)
+        await node.sync.handle_get_blocks({"start": 1, "blocks": [[1], ["1", chain[1].hash], [1, chain[1].hash], [9, "00"]]}, None)
+        return node, responses
+
+    node, (headers, blocks) = asyncio.run(scenario())
+    assert headers["payload"]["fork_height"] == 2
+    assert [header["index"] for header in headers["payload"]["headers"]] == [3]
+    assert [block["index"] for block in blocks["payload"]["blocks"]] == [1]
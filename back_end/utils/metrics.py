@@ -0,0 +1,212 @@
+# utils/metrics.py
+
+"""
+Counters, gauges and latency histograms, rendered in the Prometheus text exposition format.
+
+Recording is meant for hot paths: a counter increment is one attribute update and a
+histogram observation is a bisect over fixed bucket bounds plus three updates, so both
+stay well below a microsecond. Gauges for values that already live elsewhere (chain
+height, mempool size, queue depths) take a function that is only called when the metrics
+are rendered, so they cost nothing in between.
+
+REGISTRY holds process-wide metrics such as the crypto timings; every P2PNode keeps its
+own registry, so several nodes can share one process.
+"""
+
+import asyncio
+import bisect
+import functools
+import time
+
+# Latency bucket upper bounds (seconds), from 10 us to 10 s.
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds between event loop lag probes.
+DEFAULT_LAG_INTERVAL = 0.1
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+class Gauge:
+    __slots__ = ("value", "function")
+
+    def __init__(self, function=None):
+        """
+        Args:
+            function (callable): If given, called at render time for the current value.
+        """
+        self.value = 0
+        self.function = function
+
+    def set(self, value: float):
+        self.value = value
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)    # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self, function):
+        """Decorator that observes the duration of every call to `function`."""
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - started)
+        return timed
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bucket bound below which `fraction` of the observations fall (an estimate)."""
+        if not self.count:
+            return 0.0
+        rank, seen = fraction * self.count, 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[position] if position < len(self.bounds) else float('inf')
+        return float('inf')
+
+class MetricFamily:
+    """One named metric with a child per combination of label values."""
+
+    def __init__(self, kind: str, name: str, help_text: str, label_names: tuple, factory):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.factory = factory
+        self.children = {}    # label values tuple -> Counter / Gauge / Histogram
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: tuple, values: tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    """Creates metrics by name and renders them all as Prometheus text."""
+
+    def __init__(self):
+        self.families = {}    # name -> MetricFamily, in registration order
+
+    def _family(self, kind: str, name: str, help_text: str, labels: tuple, factory):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(kind, name, help_text, tuple(labels), factory)
+        elif family.kind != kind or family.label_names != tuple(labels):
+            raise ValueError(f"Metric {name} is already registered as a {family.kind} with labels {family.label_names}.")
+        # Without labels the family has a single child, which is returned directly.
+        return family if labels else family.labels()
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()):
+        """Returns the Counter `name`, or its MetricFamily if it has labels."""
+        return self._family("counter", name, help_text, labels, Counter)
+
+    def gauge(self, name: str, help_text: str, labels: tuple = (), function=None):
+        """Returns the Gauge `name` (evaluating `function` at render time), or its MetricFamily if it has labels."""
+        return self._family("gauge", name, help_text, labels, lambda: Gauge(function))
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), bounds: tuple = LATENCY_BUCKETS):
+        """Returns the Histogram `name`, or its MetricFamily if it has labels."""
+        return self._family("histogram", name, help_text, labels, lambda: Histogram(bounds))
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for family in self.families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, metric in list(family.children.items()):
+                if family.kind != "histogram":
+                    lines.append(f"{family.name}{_format_labels(family.label_names, values)} {_format_value(metric.get())}")
+                    continue
+                cumulative = 0
+                for position, count in enumerate(metric.counts):
+                    cumulative += count
+                    bound = metric.bounds[position] if position < len(metric.bounds) else float('inf')
+                    labels = _format_labels(family.label_names, values, f'le="{_format_value(bound)}"')
+                    lines.append(f"{family.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(family.label_names, values)
+                lines.append(f"{family.name}_sum{labels} {_format_value(metric.sum)}")
+                lines.append(f"{family.name}_count{labels} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide metrics, e.g. the crypto operation timings.
+REGISTRY = MetricsRegistry()
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task that sleeps for a fixed interval. A
+    consistently high lag means callbacks are blocking the loop.
+    """
+
+    def __init__(self, histogram: Histogram, gauge: Gauge = None, interval: float = DEFAULT_LAG_INTERVAL):
+        """
+        Args:
+            histogram (Histogram): Receives every lag sample (seconds).
+            gauge (Gauge): If given, set to the latest lag sample.
+            interval (float): Seconds between probes.
+        """
+        self.histogram = histogram
+        self.gauge = gauge
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.histogram.observe(lag)
+            if self.gauge is not None:
+                self.gauge.set(lag)
@@ -0,0 +1,101 @@
+# utils/profiler.py
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Seconds between stack samples.
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# Frames kept per sampled stack, counted from the innermost one.
+MAX_STACK_DEPTH = 64
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    A statistical profiler that can be switched on and off in a running node.
+
+    While running, a background thread records the stack of the profiled thread (by default
+    the one that started it, i.e. the event loop) every `interval` seconds. Nothing is
+    hooked into the profiled code, so it costs nothing while stopped and little while
+    running. Stacks are aggregated in the collapsed format flame graph tools read.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, max_depth: int = MAX_STACK_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()    # "outer;...;inner" -> samples
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: int = None, interval: float = None):
+        """Starts sampling `thread_id` (default: the calling thread). Earlier samples are discarded."""
+        if self.running:
+            return
+        if interval:
+            self.interval = interval
+        self.stacks.clear()
+        self.samples = 0
+        self.started_at = time.time()
+        self._stop.clear()
+        target = thread_id if thread_id is not None else threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, args=(target,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        """Stops sampling and returns the report."""
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration = time.time() - self.started_at
+        return self.report()
+
+    def _sample(self, thread_id: int):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = 20) -> list[tuple[str, int, int]]:
+        """
+        Returns (function, own samples, samples anywhere on the stack) for the functions with
+        the most own samples, i.e. where the profiled thread was actually running.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return [(label, count, total[label]) for label, count in own.most_common(limit)]
+
+    def collapsed(self) -> str:
+        """The samples as "outer;...;inner count" lines, as read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self, limit: int = 20) -> dict:
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval": self.interval,
+            "duration": self.duration if not self.running else time.time() - self.started_at,
+            "top": [{"function": label, "own": own, "total": total} for label, own, total in self.top_functions(limit)]
+        }